@@ -0,0 +1,348 @@
+"""Adaptive question selection with online 1PL (Rasch) / Elo ability estimates.
+
+Each user has an ability `theta` and each question a difficulty `b`, both kept
+in flat float32 NumPy arrays indexed through id -> row dicts. The probability
+of a correct answer is sigmoid(theta - b). Every answer nudges both estimates
+Elo-style, with a step size that shrinks as more answers are seen.
+
+Selection picks the questions with the most Fisher information for the user,
+p * (1 - p), i.e. the ones whose difficulty is closest to the user's ability.
+A difficulty-sorted snapshot is kept so a selection is a binary search plus a
+small window scan instead of a pass over every question. The snapshot is
+refreshed in the background once enough difficulties have drifted.
+
+State is checkpointed to the `user_abilities` / `question_difficulties` tables;
+only rows touched since the last checkpoint are written. Every gunicorn worker
+has its own engine, so a checkpoint upserts: the estimate is the last one
+written, and `answers` grows by the answers this process saw since its last
+checkpoint rather than being overwritten.
+"""
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger('backend')
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -30.0, 30.0)))
+
+
+class _Table:
+    """Growable id -> row mapping with value and answer count arrays and dirty tracking.
+
+    `persisted` is the part of each count already stored in the database.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.index: Dict[int, int] = {}
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.value = np.zeros(capacity, dtype=np.float32)
+        self.count = np.zeros(capacity, dtype=np.int32)
+        self.persisted = np.zeros(capacity, dtype=np.int32)
+        self.dirty = set()
+        self.size = 0
+
+    def _grow(self, need: int):
+        cap = len(self.ids)
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2)
+        for name in ('ids', 'value', 'count', 'persisted'):
+            old = getattr(self, name)
+            arr = np.zeros(new_cap, dtype=old.dtype)
+            arr[:self.size] = old[:self.size]
+            setattr(self, name, arr)
+
+    def memory_bytes(self) -> int:
+        arrays = self.ids.nbytes + self.value.nbytes + self.count.nbytes + self.persisted.nbytes
+        return int(arrays + sys.getsizeof(self.index) + sys.getsizeof(self.dirty))
+
+    def rows(self, ids: Iterable[int], create: bool = True) -> np.ndarray:
+        out = []
+        for i in ids:
+            i = int(i)
+            r = self.index.get(i)
+            if r is None:
+                if not create:
+                    r = -1
+                else:
+                    self._grow(self.size + 1)
+                    r = self.size
+                    self.ids[r] = i
+                    self.index[i] = r
+                    self.size += 1
+            out.append(r)
+        return np.asarray(out, dtype=np.int64)
+
+    def load(self, ids: Sequence[int], values: Sequence[float], counts: Sequence[int], saved: bool):
+        rows = self.rows(ids)
+        if len(rows):
+            self.value[rows] = np.asarray(values, dtype=np.float32)
+            self.count[rows] = np.asarray(counts, dtype=np.int32)
+            self.persisted[rows] = self.count[rows] if saved else 0
+
+
+def _upsert(session, model, key: str, col: str, rows: List[dict], batch: int = 500):
+    """Insert rows, or on a key another process already wrote, set `col` and add to its `answers`."""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise NotImplementedError('adaptive checkpoints need SQLite or PostgreSQL, not %s' % dialect)
+    for lo in range(0, len(rows), batch):
+        stmt = insert(model).values(rows[lo:lo + batch])
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[key], set_={col: stmt.excluded[col], 'answers': model.answers + stmt.excluded.answers}))
+
+
+class AdaptiveEngine:
+    """Online ability/difficulty estimator and max-information question selector."""
+
+    def __init__(self, k_user: float = 0.4, k_question: float = 0.3, k_min: float = 0.05,
+                 window: int = 512, resort_fraction: float = 0.02, recent_window: int = 50):
+        self.users = _Table()
+        self.questions = _Table()
+        self.k_user = k_user
+        self.k_question = k_question
+        self.k_min = k_min
+        self.window = window
+        self.resort_fraction = resort_fraction
+        self._lock = threading.RLock()
+        # Difficulty-sorted snapshot: question rows ordered by b at snapshot time
+        self._order = np.zeros(0, dtype=np.int64)
+        self._sorted_b = np.zeros(0, dtype=np.float32)
+        self._drift = 0
+        self._resorting = False
+        self._recent: Dict[int, deque] = {}
+        self._recent_window = recent_window
+        self.max_question_id = 0
+        self.answers_recorded = 0
+
+    # -- registration -------------------------------------------------
+
+    def add_questions(self, question_ids: Sequence[int], difficulties: Optional[Sequence[float]] = None,
+                      counts: Optional[Sequence[int]] = None, saved: bool = False):
+        """Register questions (new ones start at difficulty 0) and rebuild the sorted snapshot."""
+        if not len(question_ids):
+            return
+        with self._lock:
+            n = len(question_ids)
+            self.questions.load(question_ids,
+                                difficulties if difficulties is not None else np.zeros(n),
+                                counts if counts is not None else np.zeros(n),
+                                saved)
+            self.max_question_id = max(self.max_question_id, int(np.max(question_ids)))
+            self._resort()
+
+    def add_users(self, user_ids: Sequence[int], abilities: Sequence[float], counts: Sequence[int], saved: bool = True):
+        with self._lock:
+            self.users.load(user_ids, abilities, counts, saved)
+
+    def ability(self, user_id: int) -> float:
+        r = self.users.index.get(int(user_id))
+        return float(self.users.value[r]) if r is not None else 0.0
+
+    def difficulty(self, question_id: int) -> Optional[float]:
+        r = self.questions.index.get(int(question_id))
+        return float(self.questions.value[r]) if r is not None else None
+
+    def known_questions(self, question_ids: Iterable[int]) -> bool:
+        """True when every id is a registered question."""
+        return all(int(i) in self.questions.index for i in question_ids)
+
+    # -- updates ------------------------------------------------------
+
+    def _step(self, base: float, counts: np.ndarray) -> np.ndarray:
+        return np.maximum(self.k_min, base / np.sqrt(1.0 + counts.astype(np.float32) / 4.0))
+
+    def record(self, user_id: int, question_id: int, correct: bool):
+        self.record_batch([user_id], [question_id], [correct])
+
+    def record_batch(self, user_ids: Sequence[int], question_ids: Sequence[int], correct: Sequence[bool]) -> int:
+        """Apply a batch of answers and return how many were applied. Probabilities use the
+        pre-batch estimates; repeated users/questions in one batch accumulate their updates.
+
+        Answers to questions that aren't registered (see `add_questions` / `sync_questions`)
+        are dropped: question ids come from clients and must not create questions.
+        """
+        if not len(user_ids):
+            return 0
+        with self._lock:
+            q = self.questions.rows(question_ids, create=False)
+            known = q >= 0
+            if not known.all():
+                user_ids = np.asarray(user_ids)[known]
+                correct = np.asarray(correct)[known]
+                q = q[known]
+                if not len(q):
+                    return 0
+            u = self.users.rows(user_ids)
+            y = np.asarray(correct, dtype=np.float32)
+            theta = self.users.value
+            b = self.questions.value
+            resid = y - _sigmoid(theta[u] - b[q])
+            du = self._step(self.k_user, self.users.count[u]) * resid
+            dq = self._step(self.k_question, self.questions.count[q]) * resid
+            np.add.at(theta, u, du)
+            np.subtract.at(b, q, dq)
+            np.add.at(self.users.count, u, 1)
+            np.add.at(self.questions.count, q, 1)
+            self.users.dirty.update(u.tolist())
+            self.questions.dirty.update(q.tolist())
+            self.answers_recorded += len(u)
+            self._drift += len(q)
+            if self._drift > self.resort_fraction * max(1, self.questions.size) and not self._resorting:
+                self._resorting = True
+                threading.Thread(target=self._resort_background, daemon=True).start()
+            return len(q)
+
+    def _resort(self):
+        n = self.questions.size
+        b = self.questions.value[:n].copy()
+        order = np.argsort(b, kind='stable')
+        self._order = order
+        self._sorted_b = b[order]
+        self._drift = 0
+
+    def _resort_background(self):
+        try:
+            with self._lock:
+                n = self.questions.size
+                b = self.questions.value[:n].copy()
+            # The sort itself runs outside the lock; the snapshot is swapped in atomically
+            order = np.argsort(b, kind='stable')
+            sorted_b = b[order]
+            with self._lock:
+                if len(order) == self.questions.size:
+                    self._order, self._sorted_b = order, sorted_b
+                    self._drift = 0
+        finally:
+            self._resorting = False
+
+    # -- selection ----------------------------------------------------
+
+    def select(self, user_id: int, k: int = 5, exclude: Iterable[int] = (),
+               candidates: Optional[Sequence[int]] = None, remember: bool = True) -> List[int]:
+        """Return up to k question ids with the highest information for the user.
+
+        `candidates` restricts the pool (e.g. one lecture's questions); otherwise a
+        window of the difficulty-sorted snapshot around the user's ability is scanned.
+        Questions recently served to the user and ids in `exclude` are skipped.
+        """
+        with self._lock:
+            theta = self.ability(user_id)
+            recent = self._recent.get(int(user_id))
+            skip = set(int(x) for x in exclude)
+            if recent:
+                skip.update(recent)
+            if candidates is not None:
+                rows = self.questions.rows(candidates, create=False)
+                rows = rows[rows >= 0]
+            else:
+                n = len(self._order)
+                if n == 0:
+                    return []
+                half = max(self.window, k + len(skip)) // 2
+                # Search with a float32 scalar; a float64 one would upcast the whole array
+                pos = int(np.searchsorted(self._sorted_b, np.float32(theta)))
+                lo, hi = max(0, pos - half), min(n, pos + half)
+                rows = self._order[lo:hi]
+            if skip and len(rows):
+                ids = self.questions.ids[rows].tolist()
+                rows = rows[np.fromiter((i not in skip for i in ids), dtype=bool, count=len(ids))]
+            if not len(rows):
+                return []
+            p = _sigmoid(theta - self.questions.value[rows])
+            info = p * (1.0 - p)
+            if len(rows) > k:
+                top = np.argpartition(-info, k - 1)[:k]
+                top = top[np.argsort(-info[top], kind='stable')]
+            else:
+                top = np.argsort(-info, kind='stable')
+            chosen = [int(x) for x in self.questions.ids[rows[top]]]
+            if remember and self._recent_window:
+                dq = self._recent.setdefault(int(user_id), deque(maxlen=self._recent_window))
+                dq.extend(chosen)
+            return chosen
+
+    # -- persistence --------------------------------------------------
+
+    def memory_bytes(self) -> int:
+        """Estimate arrays, the difficulty-sorted snapshot and container overhead (not the int keys)."""
+        with self._lock:
+            recent = sum(sys.getsizeof(d) for d in self._recent.values())
+            return int(self.users.memory_bytes() + self.questions.memory_bytes() + self._order.nbytes
+                       + self._sorted_b.nbytes + sys.getsizeof(self._recent) + recent)
+
+    @property
+    def pending_writes(self) -> int:
+        return len(self.users.dirty) + len(self.questions.dirty)
+
+    def load(self, session):
+        """Load every question id plus any checkpointed estimates from the database."""
+        from models import Question, QuestionDifficulty, UserAbility
+        q_ids = np.fromiter((r[0] for r in session.query(Question.id)), dtype=np.int64)
+        diffs = session.query(QuestionDifficulty.question_id, QuestionDifficulty.difficulty, QuestionDifficulty.answers).all()
+        users = session.query(UserAbility.user_id, UserAbility.ability, UserAbility.answers).all()
+        with self._lock:
+            if len(q_ids):
+                self.questions.load(q_ids, np.zeros(len(q_ids)), np.zeros(len(q_ids)), False)
+                self.max_question_id = int(q_ids.max())
+            if diffs:
+                self.questions.load([d[0] for d in diffs], [d[1] for d in diffs], [d[2] for d in diffs], True)
+            if users:
+                self.users.load([u[0] for u in users], [u[1] for u in users], [u[2] for u in users], True)
+            self._resort()
+        logger.info('adaptive: loaded %d questions, %d difficulty and %d ability estimates',
+                    self.questions.size, len(diffs), len(users))
+
+    def sync_questions(self, session):
+        """Register questions created since the last load/sync."""
+        from models import Question
+        new_ids = [r[0] for r in session.query(Question.id).filter(Question.id > self.max_question_id)]
+        if new_ids:
+            self.add_questions(new_ids)
+
+    def checkpoint(self, session) -> int:
+        """Write estimates changed since the last checkpoint and commit.
+
+        On failure the rows are marked dirty again so the next checkpoint retries them.
+        """
+        from models import QuestionDifficulty, UserAbility
+        with self._lock:
+            jobs = [
+                (self.users, UserAbility, 'user_id', 'ability'),
+                (self.questions, QuestionDifficulty, 'question_id', 'difficulty'),
+            ]
+            snapshots = []
+            for table, model, key, col in jobs:
+                rows = np.fromiter(table.dirty, dtype=np.int64, count=len(table.dirty))
+                table.dirty = set()
+                counts = table.count[rows].copy()
+                snapshots.append((table, model, key, col, rows, table.ids[rows].tolist(), table.value[rows].tolist(),
+                                  counts, (counts - table.persisted[rows]).tolist()))
+        written = 0
+        try:
+            for table, model, key, col, rows, ids, vals, counts, new in snapshots:
+                _upsert(session, model, key, col, [{key: i, col: v, 'answers': n} for i, v, n in zip(ids, vals, new)])
+                written += len(ids)
+            session.commit()
+        except Exception:
+            session.rollback()
+            with self._lock:
+                for table, _, _, _, rows, *_ in snapshots:
+                    table.dirty.update(rows.tolist())
+            raise
+        with self._lock:
+            for table, _, _, _, rows, _, _, counts, _ in snapshots:
+                table.persisted[rows] = counts
+        return written
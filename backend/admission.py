@@ -0,0 +1,181 @@
+"""Admission control for model inference routes.
+
+Each model gets a `Gate`: a fixed number of concurrent inference slots plus a
+small bounded FIFO wait queue. A request is shed before any work starts when:
+  - the queue is full (429), or
+  - its deadline can't be met given the queue ahead of it and the observed
+    service time (503), or
+  - its deadline passes while it is still queued (503).
+Every rejection carries a Retry-After estimate. Bounding the waiters bounds the
+number of server threads that inference can tie up, so cheap routes such as
+/health keep responding while the models are saturated.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+DEFAULT_EWMA_ALPHA = 0.2
+
+
+class Rejected(Exception):
+    """Request shed by admission control; maps to an HTTP error with Retry-After."""
+
+    def __init__(self, gate: str, status: int, reason: str, retry_after: float):
+        super().__init__('%s: %s' % (gate, reason))
+        self.gate = gate
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+    def to_dict(self) -> dict:
+        return {'error': 'Server busy, retry later', 'reason': self.reason, 'model': self.gate,
+                'retry_after': self.retry_after}
+
+
+class _Waiter:
+    __slots__ = ('granted', 'event')
+
+    def __init__(self):
+        self.granted = False
+        self.event = threading.Event()
+
+
+class _Slot:
+    def __init__(self, gate: 'Gate'):
+        self.gate = gate
+        self.started = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.gate._release(time.monotonic() - self.started)
+        return False
+
+
+class Gate:
+    def __init__(self, name: str, concurrency: int = 1, max_queue: int = 2,
+                 service_time: Optional[float] = None, alpha: float = DEFAULT_EWMA_ALPHA):
+        if concurrency < 1 or max_queue < 0:
+            raise ValueError('concurrency must be >= 1 and max_queue >= 0')
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.alpha = alpha
+        # EWMA of seconds per request; None until the first request completes
+        self.service_time = service_time
+        self._lock = threading.Lock()
+        self._waiters: deque = deque()
+        self._in_flight = 0
+        self._stats = {'admitted': 0, 'completed': 0, 'shed_queue_full': 0, 'shed_deadline': 0,
+                       'expired_in_queue': 0, 'max_queue_depth': 0}
+
+    def _expected_wait(self, ahead: int) -> float:
+        """Seconds until a request with `ahead` waiters in front of it gets a slot."""
+        if not self.service_time:
+            return 0.0
+        busy = self._in_flight + ahead - self.concurrency + 1
+        return max(0, busy) / self.concurrency * self.service_time
+
+    def admit(self, deadline: Optional[float] = None) -> _Slot:
+        """Take an inference slot, waiting in the queue if needed.
+
+        `deadline` is an absolute time.monotonic() value (None = wait as long as
+        the queue allows). Raises Rejected instead of waiting pointlessly.
+        """
+        with self._lock:
+            ahead = len(self._waiters)
+            if self._in_flight < self.concurrency and not ahead:
+                self._in_flight += 1
+                self._stats['admitted'] += 1
+                return _Slot(self)
+            wait = self._expected_wait(ahead)
+            if ahead >= self.max_queue:
+                self._stats['shed_queue_full'] += 1
+                raise Rejected(self.name, 429, 'queue full', wait or 1)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or wait + (self.service_time or 0.0) > remaining:
+                    self._stats['shed_deadline'] += 1
+                    raise Rejected(self.name, 503, 'deadline cannot be met', wait or 1)
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+            if len(self._waiters) > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = len(self._waiters)
+
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        waiter.event.wait(timeout)
+        with self._lock:
+            if waiter.granted:
+                self._stats['admitted'] += 1
+                return _Slot(self)
+            self._waiters.remove(waiter)
+            self._stats['expired_in_queue'] += 1
+            wait = self._expected_wait(len(self._waiters))
+        raise Rejected(self.name, 503, 'deadline exceeded while queued', wait or 1)
+
+    def _release(self, elapsed: float):
+        with self._lock:
+            self._stats['completed'] += 1
+            if self.service_time is None:
+                self.service_time = elapsed
+            else:
+                self.service_time += self.alpha * (elapsed - self.service_time)
+            if self._waiters:
+                # Hand the slot straight to the oldest waiter; in-flight count is unchanged
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self._in_flight -= 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            m = dict(self._stats)
+            m['in_flight'] = self._in_flight
+            m['queue_depth'] = len(self._waiters)
+        m['concurrency'] = self.concurrency
+        m['max_queue'] = self.max_queue
+        m['shed_total'] = m['shed_queue_full'] + m['shed_deadline'] + m['expired_in_queue']
+        m['service_time_ms'] = round(self.service_time * 1000.0, 1) if self.service_time else None
+        return m
+
+
+class AdmissionController:
+    """Registry of per-model gates sharing one default configuration."""
+
+    def __init__(self, concurrency: int = 1, max_queue: int = 2):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._gates: Dict[str, Gate] = {}
+        self._lock = threading.Lock()
+
+    def gate(self, name: str) -> Gate:
+        with self._lock:
+            g = self._gates.get(name)
+            if g is None:
+                g = self._gates[name] = Gate(name, self.concurrency, self.max_queue)
+            return g
+
+    def metrics(self) -> dict:
+        with self._lock:
+            gates = dict(self._gates)
+        return {name: g.metrics() for name, g in gates.items()}
+
+
+def parse_deadline(header_value, body_value, default_ms: float = 0.0) -> Optional[float]:
+    """Turn a relative budget in ms (header wins over body) into a time.monotonic() deadline."""
+    for raw in (header_value, body_value):
+        if raw is None or raw == '':
+            continue
+        try:
+            ms = float(raw)
+        except (TypeError, ValueError):
+            continue
+        if ms > 0:
+            return time.monotonic() + ms / 1000.0
+    return time.monotonic() + default_ms / 1000.0 if default_ms > 0 else None
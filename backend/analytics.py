@@ -0,0 +1,636 @@
+"""Vectorized quiz analytics over the quiz_results table.
+
+The score columns (id, user, lecture, score, day) are bulk-loaded into NumPy
+arrays. quiz_results is append-only, so each refresh reads only the rows past
+the last loaded id and folds them into running aggregates:
+
+  users     attempts, score sum / sum of squares, best, last, first/last day
+  lectures  a 101-bin score histogram (scores are percentages), which gives
+            counts, means, pass rates and exact percentiles
+  weeks     attempts, score sum, passes, active learner-days and learners
+
+Every step is a few whole-array passes (bincount, argsort, searchsorted), so a
+refresh costs O(new rows) and queries read aggregates instead of rescanning.
+A shrinking max id (table reset) triggers a full reload. Readers hold an
+immutable Snapshot; a refresh publishes a new one when results are written,
+either in this process (`table_versions.bump`) or in another one (max id
+polled every `max_staleness` seconds).
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+import table_versions
+
+logger = logging.getLogger('backend')
+
+TABLE = 'quiz_results'
+PASS_SCORE = 60
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+SCORE_BINS = 101  # histogram bins for scores 0..100 (values outside are clipped)
+_UNIX_EPOCH_JD = 2440587.5
+_COLUMNS = (('id', np.int64), ('user', np.int32), ('lecture', np.int32), ('score', np.int32), ('day', np.int32))
+
+
+def numeric(column: str, sqlite: bool, types=('integer',)) -> str:
+    """SQL for `column` with NULL as 0. SQLite keeps whatever the API stored (column affinity only
+    converts numeric-looking text), so on SQLite values of other storage types read as 0 too."""
+    if not sqlite:
+        return 'COALESCE(%s, 0)' % column
+    return "CASE WHEN typeof(%s) IN (%s) THEN %s ELSE 0 END" % (column, ', '.join("'%s'" % t for t in types), column)
+
+
+def load_columns(conn, since_id: int = 0, chunk: int = 100_000) -> Dict[str, np.ndarray]:
+    """Rows with id > since_id as column arrays; NULL or non-numeric user/lecture/score -> 0, NULL date -> day -1.
+
+    `day` is days since 1970-01-01. On SQLite it is computed in SQL and rows are
+    read straight off the DBAPI cursor: building arrays from SQLAlchemy Row
+    objects is an order of magnitude slower than from plain tuples.
+    """
+    sqlite = conn.dialect.name == 'sqlite'
+    day = 'COALESCE(CAST(julianday(date) - %s AS INTEGER), -1)' % _UNIX_EPOCH_JD if sqlite else 'date'
+    sql = ('SELECT id, %s, %s, %s, %s FROM %s WHERE id > %%s ORDER BY id'
+           % (numeric('user_id', sqlite), numeric('lecture_id', sqlite),
+              numeric('score', sqlite, ('integer', 'real')), day, TABLE))
+    parts: List[np.ndarray] = []
+    if sqlite:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(sql % '?', (since_id,))
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    break
+                parts.append(np.fromiter(itertools.chain.from_iterable(rows), np.int64, count=5 * len(rows)))
+        finally:
+            cursor.close()
+    else:
+        from sqlalchemy import text
+        result = conn.execution_options(stream_results=True).execute(text(sql % ':since'), {'since': since_id})
+        for rows in result.partitions(chunk):
+            dates = np.array([r[4].date() if r[4] is not None else 'NaT' for r in rows], dtype='datetime64[D]')
+            days = np.where(np.isnat(dates), -1, dates.astype(np.int64))
+            parts.append(np.array([tuple(r[:4]) + (d,) for r, d in zip(rows, days.tolist())], dtype=np.int64).ravel())
+    block = np.concatenate(parts).reshape(-1, 5) if parts else np.empty((0, 5), np.int64)
+    return {name: block[:, i].astype(dtype) for i, (name, dtype) in enumerate(_COLUMNS)}
+
+
+def _week(days):
+    """Week number (Monday start) of days since the epoch; 1970-01-01 was a Thursday."""
+    return (days + 3) // 7
+
+
+def _week_label(week: int) -> str:
+    return str(np.datetime64(int(week) * 7 - 3, 'D'))
+
+
+def _hist_percentiles(hist: np.ndarray, qs) -> np.ndarray:
+    """Percentiles (linear interpolation, as np.percentile) of many score histograms: shape (rows, len(qs)).
+
+    Every row must have at least one count. Each row's cumulative counts are
+    shifted past the previous rows' so that one searchsorted covers them all.
+    """
+    counts = hist.sum(axis=1)
+    rows = np.arange(len(hist), dtype=np.int64)[:, None]
+    shift = rows * (int(counts.max()) + 1)
+    flat = (np.cumsum(hist, axis=1) + shift).ravel()
+    pos = (counts[:, None] - 1) * (np.asarray(qs, dtype=np.float64)[None, :] / 100.0)
+    lo, hi = np.floor(pos).astype(np.int64), np.ceil(pos).astype(np.int64)
+
+    def value(rank):  # smallest score whose cumulative count exceeds rank
+        return np.searchsorted(flat, rank + shift, side='right') - rows * hist.shape[1]
+
+    frac = pos - lo
+    return value(lo) * (1.0 - frac) + value(hi) * frac
+
+
+def _slope(y: np.ndarray) -> float:
+    """Least-squares slope of y over 0..n-1 (0 for fewer than two points)."""
+    if len(y) < 2:
+        return 0.0
+    x = np.arange(len(y), dtype=np.float64) - (len(y) - 1) / 2.0
+    return float((x * (y - y.mean())).sum() / (x * x).sum())
+
+
+def _series(weeks, attempts, total, passes, active_days, learners) -> dict:
+    attempts = np.asarray(attempts, dtype=np.float64)
+    learners = np.asarray(learners, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mastery = total / attempts
+        accuracy = passes / attempts * 100.0
+        engagement = np.where(learners > 0, active_days / (learners * 7.0) * 100.0, 0.0)
+    return {
+        'weeks': [_week_label(w) for w in weeks],
+        'mastery': np.rint(mastery).astype(int).tolist(),
+        'engagement': np.rint(engagement).astype(int).tolist(),
+        'accuracy': np.rint(accuracy).astype(int).tolist(),
+        'attempts': attempts.astype(int).tolist(),
+    }
+
+
+def weekly_series(users: np.ndarray, scores: np.ndarray, days: np.ndarray, pass_score: int = PASS_SCORE) -> dict:
+    """Per-week (Monday start) metrics over the given rows, all 0-100 except attempts.
+
+    mastery     mean score
+    accuracy    share of attempts scoring at least `pass_score`
+    engagement  share of days identified learners were active in the weeks they practised
+    """
+    keep = days >= 0
+    users, scores, days = users[keep], scores[keep].astype(np.float64), days[keep].astype(np.int64)
+    if not len(days):
+        return _series([], [], [], [], [], [])
+    weeks = _week(days)
+    first = int(weeks.min())
+    w = weeks - first
+    n = int(w.max()) + 1
+    known = users != 0
+    user_days = np.unique((users[known].astype(np.int64) << 32) | days[known])
+    pair_weeks = _week(user_days & 0xFFFFFFFF)
+    user_weeks = np.unique(((user_days >> 32) << 32) | pair_weeks)
+    attempts = np.bincount(w, minlength=n)
+    present = np.flatnonzero(attempts)
+    return _series(present + first, attempts[present], np.bincount(w, scores, n)[present],
+                   np.bincount(w, scores >= pass_score, n)[present],
+                   np.bincount(pair_weeks - first, minlength=n)[present],
+                   np.bincount((user_weeks & 0xFFFFFFFF) - first, minlength=n)[present])
+
+
+class _Keyed:
+    """Aggregate arrays for a growing set of integer keys, kept sorted so lookups are one searchsorted."""
+
+    def __init__(self, fields: dict):
+        self.fields = fields  # name -> (dtype, fill, trailing shape)
+        self.keys = np.empty(0, np.int64)
+        self.data = {name: np.full((0,) + shape, fill, dtype) for name, (dtype, fill, shape) in fields.items()}
+
+    def copy(self) -> '_Keyed':
+        other = _Keyed.__new__(_Keyed)
+        other.fields = self.fields
+        other.keys = self.keys
+        other.data = {name: arr.copy() for name, arr in self.data.items()}
+        return other
+
+    def positions(self, keys: np.ndarray) -> np.ndarray:
+        """Index of each key, adding missing keys (and re-laying out the arrays) first."""
+        new = np.setdiff1d(np.unique(keys), self.keys, assume_unique=True)
+        if len(new):
+            merged = np.union1d(self.keys, new)
+            at = np.searchsorted(merged, self.keys)
+            for name, (dtype, fill, shape) in self.fields.items():
+                grown = np.full((len(merged),) + shape, fill, dtype)
+                grown[at] = self.data[name]
+                self.data[name] = grown
+            self.keys = merged
+        return self.lookup(keys)
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Index of each (present) key."""
+        if len(self.keys) and self.keys[0] >= 0 and self.keys[-1] < 4 * len(self.keys) + 65536:
+            # Compact key range (autoincrement ids, week numbers): one gather instead of a binary search per key
+            table = np.zeros(int(self.keys[-1]) + 1, np.int64)
+            table[self.keys] = np.arange(len(self.keys))
+            return table[keys]
+        return np.searchsorted(self.keys, keys)
+
+    def find(self, key: int) -> Optional[int]:
+        i = int(np.searchsorted(self.keys, key))
+        return i if i < len(self.keys) and self.keys[i] == key else None
+
+
+_NO_DAY = np.iinfo(np.int64).max
+
+
+class Aggregates:
+    """Running per-user, per-lecture, per-week and global aggregates, updated one batch of rows at a time."""
+
+    def __init__(self, pass_score: int = PASS_SCORE):
+        self.pass_score = pass_score
+        self.hist = np.zeros(SCORE_BINS, np.int64)
+        self.users = _Keyed({
+            'count': (np.int64, 0, ()), 'sum': (np.float64, 0.0, ()), 'sumsq': (np.float64, 0.0, ()),
+            'best': (np.int64, np.iinfo(np.int64).min, ()), 'last': (np.int64, 0, ()),
+            'first_day': (np.int64, -1, ()), 'last_day': (np.int64, -1, ()),
+        })
+        self.lectures = _Keyed({'hist': (np.int64, 0, (SCORE_BINS,))})
+        self.weeks = _Keyed({'attempts': (np.int64, 0, ()), 'sum': (np.float64, 0.0, ()), 'passes': (np.int64, 0, ()),
+                             'active_days': (np.int64, 0, ()), 'learners': (np.int64, 0, ())})
+        self.engagement_rebuilds = 0
+
+    def copy(self) -> 'Aggregates':
+        other = Aggregates.__new__(Aggregates)
+        other.pass_score = self.pass_score
+        other.hist = self.hist.copy()
+        other.users, other.lectures, other.weeks = self.users.copy(), self.lectures.copy(), self.weeks.copy()
+        other.engagement_rebuilds = self.engagement_rebuilds
+        return other
+
+    def update(self, cols: Dict[str, np.ndarray]) -> bool:
+        """Fold in a batch of rows (in id order). Returns False if engagement needs `rebuild_engagement`."""
+        users, lectures = cols['user'], cols['lecture']
+        scores, days = cols['score'].astype(np.int64), cols['day'].astype(np.int64)
+        bins = np.clip(scores, 0, SCORE_BINS - 1)
+        self.hist += np.bincount(bins, minlength=SCORE_BINS)
+
+        m = lectures != 0
+        if m.any():
+            lp = self.lectures.positions(lectures[m])
+            size = len(self.lectures.keys) * SCORE_BINS
+            self.lectures.data['hist'] += np.bincount(lp * SCORE_BINS + bins[m], minlength=size).reshape(-1, SCORE_BINS)
+
+        dated = days >= 0
+        if dated.any():
+            wp = self.weeks.positions(_week(days[dated]))
+            k, W = len(self.weeks.keys), self.weeks.data
+            W['attempts'] += np.bincount(wp, minlength=k)
+            W['sum'] += np.bincount(wp, scores[dated], k)
+            W['passes'] += np.bincount(wp, scores[dated] >= self.pass_score, k).astype(np.int64)
+
+        m = users != 0
+        if not m.any():
+            return True
+        up = self.users.positions(users[m])
+        s, d = scores[m], days[m]
+        k, U = len(self.users.keys), self.users.data
+        counts = np.bincount(up, minlength=k)
+        U['count'] += counts
+        U['sum'] += np.bincount(up, s, k)
+        U['sumsq'] += np.bincount(up, s.astype(np.float64) ** 2, k)
+        # Group rows by user; the stable sort keeps each user's rows in id order
+        order = np.argsort(up, kind='stable')
+        present = np.flatnonzero(counts)
+        ends = np.cumsum(counts[present])
+        starts = ends - counts[present]
+        gs, gd = s[order], d[order]
+        U['best'][present] = np.maximum(U['best'][present], np.maximum.reduceat(gs, starts))
+        U['last'][present] = gs[ends - 1]
+        first_dated = np.minimum.reduceat(np.where(gd >= 0, gd, _NO_DAY), starts)
+        fresh = (U['first_day'][present] < 0) & (first_dated != _NO_DAY)
+        U['first_day'][present[fresh]] = first_dated[fresh]
+        return self._update_engagement(up[order], gd)
+
+    def _update_engagement(self, gu: np.ndarray, gd: np.ndarray) -> bool:
+        """Count new (learner, day) and (learner, week) pairs among rows grouped by user.
+
+        Exact as long as a learner's days never go backwards in id order (rows are
+        stamped at insert time): a pair is then new iff it differs from the
+        learner's previous row, or from their last active day for the first row.
+        """
+        keep = gd >= 0
+        gu, gd = gu[keep], gd[keep]
+        if not len(gu):
+            return True
+        U = self.users.data
+        first = np.ones(len(gu), bool)
+        first[1:] = gu[1:] != gu[:-1]
+        prev = np.empty_like(gd)
+        prev[1:] = gd[:-1]
+        prev[first] = U['last_day'][gu[first]]
+        if np.any((prev >= 0) & (gd < prev)):
+            return False
+        gw = _week(gd)
+        k = len(self.weeks.keys)
+        self.weeks.data['active_days'] += np.bincount(self.weeks.lookup(gw[gd != prev]), minlength=k)
+        new_week = (prev < 0) | (gw != _week(prev))
+        self.weeks.data['learners'] += np.bincount(self.weeks.lookup(gw[new_week]), minlength=k)
+        last = np.flatnonzero(np.append(first[1:], True))
+        U['last_day'][gu[last]] = gd[last]
+        return True
+
+    def rebuild_engagement(self, cols: Dict[str, np.ndarray]):
+        """Recount learner-days and learner-weeks from all rows (after out-of-order dates)."""
+        self.engagement_rebuilds += 1
+        keep = (cols['user'] != 0) & (cols['day'] >= 0)
+        user_days = np.unique((cols['user'][keep].astype(np.int64) << 32) | cols['day'][keep].astype(np.int64))
+        pair_weeks = _week(user_days & 0xFFFFFFFF)
+        user_weeks = np.unique(((user_days >> 32) << 32) | pair_weeks)
+        k = len(self.weeks.keys)
+        self.weeks.data['active_days'] = np.bincount(self.weeks.lookup(pair_weeks), minlength=k)
+        self.weeks.data['learners'] = np.bincount(self.weeks.lookup(user_weeks & 0xFFFFFFFF), minlength=k)
+        # Pairs are sorted by user then day, so each user's last pair holds their latest day
+        pair_users = user_days >> 32
+        last = np.flatnonzero(np.append(pair_users[1:] != pair_users[:-1], True))
+        self.users.data['last_day'][self.users.lookup(pair_users[last])] = user_days[last] & 0xFFFFFFFF
+
+
+class _ColumnBuffer:
+    """Append-only column storage with doubling capacity; views of the first n rows never change."""
+
+    def __init__(self):
+        self._buf = {name: np.empty(0, dtype) for name, dtype in _COLUMNS}
+        self.n = 0
+
+    def append(self, cols: Dict[str, np.ndarray]):
+        k = len(cols['id'])
+        if self.n + k > len(self._buf['id']):
+            capacity = max(1024, 2 * (self.n + k))
+            for name, dtype in _COLUMNS:
+                grown = np.empty(capacity, dtype)
+                grown[:self.n] = self._buf[name][:self.n]
+                self._buf[name] = grown
+        for name, _ in _COLUMNS:
+            self._buf[name][self.n:self.n + k] = cols[name]
+        self.n += k
+
+    def view(self) -> Dict[str, np.ndarray]:
+        return {name: self._buf[name][:self.n] for name, _ in _COLUMNS}
+
+
+class Snapshot:
+    """Immutable row columns and aggregates as of `last_id`, plus memoized derived tables."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], aggregates: Aggregates, trend_window: int = 10):
+        self.ids = columns['id']
+        self.users = columns['user']
+        self.lectures = columns['lecture']
+        self.scores = columns['score']
+        self.days = columns['day']
+        self.agg = aggregates
+        self.trend_window = trend_window
+        self.pass_score = aggregates.pass_score
+        self.last_id = int(self.ids[-1]) if len(self.ids) else 0
+        self._memo: dict = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cached(self, key, build):
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = build()
+            return self._memo[key]
+
+    def lecture_table(self, qs=DEFAULT_PERCENTILES) -> dict:
+        """Per-lecture attempts, mean, pass rate, difficulty and score percentiles (ascending lecture id)."""
+        return self._cached(('lectures', tuple(qs)), lambda: self._build_lecture_table(qs))
+
+    def _build_lecture_table(self, qs) -> dict:
+        hist = self.agg.lectures.data['hist']
+        counts = hist.sum(axis=1)
+        mean = hist @ np.arange(SCORE_BINS) / np.maximum(counts, 1)
+        passed = hist[:, self.pass_score:].sum(axis=1) / np.maximum(counts, 1)
+        pct = _hist_percentiles(hist, qs) if len(hist) else np.empty((0, len(qs)))
+        return {'ids': self.agg.lectures.keys, 'attempts': counts, 'mean': mean, 'pass_rate': passed,
+                'difficulty': 1.0 - mean / 100.0, 'percentiles': pct, 'qs': tuple(qs)}
+
+    def cohort(self, min_attempts: int = 1, lecture_id: Optional[int] = None) -> dict:
+        """Users ranked by mean score (ties: more attempts, then lower id) with competition ranks."""
+        return self._cached(('cohort', min_attempts, lecture_id), lambda: self._build_cohort(min_attempts, lecture_id))
+
+    def _build_cohort(self, min_attempts, lecture_id) -> dict:
+        if lecture_id is None:
+            ids, counts = self.agg.users.keys, self.agg.users.data['count']
+            mean = self.agg.users.data['sum'] / np.maximum(counts, 1)
+        else:
+            mask = (self.lectures == lecture_id) & (self.users != 0)
+            ids, inverse = np.unique(self.users[mask], return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(ids))
+            mean = np.bincount(inverse, self.scores[mask].astype(np.float64), len(ids)) / np.maximum(counts, 1)
+        keep = counts >= min_attempts
+        ids, counts, mean = ids[keep], counts[keep], mean[keep]
+        order = np.lexsort((ids, -counts, -mean))
+        ranked_means = mean[order]
+        # Competition ranking: 1 + number of users with a strictly higher mean
+        ranks = np.searchsorted(-ranked_means, -ranked_means, side='left') + 1
+        return {'ids': ids[order], 'mean': ranked_means, 'attempts': counts[order], 'ranks': ranks,
+                'ascending': ranked_means[::-1].copy()}
+
+    def cohort_weekly(self) -> dict:
+        W = self.agg.weeks.data
+        return self._cached('weekly', lambda: _series(self.agg.weeks.keys, W['attempts'], W['sum'], W['passes'],
+                                                      W['active_days'], W['learners']))
+
+
+def _percentile_dict(qs, values) -> dict:
+    return {('%g' % q): round(float(v), 2) for q, v in zip(qs, values)}
+
+
+class Analytics:
+    """Cached analytics over quiz_results for one engine.
+
+    `max_staleness`  seconds between max-id checks for writes from other processes.
+    `budget_ms`      once a refresh has taken longer than this, later refreshes run
+                     in the background while requests keep reading the previous
+                     snapshot.
+    """
+
+    def __init__(self, engine, max_staleness: float = 5.0, budget_ms: float = 250.0, min_attempts: int = 1,
+                 trend_window: int = 10, pass_score: int = PASS_SCORE):
+        self.engine = engine
+        self.max_staleness = max_staleness
+        self.budget_ms = budget_ms
+        self.min_attempts = min_attempts
+        self.trend_window = trend_window
+        self.pass_score = pass_score
+        self._snap: Optional[Snapshot] = None
+        self._columns = _ColumnBuffer()
+        self._seen_version = None
+        self._checked = 0.0
+        self._refresh_lock = threading.Lock()
+        self._background: Optional[threading.Thread] = None
+        self._stats = {'refreshes': 0, 'full_loads': 0, 'background_refreshes': 0, 'stale_reads': 0,
+                       'rows_loaded': 0, 'last_refresh_ms': 0.0}
+
+    # -- freshness -----------------------------------------------------------------
+    def _is_fresh(self) -> bool:
+        return (self._snap is not None and self._seen_version == table_versions.local(TABLE)
+                and time.monotonic() - self._checked < self.max_staleness)
+
+    def snapshot(self) -> Snapshot:
+        """Current snapshot, refreshed first if results were written since it was built."""
+        if self._is_fresh():
+            return self._snap
+        if self._snap is not None and self._stats['last_refresh_ms'] > self.budget_ms:
+            self._refresh_in_background()
+            self._stats['stale_reads'] += 1
+            return self._snap
+        if not self._refresh_lock.acquire(blocking=self._snap is None):
+            # Someone else is refreshing; the previous snapshot is at most one refresh old
+            self._stats['stale_reads'] += 1
+            return self._snap
+        try:
+            if not self._is_fresh():
+                self._refresh()
+        finally:
+            self._refresh_lock.release()
+        return self._snap
+
+    def refresh(self) -> Snapshot:
+        """Bring the snapshot up to date now, waiting for any refresh in progress."""
+        with self._refresh_lock:
+            self._refresh()
+        return self._snap
+
+    def _refresh_in_background(self):
+        if self._background is not None and self._background.is_alive():
+            return
+
+        def run():
+            with self._refresh_lock:
+                try:
+                    self._refresh()
+                except Exception:
+                    logger.exception('analytics: background refresh failed')
+
+        self._stats['background_refreshes'] += 1
+        self._background = threading.Thread(target=run, name='analytics-refresh', daemon=True)
+        self._background.start()
+
+    def _refresh(self):
+        t0 = time.perf_counter()
+        version = table_versions.local(TABLE)
+        snap = self._snap
+        with self.engine.connect() as conn:
+            newest = table_versions.max_id(conn, TABLE)
+            if snap is not None and newest == snap.last_id:
+                columns = None
+            elif snap is not None and newest > snap.last_id:
+                columns = load_columns(conn, snap.last_id)
+            else:
+                # First load, or rows were deleted (table reset): start over
+                snap, columns = None, load_columns(conn)
+                self._columns = _ColumnBuffer()
+                self._stats['full_loads'] += 1
+        if columns is not None:
+            self._stats['rows_loaded'] += len(columns['id'])
+            agg = snap.agg.copy() if snap is not None else Aggregates(self.pass_score)
+            self._columns.append(columns)
+            if not agg.update(columns):
+                agg.rebuild_engagement(self._columns.view())
+            snap = Snapshot(self._columns.view(), agg, self.trend_window)
+            # Build the shared tables now so requests find them ready
+            snap.lecture_table()
+            snap.cohort(self.min_attempts)
+            snap.cohort_weekly()
+            self._stats['refreshes'] += 1
+            self._stats['last_refresh_ms'] = (time.perf_counter() - t0) * 1000.0
+        self._snap = snap
+        self._seen_version = version
+        self._checked = time.monotonic()
+
+    def metrics(self) -> dict:
+        snap = self._snap
+        out = dict(self._stats)
+        out['last_refresh_ms'] = round(out['last_refresh_ms'], 2)
+        out['rows'] = len(snap) if snap is not None else 0
+        out['last_id'] = snap.last_id if snap is not None else 0
+        out['users'] = len(snap.agg.users.keys) if snap is not None else 0
+        out['lectures'] = len(snap.agg.lectures.keys) if snap is not None else 0
+        out['engagement_rebuilds'] = snap.agg.engagement_rebuilds if snap is not None else 0
+        out['snapshot_age_s'] = round(time.monotonic() - self._checked, 3) if snap is not None else None
+        out['budget_ms'] = self.budget_ms
+        return out
+
+    # -- queries ---------------------------------------------------------------
+    def user(self, user_id: int) -> Optional[dict]:
+        snap = self.snapshot()
+        i = snap.agg.users.find(user_id)
+        if i is None:
+            return None
+        U = snap.agg.users.data
+        count = int(U['count'][i])
+        mean = float(U['sum'][i]) / count
+        std = float(np.sqrt(max(float(U['sumsq'][i]) / count - mean * mean, 0.0)))
+        rows = np.flatnonzero(snap.users == user_id)
+        cohort = snap.cohort(self.min_attempts)
+        rank = percentile = None
+        if count >= self.min_attempts and len(cohort['ids']):
+            asc = cohort['ascending']
+            below = int(np.searchsorted(asc, mean, side='left'))
+            equal = int(np.searchsorted(asc, mean, side='right')) - below
+            rank = len(asc) - below - equal + 1
+            percentile = round((below + 0.5 * equal) / len(asc) * 100.0, 1)
+        return {
+            'user_id': user_id,
+            'attempts': count,
+            'mean': round(mean, 2),
+            'std': round(std, 2),
+            'best': int(U['best'][i]),
+            'last': int(U['last'][i]),
+            # Points gained per attempt over the most recent attempts
+            'trend': round(_slope(snap.scores[rows[-snap.trend_window:]].astype(np.float64)), 3),
+            'trend_window': snap.trend_window,
+            'rank': rank,
+            'cohort_size': int(len(cohort['ids'])),
+            'percentile': percentile,
+            'first_attempt': str(np.datetime64(int(U['first_day'][i]), 'D')) if U['first_day'][i] >= 0 else None,
+            'last_attempt': str(np.datetime64(int(U['last_day'][i]), 'D')) if U['last_day'][i] >= 0 else None,
+            'weekly': weekly_series(snap.users[rows], snap.scores[rows], snap.days[rows], snap.pass_score),
+        }
+
+    def _lecture_row(self, table: dict, i: int) -> dict:
+        return {
+            'lecture_id': int(table['ids'][i]),
+            'attempts': int(table['attempts'][i]),
+            'mean': round(float(table['mean'][i]), 2),
+            'pass_rate': round(float(table['pass_rate'][i]), 3),
+            'difficulty': round(float(table['difficulty'][i]), 3),
+            'percentiles': _percentile_dict(table['qs'], table['percentiles'][i]),
+        }
+
+    def lecture(self, lecture_id: int) -> Optional[dict]:
+        snap = self.snapshot()
+        i = snap.agg.lectures.find(lecture_id)
+        if i is None:
+            return None
+        out = self._lecture_row(snap.lecture_table(), i)
+        out['learners'] = int(len(np.unique(snap.users[(snap.lectures == lecture_id) & (snap.users != 0)])))
+        return out
+
+    def lectures(self, sort: str = 'difficulty', limit: int = 20, min_attempts: int = 1) -> List[dict]:
+        """Lectures ordered hardest first ('difficulty') or most attempted first ('attempts')."""
+        if sort not in ('difficulty', 'attempts'):
+            raise ValueError('sort must be "difficulty" or "attempts"')
+        table = self.snapshot().lecture_table()
+        candidates = np.flatnonzero(table['attempts'] >= min_attempts)
+        top = candidates[np.lexsort((table['ids'][candidates], -table[sort][candidates]))][:limit]
+        return [self._lecture_row(table, int(i)) for i in top]
+
+    def percentiles(self, qs: Iterable[float] = DEFAULT_PERCENTILES, user_id: Optional[int] = None,
+                    lecture_id: Optional[int] = None) -> dict:
+        qs = [float(q) for q in qs]
+        if any(q < 0 or q > 100 for q in qs):
+            raise ValueError('percentiles must be between 0 and 100')
+        snap = self.snapshot()
+        if user_id is None:
+            # Straight from the score histograms
+            if lecture_id is None:
+                hist = snap.agg.hist
+            else:
+                i = snap.agg.lectures.find(lecture_id)
+                hist = snap.agg.lectures.data['hist'][i] if i is not None else np.zeros(SCORE_BINS, np.int64)
+            count = int(hist.sum())
+            return {'count': count, 'percentiles': _percentile_dict(qs, _hist_percentiles(hist[None, :], qs)[0]) if count else {}}
+        mask = snap.users == user_id
+        if lecture_id is not None:
+            mask &= snap.lectures == lecture_id
+        values = snap.scores[mask]
+        return {'count': int(len(values)), 'percentiles': _percentile_dict(qs, np.percentile(values, qs)) if len(values) else {}}
+
+    def rankings(self, limit: int = 20, offset: int = 0, min_attempts: Optional[int] = None,
+                 lecture_id: Optional[int] = None) -> dict:
+        cohort = self.snapshot().cohort(self.min_attempts if min_attempts is None else min_attempts, lecture_id)
+        page = slice(offset, offset + limit)
+        return {
+            'cohort_size': int(len(cohort['ids'])),
+            'rankings': [{'rank': int(r), 'user_id': int(u), 'mean': round(float(m), 2), 'attempts': int(a)}
+                         for r, u, m, a in zip(cohort['ranks'][page], cohort['ids'][page], cohort['mean'][page],
+                                               cohort['attempts'][page])],
+        }
+
+    def weekly(self, user_id: Optional[int] = None, lecture_id: Optional[int] = None) -> dict:
+        snap = self.snapshot()
+        if user_id is None and lecture_id is None:
+            return snap.cohort_weekly()
+        mask = np.ones(len(snap), bool)
+        if user_id is not None:
+            mask &= snap.users == user_id
+        if lecture_id is not None:
+            mask &= snap.lectures == lecture_id
+        return weekly_series(snap.users[mask], snap.scores[mask], snap.days[mask], snap.pass_score)
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request
+from flask import Flask, g, has_request_context, jsonify, request
 from flask_cors import CORS
 
 # SQLAlchemy imports are optional at import-time because some Python
@@ -14,18 +14,22 @@ except Exception:
     sessionmaker = None
     func = None
     DB_AVAILABLE = False
+import atexit
 import json
 import threading
 import time
 import logging
 import os
+from datetime import datetime, timezone
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
 logger = logging.getLogger('backend')
 
 app = Flask(__name__)
-CORS(app)
+# Response headers browsers may read cross-origin (asgi.py sends the same list)
+CORS_EXPOSE_HEADERS = ['Retry-After', 'RateLimit-Limit', 'RateLimit-Remaining', 'RateLimit-Reset', 'ETag']
+CORS(app, expose_headers=CORS_EXPOSE_HEADERS)
 
 # Database setup (only if SQLAlchemy imported successfully)
 DB_URL = 'sqlite:///ai_active_learning.db'
@@ -45,6 +49,8 @@ try:
     # Import models to ensure tables are registered
     from models import Base
     Base.metadata.create_all(bind=engine)
+    from db_init import ensure_columns
+    ensure_columns(engine)
 except Exception:
     # Models may not be available if SQLAlchemy isn't installed — we'll handle that later
     pass
@@ -57,21 +63,42 @@ _hf_generator = None
 _hf_summarizer_ready = False
 _hf_generator_ready = False
 
+# Where the pipelines run: 'inline' (in this process) or 'process' (worker processes,
+# see inference_server.py; this process then never imports transformers/torch)
+INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'inline')
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '1'))
+INFERENCE_TIMEOUT_S = float(os.environ.get('INFERENCE_TIMEOUT_S', '60'))
+INFERENCE_MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH', '8'))
+INFERENCE_BATCH_WAIT_MS = float(os.environ.get('INFERENCE_BATCH_WAIT_MS', '5'))
+INFERENCE_SHM_MIN_BYTES = int(os.environ.get('INFERENCE_SHM_MIN_BYTES', str(64 * 1024)))
+_inference = None
+
 # Whether transformers is importable at all
 _hf_available = False
-try:
-    from transformers import pipeline
-    _hf_available = True
-except Exception:
-    _hf_available = False
+if INFERENCE_MODE == 'process':
+    import importlib.util
+    _hf_available = importlib.util.find_spec('transformers') is not None
+else:
+    try:
+        from transformers import pipeline
+        _hf_available = True
+    except Exception:
+        _hf_available = False
 
 # Configurable model names (small/lightweight defaults)
 SUMMARIZER_MODEL = 'sshleifer/distilbart-cnn-12-6'
 GENERATOR_MODEL = 'google/flan-t5-small'
+# Local snapshots written by `python main.py prepare-models` (see model_snapshots.py). Pinned models
+# load offline from there; MODEL_SNAPSHOT_REQUIRED=1 refuses to fall back to the hub.
+MODEL_SNAPSHOT_DIR = os.environ.get('MODEL_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_snapshots'))
+MODEL_SNAPSHOT_REQUIRED = os.environ.get('MODEL_SNAPSHOT_REQUIRED', '0') == '1'
 
 # Hugging Face Inference API key (optional). If set, the app will use hosted inference
 # instead of local pipelines when models aren't available or background loading is disabled.
 _HF_INFERENCE_API_KEY = os.environ.get('HF_INFERENCE_API_KEY')
+HF_INFERENCE_URL = os.environ.get('HF_INFERENCE_URL', 'https://api-inference.huggingface.co/models').rstrip('/')
+# Optional transcript service: GET <url>/<video_id> -> {"segments": [...]} (see monitor_and_fetch.HTTPTranscriptProvider)
+TRANSCRIPT_PROVIDER_URL = os.environ.get('TRANSCRIPT_PROVIDER_URL', '').rstrip('/')
 
 
 def _hf_inference_request(model: str, inputs: str, params: dict = None):
@@ -79,7 +106,7 @@ def _hf_inference_request(model: str, inputs: str, params: dict = None):
     import requests
     if not _HF_INFERENCE_API_KEY:
         raise RuntimeError('No HF_INFERENCE_API_KEY configured')
-    url = f"https://api-inference.huggingface.co/models/{model}"
+    url = f"{HF_INFERENCE_URL}/{model}"
     headers = {"Authorization": f"Bearer {_HF_INFERENCE_API_KEY}"}
     payload = {"inputs": inputs}
     if params:
@@ -92,6 +119,111 @@ def _hf_inference_request(model: str, inputs: str, params: dict = None):
         return resp.text
 
 
+def _model_event(event: str, role: str, **data):
+    """Publish a model lifecycle event to /models/events subscribers."""
+    from model_events import get_bus
+    try:
+        get_bus().publish(event, role, **data)
+    except Exception as e:
+        logger.warning('model_events: failed to publish %s for %s: %s', event, role, e)
+
+
+def _evict_model(role: str, reason: str = ''):
+    """Drop a loaded pipeline (e.g. under memory pressure) and tell subscribers."""
+    global _hf_summarizer, _hf_generator
+    global _hf_summarizer_ready, _hf_generator_ready
+    if role == 'summarizer':
+        _hf_summarizer, _hf_summarizer_ready = None, False
+    elif role == 'generator':
+        _hf_generator, _hf_generator_ready = None, False
+    else:
+        raise ValueError('unknown model role %r' % role)
+    logger.info('model %s evicted %s', role, reason)
+    _model_event('evicted', role, reason=reason)
+
+
+def _model_ready(role: str) -> bool:
+    """True when the local `role` pipeline can serve requests (in this process or on an inference worker)."""
+    if not _hf_available:
+        return False
+    if _inference is not None:
+        return _inference.ready(role)
+    if role == 'summarizer':
+        return _hf_summarizer_ready and _hf_summarizer is not None
+    return _hf_generator_ready and _hf_generator is not None
+
+
+def _run_pipeline(role: str, text: str, **kwargs):
+    """Output of the local `role` pipeline for one input, as a pipeline returns it ([dict])."""
+    if _inference is not None:
+        return [_inference.call(role, text, timeout=INFERENCE_TIMEOUT_S, **kwargs)]
+    budget = _get_thread_budget()
+    if budget is None:
+        return (_hf_summarizer if role == 'summarizer' else _hf_generator)(text, **kwargs)
+    with budget.slot():
+        return (_hf_summarizer if role == 'summarizer' else _hf_generator)(text, **kwargs)
+
+
+def _hosted_fallback(role: str) -> bool:
+    """True when a request for `role` would go to the hosted Inference API (local model still loading)."""
+    if not _hf_available or not _HF_INFERENCE_API_KEY:
+        return False
+    return not _model_ready(role)
+
+
+def _summary_from_output(out):
+    """Summary text from a hosted summarization response, or None."""
+    # Some HF responses are list-based JSON
+    if isinstance(out, list) and out and isinstance(out[0], dict) and 'summary_text' in out[0]:
+        return out[0]['summary_text']
+    # If text returned, deliver as-is
+    if isinstance(out, str):
+        return out
+    return None
+
+
+import quiz_format  # noqa: E402
+
+# Quiz output asked of the generator: 'lines' (Q:/A)/ANSWER: blocks, see quiz_format.py) or 'json'
+# (the original JSON-array prompt). Either kind of output is parsed; every well-formed question is kept.
+QUIZ_FORMAT = os.environ.get('QUIZ_FORMAT', 'lines')
+_quiz_stats = quiz_format.QuizStats()
+
+
+def _quiz_prompt(text: str) -> str:
+    return quiz_format.json_prompt(text) if QUIZ_FORMAT == 'json' else quiz_format.prompt(text)
+
+
+def _output_tokens(text: str) -> int:
+    """Generated tokens in `text`: counted by the local tokenizer, else estimated at ~4 characters a token."""
+    tokenizer = getattr(_hf_generator, 'tokenizer', None)
+    if tokenizer is not None:
+        try:
+            return len(tokenizer.encode(text))
+        except Exception:
+            pass
+    return max(1, len(text) // 4)
+
+
+def _questions_from_output(out):
+    """Usable questions parsed from generated text (or a hosted list response); None if there are none."""
+    if isinstance(out, list) and out and isinstance(out[0], dict) and 'generated_text' in out[0]:
+        out = out[0]['generated_text']
+    if not isinstance(out, str):
+        return None
+    parser = quiz_format.parse(out)
+    _quiz_stats.record(parser, _output_tokens(out))
+    if parser.malformed:
+        print('generate_quiz: dropped %d malformed question(s), kept %d' % (parser.malformed, len(parser.questions)))
+    return parser.questions or None
+
+
+def _load_pipeline(task: str, model_name: str):
+    """Pipeline for `model_name`: its prepared snapshot when one is pinned, else from the hub."""
+    import model_snapshots
+    return model_snapshots.load_pipeline(task, model_name, root=MODEL_SNAPSHOT_DIR, required=MODEL_SNAPSHOT_REQUIRED)
+
+
 def _background_load_models():
     """Load HF pipelines in a background thread so first-request latency
     doesn't block the server startup. Sets readiness flags when done.
@@ -102,28 +234,105 @@ def _background_load_models():
     if not _hf_available:
         logger.info('background_load: transformers not available; skipping model load')
         return
+    if INFERENCE_MODE == 'process':
+        _start_inference_server()
+        return
+    budget = _get_thread_budget()
+    if budget is not None:
+        logger.info('background_load: thread budget %s', budget.apply())
 
     # Load summarizer
     try:
         logger.info('background_load: starting to load summarizer model %s', SUMMARIZER_MODEL)
-        _hf_summarizer = pipeline('summarization', model=SUMMARIZER_MODEL)
+        _model_event('load-progress', 'summarizer', model_name=SUMMARIZER_MODEL, step=1, steps=2, stage='loading')
+        _hf_summarizer = _load_pipeline('summarization', SUMMARIZER_MODEL)
         _hf_summarizer_ready = True
         logger.info('background_load: summarizer ready')
+        _model_event('ready', 'summarizer', model_name=SUMMARIZER_MODEL)
     except Exception as e:
         _hf_summarizer = None
         _hf_summarizer_ready = False
         logger.exception('background_load: summarizer load failed: %s', e)
+        _model_event('failed', 'summarizer', model_name=SUMMARIZER_MODEL, error=str(e))
 
     # Load generator
     try:
         logger.info('background_load: starting to load generator model %s', GENERATOR_MODEL)
-        _hf_generator = pipeline('text2text-generation', model=GENERATOR_MODEL)
+        _model_event('load-progress', 'generator', model_name=GENERATOR_MODEL, step=2, steps=2, stage='loading')
+        _hf_generator = _load_pipeline('text2text-generation', GENERATOR_MODEL)
         _hf_generator_ready = True
         logger.info('background_load: generator ready')
+        _model_event('ready', 'generator', model_name=GENERATOR_MODEL)
     except Exception as e:
         _hf_generator = None
         _hf_generator_ready = False
         logger.exception('background_load: generator load failed: %s', e)
+        _model_event('failed', 'generator', model_name=GENERATOR_MODEL, error=str(e))
+
+
+# CPU thread budget for torch inference (see thread_budget.py)
+THREAD_BUDGET_ENABLED = os.environ.get('THREAD_BUDGET_ENABLED', '1') == '1'
+# API processes sharing the node's cores; gunicorn takes its worker count from WEB_CONCURRENCY
+THREAD_BUDGET_PROCESSES = int(os.environ.get('THREAD_BUDGET_PROCESSES', os.environ.get('WEB_CONCURRENCY', '1')))
+# Concurrent inferences per API process in inline mode (defaults to the admission gate size)
+THREAD_BUDGET_CONCURRENCY = int(os.environ.get('THREAD_BUDGET_CONCURRENCY', os.environ.get('ADMISSION_CONCURRENCY', '1')))
+THREAD_BUDGET_RESERVE = int(os.environ.get('THREAD_BUDGET_RESERVE', '0'))
+THREAD_BUDGET_INTRA_OP = int(os.environ.get('THREAD_BUDGET_INTRA_OP', '0'))
+THREAD_BUDGET_PIN = os.environ.get('THREAD_BUDGET_PIN', '0') == '1'
+_thread_budget = None
+_thread_budget_lock = threading.Lock()
+
+
+def _get_thread_budget():
+    """The ThreadBudget for this process's inference (None when disabled).
+
+    Inline, the API processes' concurrent calls share the cores. In process mode,
+    every inference worker runs one batch at a time and gets its own share; CPU
+    pinning is only done then, and only with a single API process (otherwise the
+    pools of different API processes would be pinned to the same cores).
+    """
+    global _thread_budget
+    if not THREAD_BUDGET_ENABLED:
+        return None
+    with _thread_budget_lock:
+        if _thread_budget is None:
+            from thread_budget import ThreadBudget
+            if INFERENCE_MODE == 'process':
+                _thread_budget = ThreadBudget(processes=THREAD_BUDGET_PROCESSES * INFERENCE_WORKERS,
+                                              reserve=THREAD_BUDGET_RESERVE, intra_op=THREAD_BUDGET_INTRA_OP,
+                                              pin=THREAD_BUDGET_PIN and THREAD_BUDGET_PROCESSES == 1)
+            else:
+                _thread_budget = ThreadBudget(processes=THREAD_BUDGET_PROCESSES,
+                                              concurrency=THREAD_BUDGET_CONCURRENCY,
+                                              reserve=THREAD_BUDGET_RESERVE, intra_op=THREAD_BUDGET_INTRA_OP)
+            if _thread_budget.oversubscribed:
+                logger.warning('thread_budget: %s exceeds the usable cores', _thread_budget.metrics())
+        return _thread_budget
+
+
+def _inference_event(event: str, role: str, data: dict):
+    model = SUMMARIZER_MODEL if role == 'summarizer' else GENERATOR_MODEL
+    _model_event(event, role, **dict(data, model_name=model))
+
+
+def _start_inference_server():
+    """Start the inference worker pool and wait until the models are loaded (or failed)."""
+    global _inference
+    import functools
+    import model_snapshots
+    from inference_server import InferenceClient
+    if _inference is None:
+        loader = functools.partial(model_snapshots.load_pipeline, root=MODEL_SNAPSHOT_DIR,
+                                   required=MODEL_SNAPSHOT_REQUIRED)
+        _inference = InferenceClient(
+            workers=INFERENCE_WORKERS, on_event=_inference_event, timeout=INFERENCE_TIMEOUT_S, loader=loader,
+            models={'summarizer': ('summarization', SUMMARIZER_MODEL),
+                    'generator': ('text2text-generation', GENERATOR_MODEL)},
+            max_batch=INFERENCE_MAX_BATCH, batch_wait_ms=INFERENCE_BATCH_WAIT_MS,
+            shm_min_bytes=INFERENCE_SHM_MIN_BYTES, thread_budget=_get_thread_budget()).start()
+        atexit.register(_inference.close)
+        logger.info('startup: %d inference worker(s) starting', INFERENCE_WORKERS)
+    _inference.wait_ready(timeout=INFERENCE_TIMEOUT_S * 10)
 
 
 # Start background loading thread (daemon) so it doesn't block process exit.
@@ -133,7 +342,11 @@ import os
 # This avoids crashing or consuming too much memory in limited CI/dev environments.
 ENABLE_HF_BACKGROUND = os.environ.get('ENABLE_HF_BACKGROUND', '0') == '1'
 
-if _hf_available and ENABLE_HF_BACKGROUND:
+import multiprocessing
+if multiprocessing.parent_process() is not None:
+    # Imported as __mp_main__ inside an inference worker: never start another pool
+    pass
+elif _hf_available and ENABLE_HF_BACKGROUND:
     try:
         t = threading.Thread(target=_background_load_models, daemon=True)
         t.start()
@@ -144,6 +357,100 @@ else:
     logger.info('startup: HF background loading disabled (ENABLE_HF_BACKGROUND=%s, transformers_available=%s)', ENABLE_HF_BACKGROUND, _hf_available)
 
 
+# Per-client token-bucket rate limiting for expensive routes (see rate_limit.py for RATE_LIMITS syntax)
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', '0') == '1'
+# X-API-Key values that get a bucket of their own; any other client is limited by IP
+RATE_LIMIT_API_KEYS = frozenset(k.strip() for k in os.environ.get('RATE_LIMIT_API_KEYS', '').split(',') if k.strip())
+_rate_limiter = None
+if RATE_LIMIT_ENABLED:
+    try:
+        from rate_limit import from_env as _rate_limiter_from_env
+        _rate_limiter = _rate_limiter_from_env()
+        if THREAD_BUDGET_PROCESSES > 1 and type(_rate_limiter.store).__name__ == 'MemoryStore':
+            logger.warning('startup: RATE_LIMIT_STORE=memory with %d worker processes; each worker keeps its own '
+                           'buckets, so clients get up to %dx the configured limits (set RATE_LIMIT_STORE=sqlite)',
+                           THREAD_BUDGET_PROCESSES, THREAD_BUDGET_PROCESSES)
+    except Exception as e:
+        logger.exception('startup: rate limiter disabled: %s', e)
+
+
+@app.before_request
+def _check_rate_limit():
+    if _rate_limiter is None or request.url_rule is None \
+            or _rate_limiter.rule_for(request.url_rule.rule, request.method) is None:
+        return None
+    from rate_limit import client_key, headers
+    client = client_key(request.headers.get('X-API-Key'), request.remote_addr, request.headers.get('X-Forwarded-For'),
+                        RATE_LIMIT_TRUST_PROXY, RATE_LIMIT_API_KEYS)
+    try:
+        decision = _rate_limiter.check(request.url_rule.rule, client, method=request.method)
+    except Exception as e:
+        # Never fail a request because the limiter store is unavailable
+        logger.warning('rate_limit: check failed, allowing request: %s', e)
+        return None
+    if decision is None:
+        return None
+    g.rate_limit = decision
+    if not decision.allowed:
+        resp = jsonify({'error': 'Rate limit exceeded, retry later', 'retry_after': decision.retry_after})
+        resp.status_code = 429
+        resp.headers.update(headers(decision))
+        return resp
+    return None
+
+
+@app.after_request
+def _add_rate_limit_headers(resp):
+    decision = g.pop('rate_limit', None)
+    if decision is not None and decision.allowed:
+        from rate_limit import headers
+        resp.headers.update(headers(decision))
+    return resp
+
+
+@app.route('/metrics/rate-limit', methods=['GET'])
+def rate_limit_metrics():
+    if _rate_limiter is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(_rate_limiter.metrics(), enabled=True))
+
+
+# Conditional GET (ETag/304) and gzip/brotli compression for read endpoints (see http_cache.py)
+HTTP_CACHE_ENABLED = os.environ.get('HTTP_CACHE_ENABLED', '1') == '1'
+HTTP_CACHE_MAX_BYTES = int(os.environ.get('HTTP_CACHE_MAX_BYTES', str(32 << 20)))
+HTTP_CACHE_MAX_STALENESS_S = float(os.environ.get('HTTP_CACHE_MAX_STALENESS_S', '5'))
+HTTP_COMPRESS_ENABLED = os.environ.get('HTTP_COMPRESS_ENABLED', '1') == '1'
+HTTP_COMPRESS_MIN_BYTES = int(os.environ.get('HTTP_COMPRESS_MIN_BYTES', '1024'))
+HTTP_COMPRESS_LEVEL = int(os.environ.get('HTTP_COMPRESS_LEVEL', '6'))
+
+from http_cache import ResponseCache  # noqa: E402
+
+_http_cache = ResponseCache(engine=engine if DB_AVAILABLE else None, max_bytes=HTTP_CACHE_MAX_BYTES,
+                            max_staleness=HTTP_CACHE_MAX_STALENESS_S, min_bytes=HTTP_COMPRESS_MIN_BYTES,
+                            level=HTTP_COMPRESS_LEVEL, compress=HTTP_COMPRESS_ENABLED,
+                            enabled=HTTP_CACHE_ENABLED)
+if HTTP_COMPRESS_ENABLED:
+    app.after_request(_http_cache.compress)
+
+
+def _lectures_written(n: int = 1):
+    """Call after committing Lecture rows so cached /my-lectures responses are rebuilt."""
+    import table_versions
+    table_versions.bump('lectures', n)
+
+
+def _questions_written(n: int = 1):
+    """Call after committing Question rows so cached GET /generate-quiz responses are rebuilt."""
+    import table_versions
+    table_versions.bump('questions', n)
+
+
+@app.route('/metrics/http-cache', methods=['GET'])
+def http_cache_metrics():
+    return jsonify(dict(_http_cache.metrics(), enabled=HTTP_CACHE_ENABLED, compress=HTTP_COMPRESS_ENABLED))
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -153,17 +460,157 @@ def health():
     })
 
 
-@app.route('/models/status', methods=['GET'])
-def models_status():
-    """Return the HF model availability and readiness state."""
-    return jsonify({
+def _models_status_payload():
+    return {
         'transformers_available': _hf_available,
-        'summarizer_ready': _hf_summarizer_ready,
-        'generator_ready': _hf_generator_ready,
+        'summarizer_ready': _model_ready('summarizer'),
+        'generator_ready': _model_ready('generator'),
+        'inference_mode': INFERENCE_MODE,
         'background_loading_enabled': os.environ.get('ENABLE_HF_BACKGROUND', '0') == '1',
         'summarizer_model': SUMMARIZER_MODEL,
         'generator_model': GENERATOR_MODEL,
-    })
+    }
+
+
+@app.route('/models/status', methods=['GET'])
+def models_status():
+    """Return the HF model availability and readiness state."""
+    return jsonify(_models_status_payload())
+
+
+@app.route('/metrics/inference', methods=['GET'])
+def inference_metrics():
+    """Inference worker pool state (INFERENCE_MODE=process) and the CPU thread budget."""
+    budget = _get_thread_budget()
+    threads = budget.metrics() if budget is not None else None
+    if _inference is None:
+        return jsonify({'mode': INFERENCE_MODE, 'running': False, 'thread_budget': threads})
+    return jsonify(dict(_inference.metrics(), mode=INFERENCE_MODE, running=True, thread_budget=threads))
+
+
+# Each open /models/events stream holds a worker thread: end streams after MODEL_EVENTS_MAX_AGE
+# seconds (clients reconnect and replay from Last-Event-ID) and cap how many are open per process
+MODEL_EVENTS_MAX_AGE = float(os.environ.get('MODEL_EVENTS_MAX_AGE', '300'))
+MODEL_EVENTS_MAX_STREAMS = int(os.environ.get('MODEL_EVENTS_MAX_STREAMS', '4'))
+
+
+@app.route('/models/events', methods=['GET'])
+def models_events():
+    """Server-Sent Events stream of model load-progress/ready/failed/evicted events.
+
+    The first frame is a `status` snapshot (same body as /models/status); after
+    that only changes are pushed. Reconnects send `Last-Event-ID` (EventSource
+    does this automatically) to replay anything missed. The stream ends after
+    MODEL_EVENTS_MAX_AGE seconds; past MODEL_EVENTS_MAX_STREAMS open streams
+    the answer is 503 and clients poll /models/status instead.
+    """
+    from flask import Response, stream_with_context
+    from model_events import get_bus, stream
+    bus = get_bus()
+    retry_s = 30
+    if not bus.acquire_stream(MODEL_EVENTS_MAX_STREAMS):
+        return Response('retry: %d\n\n' % (retry_s * 1000), status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(retry_s), 'Cache-Control': 'no-cache'})
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    body = stream(bus, _models_status_payload, last_event_id=last_id,
+                  heartbeat=float(os.environ.get('MODEL_EVENTS_HEARTBEAT', '15')), max_age=MODEL_EVENTS_MAX_AGE)
+    resp = Response(stream_with_context(body), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    resp.call_on_close(bus.release_stream)
+    return resp
+
+
+# Admission control for model inference: bounded per-model queues and request deadlines.
+# In process mode the gate must let a full batch per worker through, or the pool only ever sees batches of 1.
+ADMISSION_CONCURRENCY = int(os.environ.get(
+    'ADMISSION_CONCURRENCY', INFERENCE_WORKERS * INFERENCE_MAX_BATCH if INFERENCE_MODE == 'process' else 1))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', '2'))
+# Deadline applied when a request doesn't send one (0 = wait as long as the queue allows)
+ADMISSION_DEFAULT_DEADLINE_MS = float(os.environ.get('ADMISSION_DEFAULT_DEADLINE_MS', '0'))
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def _get_admission():
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            from admission import AdmissionController
+            _admission = AdmissionController(concurrency=ADMISSION_CONCURRENCY, max_queue=ADMISSION_MAX_QUEUE)
+        return _admission
+
+
+def _admit(role: str, payload: dict):
+    """Inference slot for `role` honoring X-Request-Deadline-Ms / body deadline_ms; raises Rejected."""
+    from admission import parse_deadline
+    # Background jobs (e.g. /ingest-lecture) have no request headers, only their payload
+    header = request.headers.get('X-Request-Deadline-Ms') if has_request_context() else None
+    deadline = parse_deadline(header,
+                              payload.get('deadline_ms') if isinstance(payload, dict) else None,
+                              ADMISSION_DEFAULT_DEADLINE_MS)
+    return _get_admission().gate(role).admit(deadline)
+
+
+from admission import Rejected as _AdmissionRejected  # noqa: E402
+
+
+@app.errorhandler(_AdmissionRejected)
+def _admission_rejected(e):
+    print('admission: shed %s request (%s)' % (e.gate, e.reason))
+    resp = jsonify(e.to_dict())
+    resp.status_code = e.status
+    resp.headers['Retry-After'] = str(e.retry_after)
+    return resp
+
+
+@app.route('/metrics/admission', methods=['GET'])
+def admission_metrics():
+    """Queue depth, in-flight requests and shed counts per model gate."""
+    return jsonify({'concurrency': ADMISSION_CONCURRENCY, 'max_queue': ADMISSION_MAX_QUEUE,
+                    'default_deadline_ms': ADMISSION_DEFAULT_DEADLINE_MS,
+                    'gates': _get_admission().metrics()})
+
+
+# Latency-budget routing across the summarization and quiz tiers (see tier_router.py)
+# Budget applied when a request sends neither X-Latency-Budget-Ms nor latency_budget_ms (0 = none)
+LATENCY_BUDGET_DEFAULT_MS = float(os.environ.get('LATENCY_BUDGET_DEFAULT_MS', '0'))
+# Service-time estimates used until a tier has served its first call
+ROUTER_PRIOR_MS = {'huggingface': 3000.0, 'hf-inference': 1500.0, 'extractive': 20.0, 'mock': 1.0}
+ROUTER_PRIOR_MS.update({k: float(v) for k, v in (item.split('=', 1) for item in
+                        os.environ.get('ROUTER_PRIOR_MS', '').split(',') if '=' in item)})
+_routers = {}
+_routers_lock = threading.Lock()
+_ROUTER_TIERS = {'summarizer': ('huggingface', 'hf-inference', 'extractive'),
+                 'generator': ('huggingface', 'hf-inference', 'mock')}
+
+
+def _get_router(role: str):
+    with _routers_lock:
+        router = _routers.get(role)
+        if router is None:
+            from tier_router import TierRouter
+            tiers = _ROUTER_TIERS[role]
+            # Model tiers share the admission gate's slots; the cheap tiers never queue
+            router = _routers[role] = TierRouter(
+                role, {t: ROUTER_PRIOR_MS[t] for t in tiers},
+                concurrency={'huggingface': ADMISSION_CONCURRENCY, 'hf-inference': ADMISSION_CONCURRENCY})
+        return router
+
+
+def _latency_budget(payload: dict):
+    from tier_router import parse_budget
+    header = request.headers.get('X-Latency-Budget-Ms') if has_request_context() else None
+    return parse_budget(header, payload.get('latency_budget_ms') if isinstance(payload, dict) else None,
+                        LATENCY_BUDGET_DEFAULT_MS)
+
+
+@app.route('/metrics/routing', methods=['GET'])
+def routing_metrics():
+    """Per-tier service-time estimates, in-flight calls, predictions and budget hit counts."""
+    with _routers_lock:
+        routers = dict(_routers)
+    return jsonify({'default_budget_ms': LATENCY_BUDGET_DEFAULT_MS,
+                    'routers': {role: r.metrics() for role, r in routers.items()}})
 
 
 @app.route('/test-db', methods=['GET'])
@@ -208,6 +655,8 @@ def seed_db_route():
 
         # Call the seeding logic and then report counts back to caller.
         seed_questions()
+        _lectures_written()
+        _questions_written()
 
         # After seeding, compute counts for reporting
         try:
@@ -228,87 +677,247 @@ def seed_db_route():
         return jsonify({'error': str(e)}), 500
 
 
+SUMMARY_MODES = ('auto', 'abstractive', 'extractive')
+
+
 @app.route('/summarize', methods=['POST'])
 def summarize():
-    """Naive/mock summarization endpoint.
+    """Summarization endpoint with an abstractive and an extractive tier.
 
-    Accepts JSON: { "text": "..." }
-    Returns: { "summary": "..." }
+    Accepts JSON: { "text": "...", "mode": "auto|abstractive|extractive", "max_sentences": 5 }
+    Returns: { "summary": "...", "source": "huggingface|hf-inference|extractive" }
+    In auto mode a loading or overloaded model degrades to the extractive
+    summary, flagged with "degraded": "model-loading|overloaded".
     """
     payload = request.get_json(force=True, silent=True) or {}
     text = payload.get('text') or payload.get('transcript')
     force_mock = payload.get('force_mock') if isinstance(payload, dict) else False
     if not text:
         return jsonify({'error': 'Missing "text" in request body'}), 400
+    if payload.get('mode', 'auto') not in SUMMARY_MODES:
+        return jsonify({'error': '"mode" must be one of %s' % ', '.join(SUMMARY_MODES)}), 400
 
     # If forced mock is requested, always return a quick placeholder
     if force_mock:
         return jsonify({'summary': 'Mock summary (force_mock=True)', 'source': 'mock'})
+    body, status = _summarize_text(text, payload)
+    return jsonify(body), status
 
-    # If HF isn't available at all, fall back to heuristic immediately
-    if not _hf_available:
-        print('summarize: transformers not available, using heuristic')
-    else:
-        # If model is not yet ready, inform caller to retry or return mock
-        if not _hf_summarizer_ready or _hf_summarizer is None:
-            # If an HF Inference API key is configured, try the hosted model as a fallback
-            if _HF_INFERENCE_API_KEY:
-                try:
-                    out = _hf_inference_request(SUMMARIZER_MODEL, text[:1000], params={'max_length': 120, 'min_length': 30})
-                    # Some HF responses are list-based JSON
-                    if isinstance(out, list) and out and isinstance(out[0], dict) and 'summary_text' in out[0]:
-                        return jsonify({'summary': out[0]['summary_text'], 'source': 'hf-inference'})
-                    # If text returned, deliver as-is
-                    if isinstance(out, str):
-                        return jsonify({'summary': out, 'source': 'hf-inference'})
-                except Exception as e:
-                    print('summarize: HF Inference API fallback failed -', str(e))
+
+def _summarize_text(text: str, payload: dict):
+    """Summary of `text` as (body, status): local model, hosted fallback or extractive.
+
+    The tier router picks the best available tier predicted to meet the
+    request's latency budget; the body's "routing" reports the tier and its
+    predicted and actual latency. mode "extractive" skips the model. mode
+    "abstractive" never degrades: it returns a 202 'loading' body while the
+    local model is still loading and no hosted fallback answered, and raises
+    admission Rejected when overloaded. "auto" (the default) answers those
+    with the extractive summary instead.
+    """
+    mode = payload.get('mode') or 'auto'
+    local = _model_ready('summarizer')
+    hosted = _hf_available and not local and bool(_HF_INFERENCE_API_KEY)
+    candidates = []
+    if mode != 'extractive':
+        if not _hf_available:
+            print('summarize: transformers not available, using extractive summary')
+        elif local or hosted:
+            candidates.append('huggingface' if local else 'hf-inference')
+        elif mode == 'abstractive':
             print('summarize: summarizer not ready yet')
-            return jsonify({'message': 'Model loading, please try again later', 'source': 'loading'}), 202
-        # Use the pre-loaded summarizer pipeline
+            return {'message': 'Model loading, please try again later', 'source': 'loading'}, 202
+    if mode != 'abstractive' or not candidates:
+        candidates.append('extractive')
+    router = _get_router('summarizer')
+    decision = router.choose(candidates, _latency_budget(payload))
+    degraded = None
+    if decision.tier != 'extractive':
+        summary = None
         try:
-            hf_input = text if len(text) < 1000 else text[:1000]
-            result = _hf_summarizer(hf_input, max_length=120, min_length=30, do_sample=False)
-            summary = result[0]['summary_text']
-            return jsonify({'summary': summary, 'source': 'huggingface'})
-        except Exception as ex:
-            print('summarize: error during HF summarization -', str(ex))
-            # Fall through to heuristic
-
-    # Very simple heuristic summary as a fallback: first 2 sentences or first 200 chars
-    sentences = [s.strip() for s in text.replace('\n', ' ').split('.') if s.strip()]
-    if len(sentences) >= 2:
-        summary = '. '.join(sentences[:2]).strip() + '.'
-    else:
-        summary = (text[:200].strip() + '...') if len(text) > 200 else text
+            # Admission raises Rejected before any work if overloaded
+            with router.track(decision.tier, queued=True) as call, _admit('summarizer', payload):
+                call.begin()
+                summary = _local_summary(text) if local else _hosted_summary(text)
+        except _AdmissionRejected as e:
+            if mode == 'abstractive':
+                raise
+            print('summarize: summarizer overloaded (%s), using extractive summary' % e.reason)
+            degraded = 'overloaded'
+        if summary is not None:
+            return {'summary': summary, 'source': decision.tier, 'routing': decision.report()}, 200
+        if hosted and not degraded:
+            if mode == 'abstractive':
+                print('summarize: summarizer not ready yet')
+                return {'message': 'Model loading, please try again later', 'source': 'loading'}, 202
+            print('summarize: summarizer not ready yet, using extractive summary')
+            degraded = 'model-loading'
+    elif len(candidates) > 1:
+        print('summarize: model predicted over the latency budget, using extractive summary')
+        degraded = 'latency-budget'
+    elif _hf_available and mode == 'auto':
+        print('summarize: summarizer not ready yet, using extractive summary')
+        degraded = 'model-loading'
+    with router.track('extractive'):
+        body = _extractive_body(text, payload, degraded)
+    body['routing'] = decision.report('extractive')
+    return body, 200
+
+
+def _local_summary(text: str):
+    try:
+        hf_input = text if len(text) < 1000 else text[:1000]
+        result = _run_pipeline('summarizer', hf_input, max_length=120, min_length=30, do_sample=False)
+        return result[0]['summary_text']
+    except Exception as ex:
+        print('summarize: error during HF summarization -', str(ex))
+        return None
+
+
+def _hosted_summary(text: str):
+    try:
+        out = _hf_inference_request(SUMMARIZER_MODEL, text[:1000], params={'max_length': 120, 'min_length': 30})
+        return _summary_from_output(out)
+    except Exception as e:
+        print('summarize: HF Inference API fallback failed -', str(e))
+        return None
+
+
+# Longest input the extractive tier reads (~8 hours of speech); the rest is ignored
+EXTRACTIVE_MAX_CHARS = int(os.environ.get('EXTRACTIVE_MAX_CHARS', '400000'))
+
+
+def _extractive_body(text: str, payload: dict, degraded: str = None) -> dict:
+    import extractive
+    try:
+        max_sentences = min(max(int(payload.get('max_sentences', 5)), 1), 50)
+    except (TypeError, ValueError):
+        max_sentences = 5
+    truncated = len(text) > EXTRACTIVE_MAX_CHARS
+    body = {'summary': extractive.summarize(text[:EXTRACTIVE_MAX_CHARS], max_sentences=max_sentences),
+            'source': 'extractive'}
+    if truncated:
+        body['truncated'] = True
+    if degraded:
+        body['degraded'] = degraded
+    return body
+
+
+def _question_payload(q):
+    # models may store options differently; best-effort extraction
+    try:
+        opts = json.loads(getattr(q, 'options', '[]'))
+    except Exception:
+        opts = []
+    return {'id': getattr(q, 'id', None), 'topic': getattr(q, 'topic', None), 'question_text': getattr(q, 'question_text', None), 'options': opts}
+
 
-    return jsonify({'summary': summary, 'source': 'heuristic'})
+# Adaptive selection engine, loaded lazily from the DB on first use
+_adaptive_engine = None
+_adaptive_lock = threading.Lock()
+ADAPTIVE_CHECKPOINT_EVERY = int(os.environ.get('ADAPTIVE_CHECKPOINT_EVERY', '200'))
+
+
+def _get_adaptive_engine():
+    global _adaptive_engine
+    with _adaptive_lock:
+        if _adaptive_engine is None:
+            from adaptive import AdaptiveEngine
+            engine = AdaptiveEngine()
+            session = SessionLocal()
+            try:
+                engine.load(session)
+            finally:
+                session.close()
+            _adaptive_engine = engine
+        return _adaptive_engine
+
+
+def _adaptive_select(session, user_id, lecture_id=None, count=5):
+    from models import Question
+    engine = _get_adaptive_engine()
+    engine.sync_questions(session)
+    candidates = None
+    if lecture_id is not None:
+        # Near-duplicate lectures share the original's questions
+        lecture_id = _canonical_lecture_id(session, lecture_id)
+        candidates = [r[0] for r in session.query(Question.id).filter(Question.lecture_id == lecture_id)]
+    return engine.select(user_id, k=max(1, min(count, 50)), candidates=candidates)
+
+
+def _record_answers(user_id, answers):
+    """Feed graded answers [(question_id, correct), ...] to the adaptive engine and
+    checkpoint its state once enough estimates have changed."""
+    if not answers or not DB_AVAILABLE or SessionLocal is None:
+        return
+    try:
+        engine = _get_adaptive_engine()
+        question_ids = [a[0] for a in answers]
+        if not engine.known_questions(question_ids):
+            # Questions created since the last sync; ids that still aren't known are dropped
+            session = SessionLocal()
+            try:
+                engine.sync_questions(session)
+            finally:
+                session.close()
+        if not engine.record_batch([user_id] * len(answers), question_ids, [a[1] for a in answers]):
+            return
+        # Adaptive picks changed; cached GET /generate-quiz responses are stale
+        import table_versions
+        table_versions.bump('quiz_answers', len(answers))
+        if engine.pending_writes >= ADAPTIVE_CHECKPOINT_EVERY:
+            _checkpoint_adaptive()
+    except Exception as e:
+        logger.warning('adaptive: failed to record answers: %s', e)
+
+
+def _checkpoint_adaptive():
+    if _adaptive_engine is None or not _adaptive_engine.pending_writes:
+        return
+    session = SessionLocal()
+    try:
+        n = _adaptive_engine.checkpoint(session)
+        logger.info('adaptive: checkpointed %d estimates', n)
+    finally:
+        session.close()
+
+
+atexit.register(_checkpoint_adaptive)
 
 
 @app.route('/generate-quiz', methods=['GET', 'POST'])
+@_http_cache.cached('questions', 'quiz_results', 'quiz_answers', when=lambda: request.args.get('user_id'))
 def generate_quiz():
     """Mock MCQ generator.
 
-    Accepts JSON: { "text": "..." }
-    Returns: { "questions": [ {question, options, answerIndex} ] }
+    Accepts JSON: { "text": "..." } or { "topic": "...", "k": 4 } to ground the
+    prompt in the most relevant saved transcript chunks.
+    Returns: { "questions": [ {question, options, answerIndex} ], "context": [...] }
+
+    GET returns stored questions; with ?user_id= (and optional lecture_id, count)
+    they are picked adaptively for the user's current ability estimate.
     """
     # Support both DB-backed random quiz (GET) and text-based generation (POST)
     if request.method == 'GET':
-        # Return 5 random questions from DB
+        # Return 5 questions from DB: adaptively chosen when a user_id is given, else random
         try:
             if not DB_AVAILABLE or SessionLocal is None:
                 raise RuntimeError('DB unavailable')
             from models import Question
             session = SessionLocal()
-            qs = session.query(Question).order_by(func.random()).limit(5).all()
-            out = []
-            for q in qs:
-                # models may store options differently; best-effort extraction
+            user_id = request.args.get('user_id', type=int)
+            if user_id is not None:
                 try:
-                    opts = json.loads(getattr(q, 'options', '[]'))
-                except Exception:
-                    opts = []
-                out.append({'id': getattr(q, 'id', None), 'topic': getattr(q, 'topic', None), 'question_text': getattr(q, 'question_text', None), 'options': opts})
+                    selected = _adaptive_select(session, user_id, request.args.get('lecture_id', type=int),
+                                                request.args.get('count', 5, type=int))
+                    by_id = {q.id: q for q in session.query(Question).filter(Question.id.in_(selected)).all()}
+                    out = [_question_payload(by_id[qid]) for qid in selected if qid in by_id]
+                    session.close()
+                    return jsonify({'questions': out, 'adaptive': True, 'ability': round(_get_adaptive_engine().ability(user_id), 4)})
+                except Exception as e:
+                    print('generate_quiz: adaptive selection failed, serving random questions -', str(e))
+            qs = session.query(Question).order_by(func.random()).limit(5).all()
+            out = [_question_payload(q) for q in qs]
             session.close()
             return jsonify({'questions': out})
         except Exception:
@@ -317,71 +926,74 @@ def generate_quiz():
 
     payload = request.get_json(force=True, silent=True) or {}
     text = payload.get('text')
+    # Retrieval-grounded generation: build the prompt text from chunks relevant to a topic
+    context = None
+    topic = payload.get('topic')
+    if request.method == 'POST' and not text and topic:
+        try:
+            if not DB_AVAILABLE or SessionLocal is None:
+                raise RuntimeError('DB unavailable')
+            from embeddings import search_chunks
+            session = SessionLocal()
+            try:
+                hits = search_chunks(session, topic, k=max(1, min(int(payload.get('k', 4)), 20)))
+            finally:
+                session.close()
+            if hits:
+                text = '\n\n'.join(h['text'] for h in hits)
+                context = [{'chunk_id': h['chunk_id'], 'lecture_id': h['lecture_id'], 'score': h['score']} for h in hits]
+        except Exception as e:
+            print('generate_quiz: retrieval for topic failed -', str(e))
     # For POST text-based generation ensure text present
     if request.method == 'POST' and not text:
         return jsonify({'error': 'Missing "text" in request body'}), 400
 
+    def respond(body, status=200):
+        if context is not None:
+            body['context'] = context
+        return jsonify(body), status
+
     # If forced mock is requested, return mock quickly
     force_mock = payload.get('force_mock') if isinstance(payload, dict) else False
     if force_mock:
-        return jsonify({'questions': [
+        return respond({'questions': [
             {'question': 'Mock question 1', 'options': ['A', 'B', 'C', 'D'], 'answerIndex': 0},
             {'question': 'Mock question 2', 'options': ['A', 'B', 'C', 'D'], 'answerIndex': 1}
         ], 'source': 'mock'})
 
+    # The transcript of a saved lecture (or a near-duplicate of one) reuses its stored questions
+    if request.method == 'POST' and text and payload.get('reuse', True):
+        stored = _stored_questions(text)
+        if stored is not None:
+            return respond(stored)
+
+    local = _model_ready('generator')
+    hosted = _hf_available and not local and bool(_HF_INFERENCE_API_KEY and text)
     # If HF not available, fall back to mock
     if not _hf_available:
         print('generate_quiz: transformers not available, returning mock')
-    else:
-        # If generator model hasn't finished loading yet, inform client
-        if not _hf_generator_ready or _hf_generator is None:
-            # HF Inference API fallback
-            if _HF_INFERENCE_API_KEY and text:
-                try:
-                    prompt = f"Generate 2 multiple-choice questions (provide options and correct answer index) from the following text:\n\n{text}\n\nOutput as JSON array"
-                    out = _hf_inference_request(GENERATOR_MODEL, prompt, params={'max_length': 256})
-                    if isinstance(out, list) and out and isinstance(out[0], dict) and 'generated_text' in out[0]:
-                        out_text = out[0]['generated_text']
-                        start = out_text.find('[')
-                        end = out_text.rfind(']')
-                        if start != -1 and end != -1 and end > start:
-                            try:
-                                questions = json.loads(out_text[start:end+1])
-                                return jsonify({'questions': questions, 'source': 'hf-inference'})
-                            except Exception:
-                                pass
-                    if isinstance(out, str):
-                        # best-effort JSON extraction
-                        start = out.find('[')
-                        end = out.rfind(']')
-                        if start != -1 and end != -1 and end > start:
-                            try:
-                                questions = json.loads(out[start:end+1])
-                                return jsonify({'questions': questions, 'source': 'hf-inference'})
-                            except Exception:
-                                pass
-                except Exception as e:
-                    print('generate_quiz: HF Inference API fallback failed -', str(e))
+    elif not local and not hosted:
+        # Generator model hasn't finished loading yet and there is no hosted fallback
+        print('generate_quiz: generator not ready yet')
+        return respond({'message': 'Model loading, please try again later', 'source': 'loading'}, 202)
+    # Best tier predicted to meet the caller's latency budget
+    router = _get_router('generator')
+    candidates = (['huggingface' if local else 'hf-inference'] if local or hosted else []) + ['mock']
+    decision = router.choose(candidates, _latency_budget(payload))
+    degraded = None
+    if decision.tier != 'mock':
+        # Admission raises Rejected before any work if overloaded
+        with router.track(decision.tier, queued=True) as call, _admit('generator', payload):
+            call.begin()
+            questions = _local_questions(text) if local else _hosted_questions(text)
+        if questions is not None:
+            return respond({'questions': questions, 'source': decision.tier, 'routing': decision.report()})
+        if hosted:
             print('generate_quiz: generator not ready yet')
-            return jsonify({'message': 'Model loading, please try again later', 'source': 'loading'}), 202
-        # Use the pre-loaded generator
-        try:
-            prompt = f"Generate 2 multiple-choice questions (provide options and correct answer index) from the following text:\n\n{text}\n\nOutput as JSON array"
-            res = _hf_generator(prompt, max_length=256, do_sample=False)
-            out_text = res[0]['generated_text'] if isinstance(res, list) else str(res)
-            # Best-effort JSON extraction
-            start = out_text.find('[')
-            end = out_text.rfind(']')
-            if start != -1 and end != -1 and end > start:
-                json_str = out_text[start:end+1]
-                try:
-                    questions = json.loads(json_str)
-                    return jsonify({'questions': questions, 'source': 'huggingface'})
-                except Exception:
-                    print('generate_quiz: failed to parse HF output, falling back to mock')
-        except Exception as ex:
-            print('generate_quiz: error during HF generation -', str(ex))
-            # Fall through to mock below
+            return respond({'message': 'Model loading, please try again later', 'source': 'loading'}, 202)
+    elif len(candidates) > 1:
+        print('generate_quiz: model predicted over the latency budget, returning mock')
+        degraded = 'latency-budget'
 
     # Fallback mock questions
     questions = [
@@ -402,7 +1014,71 @@ def generate_quiz():
         }
     ]
 
-    return jsonify({'questions': questions, 'source': 'mock'})
+    body = {'questions': questions, 'source': 'mock', 'routing': decision.report('mock')}
+    if degraded:
+        body['degraded'] = degraded
+    return respond(body)
+
+
+def _generated_payload(q):
+    """A stored Question in the generated-quiz shape: {id, question, options, answerIndex}.
+
+    None when no option matches its correct_answer, so no answer can be marked right.
+    """
+    from grading import answer_index
+    opts = _question_payload(q)['options']
+    index = answer_index(opts, q.correct_answer)
+    if index is None:
+        return None
+    return {'id': q.id, 'question': q.question_text, 'options': opts, 'answerIndex': index}
+
+
+def _stored_questions(text: str):
+    """{questions, source: 'stored', lecture_id} when `text` matches a lecture with questions, else None."""
+    if not DEDUP_ENABLED or not DB_AVAILABLE or SessionLocal is None:
+        return None
+    from models import Question
+    session = SessionLocal()
+    try:
+        _, original, _ = _find_duplicate(session, text)
+        if original is None:
+            return None
+        qs = session.query(Question).filter(Question.lecture_id == original).order_by(func.random()).limit(5).all()
+        questions = [p for p in map(_generated_payload, qs) if p is not None]
+        if not questions:
+            return None
+        print('generate_quiz: text matches lecture %s, reusing its stored questions' % original)
+        return {'questions': questions, 'source': 'stored', 'lecture_id': original}
+    finally:
+        session.close()
+
+
+def _local_questions(text: str):
+    try:
+        res = _run_pipeline('generator', _quiz_prompt(text), max_length=256, do_sample=False)
+        out_text = res[0]['generated_text'] if isinstance(res, list) else str(res)
+        questions = _questions_from_output(out_text)
+        if questions is None:
+            print('generate_quiz: failed to parse HF output, falling back to mock')
+        return questions
+    except Exception as ex:
+        print('generate_quiz: error during HF generation -', str(ex))
+        return None
+
+
+def _hosted_questions(text: str):
+    try:
+        out = _hf_inference_request(GENERATOR_MODEL, _quiz_prompt(text), params={'max_length': 256})
+        return _questions_from_output(out)
+    except Exception as e:
+        print('generate_quiz: HF Inference API fallback failed -', str(e))
+        return None
+
+
+@app.route('/metrics/quiz-generation', methods=['GET'])
+def quiz_generation_metrics():
+    """Parse success rate of generated quizzes and output tokens spent per usable question."""
+    return jsonify({'format': QUIZ_FORMAT, **_quiz_stats.metrics()})
 
 
 @app.route('/seed-questions', methods=['GET'])
@@ -410,6 +1086,8 @@ def seed_questions_route():
     try:
         from db_init import seed_questions
         seed_questions()
+        _lectures_written()
+        _questions_written()
         return jsonify({'message': 'Questions seeded'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -418,113 +1096,871 @@ def seed_questions_route():
 @app.route('/save-progress', methods=['POST'])
 def save_progress():
     payload = request.get_json(force=True, silent=True) or {}
-    user_id = payload.get('user_id', 1)
-    week = payload.get('week')
-    mastery = int(payload.get('mastery', 0))
-    engagement = int(payload.get('engagement', 0))
-    accuracy = int(payload.get('accuracy', 0))
+    # Validate everything before the row is written or queued: analytics reads these columns as integers
+    try:
+        user_id = int(payload.get('user_id', 1))
+        lecture_id = payload.get('lecture_id')
+        lecture_id = int(lecture_id) if lecture_id is not None else None
+        mastery = int(payload.get('mastery', 0))
+        # Optional per-question outcomes: [{ "question_id": 3, "correct": true }, ...]
+        answers = [(int(a['question_id']), bool(a.get('correct'))) for a in payload.get('answers') or []
+                   if isinstance(a, dict) and a.get('question_id') is not None]
+    except (TypeError, ValueError):
+        return jsonify({'error': '"user_id", "lecture_id", "mastery" and question ids must be integers'}), 400
     try:
         if not DB_AVAILABLE or SessionLocal is None:
             return jsonify({'error': 'Database not available in this environment'}), 503
-        from models import QuizResult
-        session = SessionLocal()
         # Save as a QuizResult with score mapped from mastery (demo mapping)
         score = mastery
-        qr = QuizResult(user_id=user_id, lecture_id=payload.get('lecture_id'), score=score)
-        session.add(qr)
-        session.commit()
-        session.close()
+        buffer = _get_progress_buffer()
+        if buffer is not None:
+            from write_behind import BufferFull
+            row = {'user_id': user_id, 'lecture_id': lecture_id, 'score': score,
+                   'date': datetime.now(timezone.utc).replace(tzinfo=None)}
+            try:
+                buffer.submit(row)
+            except BufferFull as e:
+                return jsonify({'error': str(e)}), 503
+        else:
+            from models import QuizResult
+            session = SessionLocal()
+            qr = QuizResult(user_id=user_id, lecture_id=lecture_id, score=score)
+            session.add(qr)
+            session.commit()
+            session.close()
+            _quiz_results_written()
+        _record_answers(user_id, answers)
+        if buffer is not None and buffer.durability == 'buffered':
+            return jsonify({'message': 'Progress (quiz result) queued', 'durability': 'buffered'}), 202
         return jsonify({'message': 'Progress (quiz result) saved'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Optional write-behind mode for /save-progress: 'direct' (one commit per call, default),
+# 'sync' (group commit, ack after commit) or 'buffered' (ack once queued).
+PROGRESS_WRITE_MODE = os.environ.get('PROGRESS_WRITE_MODE', 'direct')
+_progress_buffer = None
+_progress_buffer_lock = threading.Lock()
+
+
+def _get_progress_buffer():
+    global _progress_buffer
+    if PROGRESS_WRITE_MODE not in ('sync', 'buffered'):
+        return None
+    with _progress_buffer_lock:
+        if _progress_buffer is None:
+            from models import QuizResult
+            from write_behind import WriteBehindBuffer
+            _progress_buffer = WriteBehindBuffer(
+                SessionLocal, QuizResult, durability=PROGRESS_WRITE_MODE,
+                max_batch=int(os.environ.get('PROGRESS_FLUSH_BATCH', '500')),
+                flush_interval=float(os.environ.get('PROGRESS_FLUSH_INTERVAL_MS', '50')) / 1000.0,
+                max_queue=int(os.environ.get('PROGRESS_MAX_QUEUE', '100000')),
+                on_commit=_quiz_results_written,
+            )
+            logger.info('save_progress: write-behind enabled (mode=%s)', PROGRESS_WRITE_MODE)
+        return _progress_buffer
+
+
+def _close_progress_buffer():
+    if _progress_buffer is not None:
+        _progress_buffer.close()
+
+
+atexit.register(_close_progress_buffer)
+
+
+@app.route('/metrics/progress-writes', methods=['GET'])
+def progress_write_metrics():
+    """Queue depth, batch sizes and flush latency of the /save-progress write path."""
+    if _progress_buffer is None:
+        return jsonify({'mode': PROGRESS_WRITE_MODE, 'buffer': None})
+    return jsonify({'mode': PROGRESS_WRITE_MODE, 'buffer': _progress_buffer.metrics()})
+
+
+@app.route('/submit-quiz', methods=['POST'])
+def submit_quiz():
+    """Grade a whole quiz server-side and store it in one transaction.
+
+    Accepts JSON: { "user_id": 1, "lecture_id": 2,
+                    "answers": [ {"question_id": 5, "answer": "text"} | {"question_id": 6, "answer_index": 2} ] }
+    Returns: { "quiz_result_id", "score", "correct", "total", "results": [...], "unknown_question_ids": [...] }
+    """
+    payload = request.get_json(force=True, silent=True) or {}
+    from grading import grade, normalize_submission
+    try:
+        user_id = int(payload.get('user_id', 1))
+        lecture_id = payload.get('lecture_id')
+        lecture_id = int(lecture_id) if lecture_id is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': '"user_id" and "lecture_id" must be integers'}), 400
+    try:
+        submission = normalize_submission(payload.get('answers'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not submission:
+        return jsonify({'error': 'Missing "answers" in request body'}), 400
+    try:
+        if not DB_AVAILABLE or SessionLocal is None:
+            return jsonify({'error': 'Database not available in this environment'}), 503
+        from models import Question, QuizAnswer, QuizResult
+        session = SessionLocal()
+        try:
+            ids = [qid for qid, _ in submission]
+            questions = {q.id: q for q in session.query(Question).filter(Question.id.in_(ids)).all()}
+            results, unknown = grade(questions, submission)
+            if not results:
+                return jsonify({'error': 'None of the submitted questions exist', 'unknown_question_ids': unknown}), 400
+            n_correct = sum(1 for r in results if r['correct'])
+            score = int(round(100.0 * n_correct / len(results)))
+            if lecture_id is None:
+                lecture_ids = {questions[r['question_id']].lecture_id for r in results}
+                lecture_id = lecture_ids.pop() if len(lecture_ids) == 1 else None
+            qr = QuizResult(user_id=user_id, lecture_id=lecture_id, score=score)
+            session.add(qr)
+            session.flush()
+            session.add_all([QuizAnswer(quiz_result_id=qr.id, question_id=r['question_id'],
+                                        answer=None if r['answer'] is None else r['answer'][:256],
+                                        correct=r['correct']) for r in results])
+            session.commit()
+            result_id = qr.id
+        finally:
+            session.close()
+        _quiz_results_written()
+        _record_answers(user_id, [(r['question_id'], r['correct']) for r in results])
+        return jsonify({
+            'quiz_result_id': result_id,
+            'score': score,
+            'correct': n_correct,
+            'total': len(results),
+            'results': [{'question_id': r['question_id'], 'correct': r['correct'], 'correct_answer': r['correct_answer']} for r in results],
+            'unknown_question_ids': unknown,
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/save-lecture', methods=['POST'])
 def save_lecture():
     payload = request.get_json(force=True, silent=True) or {}
-    title = payload.get('title')
-    # Accept either video_url or yt_url and normalize
-    video_url = payload.get('video_url') or payload.get('yt_url')
-    transcript = payload.get('transcript')
-    summary = payload.get('summary')
+    try:
+        fields = _lecture_fields(payload)
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': '"segments" must be a list of {text, start, duration} objects'}), 400
     try:
         if not DB_AVAILABLE or SessionLocal is None:
             return jsonify({'error': 'Database not available in this environment'}), 503
-        from models import Lecture
         session = SessionLocal()
-        lec = Lecture(title=title, yt_url=video_url, transcript=transcript, summary=summary)
-        session.add(lec)
+        lec, chunks = _add_lecture(session, fields)
+        session.commit()
+        _lectures_written()
+        lid, original = lec.id, lec.duplicate_of
+        indexed = _index_lecture_chunks(chunks)
+        session.close()
+        return jsonify({'message': 'Lecture saved', 'lecture_id': lid, 'duplicate_of': original,
+                        'chunks_indexed': indexed})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/save-lectures', methods=['POST'])
+def save_lectures():
+    """Batch variant of /save-lecture used by bulk harvesting.
+
+    Accepts JSON: { "lectures": [ {title, video_url, transcript, summary, segments}, ... ] }
+    All lectures are written in one transaction.
+    Returns: { "lecture_ids": [...], "chunks_indexed": n }
+    """
+    payload = request.get_json(force=True, silent=True) or {}
+    items = payload.get('lectures')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Missing "lectures" list in request body'}), 400
+    try:
+        fields = [_lecture_fields(item) for item in items]
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Each lecture must be an object; "segments" must be a list of {text, start, duration}'}), 400
+    try:
+        if not DB_AVAILABLE or SessionLocal is None:
+            return jsonify({'error': 'Database not available in this environment'}), 503
+        session = SessionLocal()
+        try:
+            added = [_add_lecture(session, f) for f in fields]
+            session.commit()
+            _lectures_written(len(added))
+            ids = [lec.id for lec, _ in added]
+            originals = [lec.duplicate_of for lec, _ in added]
+            indexed = _index_lecture_chunks([c for _, chunks in added for c in chunks])
+        finally:
+            session.close()
+        return jsonify({'message': 'Lectures saved', 'lecture_ids': ids, 'duplicate_of': originals,
+                        'chunks_indexed': indexed})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Single round trip lecture ingest: the server fetches, summarizes and saves
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', '2'))
+# How long POST /ingest-lecture waits for the result before answering with a job handle
+INGEST_WAIT_MS = float(os.environ.get('INGEST_WAIT_MS', '10000'))
+# How long a job waits for a still-loading summarizer before using the extractive summary
+INGEST_MODEL_WAIT_S = float(os.environ.get('INGEST_MODEL_WAIT_S', '120'))
+_ingest_jobs = None
+_ingest_jobs_lock = threading.Lock()
+
+
+def _get_ingest_jobs():
+    global _ingest_jobs
+    with _ingest_jobs_lock:
+        if _ingest_jobs is None:
+            from jobs import JobRegistry
+            _ingest_jobs = JobRegistry(workers=INGEST_WORKERS, name='ingest', on_change=_store_ingest_job)
+        return _ingest_jobs
+
+
+def _store_ingest_job(job):
+    """Mirror a job's status into ingest_jobs so any worker process can answer its polls."""
+    from models import IngestJob
+    session = SessionLocal()
+    try:
+        if job.status == 'queued':
+            # Rows of jobs no worker tracks any more
+            session.query(IngestJob).filter(IngestJob.finished < time.time() - _ingest_jobs.ttl).delete()
+        failed = job.status == 'failed'
+        session.merge(IngestJob(id=job.id, status=job.status,
+                                result=json.dumps(job.result) if job.status == 'done' else None,
+                                error=str(job.error) if failed else None,
+                                error_code=(422 if isinstance(job.error, LookupError) else 500) if failed else None,
+                                started=job.started, finished=job.finished))
+        session.commit()
+    finally:
+        session.close()
+
+
+def _stored_ingest_job(job_id):
+    """A Job rebuilt from ingest_jobs (one created by another worker), or None."""
+    from jobs import Job
+    from models import IngestJob
+    session = SessionLocal()
+    try:
+        row = session.get(IngestJob, job_id)
+    finally:
+        session.close()
+    if row is None:
+        return None
+    job = Job(row.id, None)
+    job.status, job.started, job.finished = row.status, row.started, row.finished
+    if row.status == 'done':
+        job.result = json.loads(row.result)
+    elif row.status == 'failed':
+        job.error = (LookupError if row.error_code == 422 else RuntimeError)(row.error)
+    return job
+
+
+def _ingest_summary(transcript: str, options: dict):
+    """(summary, source), waiting for a loading model or a full admission queue up to INGEST_MODEL_WAIT_S."""
+    deadline = time.monotonic() + (INGEST_MODEL_WAIT_S if ENABLE_HF_BACKGROUND else 0)
+    options = dict(options, mode='abstractive')
+    while True:
+        try:
+            body, status = _summarize_text(transcript, options)
+            if status == 200:
+                return body['summary'], body['source']
+            wait = 1.0
+        except _AdmissionRejected as e:
+            wait = e.retry_after
+        if time.monotonic() + wait > deadline:
+            body = _extractive_body(transcript, options)
+            return body['summary'], body['source']
+        time.sleep(wait)
+
+
+def _ingest_lecture(url: str, title: str, options: dict) -> dict:
+    from models import Lecture
+    fetched = _fetch_transcript_payload(url, allow_mock=False)
+    transcript = fetched['transcript']
+    session = SessionLocal()
+    try:
+        dedup = _find_duplicate(session, transcript)
+        original = dedup[1]
+        summary = None
+        if original is not None:
+            summary = session.query(Lecture.summary).filter(Lecture.id == original).scalar()
+    finally:
+        session.close()
+    if summary:
+        # A near-duplicate of a stored lecture: skip summarization entirely
+        source = 'duplicate'
+    else:
+        summary, source = _ingest_summary(transcript, options)
+    fields = _lecture_fields({'title': title or url, 'video_url': url, 'transcript': transcript,
+                              'summary': summary, 'segments': fetched.get('segments')})
+    session = SessionLocal()
+    try:
+        lec, chunks = _add_lecture(session, fields, dedup=dedup)
         session.commit()
+        _lectures_written()
         lid = lec.id
+    finally:
         session.close()
-        return jsonify({'message': 'Lecture saved', 'lecture_id': lid})
+    print('ingest-lecture: saved lecture %s (%d transcript chars, summary from %s)' % (lid, len(transcript), source))
+    return {'lecture_id': lid, 'title': fields['title'], 'summary': summary, 'source': source,
+            'duplicate_of': original, 'transcript_chars': len(transcript),
+            'segments': len(fetched.get('segments') or []), 'chunks_indexed': _index_lecture_chunks(chunks)}
+
+
+def _ingest_response(job):
+    if job.status == 'done':
+        return jsonify(dict(job.to_dict(), **job.result))
+    if job.status == 'failed':
+        # LookupError: the video has no transcript we can fetch
+        return jsonify(job.to_dict()), 422 if isinstance(job.error, LookupError) else 500
+    resp = jsonify(dict(job.to_dict(), status_url='/ingest-lecture/%s' % job.id))
+    resp.status_code = 202
+    resp.headers['Location'] = '/ingest-lecture/%s' % job.id
+    resp.headers['Retry-After'] = '2'
+    return resp
+
+
+@app.route('/ingest-lecture', methods=['POST'])
+def ingest_lecture():
+    """Fetch, summarize and save a lecture in one call.
+
+    Accepts JSON: { "url": "...", "title": "...", "wait_ms": 10000 }
+    Returns: { "lecture_id", "summary", "source", ... } once done within wait_ms,
+    otherwise 202 { "job_id", "status", "status_url" } to poll.
+    Concurrent requests for the same video share one job.
+    """
+    payload = request.get_json(force=True, silent=True) or {}
+    url = payload.get('url') or payload.get('video_url')
+    if not url:
+        return jsonify({'error': 'Missing "url" in request body'}), 400
+    try:
+        wait_ms = min(max(float(payload.get('wait_ms', INGEST_WAIT_MS)), 0.0), 60000.0)
+    except (TypeError, ValueError):
+        return jsonify({'error': '"wait_ms" must be a number'}), 400
+    if not DB_AVAILABLE or SessionLocal is None:
+        return jsonify({'error': 'Database not available in this environment'}), 503
+    options = {'deadline_ms': payload['deadline_ms']} if 'deadline_ms' in payload else {}
+    job, created = _get_ingest_jobs().submit(_ingest_lecture, url, payload.get('title'), options,
+                                             key=_video_id(url))
+    if not created:
+        print('ingest-lecture: joining in-flight job %s for %s' % (job.id, url))
+    job.wait(wait_ms / 1000.0)
+    return _ingest_response(job)
+
+
+@app.route('/ingest-lecture/<job_id>', methods=['GET'])
+def ingest_lecture_status(job_id):
+    """Status of an ingest job; the full result once it is done."""
+    job = _get_ingest_jobs().get(job_id)
+    if job is None and DB_AVAILABLE and SessionLocal is not None:
+        job = _stored_ingest_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job id'}), 404
+    return _ingest_response(job)
+
+
+@app.route('/metrics/ingest', methods=['GET'])
+def ingest_metrics():
+    """Submitted, deduplicated, finished and in-flight /ingest-lecture jobs."""
+    if _ingest_jobs is None:
+        return jsonify({'workers': INGEST_WORKERS, 'jobs': None})
+    return jsonify({'workers': INGEST_WORKERS, 'jobs': _ingest_jobs.metrics()})
+
+
+def _lecture_fields(payload):
+    """Normalize a lecture payload; raises TypeError/ValueError on malformed segments."""
+    segments = payload.get('segments')
+    # Optional timestamped segments as returned by /fetch-transcript: [{text, start, duration}, ...]
+    packed_segments = _pack_segments(segments)
+    transcript = payload.get('transcript')
+    if not transcript and packed_segments is not None:
+        from segments import SegmentArray
+        transcript = SegmentArray.from_bytes(packed_segments).text()
+    return {
+        'title': payload.get('title'),
+        # Accept either video_url or yt_url and normalize
+        'yt_url': payload.get('video_url') or payload.get('yt_url'),
+        'transcript': transcript,
+        'summary': payload.get('summary'),
+        'segments': packed_segments,
+    }
+
+
+# Near-duplicate transcripts (see dedup.py) share the original's summary, chunks and questions
+DEDUP_ENABLED = os.environ.get('DEDUP_ENABLED', '1') == '1'
+# Estimated Jaccard similarity of word 5-shingles at which two transcripts count as the same lecture
+DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', '0.85'))
+DEDUP_NUM_PERM = int(os.environ.get('DEDUP_NUM_PERM', '128'))
+DEDUP_MIN_WORDS = int(os.environ.get('DEDUP_MIN_WORDS', '50'))
+_dedup_index = None
+_dedup_lock = threading.Lock()
+
+
+def _get_dedup_index():
+    global _dedup_index
+    with _dedup_lock:
+        if _dedup_index is None:
+            from dedup import DedupIndex
+            index = DedupIndex(threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM, min_words=DEDUP_MIN_WORDS)
+            # Band keys written under another DEDUP_THRESHOLD would never match: rebuild them once
+            session = SessionLocal()
+            try:
+                done = index.ensure_layout(session)
+                session.commit()
+                if done:
+                    logger.info('dedup: reindexed %d lectures for %d bands x %d rows', done, index.bands, index.rows)
+            except Exception as e:
+                session.rollback()
+                logger.warning('dedup: layout check failed: %s', e)
+            finally:
+                session.close()
+            _dedup_index = index
+        return _dedup_index
+
+
+if DEDUP_ENABLED and DB_AVAILABLE and SessionLocal is not None:
+    # Check the stored band layout at startup rather than on the first upload
+    threading.Thread(target=_get_dedup_index, name='dedup-layout', daemon=True).start()
+
+
+def _find_duplicate(session, transcript):
+    """(signature, original lecture id, similarity) for a transcript.
+
+    The signature is None when dedup is off or the text is too short to compare;
+    the original is None when no stored lecture is similar enough.
+    """
+    if not DEDUP_ENABLED or not transcript:
+        return None, None, None
+    try:
+        index = _get_dedup_index()
+        sig = index.signature(transcript)
+        matches = index.query(session, sig, limit=1) if sig is not None else []
+    except Exception as e:
+        logger.warning('dedup: lookup failed: %s', e)
+        return None, None, None
+    if not matches:
+        return sig, None, None
+    lecture_id, sim = matches[0]
+    return sig, _canonical_lecture_id(session, lecture_id), sim
+
+
+def _canonical_lecture_id(session, lecture_id):
+    """The lecture a near-duplicate points to, or lecture_id itself."""
+    from models import Lecture
+    return session.query(Lecture.duplicate_of).filter(Lecture.id == lecture_id).scalar() or lecture_id
+
+
+def _add_lecture(session, fields, dedup=None):
+    """Add a Lecture plus its retrieval chunks to the session (caller commits).
+
+    A near-duplicate of a stored lecture gets `duplicate_of` set, borrows its
+    summary when none was sent, and creates no chunks of its own.
+    `dedup` is a precomputed _find_duplicate() result.
+    """
+    from models import Lecture
+    sig, original, sim = dedup if dedup is not None else _find_duplicate(session, fields['transcript'])
+    if original is not None:
+        fields = dict(fields, duplicate_of=original)
+        if not fields.get('summary'):
+            fields['summary'] = session.query(Lecture.summary).filter(Lecture.id == original).scalar()
+    lec = Lecture(**fields)
+    session.add(lec)
+    session.flush()
+    if sig is not None:
+        _get_dedup_index().add(session, lec.id, sig)
+    if original is not None:
+        print('save_lecture: lecture %s is a near-duplicate of %s (similarity %.2f), reusing its chunks'
+              % (lec.id, original, sim))
+        return lec, []
+    chunks = _create_lecture_chunks(session, lec.id, fields['transcript'])
+    return lec, chunks
+
+
+def _pack_segments(segments):
+    if not segments:
+        return None
+    if not isinstance(segments, list):
+        raise TypeError('segments must be a list')
+    from segments import SegmentArray
+    return SegmentArray.from_segments(segments).to_bytes()
+
+
+@app.route('/lectures/<int:lecture_id>/segments', methods=['GET'])
+def lecture_segments(lecture_id):
+    """Timestamped transcript segments overlapping [from, to) seconds.
+
+    Only the packed segments column is read; the full transcript is never loaded.
+    Returns: { "lecture_id", "from", "to", "count", "duration", "segments": [ {start, duration, text} ] }
+    """
+    t_from = request.args.get('from', 0.0, type=float)
+    t_to = request.args.get('to', None, type=float)
+    try:
+        if not DB_AVAILABLE or SessionLocal is None:
+            return jsonify({'error': 'Database not available in this environment'}), 503
+        from models import Lecture
+        from segments import SegmentArray
+        session = SessionLocal()
+        try:
+            row = session.query(Lecture.id, Lecture.segments).filter(Lecture.id == lecture_id).first()
+        finally:
+            session.close()
+        if row is None:
+            return jsonify({'error': 'Lecture not found'}), 404
+        if row.segments is None:
+            return jsonify({'error': 'No timestamped segments stored for this lecture'}), 404
+        segs = SegmentArray.from_bytes(row.segments)
+        out = segs.slice(t_from, t_to)
+        return jsonify({'lecture_id': lecture_id, 'from': t_from, 'to': t_to, 'count': len(out),
+                        'duration': round(segs.end_time, 3), 'segments': out})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _create_lecture_chunks(session, lecture_id, transcript):
+    """Create chunk rows for a new lecture. Retrieval is optional, so failures only log."""
+    if not transcript:
+        return []
+    try:
+        from embeddings import create_chunks
+        return create_chunks(session, lecture_id, transcript)
+    except Exception as e:
+        logger.warning('save_lecture: chunking failed for lecture %s: %s', lecture_id, e)
+        return []
+
+
+def _index_lecture_chunks(chunks):
+    """Embed committed chunks into the on-disk index; returns the number indexed."""
+    if not chunks:
+        return 0
+    try:
+        from embeddings import index_chunks
+        return index_chunks(chunks)
+    except Exception as e:
+        logger.warning('save_lecture: embedding index update failed: %s', e)
+        return 0
+
+
+@app.route('/related', methods=['GET', 'POST'])
+def related():
+    """Semantic search over saved transcript chunks.
+
+    Accepts ?q=...&k=5 (GET) or JSON { "q": "...", "k": 5, "exclude_lecture_id": 3 } (POST)
+    Returns: { "results": [ {chunk_id, lecture_id, title, position, text, score} ] }
+    """
+    if request.method == 'POST':
+        payload = request.get_json(force=True, silent=True) or {}
+    else:
+        payload = request.args
+    query = payload.get('q') or payload.get('text')
+    if not query:
+        return jsonify({'error': 'Missing "q" in request'}), 400
+    try:
+        k = max(1, min(int(payload.get('k', 5)), 50))
+        exclude = payload.get('exclude_lecture_id')
+        exclude = int(exclude) if exclude not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': '"k" and "exclude_lecture_id" must be integers'}), 400
+    try:
+        if not DB_AVAILABLE or SessionLocal is None:
+            return jsonify({'error': 'Database not available in this environment'}), 503
+        from embeddings import search_chunks
+        session = SessionLocal()
+        try:
+            results = search_chunks(session, query, k=k, exclude_lecture_id=exclude)
+        finally:
+            session.close()
+        return jsonify({'results': results})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/my-lectures', methods=['GET'])
+@_http_cache.cached('lectures')
 def my_lectures():
+    """List saved lectures.
+
+    ?include=transcript,summary (the default) selects which large fields to return;
+    pass ?include= for a lightweight listing that never reads the text columns.
+    """
+    include = request.args.get('include', 'transcript,summary')
+    fields = [f for f in ('transcript', 'summary') if f in include.split(',')]
     try:
         if not DB_AVAILABLE or SessionLocal is None:
             return jsonify({'error': 'Database not available in this environment'}), 503
+        from sqlalchemy.orm import undefer
         from models import Lecture
         session = SessionLocal()
-        qs = session.query(Lecture).all()
+        # Large columns are deferred; undefer only what's requested so it loads in the same query
+        qs = session.query(Lecture).options(*[undefer(getattr(Lecture, f)) for f in fields]).all()
         out = []
         for l in qs:
-            out.append({'id': l.id, 'title': l.title, 'video_url': l.yt_url, 'transcript': l.transcript, 'summary': l.summary})
+            item = {'id': l.id, 'title': l.title, 'video_url': l.yt_url}
+            for f in fields:
+                item[f] = getattr(l, f)
+            out.append(item)
         session.close()
         return jsonify({'lectures': out})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Quiz analytics: score columns cached as NumPy arrays, refreshed when results are written
+ANALYTICS_MAX_STALENESS_S = float(os.environ.get('ANALYTICS_MAX_STALENESS_S', '5'))
+ANALYTICS_BUDGET_MS = float(os.environ.get('ANALYTICS_BUDGET_MS', '250'))
+ANALYTICS_MIN_ATTEMPTS = int(os.environ.get('ANALYTICS_MIN_ATTEMPTS', '1'))
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def _quiz_results_written(n: int = 1):
+    """Call after committing QuizResult rows so cached analytics are rebuilt on next read."""
+    import table_versions
+    table_versions.bump('quiz_results', n)
+
+
+def _get_analytics():
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            from analytics import Analytics
+            _analytics = Analytics(engine, max_staleness=ANALYTICS_MAX_STALENESS_S, budget_ms=ANALYTICS_BUDGET_MS,
+                                   min_attempts=ANALYTICS_MIN_ATTEMPTS)
+        return _analytics
+
+
+def _warm_analytics():
+    try:
+        _get_analytics().refresh()
+    except Exception as e:
+        logger.warning('analytics: warm-up failed: %s', e)
+
+
+# Load the score columns in the background so the first /analytics request doesn't pay for it
+if DB_AVAILABLE and engine is not None and os.environ.get('ANALYTICS_WARM_ON_START', '1') == '1':
+    threading.Thread(target=_warm_analytics, name='analytics-warm', daemon=True).start()
+
+
+def _int_arg(name):
+    value = request.args.get(name)
+    return int(value) if value not in (None, '') else None
+
+
 @app.route('/analyze-performance', methods=['GET'])
+@_http_cache.cached('quiz_results')
 def analyze_performance():
+    """Weekly mastery (mean score), engagement (active days) and accuracy (pass rate).
+
+    Optional query params: user_id, lecture_id.
+    """
     try:
         if not DB_AVAILABLE or SessionLocal is None:
             return jsonify({'error': 'Database not available in this environment'}), 503
-        from models import QuizResult
-        session = SessionLocal()
-        qs = session.query(QuizResult).all()
-        data = {}
-        for q in qs:
-            wk = q.date.date().isoformat() if q.date else 'unknown'
-            if wk not in data:
-                data[wk] = {'scores': []}
-            data[wk]['scores'].append(q.score or 0)
-        weeks = sorted(data.keys())
-        mastery = [int(sum(data[w]['scores'])/len(data[w]['scores'])) if data[w]['scores'] else 0 for w in weeks]
-        # For demo purposes use mastery for all three metrics
-        engagement = mastery[:]
-        accuracy = mastery[:]
-        session.close()
-        return jsonify({'weeks': weeks, 'mastery': mastery, 'engagement': engagement, 'accuracy': accuracy})
+        try:
+            user_id, lecture_id = _int_arg('user_id'), _int_arg('lecture_id')
+        except ValueError:
+            return jsonify({'error': 'user_id and lecture_id must be integers'}), 400
+        return jsonify(_get_analytics().weekly(user_id=user_id, lecture_id=lecture_id))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/analytics/users/<int:user_id>', methods=['GET'])
+def analytics_user(user_id):
+    """Attempts, mean/best/last score, recent trend, cohort rank/percentile and weekly series."""
+    if not DB_AVAILABLE or SessionLocal is None:
+        return jsonify({'error': 'Database not available in this environment'}), 503
+    out = _get_analytics().user(user_id)
+    if out is None:
+        return jsonify({'error': 'No quiz results for user %d' % user_id}), 404
+    return jsonify(out)
+
+
+@app.route('/analytics/lectures', methods=['GET'])
+def analytics_lectures():
+    """Lectures ordered by difficulty (default) or attempts: ?sort=&limit=&min_attempts="""
+    if not DB_AVAILABLE or SessionLocal is None:
+        return jsonify({'error': 'Database not available in this environment'}), 503
+    try:
+        limit = min(int(request.args.get('limit', 20)), 1000)
+        min_attempts = int(request.args.get('min_attempts', 1))
+        rows = _get_analytics().lectures(sort=request.args.get('sort', 'difficulty'), limit=limit,
+                                         min_attempts=min_attempts)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'lectures': rows})
+
+
+@app.route('/analytics/lectures/<int:lecture_id>', methods=['GET'])
+def analytics_lecture(lecture_id):
+    """Attempts, learners, mean, pass rate, difficulty and score percentiles for one lecture."""
+    if not DB_AVAILABLE or SessionLocal is None:
+        return jsonify({'error': 'Database not available in this environment'}), 503
+    out = _get_analytics().lecture(lecture_id)
+    if out is None:
+        return jsonify({'error': 'No quiz results for lecture %d' % lecture_id}), 404
+    return jsonify(out)
+
+
+@app.route('/analytics/percentiles', methods=['GET'])
+def analytics_percentiles():
+    """Score percentiles: ?q=10,50,90 optionally filtered by user_id and/or lecture_id."""
+    if not DB_AVAILABLE or SessionLocal is None:
+        return jsonify({'error': 'Database not available in this environment'}), 503
+    from analytics import DEFAULT_PERCENTILES
+    try:
+        q = request.args.get('q')
+        qs = [float(x) for x in q.split(',') if x.strip()] if q else DEFAULT_PERCENTILES
+        out = _get_analytics().percentiles(qs, user_id=_int_arg('user_id'), lecture_id=_int_arg('lecture_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(out)
+
+
+@app.route('/analytics/rankings', methods=['GET'])
+def analytics_rankings():
+    """Users ranked by mean score: ?limit=&offset=&min_attempts=&lecture_id="""
+    if not DB_AVAILABLE or SessionLocal is None:
+        return jsonify({'error': 'Database not available in this environment'}), 503
+    try:
+        limit = min(int(request.args.get('limit', 20)), 1000)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        out = _get_analytics().rankings(limit=limit, offset=offset, min_attempts=_int_arg('min_attempts'),
+                                        lecture_id=_int_arg('lecture_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(out)
+
+
+@app.route('/metrics/analytics', methods=['GET'])
+def analytics_metrics():
+    """Rows cached, refresh counts/latency and snapshot age of the analytics cache."""
+    if _analytics is None:
+        return jsonify({'loaded': False})
+    return jsonify(dict(_analytics.metrics(), loaded=True))
+
+
+# Leaderboard: per-user score totals in a Fenwick tree over mean-score buckets (see leaderboard.py),
+# built once from quiz_results and then updated with each new row
+LEADERBOARD_RESOLUTION = int(os.environ.get('LEADERBOARD_RESOLUTION', '100'))
+_leaderboard = None
+_leaderboard_lock = threading.Lock()
+
+
+def _get_leaderboard():
+    global _leaderboard
+    with _leaderboard_lock:
+        if _leaderboard is None:
+            from leaderboard import Leaderboard
+            _leaderboard = Leaderboard(engine, min_attempts=ANALYTICS_MIN_ATTEMPTS, resolution=LEADERBOARD_RESOLUTION,
+                                       max_staleness=ANALYTICS_MAX_STALENESS_S)
+        return _leaderboard
+
+
+def _warm_leaderboard():
+    try:
+        _get_leaderboard().refresh()
+    except Exception as e:
+        logger.warning('leaderboard: warm-up failed: %s', e)
+
+
+if DB_AVAILABLE and engine is not None and os.environ.get('ANALYTICS_WARM_ON_START', '1') == '1':
+    threading.Thread(target=_warm_leaderboard, name='leaderboard-warm', daemon=True).start()
+
+
+@app.route('/leaderboard', methods=['GET'])
+def leaderboard_top():
+    """Top learners by mean score: ?limit=&offset="""
+    if not DB_AVAILABLE or SessionLocal is None:
+        return jsonify({'error': 'Database not available in this environment'}), 503
+    try:
+        limit = min(int(request.args.get('limit', 20)), 1000)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    return jsonify(_get_leaderboard().top(limit=limit, offset=offset))
+
+
+@app.route('/leaderboard/users/<int:user_id>', methods=['GET'])
+def leaderboard_user(user_id):
+    """Rank, percentile, mean and attempts of one learner."""
+    if not DB_AVAILABLE or SessionLocal is None:
+        return jsonify({'error': 'Database not available in this environment'}), 503
+    out = _get_leaderboard().user(user_id)
+    if out is None:
+        return jsonify({'error': 'No quiz results for user %d' % user_id}), 404
+    return jsonify(out)
+
+
+@app.route('/metrics/leaderboard', methods=['GET'])
+def leaderboard_metrics():
+    """Indexed users, rows folded in since the last rebuild and index age."""
+    if _leaderboard is None:
+        return jsonify({'loaded': False})
+    return jsonify(dict(_leaderboard.metrics(), loaded=True))
+
+
 @app.route('/fetch-transcript', methods=['POST'])
 def fetch_transcript():
     payload = request.get_json(force=True, silent=True) or {}
     url = payload.get('url') or payload.get('video_url')
     if not url:
         return jsonify({'error': 'Missing "url" in request body'}), 400
+    return jsonify(_fetch_transcript_payload(url))
+
+
+def _fetch_transcript_payload(url: str, allow_mock: bool = True) -> dict:
+    """{transcript, segments} from the transcript service or youtube_transcript_api.
+
+    Falls back to a mock transcript, or raises LookupError when allow_mock is False.
+    """
+    vid = _video_id(url)
+
+    # A configured transcript service takes precedence over youtube_transcript_api
+    if TRANSCRIPT_PROVIDER_URL:
+        import requests
+        try:
+            resp = requests.get(f'{TRANSCRIPT_PROVIDER_URL}/{vid}', timeout=30)
+            resp.raise_for_status()
+            return _transcript_payload(_provider_segments(resp.json()))
+        except Exception as e:
+            print('fetch_transcript: transcript provider failed -', str(e))
 
     # Try to extract transcript using youtube_transcript_api if installed
     try:
         from youtube_transcript_api import YouTubeTranscriptApi
-        # extract video id from URL
-        import re
-        m = re.search(r'(?:v=|youtu\.be/)([A-Za-z0-9_-]{6,})', url)
-        vid = m.group(1) if m else url
-        transcript_list = YouTubeTranscriptApi.get_transcript(vid)
-        text = ' '.join([t['text'] for t in transcript_list])
-        return jsonify({'transcript': text})
-    except Exception:
+        return _transcript_payload(YouTubeTranscriptApi.get_transcript(vid))
+    except Exception as e:
+        if not allow_mock:
+            raise LookupError('No transcript available for video %s' % vid) from e
         # Fallback: return mock transcript
-        mock = 'This is a mocked transcript. Install youtube-transcript-api for real transcripts.'
-        return jsonify({'transcript': mock})
+        return _mock_transcript_payload()
+
+
+def _video_id(url: str) -> str:
+    import re
+    m = re.search(r'(?:v=|youtu\.be/)([A-Za-z0-9_-]{6,})', url)
+    return m.group(1) if m else url
+
+
+def _provider_segments(data: dict):
+    if data.get('segments'):
+        return data['segments']
+    if data.get('transcript'):
+        return [{'text': data['transcript'], 'start': 0.0, 'duration': 0.0}]
+    raise ValueError('provider returned no transcript')
+
+
+def _transcript_payload(transcript_list):
+    text = ' '.join([t['text'] for t in transcript_list])
+    # Keep the timing so /save-lecture can store it for time-range queries
+    segments = [{'text': t.get('text', ''), 'start': t.get('start', 0.0), 'duration': t.get('duration', 0.0)} for t in transcript_list]
+    return {'transcript': text, 'segments': segments}
+
+
+def _mock_transcript_payload():
+    return {'transcript': 'This is a mocked transcript. Install youtube-transcript-api for real transcripts.'}
 
 
 @app.route('/cognitive-load', methods=['POST'])
@@ -566,5 +2002,209 @@ def cognitive_load():
     return jsonify({'chunks': chunks, 'readability_flesch': readability})
 
 
+# --- Admin-only profiling and memory introspection ----------------------------
+# Endpoints answer 404 unless ADMIN_TOKEN is set and sent as X-Admin-Token.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+# Profile requests slower than this many ms (0 = off; no hooks are installed then)
+PROFILE_SLOW_REQUESTS_MS = float(os.environ.get('PROFILE_SLOW_REQUESTS_MS', '0'))
+
+
+def _admin_denied():
+    import hmac
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Forbidden'}), 403
+    return None
+
+
+def _models_memory():
+    if _inference is not None:
+        # The models live in the worker processes, outside this process's RSS
+        workers = [w for w in _inference.metrics()['workers'] if w is not None]
+        return {'bytes': 0, 'mode': 'process',
+                'worker_rss_bytes': {str(w['pid']): w['rss_bytes'] for w in workers},
+                'workers_total_bytes': sum(w['rss_bytes'] or 0 for w in workers)}
+    from profiling import torch_module_bytes
+    out = {}
+    for role, pipe in (('summarizer', _hf_summarizer), ('generator', _hf_generator)):
+        model = getattr(pipe, 'model', None)
+        out[role] = torch_module_bytes(model) if model is not None else 0
+    return {'bytes': sum(out.values()), **out}
+
+
+def _db_memory():
+    from profiling import traced_bytes_by_package
+    if engine is None:
+        return {'bytes': 0}
+    traced = traced_bytes_by_package(['sqlalchemy', 'sqlite3'])
+    return {'bytes': sum(traced.values()) if traced else None, 'pool': engine.pool.status(),
+            'note': None if traced else 'start a tracemalloc snapshot to attribute DB memory'}
+
+
+def _caches_memory():
+    out = {}
+    try:
+        from embeddings import index_memory_bytes
+        out['embedding_index'] = index_memory_bytes()
+    except ImportError:
+        pass
+    if _adaptive_engine is not None:
+        out['adaptive_engine'] = _adaptive_engine.memory_bytes()
+    if _rate_limiter is not None:
+        out['rate_limit_buckets'] = _rate_limiter.memory_bytes()
+    if _progress_buffer is not None:
+        out['write_behind_rows'] = _progress_buffer.memory_bytes()
+    return {'bytes': sum(out.values()), **out}
+
+
+try:
+    from profiling import register_memory_reporter
+    register_memory_reporter('models', _models_memory)
+    register_memory_reporter('db_engine', _db_memory)
+    register_memory_reporter('caches', _caches_memory)
+except Exception as e:
+    logger.warning('startup: memory reporters unavailable: %s', e)
+
+
+@app.route('/admin/profile/cpu', methods=['GET', 'POST'])
+def admin_profile_cpu():
+    """Sample all threads for ?seconds= (max 60) and return collapsed stacks.
+
+    ?format=collapsed (default) is a text file for flamegraph.pl / speedscope;
+    ?format=json returns the top functions plus the collapsed text.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    from flask import Response
+    from profiling import sample_stacks, to_collapsed, top_functions
+    seconds = min(60.0, max(0.1, request.args.get('seconds', 5.0, type=float)))
+    interval = max(1.0, request.args.get('interval_ms', 5.0, type=float)) / 1000.0
+    counts = sample_stacks(seconds, interval, include_idle=request.args.get('idle') == '1')
+    if request.args.get('format') == 'json':
+        return jsonify({'seconds': seconds, 'samples': sum(counts.values()), 'top': top_functions(counts),
+                        'collapsed': to_collapsed(counts)})
+    return Response(to_collapsed(counts), mimetype='text/plain',
+                    headers={'Content-Disposition': 'attachment; filename=profile.collapsed'})
+
+
+@app.route('/admin/memory', methods=['GET'])
+def admin_memory():
+    """RSS plus the footprint attributed to models, the DB engine and caches."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    from profiling import list_snapshots, memory_report
+    return jsonify(dict(memory_report(), snapshots=list_snapshots()))
+
+
+@app.route('/admin/memory/snapshot', methods=['POST'])
+def admin_memory_snapshot():
+    """Take a tracemalloc snapshot (starting tracing on first use); ?top= largest sites."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    from profiling import snapshot_top, take_snapshot
+    info = take_snapshot(request.args.get('label', ''), nframes=request.args.get('frames', 10, type=int))
+    info['top'] = snapshot_top(info['id'], limit=request.args.get('top', 20, type=int))
+    return jsonify(info)
+
+
+@app.route('/admin/memory/diff', methods=['GET'])
+def admin_memory_diff():
+    """Allocation growth between snapshots ?from=<id>&to=<id> (to defaults to a new snapshot)."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    from profiling import snapshot_diff, take_snapshot
+    old_id = request.args.get('from', type=int)
+    new_id = request.args.get('to', type=int)
+    if old_id is None:
+        return jsonify({'error': 'Missing "from" snapshot id'}), 400
+    try:
+        if new_id is None:
+            new_id = take_snapshot('diff')['id']
+        diff = snapshot_diff(old_id, new_id, limit=request.args.get('top', 20, type=int),
+                             group_by=request.args.get('group_by', 'lineno'))
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'from': old_id, 'to': new_id, 'diff': diff})
+
+
+@app.route('/admin/memory/stop', methods=['POST'])
+def admin_memory_stop():
+    """Stop tracemalloc and drop stored snapshots (tracing slows allocations)."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    from profiling import stop_tracing
+    stop_tracing()
+    return jsonify({'tracing': False})
+
+
+_slow_profiler = None
+if PROFILE_SLOW_REQUESTS_MS > 0:
+    from profiling import SlowRequestProfiler
+    _slow_profiler = SlowRequestProfiler(PROFILE_SLOW_REQUESTS_MS,
+                                         interval=float(os.environ.get('PROFILE_SLOW_INTERVAL_MS', '10')) / 1000.0)
+
+    @app.before_request
+    def _profile_request_start():
+        _slow_profiler.start('%s %s' % (request.method, request.path))
+
+    @app.after_request
+    def _profile_request_status(resp):
+        g.profile_status = resp.status_code
+        return resp
+
+    @app.teardown_request
+    def _profile_request_finish(exc):
+        profile = _slow_profiler.finish(g.pop('profile_status', None) if exc is None else 500)
+        if profile is not None:
+            top = profile['top'][0]['function'] if profile['top'] else '-'
+            logger.warning('slow request: %s took %.0fms (hottest: %s)', profile['request'], profile['duration_ms'], top)
+
+
+@app.route('/admin/profile/slow', methods=['GET'])
+def admin_slow_requests():
+    """Stack samples of recent requests slower than PROFILE_SLOW_REQUESTS_MS."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if _slow_profiler is None:
+        return jsonify({'enabled': False, 'profiles': []})
+    return jsonify({'enabled': True, 'threshold_ms': PROFILE_SLOW_REQUESTS_MS, 'profiles': _slow_profiler.profiles()})
+
+
+@app.route('/export/<table>', methods=['GET'])
+def export_table(table):
+    """Stream a full (or ?since_id= incremental) dump of a table; admin token required.
+
+    ?format=ndjson (default) | csv | parquet, plus optional ?limit= and ?batch_size=.
+    Each batch is a separate keyset query, so a slow download never holds a
+    transaction open against writers, and memory stays flat.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if not DB_AVAILABLE or engine is None:
+        return jsonify({'error': 'Database not available in this environment'}), 503
+    from flask import Response
+    import export as exporter
+    fmt = request.args.get('format', 'ndjson')
+    if fmt == 'parquet' and not exporter.parquet_available():
+        return jsonify({'error': 'Parquet export needs the optional pyarrow package'}), 501
+    try:
+        chunks = exporter.export(engine, table, fmt, since_id=request.args.get('since_id', 0, type=int),
+                                 batch_size=max(1, request.args.get('batch_size', exporter.DEFAULT_BATCH_SIZE, type=int)),
+                                 limit=request.args.get('limit', type=int), paged=True)
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': e.args[0] if e.args else str(e)}), 400
+    filename = '%s.%s' % (table, exporter.EXTENSIONS[fmt])
+    return Response(chunks, mimetype=exporter.CONTENT_TYPES[fmt],
+                    headers={'Content-Disposition': 'attachment; filename=%s' % filename})
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,266 @@
+"""ASGI entry point: network-bound routes run on the event loop, everything else runs in Flask.
+
+  uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Three routes are served natively async. Their upstream calls share one pooled
+httpx client and overlap on a single thread instead of each holding a worker
+thread while it waits:
+  POST /fetch-transcript   transcript service / youtube_transcript_api
+  POST /summarize          only the hosted-inference fallback (local model still loading),
+                           degrading to the extractive summary when it fails
+  POST /generate-quiz      stored questions of a matching lecture, else only the
+                           hosted-inference fallback for { "text": ... }
+
+Every other request, and every case these handlers don't cover (local
+pipelines, force_mock, extractive summaries, retrieval, requests with a
+latency budget for the tier router or a deadline for admission control),
+is passed unchanged to the Flask app through asgiref's WSGI adapter. The
+adapter's thread pool size is set with ASGI_THREADS.
+
+The native handlers build their bodies with the Flask app's helpers (stored
+question reuse, tier routing report, extractive fallback), so responses
+match gunicorn's. One difference: hosted calls here are not queued behind the
+per-model admission gate, whose few slots are sized for local inference.
+Their concurrency is bounded by the upstream connection pool instead, and an
+exhausted pool answers 503 with Retry-After.
+"""
+import asyncio
+import json
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as webapp
+from async_upstream import UpstreamBusy, from_env
+
+_wsgi = WsgiToAsgi(webapp.app)
+upstream = from_env(webapp.HF_INFERENCE_URL, webapp._HF_INFERENCE_API_KEY, webapp.TRANSCRIPT_PROVIDER_URL)
+
+_CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-expose-headers', ', '.join(webapp.CORS_EXPOSE_HEADERS).encode('latin-1')),
+]
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def _replay(body: bytes, receive):
+    """A receive() that hands the already-read body to the WSGI adapter, then defers to the real one."""
+    sent = False
+
+    async def _receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return await receive()
+    return _receive
+
+
+async def _send_json(send, status: int, body: dict, headers=None):
+    raw = json.dumps(body).encode('utf-8')
+    out = [(b'content-type', b'application/json'), (b'content-length', str(len(raw)).encode())] + _CORS_HEADERS
+    for k, v in (headers or {}).items():
+        out.append((k.lower().encode('latin-1'), str(v).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': out})
+    await send({'type': 'http.response.body', 'body': raw})
+
+
+def _header(scope, name: bytes):
+    for k, v in scope.get('headers', []):
+        if k == name:
+            return v.decode('latin-1')
+    return None
+
+
+def _rate_limit(scope, route: str):
+    """Same per-client token bucket as the Flask before_request hook: (allowed, headers)."""
+    limiter = webapp._rate_limiter
+    if limiter is None:
+        return True, {}
+    from rate_limit import client_key, headers
+    client = client_key(_header(scope, b'x-api-key'), (scope.get('client') or ('unknown',))[0],
+                        _header(scope, b'x-forwarded-for'), webapp.RATE_LIMIT_TRUST_PROXY, webapp.RATE_LIMIT_API_KEYS)
+    try:
+        decision = limiter.check(route, client, method=scope['method'])
+    except Exception as e:
+        webapp.logger.warning('rate_limit: check failed, allowing request: %s', e)
+        return True, {}
+    if decision is None:
+        return True, {}
+    return decision.allowed, headers(decision)
+
+
+def _budgeted(scope, payload: dict) -> bool:
+    """Requests with a latency budget (tier router) or a deadline (admission gate) are served by the Flask app."""
+    from admission import parse_deadline
+    from tier_router import parse_budget
+    if parse_budget(_header(scope, b'x-latency-budget-ms'), payload.get('latency_budget_ms'),
+                    webapp.LATENCY_BUDGET_DEFAULT_MS) is not None:
+        return True
+    return parse_deadline(_header(scope, b'x-request-deadline-ms'), payload.get('deadline_ms'),
+                          webapp.ADMISSION_DEFAULT_DEADLINE_MS) is not None
+
+
+async def _throttled(send, limit_headers):
+    await _send_json(send, 429, {'error': 'Rate limit exceeded, retry later',
+                                 'retry_after': int(limit_headers.get('Retry-After', 1))}, limit_headers)
+
+
+async def _busy(send, limit_headers):
+    await _send_json(send, 503, {'error': 'Server busy, retry later', 'reason': 'upstream connections exhausted',
+                                 'retry_after': 1}, dict(limit_headers, **{'Retry-After': 1}))
+
+
+async def fetch_transcript(scope, payload: dict, send) -> bool:
+    url = payload.get('url') or payload.get('video_url')
+    if not url:
+        await _send_json(send, 400, {'error': 'Missing "url" in request body'})
+        return True
+    allowed, limit_headers = _rate_limit(scope, '/fetch-transcript')
+    if not allowed:
+        await _throttled(send, limit_headers)
+        return True
+    vid = webapp._video_id(url)
+    try:
+        if upstream.transcript_url:
+            try:
+                segments = webapp._provider_segments(await upstream.provider_transcript(vid))
+                await _send_json(send, 200, webapp._transcript_payload(segments), limit_headers)
+                return True
+            except UpstreamBusy:
+                raise
+            except Exception as e:
+                print('fetch_transcript: transcript provider failed -', str(e))
+        try:
+            segments = await upstream.youtube_transcript(vid)
+            await _send_json(send, 200, webapp._transcript_payload(segments), limit_headers)
+        except Exception:
+            await _send_json(send, 200, webapp._mock_transcript_payload(), limit_headers)
+    except UpstreamBusy:
+        await _busy(send, limit_headers)
+    return True
+
+
+def _extractive(router, text: str, payload: dict) -> dict:
+    with router.track('extractive'):
+        return webapp._extractive_body(text, payload, 'model-loading')
+
+
+async def summarize(scope, payload: dict, send) -> bool:
+    text = payload.get('text') or payload.get('transcript')
+    mode = payload.get('mode') or 'auto'
+    if not text or payload.get('force_mock') or mode not in ('auto', 'abstractive') \
+            or not webapp._hosted_fallback('summarizer') or _budgeted(scope, payload):
+        return False
+    allowed, limit_headers = _rate_limit(scope, '/summarize')
+    if not allowed:
+        await _throttled(send, limit_headers)
+        return True
+    # Same tier router as the Flask view; without a latency budget it picks the hosted tier
+    router = webapp._get_router('summarizer')
+    decision = router.choose(['hf-inference'] + (['extractive'] if mode == 'auto' else []))
+    try:
+        with router.track('hf-inference'):
+            out = await upstream.hf_inference(webapp.SUMMARIZER_MODEL, text[:1000],
+                                              params={'max_length': 120, 'min_length': 30})
+        summary = webapp._summary_from_output(out)
+        if summary is not None:
+            await _send_json(send, 200, {'summary': summary, 'source': 'hf-inference', 'routing': decision.report()},
+                             limit_headers)
+            return True
+    except UpstreamBusy:
+        await _busy(send, limit_headers)
+        return True
+    except Exception as e:
+        print('summarize: HF Inference API fallback failed -', str(e))
+    if mode == 'auto':
+        # Extractive ranking is CPU work; keep it off the event loop
+        print('summarize: summarizer not ready yet, using extractive summary')
+        body = await asyncio.to_thread(_extractive, router, text, payload)
+        body['routing'] = decision.report('extractive')
+        await _send_json(send, 200, body, limit_headers)
+        return True
+    print('summarize: summarizer not ready yet')
+    await _send_json(send, 202, {'message': 'Model loading, please try again later', 'source': 'loading'}, limit_headers)
+    return True
+
+
+async def generate_quiz(scope, payload: dict, send) -> bool:
+    text = payload.get('text')
+    if not text or payload.get('force_mock') or not webapp._hosted_fallback('generator') or _budgeted(scope, payload):
+        return False
+    allowed, limit_headers = _rate_limit(scope, '/generate-quiz')
+    if not allowed:
+        await _throttled(send, limit_headers)
+        return True
+    if payload.get('reuse', True):
+        # A saved lecture's transcript (or a near-duplicate) gets its stored questions, as under Flask
+        stored = await asyncio.to_thread(webapp._stored_questions, text)
+        if stored is not None:
+            await _send_json(send, 200, stored, limit_headers)
+            return True
+    router = webapp._get_router('generator')
+    decision = router.choose(['hf-inference', 'mock'])
+    try:
+        with router.track('hf-inference'):
+            out = await upstream.hf_inference(webapp.GENERATOR_MODEL, webapp._quiz_prompt(text), params={'max_length': 256})
+        questions = webapp._questions_from_output(out)
+        if questions is not None:
+            await _send_json(send, 200, {'questions': questions, 'source': 'hf-inference', 'routing': decision.report()},
+                             limit_headers)
+            return True
+    except UpstreamBusy:
+        await _busy(send, limit_headers)
+        return True
+    except Exception as e:
+        print('generate_quiz: HF Inference API fallback failed -', str(e))
+    print('generate_quiz: generator not ready yet')
+    await _send_json(send, 202, {'message': 'Model loading, please try again later', 'source': 'loading'}, limit_headers)
+    return True
+
+
+ASYNC_ROUTES = {
+    '/fetch-transcript': fetch_transcript,
+    '/summarize': summarize,
+    '/generate-quiz': generate_quiz,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await upstream.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    handler = ASYNC_ROUTES.get(scope.get('path')) if scope['type'] == 'http' and scope['method'] == 'POST' else None
+    if handler is not None:
+        body = await _read_body(receive)
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            payload = {}
+        if not isinstance(payload, dict):
+            payload = {}
+        if await handler(scope, payload, send):
+            return
+        receive = _replay(body, receive)
+    await _wsgi(scope, receive, send)
@@ -0,0 +1,93 @@
+"""Async HTTP client for network-bound upstream calls (hosted inference, transcript service).
+
+One pooled `httpx.AsyncClient` is shared by every request on the event loop, so
+hundreds of slow upstream calls can be in flight on a single thread. Keep-alive
+connections are reused across requests. `max_connections` bounds concurrent
+upstream calls; a request that can't get a connection within `pool_timeout`
+fails fast with UpstreamBusy instead of queueing indefinitely.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Optional
+
+try:
+    import httpx
+except Exception:  # httpx is only needed for the ASGI entry point
+    httpx = None
+
+
+class UpstreamBusy(RuntimeError):
+    """All upstream connections are busy; callers should answer 503 with Retry-After."""
+
+
+class AsyncUpstream:
+    def __init__(self, hf_url: str, hf_api_key: Optional[str] = None, transcript_url: str = '',
+                 max_connections: int = 100, max_keepalive: int = 20, timeout: float = 60.0,
+                 pool_timeout: float = 5.0, blocking_concurrency: int = 8):
+        if httpx is None:
+            raise RuntimeError('httpx is required for the async upstream client (pip install httpx)')
+        self.hf_url = hf_url.rstrip('/')
+        self.hf_api_key = hf_api_key
+        self.transcript_url = transcript_url.rstrip('/')
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(timeout, pool=pool_timeout)
+        self._client: Optional['httpx.AsyncClient'] = None
+        # youtube_transcript_api is synchronous; bound how many threads it may hold
+        self._blocking = asyncio.Semaphore(blocking_concurrency)
+
+    @property
+    def client(self) -> 'httpx.AsyncClient':
+        # Created lazily so it binds to the server's running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    async def _request(self, method: str, url: str, **kwargs):
+        try:
+            resp = await self.client.request(method, url, **kwargs)
+        except httpx.PoolTimeout as e:
+            raise UpstreamBusy('no free upstream connection for %s' % url) from e
+        resp.raise_for_status()
+        return resp
+
+    async def hf_inference(self, model: str, inputs: str, params: Optional[dict] = None):
+        """Async twin of app._hf_inference_request: parsed JSON, or text if the body isn't JSON."""
+        if not self.hf_api_key:
+            raise RuntimeError('No HF_INFERENCE_API_KEY configured')
+        payload = {'inputs': inputs}
+        if params:
+            payload['parameters'] = params
+        resp = await self._request('POST', f'{self.hf_url}/{model}', json=payload,
+                                   headers={'Authorization': f'Bearer {self.hf_api_key}'})
+        try:
+            return resp.json()
+        except ValueError:
+            return resp.text
+
+    async def provider_transcript(self, vid: str) -> dict:
+        """JSON from the transcript service ({"segments": [...]} or {"transcript": "..."})."""
+        if not self.transcript_url:
+            raise RuntimeError('No TRANSCRIPT_PROVIDER_URL configured')
+        resp = await self._request('GET', f'{self.transcript_url}/{vid}')
+        return resp.json()
+
+    async def youtube_transcript(self, vid: str):
+        """youtube_transcript_api is synchronous, so it runs in a bounded pool of worker threads."""
+        from youtube_transcript_api import YouTubeTranscriptApi
+        async with self._blocking:
+            return await asyncio.to_thread(YouTubeTranscriptApi.get_transcript, vid)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def from_env(hf_url: str, hf_api_key: Optional[str], transcript_url: str) -> AsyncUpstream:
+    return AsyncUpstream(hf_url, hf_api_key, transcript_url,
+                         max_connections=int(os.environ.get('ASYNC_UPSTREAM_MAX_CONNECTIONS', '100')),
+                         max_keepalive=int(os.environ.get('ASYNC_UPSTREAM_MAX_KEEPALIVE', '20')),
+                         timeout=float(os.environ.get('ASYNC_UPSTREAM_TIMEOUT', '60')),
+                         pool_timeout=float(os.environ.get('ASYNC_UPSTREAM_POOL_TIMEOUT', '5')))
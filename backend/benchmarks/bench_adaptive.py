@@ -0,0 +1,111 @@
+"""Simulation benchmark for the adaptive selection engine.
+
+Draws true abilities/difficulties, then alternates selection and batched
+answer updates for simulated users. Reports selection latency, update
+throughput, how well the estimates recover the truth, and checkpoint time
+to a temporary SQLite database.
+
+Usage:
+  python benchmarks/bench_adaptive.py --users 100000 --questions 1000000 --rounds 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adaptive import AdaptiveEngine  # noqa: E402
+
+
+def _spearman(a, b):
+    ra = np.argsort(np.argsort(a))
+    rb = np.argsort(np.argsort(b))
+    return float(np.corrcoef(ra, rb)[0, 1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate adaptive quizzing at scale')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--questions', type=int, default=1_000_000)
+    parser.add_argument('--rounds', type=int, default=20, help='Answer rounds; each active user answers --per-round questions')
+    parser.add_argument('--active', type=int, default=20_000, help='Users active per round')
+    parser.add_argument('--per-round', type=int, default=5)
+    parser.add_argument('--timed-selects', type=int, default=2000)
+    parser.add_argument('--skip-checkpoint', action='store_true')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    true_theta = rng.normal(0, 1, args.users).astype(np.float32)
+    true_b = rng.normal(0, 1.2, args.questions).astype(np.float32)
+    user_ids = np.arange(1, args.users + 1)
+    question_ids = np.arange(1, args.questions + 1)
+
+    engine = AdaptiveEngine()
+    t = time.perf_counter()
+    engine.add_questions(question_ids)
+    print(f'register {args.questions:,} questions: {time.perf_counter() - t:.2f}s')
+
+    # Seed difficulties with a cold-start pass so selection has something to work with
+    warm_users = rng.integers(0, args.users, args.questions)
+    correct = rng.random(args.questions) < 1 / (1 + np.exp(-(true_theta[warm_users] - true_b)))
+    t = time.perf_counter()
+    engine.record_batch(user_ids[warm_users], question_ids, correct)
+    dt = time.perf_counter() - t
+    print(f'warm-up: {args.questions:,} answers in {dt:.2f}s ({args.questions / dt:,.0f} answers/s)')
+
+    select_times = []
+    update_time = 0.0
+    answered = 0
+    for r in range(args.rounds):
+        active = rng.choice(args.users, size=args.active, replace=False)
+        picked_u, picked_q = [], []
+        for i, u in enumerate(active):
+            t0 = time.perf_counter()
+            qs = engine.select(int(user_ids[u]), k=args.per_round)
+            if i < args.timed_selects // args.rounds:
+                select_times.append(time.perf_counter() - t0)
+            picked_u.extend([u] * len(qs))
+            picked_q.extend(q - 1 for q in qs)
+        pu = np.asarray(picked_u)
+        pq = np.asarray(picked_q)
+        y = rng.random(len(pu)) < 1 / (1 + np.exp(-(true_theta[pu] - true_b[pq])))
+        t0 = time.perf_counter()
+        engine.record_batch(user_ids[pu], question_ids[pq], y)
+        update_time += time.perf_counter() - t0
+        answered += len(pu)
+
+    st = np.asarray(select_times) * 1000
+    print(f'select (k={args.per_round}): p50={np.percentile(st, 50):.3f}ms p99={np.percentile(st, 99):.3f}ms max={st.max():.3f}ms')
+    print(f'adaptive answers: {answered:,} in {update_time:.2f}s ({answered / max(update_time, 1e-9):,.0f} answers/s batched)')
+
+    rows = engine.users.rows(user_ids, create=False)
+    seen = engine.users.count[rows] >= 20
+    est = engine.users.value[rows]
+    print(f'ability recovery (users with >=20 answers, n={int(seen.sum()):,}): '
+          f'spearman={_spearman(est[seen], true_theta[seen]):.3f}')
+    q_rows = engine.questions.rows(question_ids, create=False)
+    q_seen = engine.questions.count[q_rows] >= 3
+    print(f'difficulty recovery (questions with >=3 answers, n={int(q_seen.sum()):,}): '
+          f'spearman={_spearman(engine.questions.value[q_rows][q_seen], true_b[q_seen]):.3f}')
+
+    if not args.skip_checkpoint:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from models import Base
+        with tempfile.TemporaryDirectory() as tmp:
+            db = create_engine('sqlite:///' + os.path.join(tmp, 'bench.db'))
+            Base.metadata.create_all(db)
+            session = sessionmaker(bind=db)()
+            t = time.perf_counter()
+            n = engine.checkpoint(session)
+            print(f'checkpoint: {n:,} rows in {time.perf_counter() - t:.2f}s')
+            session.close()
+            db.dispose()
+
+
+if __name__ == '__main__':
+    main()
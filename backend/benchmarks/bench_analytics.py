@@ -0,0 +1,110 @@
+"""Latency of the /analytics queries on a large quiz_results table.
+
+Fills a scratch SQLite database with --rows synthetic results, then times:
+  cold      first bulk load into NumPy arrays + building the user/lecture/cohort tables
+  queries   user summary, lecture stats, percentiles, rankings, weekly series (warm cache)
+  refresh   incremental reload after --append new rows are written
+and compares the warm query latencies with --budget-ms.
+
+Usage:
+  python benchmarks/bench_analytics.py --rows 2000000 --users 50000 --lectures 2000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+import analytics  # noqa: E402
+import table_versions  # noqa: E402
+from models import Base  # noqa: E402
+
+
+def fill(path, rows, users, lectures, seed=0, start_id=1, first_day=19_700, days=365):
+    """Insert synthetic results whose dates advance with the id, as rows stamped at insert time do."""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    chunk = 200_000
+    for lo in range(0, rows, chunk):
+        n = min(chunk, rows - lo)
+        ids = np.arange(start_id + lo, start_id + lo + n)
+        u = rng.integers(1, users + 1, n)
+        lec = rng.integers(1, lectures + 1, n)
+        score = np.clip(rng.normal(65, 18, n), 0, 100).astype(int)
+        day = first_day + np.arange(lo, lo + n) * days // max(rows, 1)
+        dates = np.datetime_as_string(day.astype('datetime64[D]')) if n else []
+        conn.executemany('INSERT INTO quiz_results (id, user_id, lecture_id, score, date) VALUES (?, ?, ?, ?, ?)',
+                         zip(ids.tolist(), u.tolist(), lec.tolist(), score.tolist(),
+                             (d + ' 12:00:00' for d in dates)))
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000.0)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vectorized quiz analytics')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--lectures', type=int, default=1_000)
+    parser.add_argument('--append', type=int, default=1_000, help='Rows written before the incremental refresh')
+    parser.add_argument('--budget-ms', type=float, default=250.0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'analytics.db')
+    engine = create_engine('sqlite:///' + path)
+    Base.metadata.create_all(engine)
+    t = time.perf_counter()
+    fill(path, args.rows, args.users, args.lectures)
+    print(f'filled {args.rows} rows ({args.users} users, {args.lectures} lectures) in {time.perf_counter() - t:.1f}s')
+
+    stats = analytics.Analytics(engine, max_staleness=3600, budget_ms=args.budget_ms)
+    t = time.perf_counter()
+    stats.refresh()
+    print(f'cold load + tables     {(time.perf_counter() - t) * 1000:9.1f} ms')
+
+    rng = np.random.default_rng(1)
+    queries = {
+        'user summary': lambda: stats.user(int(rng.integers(1, args.users + 1))),
+        'lecture stats': lambda: stats.lecture(int(rng.integers(1, args.lectures + 1))),
+        'hardest lectures': lambda: stats.lectures(limit=20),
+        'global percentiles': lambda: stats.percentiles(),
+        'lecture percentiles': lambda: stats.percentiles(lecture_id=int(rng.integers(1, args.lectures + 1))),
+        'rankings top 20': lambda: stats.rankings(limit=20),
+        'cohort weekly': lambda: stats.weekly(),
+        'user weekly': lambda: stats.weekly(user_id=int(rng.integers(1, args.users + 1))),
+    }
+    over = []
+    for name, fn in queries.items():
+        p50, p95 = timed(fn)
+        print(f'{name:22s} p50 {p50:8.2f} ms  p95 {p95:8.2f} ms')
+        if p95 > args.budget_ms:
+            over.append(name)
+
+    fill(path, args.append, args.users, args.lectures, seed=2, start_id=args.rows + 1, first_day=19_700 + 365, days=1)
+    table_versions.bump('quiz_results', args.append)
+    t = time.perf_counter()
+    stats.refresh()
+    print(f'refresh +{args.append} rows      {(time.perf_counter() - t) * 1000:9.1f} ms')
+    print('metrics: %s' % stats.metrics())
+    print('over budget: %s' % (', '.join(over) or 'none'))
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
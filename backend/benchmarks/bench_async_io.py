@@ -0,0 +1,181 @@
+"""Throughput of network-bound routes: Flask on a fixed thread pool vs the ASGI entry point.
+
+A local stand-in plays the slow upstreams (hosted inference API and transcript
+service), answering every request after --delay seconds. The same backend is
+served two ways:
+  wsgi   Flask app on a pool of --threads worker threads (like gunicorn gthread)
+  asgi   asgi.application under uvicorn (one event loop thread)
+An async load generator then keeps --concurrency requests in flight against
+/fetch-transcript and the hosted-inference fallback of /summarize.
+
+Usage:
+  python benchmarks/bench_async_io.py --delay 0.2 --concurrency 64 --requests 512 --threads 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from werkzeug.serving import BaseWSGIServer  # noqa: E402
+
+
+def start_slow_upstream(delay: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, body):
+            time.sleep(delay)
+            raw = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_GET(self):  # transcript service: /<video id>
+            vid = self.path.strip('/')
+            self._reply({'segments': [{'text': f'segment of {vid}', 'start': 0.0, 'duration': 2.0}]})
+
+        def do_POST(self):  # hosted inference: /<model>
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            self._reply([{'summary_text': 'upstream summary'}])
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024  # a small listen backlog would add SYN-retry stalls to the results
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles connections on a fixed-size thread pool."""
+    request_queue_size = 1024
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def start_wsgi(app, threads):
+    server = PooledWSGIServer('127.0.0.1', 0, app, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def start_asgi(application):
+    import socket
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(application, host='127.0.0.1', port=port, log_level='warning',
+                                           lifespan='on', backlog=1024))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f'http://127.0.0.1:{port}'
+
+
+async def load(base_url, path, body, concurrency, total):
+    latencies, errors, statuses = [], 0, {}
+    # No keep-alive: a persistent connection would pin a WSGI worker thread between requests
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        queue = asyncio.Queue()
+        for i in range(total):
+            queue.put_nowait(i)
+
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                t = time.perf_counter()
+                try:
+                    resp = await client.post(base_url + path, json=dict(body, user_id=i))
+                    statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+                    latencies.append(time.perf_counter() - t)
+                except Exception:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+    latencies.sort()
+    pct = (lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else float('nan'))
+    return wall, pct(0.5), pct(0.95), errors, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark WSGI thread pool vs ASGI for network-bound routes')
+    parser.add_argument('--delay', type=float, default=0.2, help='Upstream latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=512)
+    parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+    parser.add_argument('--modes', default='wsgi,asgi')
+    args = parser.parse_args()
+
+    upstream = start_slow_upstream(args.delay)
+    upstream_url = f'http://127.0.0.1:{upstream.server_port}'
+    os.environ.update({
+        'HF_INFERENCE_API_KEY': 'bench', 'HF_INFERENCE_URL': upstream_url, 'TRANSCRIPT_PROVIDER_URL': upstream_url,
+        'RATE_LIMIT_ENABLED': '0',
+        # Let the thread pool, not the inference admission gate, be the WSGI limit
+        'ADMISSION_CONCURRENCY': '1024', 'ADMISSION_MAX_QUEUE': '1024',
+        'ASYNC_UPSTREAM_MAX_CONNECTIONS': str(max(100, args.concurrency)),
+    })
+    os.chdir(tempfile.mkdtemp())  # app.py creates its SQLite file in the working directory
+    import app as webapp
+    import asgi
+    # Simulate the window where transformers is installed but local models are still
+    # loading, which is when /summarize goes to the hosted Inference API
+    webapp._hf_available = True
+
+    routes = [('/fetch-transcript', {'url': 'https://youtu.be/abcdefgh'}),
+              ('/summarize', {'text': 'A long lecture transcript. ' * 50})]
+    print(f'upstream delay {args.delay * 1000:.0f}ms, {args.requests} requests, concurrency {args.concurrency}, '
+          f'wsgi threads {args.threads}')
+    for mode in args.modes.split(','):
+        server, base = start_wsgi(webapp.app, args.threads) if mode == 'wsgi' else start_asgi(asgi.application)
+        for path, body in routes:
+            wall, p50, p95, errors, statuses = asyncio.run(load(base, path, body, args.concurrency, args.requests))
+            print(f'{mode:5s} {path:18s} {args.requests / wall:8.1f} req/s  p50 {p50:7.1f}ms  p95 {p95:7.1f}ms  '
+                  f'errors={errors} statuses={statuses}')
+        if mode == 'wsgi':
+            server.shutdown()
+        else:
+            server.should_exit = True
+    upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
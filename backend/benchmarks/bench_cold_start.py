@@ -0,0 +1,91 @@
+"""Cold start of the model pipelines: hub loading vs. a prepared snapshot.
+
+Each run starts a fresh Python process (so nothing is cached in memory
+except the OS page cache) that imports transformers, loads the pipeline and
+runs one inference. It reports the time to load, to the first output and the
+peak RSS:
+  hub        pipeline(task, model=NAME), as app.py did before snapshots; the
+             files come from the local hub cache, but the hub is still asked
+             for the latest revision unless HF_HUB_OFFLINE is set
+  snapshot   model_snapshots.load_pipeline from `python main.py prepare-models`
+             output, run with HF_HUB_OFFLINE=1 and TRANSFORMERS_OFFLINE=1 to
+             prove that boot needs no network
+
+Prepare the snapshots first, e.g.:
+  python main.py prepare-models --roles summarizer
+Then:
+  python benchmarks/bench_cold_start.py --role summarizer --repeat 3
+  python benchmarks/bench_cold_start.py --role generator --modes snapshot --drop-caches
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import model_snapshots  # noqa: E402
+
+MODELS = {'summarizer': ('summarization', 'sshleifer/distilbart-cnn-12-6'),
+          'generator': ('text2text-generation', 'google/flan-t5-small')}
+
+CHILD = r'''
+import json, resource, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {backend!r})
+mode, task, name, root = {mode!r}, {task!r}, {name!r}, {root!r}
+if mode == 'snapshot':
+    import model_snapshots
+    pipe = model_snapshots.load_pipeline(task, name, root=root, required=True)
+else:
+    from transformers import pipeline
+    pipe = pipeline(task, model=name)
+t1 = time.perf_counter()
+pipe('The lecture explains gradient descent and how the learning rate controls each step. ' * 8,
+     max_length=60, do_sample=False)
+t2 = time.perf_counter()
+print(json.dumps({{'load_s': t1 - t0, 'first_s': t2 - t0,
+                  'rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}}))
+'''
+
+
+def run(mode, task, name, root, drop_caches):
+    env = dict(os.environ)
+    if mode == 'snapshot':
+        env.update(HF_HUB_OFFLINE='1', TRANSFORMERS_OFFLINE='1')
+    if drop_caches:
+        # Needs root; measures a true cold read of the weights from disk
+        subprocess.run(['sh', '-c', 'sync; echo 3 > /proc/sys/vm/drop_caches'], check=False)
+    code = CHILD.format(backend=BACKEND_DIR, mode=mode, task=task, name=name, root=root)
+    out = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise SystemExit('%s run failed:\n%s' % (mode, out.stderr[-2000:]))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark model cold start: hub vs. local snapshot')
+    parser.add_argument('--role', choices=sorted(MODELS), default='summarizer')
+    parser.add_argument('--modes', default='hub,snapshot')
+    parser.add_argument('--root', default=model_snapshots.DEFAULT_ROOT)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--drop-caches', action='store_true', help='Drop the OS page cache before each run (root only)')
+    args = parser.parse_args()
+
+    task, name = MODELS[args.role]
+    snapshot = model_snapshots.find(name, args.root)
+    print(f'{args.role}: {name}; snapshot: {snapshot or "none (run python main.py prepare-models)"}')
+    for mode in args.modes.split(','):
+        if mode == 'snapshot' and snapshot is None:
+            continue
+        runs = [run(mode, task, name, args.root, args.drop_caches) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r['first_s'])
+        mean = sum(r['first_s'] for r in runs) / len(runs)
+        print(f"{mode:>9}  load {best['load_s']:6.2f} s  first output {best['first_s']:6.2f} s "
+              f"(mean {mean:.2f} s)  peak RSS {best['rss_mib']:7.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
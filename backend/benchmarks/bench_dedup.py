@@ -0,0 +1,136 @@
+"""Near-duplicate lookup over a large lecture catalog.
+
+Builds a scratch SQLite catalog of --lectures synthetic transcripts, stores
+their MinHash signatures and LSH band keys (dedup.py), then times:
+  build      signature computation and bulk insert of signatures + band keys
+  lsh        DedupIndex.query for --queries planted near-duplicates (copies of
+             catalog lectures with --edit-rate of words changed, plus caption cues
+             and different casing) and as many unrelated transcripts
+  scan       the linear baseline: compare against every stored signature in memory
+and reports recall on the planted copies (for LSH and the exhaustive scan, so
+banding losses show separately from copies that fall below the threshold),
+false matches on the unrelated transcripts, and the number of candidates LSH
+had to verify.
+
+Usage:
+  python benchmarks/bench_dedup.py --lectures 100000 --words 300 --threshold 0.85
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import dedup  # noqa: E402
+from models import Base, LectureBand, LectureSignature  # noqa: E402
+
+VOCAB = np.array(['w%d' % i for i in range(20_000)])
+
+
+def lecture_words(rng, words):
+    # Zipf-like word frequencies, as in speech
+    ranks = np.minimum(rng.zipf(1.3, words), len(VOCAB)) - 1
+    return VOCAB[ranks].tolist()
+
+
+def near_copy(rng, words, rate):
+    out = list(words)
+    for i in np.flatnonzero(rng.random(len(out)) < rate):
+        out[i] = 'edit%d' % rng.integers(1_000_000)
+    return '[Music] ' + ' '.join(out).upper() + ' [Applause]'
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MinHash/LSH near-duplicate detection')
+    parser.add_argument('--lectures', type=int, default=100_000)
+    parser.add_argument('--words', type=int, default=300, help='Words per synthetic transcript')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--edit-rate', type=float, default=0.01, help='Share of words changed in planted copies')
+    parser.add_argument('--threshold', type=float, default=dedup.DEFAULT_THRESHOLD)
+    parser.add_argument('--num-perm', type=int, default=dedup.DEFAULT_NUM_PERM)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = dedup.DedupIndex(threshold=args.threshold, num_perm=args.num_perm, min_words=1)
+    path = os.path.join(tempfile.mkdtemp(), 'dedup.db')
+    engine = create_engine('sqlite:///' + path)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    print(f'{args.lectures} lectures x {args.words} words, threshold {args.threshold}, '
+          f'{index.bands} bands x {index.rows} rows')
+
+    planted = set(rng.choice(args.lectures, args.queries, replace=False).tolist())
+    originals = {}
+    sigs = np.empty((args.lectures, args.num_perm), dtype=np.uint32)
+    t_sig = t_insert = 0.0
+    chunk = 10_000
+    for lo in range(0, args.lectures, chunk):
+        rows_sig, rows_band = [], []
+        t = time.perf_counter()
+        for i in range(lo, min(lo + chunk, args.lectures)):
+            words = lecture_words(rng, args.words)
+            if i in planted:
+                originals[i + 1] = words
+            sigs[i] = index.hasher.signature(words)
+            rows_sig.append({'lecture_id': i + 1, 'scheme': index.scheme, 'signature': sigs[i].tobytes()})
+            rows_band.extend({'key': k, 'lecture_id': i + 1}
+                             for k in dedup.band_keys(sigs[i], index.bands, index.rows).tolist())
+        t_sig += time.perf_counter() - t
+        t = time.perf_counter()
+        session.execute(insert(LectureSignature), rows_sig)
+        session.execute(insert(LectureBand), rows_band)
+        session.commit()
+        t_insert += time.perf_counter() - t
+    print(f'generate + sign      {t_sig:8.1f} s  ({t_sig / args.lectures * 1e6:.0f} us per lecture)')
+    print(f'insert               {t_insert:8.1f} s  ({os.path.getsize(path) / 2 ** 20:.0f} MiB database)')
+
+    queries = [(lid, near_copy(rng, words, args.edit_rate)) for lid, words in originals.items()]
+    queries += [(None, ' '.join(lecture_words(rng, args.words))) for _ in range(args.queries)]
+    lsh_ms, scan_ms, candidates = [], [], []
+    hits = misses = false = scan_hits = 0
+    for expected, text in queries:
+        t = time.perf_counter()
+        sig = index.signature(text)
+        matches = index.query(session, sig)
+        lsh_ms.append((time.perf_counter() - t) * 1000.0)
+        keys = dedup.band_keys(sig, index.bands, index.rows).tolist()
+        candidates.append(session.query(LectureBand.lecture_id).filter(LectureBand.key.in_(keys)).distinct().count())
+        found = {m[0] for m in matches}
+        if expected is None:
+            false += bool(found)
+        elif expected in found:
+            hits += 1
+        else:
+            misses += 1
+        t = time.perf_counter()
+        sig = index.signature(text)
+        sims = (sigs == sig).mean(axis=1)
+        scanned = np.flatnonzero(sims >= args.threshold) + 1
+        scan_ms.append((time.perf_counter() - t) * 1000.0)
+        scan_hits += expected is not None and expected in scanned
+
+    p50, p95 = percentiles(lsh_ms)
+    print(f'lsh query            p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  '
+          f'({np.mean(candidates):.1f} candidates verified on average)')
+    p50, p95 = percentiles(scan_ms)
+    print(f'linear scan          p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  (in-memory, all {args.lectures} signatures)')
+    print(f'recall on planted copies: lsh {hits}/{hits + misses}, linear scan {scan_hits}/{hits + misses} '
+          f'(the rest estimate below the threshold); unrelated transcripts matched: {false}/{args.queries}')
+    session.close()
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
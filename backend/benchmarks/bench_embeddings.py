@@ -0,0 +1,80 @@
+"""Recall and latency benchmark for the memory-mapped embedding index.
+
+Builds an index of random unit vectors in a temp directory and reports:
+  - exact recall@k of the blocked memmap search against a float64 brute force
+  - retrieval recall@k for noisy copies of stored vectors (paraphrase stand-in)
+  - query latency (single query and batched) and insert throughput
+
+Usage:
+  python benchmarks/bench_embeddings.py --rows 200000 --dim 384 --queries 256
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import EmbeddingIndex  # noqa: E402
+
+
+def _percentile_ms(samples, p):
+    return float(np.percentile(np.asarray(samples) * 1000.0, p))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark EmbeddingIndex recall and latency')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=256)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--noise', type=float, default=0.6, help='Gaussian noise (relative to unit norm) for paraphrase queries')
+    parser.add_argument('--block-rows', type=int, default=65536)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vecs = rng.standard_normal((args.rows, args.dim), dtype=np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = EmbeddingIndex(os.path.join(tmp, 'bench'), args.dim, 'bench')
+        t0 = time.perf_counter()
+        for start in range(0, args.rows, 10_000):
+            index.add(np.arange(start, min(start + 10_000, args.rows)), vecs[start:start + 10_000])
+        insert_s = time.perf_counter() - t0
+        print(f'insert: {args.rows} rows in {insert_s:.2f}s ({args.rows / insert_s:,.0f} rows/s)')
+
+        q_idx = rng.choice(args.rows, size=args.queries, replace=False)
+        noise = rng.standard_normal((args.queries, args.dim), dtype=np.float32) * (args.noise / np.sqrt(args.dim))
+        queries = vecs[q_idx] + noise
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        # Exact recall: blocked top-k merge vs float64 brute force
+        ids, _ = index.search(queries, k=args.k, block_rows=args.block_rows)
+        truth = np.argsort(-(queries.astype(np.float64) @ vecs.astype(np.float64).T), axis=1)[:, :args.k]
+        exact = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ids, truth)])
+        print(f'exact recall@{args.k} vs brute force: {exact:.4f}')
+
+        # Retrieval recall: is the source vector of each noisy query in the top k?
+        hit = np.mean([src in row for src, row in zip(q_idx, ids)])
+        print(f'paraphrase recall@{args.k} (noise={args.noise}): {hit:.4f}')
+
+        single = []
+        for q in queries[:64]:
+            t = time.perf_counter()
+            index.search(q, k=args.k, block_rows=args.block_rows)
+            single.append(time.perf_counter() - t)
+        print(f'single query: p50={_percentile_ms(single, 50):.2f}ms p95={_percentile_ms(single, 95):.2f}ms')
+
+        for batch in (8, 64, args.queries):
+            t = time.perf_counter()
+            index.search(queries[:batch], k=args.k, block_rows=args.block_rows)
+            dt = time.perf_counter() - t
+            print(f'batch of {batch}: {dt * 1000:.1f}ms total, {dt * 1000 / batch:.3f}ms/query')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""Offline latency and throughput of the model paths, with tiny local models.
+
+Builds tiny randomly initialized BART (summaries) and T5 (quizzes) pipelines
+in memory (tiny_models.py; nothing is downloaded) and times every
+combination of --ops, --backends, --words and --batches:
+  direct    the pipeline itself, called with `batch` inputs (batch_size=batch)
+  inline    POST /summarize (mode abstractive) or /generate-quiz through the
+            Flask app with the pipelines in-process; `batch` concurrent clients
+  process   the same routes with INFERENCE_MODE=process workers
+            (inference_server.py), which batch concurrent calls
+Transcripts are synthetic lectures of `words` words. Each case runs
+--repeat rounds after one warm-up round and reports p50/p95 latency per
+request and requests per second. Quiz output from a random model never
+parses, so /generate-quiz answers with its mock questions after generating;
+the time is still the model's.
+
+Every run is appended to --history (perf_history.py). Cases are compared
+with the median of earlier runs on the same machine and library versions,
+and regressions beyond --threshold are listed; --fail-on-regression exits 1.
+
+Usage:
+  python benchmarks/bench_inference.py
+  python benchmarks/bench_inference.py --ops summarize --backends direct,inline --words 200,1000 --batches 1,4
+  python benchmarks/bench_inference.py --threshold 0.15 --fail-on-regression
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import perf_history  # noqa: E402
+import tiny_models  # noqa: E402
+
+DEFAULT_HISTORY = os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'inference_history.jsonl')
+ROUTES = {'summarize': '/summarize', 'quiz': '/generate-quiz'}
+
+
+def load_app(concurrency):
+    """Import app.py in a scratch directory (its SQLite file) with limits that let `concurrency` requests in."""
+    os.environ.update({'ANALYTICS_WARM_ON_START': '0', 'ENABLE_HF_BACKGROUND': '0', 'RATE_LIMIT_ENABLED': '0',
+                       'DEDUP_ENABLED': '0', 'ADMISSION_CONCURRENCY': str(concurrency),
+                       'ADMISSION_MAX_QUEUE': str(4 * concurrency)})
+    os.chdir(tempfile.mkdtemp())
+    import app as webapp
+    return webapp
+
+
+def summarize_stats(latencies, requests, wall):
+    latencies = sorted(latencies)
+    return {'p50_ms': round(latencies[len(latencies) // 2], 3),
+            'p95_ms': round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 3),
+            'rps': round(requests / wall, 3)}
+
+
+def run_direct(pipe, inputs, kwargs, batch, repeat):
+    pipe(inputs[:batch], batch_size=batch, **kwargs)  # warm-up
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        pipe(inputs[:batch], batch_size=batch, **kwargs)
+        # every input of the batch waited for the whole call
+        latencies.extend([(time.perf_counter() - t) * 1000.0] * batch)
+    return summarize_stats(latencies, batch * repeat, time.perf_counter() - start)
+
+
+def run_route(webapp, path, body, batch, repeat):
+    latencies, served = [], []
+
+    def one():
+        client = webapp.app.test_client()
+        t = time.perf_counter()
+        resp = client.post(path, json=body)
+        latencies.append((time.perf_counter() - t) * 1000.0)
+        # The router's pick; a fallback that answered afterwards is reported under 'chosen'
+        routing = (resp.get_json(silent=True) or {}).get('routing') or {}
+        served.append(routing.get('chosen', routing.get('tier')) == 'huggingface')
+
+    def round_():
+        threads = [threading.Thread(target=one) for _ in range(batch)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    round_()  # warm-up
+    latencies.clear()
+    served.clear()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        round_()
+    out = summarize_stats(latencies, batch * repeat, time.perf_counter() - start)
+    out['model_served'] = round(sum(served) / len(served), 3)
+    return out
+
+
+def use_backend(webapp, backend, pipes, args, max_batch):
+    """Point the app at in-process pipelines or at a fresh inference worker pool; returns the pool (or None)."""
+    webapp._hf_summarizer, webapp._hf_generator = pipes['summarize'], pipes['quiz']
+    webapp._hf_summarizer_ready = webapp._hf_generator_ready = True
+    webapp._inference = None
+    if backend != 'process':
+        return None
+    from inference_server import InferenceClient
+    client = InferenceClient(workers=args.workers, loader=tiny_models.load_pipeline, max_batch=max_batch,
+                             batch_wait_ms=args.batch_wait_ms,
+                             models={'summarizer': ('summarization', tiny_models.MODELS['summarization']),
+                                     'generator': ('text2text-generation', tiny_models.MODELS['text2text-generation'])})
+    client.start()
+    if not client.wait_ready(timeout=300):
+        raise SystemExit('inference workers did not load the tiny models')
+    webapp._inference = client
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the model paths with tiny local models')
+    parser.add_argument('--ops', default='summarize,quiz')
+    parser.add_argument('--backends', default='direct,inline,process')
+    parser.add_argument('--words', default='200,1000,4000', help='Comma-separated transcript lengths')
+    parser.add_argument('--batches', default='1,4', help='Comma-separated batch sizes / concurrent clients')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=1, help='Inference workers for the process backend')
+    parser.add_argument('--batch-wait-ms', type=float, default=5.0)
+    parser.add_argument('--history', default=DEFAULT_HISTORY)
+    parser.add_argument('--threshold', type=float, default=0.1, help='Flag changes worse than this fraction')
+    parser.add_argument('--window', type=int, default=5, help='Earlier runs the baseline is the median of')
+    parser.add_argument('--no-save', action='store_true', help='Compare without appending this run')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+    ops = args.ops.split(',')
+    backends = args.backends.split(',')
+    words = [int(w) for w in args.words.split(',')]
+    batches = [int(b) for b in args.batches.split(',')]
+
+    from bench_summarize import synthetic_lecture
+    webapp = load_app(max(batches))
+    if not webapp._hf_available:
+        raise SystemExit('transformers is not installed')
+    pipes = {'summarize': tiny_models.load_pipeline('summarization'),
+             'quiz': tiny_models.load_pipeline('text2text-generation')}
+    # The same arguments and input preparation as app.py
+    direct_kwargs = {'summarize': {'max_length': 120, 'min_length': 30, 'do_sample': False},
+                     'quiz': {'max_length': 256, 'do_sample': False}}
+    prepare = {'summarize': lambda text: text[:1000], 'quiz': webapp._quiz_prompt}
+
+    results = {}
+    print(f'{"case":<34} {"p50 ms":>9} {"p95 ms":>9} {"req/s":>8}')
+    for backend in backends:
+        pool = use_backend(webapp, backend, pipes, args, max(batches))
+        try:
+            for op in ops:
+                path = ROUTES[op]
+                for n in words:
+                    text = synthetic_lecture(n)
+                    for batch in batches:
+                        case = f'{op}/{backend}/{n}w/b{batch}'
+                        if backend == 'direct':
+                            row = run_direct(pipes[op], [prepare[op](text)] * batch, direct_kwargs[op], batch,
+                                             args.repeat)
+                        else:
+                            body = {'text': text, 'mode': 'abstractive', 'reuse': False}
+                            row = run_route(webapp, path, body, batch, args.repeat)
+                        results[case] = row
+                        note = ''
+                        if row.get('model_served', 1.0) < 1.0:
+                            note = f"  ({row['model_served']:.0%} served by the model path)"
+                        print(f"{case:<34} {row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['rps']:8.2f}{note}")
+        finally:
+            if pool is not None:
+                webapp._inference = None
+                pool.close()
+
+    env = perf_history.fingerprint(suite='tiny-models')
+    flags = perf_history.compare(results, perf_history.load(args.history), env, args.threshold, args.window)
+    if not args.no_save:
+        perf_history.append(args.history, results, env, config=vars(args), commit=perf_history.git_commit(BACKEND_DIR))
+        print(f'appended to {args.history}')
+    for f in flags:
+        print(f"REGRESSION {f['case']} {f['metric']}: {f['value']} vs baseline {f['baseline']} ({f['change']:+.0%})")
+    if not flags:
+        print(f'no regressions beyond {args.threshold:.0%}')
+    if flags and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
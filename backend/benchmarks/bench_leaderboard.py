@@ -0,0 +1,124 @@
+"""Leaderboard rank queries on millions of learners: Fenwick index vs. scanning quiz_results.
+
+Fills a scratch SQLite database with --rows synthetic results spread over
+--users learners, then times:
+  rebuild   building the index at startup (one GROUP BY + bucketing)
+  queries   rank/percentile of a random learner, the top 20 and a deep page
+  updates   --append new rows folded in (per-row cost)
+  scan      what a request without the index pays: GROUP BY over all rows,
+            then counting the learners above one mean
+and reports the process's peak RSS.
+
+Usage:
+  python benchmarks/bench_leaderboard.py --users 1000000 --rows 3000000
+  python benchmarks/bench_leaderboard.py --users 5000000 --rows 10000000 --resolution 10
+"""
+import argparse
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+import leaderboard  # noqa: E402
+import table_versions  # noqa: E402
+from models import Base  # noqa: E402
+
+
+def fill(path, rows, users, seed=0, start_id=1):
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    chunk = 500_000
+    for lo in range(0, rows, chunk):
+        n = min(chunk, rows - lo)
+        ids = np.arange(start_id + lo, start_id + lo + n)
+        u = rng.integers(1, users + 1, n)
+        score = np.clip(rng.normal(65, 18, n), 0, 100).astype(int)
+        conn.executemany('INSERT INTO quiz_results (id, user_id, score) VALUES (?, ?, ?)',
+                         zip(ids.tolist(), u.tolist(), score.tolist()))
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, repeat=200):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+def scan_rank(path, user_id):
+    """Rank of one learner without an index: aggregate every row, then count the means above theirs."""
+    conn = sqlite3.connect(path)
+    try:
+        means = dict(conn.execute('SELECT user_id, AVG(score) FROM quiz_results WHERE user_id IS NOT NULL '
+                                  'GROUP BY user_id'))
+    finally:
+        conn.close()
+    mine = means.get(user_id)
+    return None if mine is None else 1 + sum(1 for m in means.values() if m > mine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the incremental leaderboard')
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--append', type=int, default=10_000, help='Rows written before the incremental update')
+    parser.add_argument('--resolution', type=int, default=100, help='Buckets per score point')
+    parser.add_argument('--scan-repeat', type=int, default=3, help='Full-scan rank queries to time')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'leaderboard.db')
+    engine = create_engine('sqlite:///' + path)
+    Base.metadata.create_all(engine)
+    t = time.perf_counter()
+    fill(path, args.rows, args.users)
+    print(f'filled {args.rows} rows ({args.users} users) in {time.perf_counter() - t:.1f}s')
+
+    board = leaderboard.Leaderboard(engine, resolution=args.resolution, max_staleness=3600)
+    t = time.perf_counter()
+    board.refresh()
+    m = board.metrics()
+    print(f'rebuild                {(time.perf_counter() - t) * 1000:10.1f} ms  '
+          f'({m["users"]} users, {m["buckets"]} buckets)')
+
+    rng = np.random.default_rng(1)
+    queries = {
+        'rank + percentile': lambda: board.user(int(rng.integers(1, args.users + 1))),
+        'top 20': lambda: board.top(limit=20),
+        'page at rank 500k': lambda: board.top(limit=20, offset=min(500_000, args.users // 2)),
+    }
+    for name, fn in queries.items():
+        p50, p95 = timed(fn)
+        print(f'{name:22s} p50 {p50:9.1f} us  p95 {p95:9.1f} us')
+
+    fill(path, args.append, args.users, seed=2, start_id=args.rows + 1)
+    table_versions.bump('quiz_results', args.append)
+    t = time.perf_counter()
+    board.refresh()
+    elapsed = time.perf_counter() - t
+    print(f'update +{args.append} rows   {elapsed * 1000:10.1f} ms  ({elapsed / max(args.append, 1) * 1e6:.1f} us/row)')
+
+    samples = []
+    for _ in range(args.scan_repeat):
+        t = time.perf_counter()
+        scan_rank(path, int(rng.integers(1, args.users + 1)))
+        samples.append(time.perf_counter() - t)
+    print(f'scan rank (no index)   {min(samples) * 1000:10.1f} ms')
+    print(f'peak RSS               {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0:10.0f} MiB')
+    print('metrics: %s' % board.metrics())
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
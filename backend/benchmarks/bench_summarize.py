@@ -0,0 +1,171 @@
+"""Latency and quality of the summarization tiers.
+
+Compares, on the same transcripts:
+  lead         the original heuristic (first two sentences)
+  extractive   TextRank over TF-IDF (extractive.py); NumPy path, plus SciPy when installed
+  abstractive  the local transformers pipeline (only with --model and transformers installed)
+
+Quality without references is measured against the transcript itself:
+  coverage     cosine similarity of the summary's and transcript's TF-IDF vectors
+  keywords     share of the transcript's top-20 TF-IDF terms that appear in the summary
+With --references (JSONL of {"transcript", "summary"}) ROUGE-1/2 F1 against the
+reference summaries is reported too.
+
+By default a synthetic hour-long lecture (~9k words) is generated; --captions
+drops the punctuation, as auto-generated YouTube captions have none.
+
+Usage:
+  python benchmarks/bench_summarize.py --words 9000 --captions
+  python benchmarks/bench_summarize.py --transcript lecture.txt --model sshleifer/distilbart-cnn-12-6
+  python benchmarks/bench_summarize.py --references refs.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np  # noqa: E402
+
+import extractive  # noqa: E402
+
+TOPICS = {
+    'gradients': 'gradient descent learning rate loss function minimum step parameters update converge',
+    'networks': 'neural network layer neuron activation weights hidden input output architecture',
+    'backprop': 'backpropagation chain rule derivative error signal layer gradients propagate',
+    'overfitting': 'overfitting regularization dropout validation training data generalize penalty',
+    'evaluation': 'accuracy precision recall test set benchmark metric confusion matrix evaluate',
+}
+FILLER = ('so um let us move on', 'okay any questions so far', 'right so as I was saying',
+          'you know this is kind of important', 'alright let me just check the time')
+
+
+def synthetic_lecture(words: int, seed: int = 0, captions: bool = False) -> str:
+    """A lecture walking through TOPICS in order, with chit-chat between explanations."""
+    rng = np.random.default_rng(seed)
+    names = list(TOPICS)
+    sentences, total = [], 0
+    while total < words:
+        topic = names[min(len(names) - 1, total * len(names) // words)]
+        if rng.random() < 0.3:
+            sentence = str(rng.choice(FILLER))
+        else:
+            vocab = TOPICS[topic].split() + TOPICS[str(rng.choice(names))].split()[:3]
+            picked = rng.choice(vocab, size=int(rng.integers(8, 18)))
+            sentence = 'the ' + ' and the '.join(' '.join(picked[i:i + 3]) for i in range(0, len(picked), 3))
+        sentences.append(sentence if captions else sentence.capitalize() + '.')
+        total += sentence.count(' ') + 1
+    return ' '.join(sentences)
+
+
+def _tokens(text):
+    return [w for w in extractive._WORD_RE.findall(text.lower()) if w not in extractive.STOPWORDS and len(w) > 1]
+
+
+def coverage(summary: str, transcript: str):
+    """(cosine of TF-IDF vectors, top-20 keyword recall), with idf over the transcript's sentences."""
+    sentences = extractive.split_sentences(transcript)
+    df = Counter(w for s in sentences for w in set(_tokens(s)))
+    idf = {w: np.log((1.0 + len(sentences)) / (1.0 + c)) + 1.0 for w, c in df.items()}
+    doc, summ = Counter(_tokens(transcript)), Counter(_tokens(summary))
+    vec = {w: c * idf[w] for w, c in doc.items()}
+    dot = sum(summ[w] * idf.get(w, 0.0) * vec.get(w, 0.0) for w in summ)
+    norm = np.sqrt(sum(v * v for v in vec.values())) * np.sqrt(sum((c * idf.get(w, 0.0)) ** 2 for w, c in summ.items()))
+    top = [w for w, _ in sorted(vec.items(), key=lambda kv: -kv[1])[:20]]
+    return (dot / norm if norm else 0.0), sum(1 for w in top if w in summ) / max(len(top), 1)
+
+
+def rouge_f1(summary: str, reference: str, n: int) -> float:
+    def grams(text):
+        words = _tokens(text)
+        return Counter(tuple(words[i:i + n]) for i in range(len(words) - n + 1))
+    got, ref = grams(summary), grams(reference)
+    overlap = sum((got & ref).values())
+    if not overlap:
+        return 0.0
+    p, r = overlap / sum(got.values()), overlap / sum(ref.values())
+    return 2 * p * r / (p + r)
+
+
+def timed(fn, repeat):
+    samples, out = [], None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        samples.append((time.perf_counter() - t) * 1000.0)
+    samples.sort()
+    return out, samples[len(samples) // 2], samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+def tiers(args):
+    out = {'lead': extractive.lead_summary}
+    sparse = extractive._sparse
+
+    def numpy_only(text):
+        extractive._sparse = None
+        try:
+            return extractive.summarize(text, max_sentences=args.sentences)
+        finally:
+            extractive._sparse = sparse
+    out['extractive-numpy'] = numpy_only
+    if sparse is not None:
+        out['extractive-scipy'] = lambda text: extractive.summarize(text, max_sentences=args.sentences)
+    if args.model:
+        try:
+            from transformers import pipeline
+            pipe = pipeline('summarization', model=args.model)
+            # Same truncation and lengths as app._summarize_text
+            out['abstractive'] = lambda text: pipe(text[:1000], max_length=120, min_length=30,
+                                                   do_sample=False)[0]['summary_text']
+        except Exception as e:
+            print('abstractive tier unavailable: %s' % e)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark summarization tiers')
+    parser.add_argument('--transcript', help='Plain-text transcript file (default: synthetic lecture)')
+    parser.add_argument('--references', help='JSONL of {"transcript", "summary"} for ROUGE')
+    parser.add_argument('--words', type=int, default=9000, help='Synthetic lecture length')
+    parser.add_argument('--captions', action='store_true', help='Synthetic lecture without punctuation')
+    parser.add_argument('--model', help='Summarization model for the abstractive tier')
+    parser.add_argument('--sentences', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.references:
+        with open(args.references) as f:
+            docs = [json.loads(line) for line in f if line.strip()]
+    elif args.transcript:
+        with open(args.transcript) as f:
+            docs = [{'transcript': f.read()}]
+    else:
+        docs = [{'transcript': synthetic_lecture(args.words, captions=args.captions)}]
+    words = sum(len(d['transcript'].split()) for d in docs) / len(docs)
+    print(f'{len(docs)} transcript(s), {words:.0f} words on average, scipy={"yes" if extractive._sparse else "no"}')
+
+    header = f'{"tier":18s} {"p50 ms":>9s} {"p95 ms":>9s} {"coverage":>9s} {"keywords":>9s}'
+    print(header + ('  rouge-1  rouge-2' if args.references else ''))
+    for name, fn in tiers(args).items():
+        rows = []
+        repeat = 1 if name == 'abstractive' else args.repeat
+        for doc in docs:
+            summary, p50, p95 = timed(lambda: fn(doc['transcript']), repeat)
+            cov, kw = coverage(summary, doc['transcript'])
+            row = [p50, p95, cov, kw]
+            if 'summary' in doc:
+                row += [rouge_f1(summary, doc['summary'], 1), rouge_f1(summary, doc['summary'], 2)]
+            rows.append(row)
+        m = np.mean(rows, axis=0)
+        line = f'{name:18s} {m[0]:9.2f} {m[1]:9.2f} {m[2]:9.3f} {m[3]:9.2f}'
+        if len(m) > 4:
+            line += f'  {m[4]:7.3f}  {m[5]:7.3f}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Sweep process x thread splits for CPU inference.
+
+For each split, starts that many worker processes, each limited to that many
+intra-op threads (thread_budget.apply_threads, optionally pinned to its own
+CPU set), loads the model in every worker, then feeds --requests synthetic
+transcripts from a shared queue and reports throughput and latency:
+  summarizer   the summarization pipeline, called as app.py calls it
+  generator    the quiz text2text pipeline, called as app.py calls it
+  matmul       a NumPy matrix-product loop (BLAS threads); runs without torch
+
+Splits default to every power-of-two process count whose threads fill the
+usable cores (e.g. 1x16, 2x8, 4x4, 8x2, 16x1). The best split gives
+THREAD_BUDGET_PROCESSES x INFERENCE_WORKERS (process mode) or
+WEB_CONCURRENCY x THREAD_BUDGET_CONCURRENCY (inline), with
+THREAD_BUDGET_INTRA_OP set to its thread count.
+
+Usage:
+  python benchmarks/bench_threads.py --role summarizer --requests 64
+  python benchmarks/bench_threads.py --role generator --splits 1x8,2x4,4x2 --pin
+  python benchmarks/bench_threads.py --role matmul
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from thread_budget import ThreadBudget, apply_threads, available_cpus  # noqa: E402
+
+MODELS = {'summarizer': 'sshleifer/distilbart-cnn-12-6', 'generator': 'google/flan-t5-small'}
+
+
+def workload(role, model):
+    """A callable running one request; heavy imports happen here, after the thread settings."""
+    if role == 'matmul':
+        import numpy as np
+        a = np.random.default_rng(0).random((384, 384))
+
+        def run(_text):
+            m = a
+            for _ in range(8):
+                m = m @ a
+                m /= m.max()
+        return run
+    from transformers import pipeline
+    if role == 'summarizer':
+        pipe = pipeline('summarization', model=model)
+        return lambda text: pipe(text[:1000], max_length=120, min_length=30, do_sample=False)
+    pipe = pipeline('text2text-generation', model=model)
+    return lambda text: pipe('Generate 2 multiple-choice questions (provide options and correct answer index) '
+                             'from the following text:\n\n%s\n\nOutput as JSON array' % text[:2000],
+                             max_length=256, do_sample=False)
+
+
+def worker(settings, role, model, tasks, results, barrier):
+    apply_threads(**settings)
+    run = workload(role, model)
+    run('warm up ' * 50)
+    barrier.wait()
+    while True:
+        text = tasks.get()
+        if text is None:
+            return
+        t = time.perf_counter()
+        run(text)
+        results.put((time.perf_counter() - t) * 1000.0)
+
+
+def parse_splits(spec, cores):
+    if spec:
+        return [tuple(int(v) for v in item.lower().split('x')) for item in spec.split(',')]
+    out, procs = [], 1
+    while procs <= cores:
+        out.append((procs, cores // procs))
+        procs *= 2
+    return out
+
+
+def sweep(split, args, texts, ctx):
+    procs, threads = split
+    budget = ThreadBudget(processes=procs, reserve=args.reserve, intra_op=threads, pin=args.pin)
+    tasks, results = ctx.Queue(), ctx.Queue()
+    barrier = ctx.Barrier(procs + 1)
+    workers = [ctx.Process(target=worker, args=(budget.settings(i), args.role, args.model, tasks, results, barrier),
+                           daemon=True) for i in range(procs)]
+    for w in workers:
+        w.start()
+    barrier.wait(timeout=args.load_timeout)
+    start = time.perf_counter()
+    for i in range(args.requests):
+        tasks.put(texts[i % len(texts)])
+    for _ in workers:
+        tasks.put(None)
+    latencies = sorted(results.get() for _ in range(args.requests))
+    wall = time.perf_counter() - start
+    for w in workers:
+        w.join()
+    return {'split': '%dx%d' % split, 'rps': args.requests / wall,
+            'p50': latencies[len(latencies) // 2], 'p95': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+            'oversubscribed': budget.oversubscribed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the best process x thread split for CPU inference')
+    parser.add_argument('--role', choices=('summarizer', 'generator', 'matmul'), default='summarizer')
+    parser.add_argument('--model', help='Model name (default: the one app.py uses for --role)')
+    parser.add_argument('--splits', help='Comma-separated PROCESSESxTHREADS, e.g. 1x8,2x4,4x2')
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--words', type=int, default=2000, help='Words per synthetic transcript')
+    parser.add_argument('--reserve', type=int, default=0, help='Cores left out of the budget')
+    parser.add_argument('--pin', action='store_true', help='Pin each worker to its own CPU set')
+    parser.add_argument('--load-timeout', type=float, default=600.0)
+    args = parser.parse_args()
+    args.model = args.model or MODELS.get(args.role)
+
+    from bench_summarize import synthetic_lecture
+    texts = [synthetic_lecture(args.words, seed=i) for i in range(8)]
+    cores = max(1, len(available_cpus()) - args.reserve)
+    ctx = multiprocessing.get_context('spawn')
+    print(f'{args.role} ({args.model or "numpy"}), {cores} usable cores, {args.requests} requests per split')
+    rows = []
+    for split in parse_splits(args.splits, cores):
+        row = sweep(split, args, texts, ctx)
+        rows.append(row)
+        note = '  (oversubscribed)' if row['oversubscribed'] else ''
+        print(f"{row['split']:>7}  {row['rps']:7.2f} req/s  p50 {row['p50']:8.1f} ms  p95 {row['p95']:8.1f} ms{note}")
+    best = max(rows, key=lambda r: r['rps'])
+    print(f"best: {best['split']} ({best['rps']:.2f} req/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Measure DB size and listing cost before/after transcript compression + deferral.
+
+Builds a synthetic catalog with plain-text transcripts (the legacy layout),
+times a listing query that loads every column (old behaviour), runs the
+compression migration, then times the deferred title-only listing and a
+single-transcript read.
+
+Usage:
+  python benchmarks/bench_transcript_storage.py --lectures 5000 --words 8000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker, undefer  # noqa: E402
+
+from db_init import compress_lecture_text  # noqa: E402
+from models import Base, Lecture  # noqa: E402
+
+VOCAB = ('model data learning gradient loss function network layer training example feature '
+         'vector matrix probability distribution sample estimate error optimization parameter '
+         'the a of to and in is that we this it for with as on are be by').split()
+
+
+def _transcript(rng, words):
+    return ' '.join(rng.choice(VOCAB) for _ in range(words))
+
+
+def _time(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark compressed, deferred transcript storage')
+    parser.add_argument('--lectures', type=int, default=5000)
+    parser.add_argument('--words', type=int, default=8000, help='Words per transcript (~1 hour of speech is 8-10k)')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'catalog.db')
+        db = create_engine('sqlite:///' + path)
+        Base.metadata.create_all(db)
+        with db.begin() as conn:
+            for start in range(0, args.lectures, 500):
+                rows = [{'id': i + 1, 'title': f'Lecture {i + 1}', 'url': f'https://youtu.be/v{i}',
+                         't': _transcript(rng, args.words), 's': _transcript(rng, 60)}
+                        for i in range(start, min(start + 500, args.lectures))]
+                conn.execute(text('INSERT INTO lectures (id, title, yt_url, transcript, summary) '
+                                  'VALUES (:id, :title, :url, :t, :s)'), rows)
+        Session = sessionmaker(bind=db)
+        size_before = os.path.getsize(path)
+
+        def list_all_columns():
+            s = Session()
+            rows = s.query(Lecture).options(undefer(Lecture.transcript), undefer(Lecture.summary)).all()
+            n = sum(len(r.title) + len(r.transcript or '') + len(r.summary or '') for r in rows)
+            s.close()
+            return n
+
+        def list_titles():
+            s = Session()
+            rows = s.query(Lecture).all()
+            n = sum(len(r.title) for r in rows)
+            s.close()
+            return n
+
+        def read_one():
+            s = Session()
+            n = len(s.get(Lecture, args.lectures // 2).transcript)
+            s.close()
+            return n
+
+        t_old, bytes_old = _time(list_all_columns)
+        t_titles_plain, _ = _time(list_titles)
+
+        t = time.perf_counter()
+        n, before, after = compress_lecture_text(db)
+        migrate_s = time.perf_counter() - t
+        size_after = os.path.getsize(path)
+
+        t_new, bytes_new = _time(list_titles)
+        t_full_compressed, _ = _time(list_all_columns, repeat=1)
+        t_one, _ = _time(read_one)
+        db.dispose()
+
+    mb = 1024 * 1024
+    print(f'catalog: {args.lectures} lectures x {args.words} words')
+    print(f'db file: {size_before / mb:.1f} MiB plain -> {size_after / mb:.1f} MiB compressed '
+          f'({size_before / max(size_after, 1):.1f}x smaller)')
+    print(f'migration: {n} rows, {before / mb:.1f} -> {after / mb:.1f} MiB of text in {migrate_s:.1f}s')
+    print(f'listing, all columns (old): {t_old * 1000:.1f}ms, {bytes_old / mb:.1f} MiB materialized')
+    print(f'listing, titles only, plain rows: {t_titles_plain * 1000:.1f}ms')
+    print(f'listing, titles only, compressed+deferred: {t_new * 1000:.1f}ms, {bytes_new / 1024:.1f} KiB materialized')
+    print(f'listing, all columns, compressed: {t_full_compressed * 1000:.1f}ms')
+    print(f'single transcript read (deferred load + decompress): {t_one * 1000:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Sustained insert throughput for the /save-progress write path.
+
+Runs concurrent writer threads against a temporary SQLite file in three modes:
+  direct    one session + commit per event (the default /save-progress path)
+  sync      WriteBehindBuffer group commit, each writer waits for its commit
+  buffered  WriteBehindBuffer, writers return once queued (timed until drained)
+
+Usage:
+  python benchmarks/bench_write_behind.py --threads 64 --events 4000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from models import Base, QuizResult  # noqa: E402
+from write_behind import WriteBehindBuffer  # noqa: E402
+
+
+def _run_threads(n_threads, per_thread, fn):
+    def worker(t):
+        for i in range(per_thread):
+            fn({'user_id': t, 'lecture_id': None, 'score': i % 100})
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+
+def bench(mode, tmp, args):
+    db = create_engine('sqlite:///' + os.path.join(tmp, f'{mode}.db'), connect_args={'timeout': 60})
+    Base.metadata.create_all(db)
+    Session = sessionmaker(bind=db)
+    per_thread = args.events // args.threads
+    total = per_thread * args.threads
+    buf = None
+
+    if mode == 'direct':
+        def write(row):
+            session = Session()
+            session.add(QuizResult(**row))
+            session.commit()
+            session.close()
+    else:
+        buf = WriteBehindBuffer(Session, QuizResult, durability=mode, max_batch=args.batch,
+                                flush_interval=args.interval_ms / 1000.0)
+        write = buf.submit
+
+    t0 = time.perf_counter()
+    _run_threads(args.threads, per_thread, write)
+    ack_s = time.perf_counter() - t0
+    if buf is not None:
+        buf.flush()
+        metrics = buf.metrics()
+        buf.close()
+    durable_s = time.perf_counter() - t0
+
+    session = Session()
+    stored = session.query(QuizResult).count()
+    session.close()
+    db.dispose()
+    line = f'{mode:9s} {total:7d} events  acked {total / ack_s:10,.0f}/s  durable {total / durable_s:10,.0f}/s  stored={stored}'
+    if buf is not None:
+        line += f"  batches={metrics['batches']} avg_batch={metrics['avg_batch_size']}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /save-progress write modes')
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--interval-ms', type=float, default=5.0)
+    parser.add_argument('--modes', default='direct,sync,buffered')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes.split(','):
+            bench(mode, tmp, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Tiny randomly initialized BART and T5 pipelines, built locally without downloads.
+
+They have the architecture families of the production models (distilbart
+for summaries, flan-t5 for quizzes) and go through the same transformers
+pipeline interfaces, but with a few hundred thousand parameters and a
+word-level tokenizer built in memory. Outputs are gibberish. Timings
+measure the serving path around the model (tokenization, generation loop,
+batching, IPC, Flask routing), not model quality.
+
+`load_pipeline(task, model_name)` matches the loader signature of
+inference_server.InferenceClient, so it also works inside worker processes.
+"""
+SPECIALS = {'bart': ['<s>', '<pad>', '</s>', '<unk>'], 't5': ['<pad>', '</s>', '<unk>']}
+MODELS = {'summarization': 'tiny-bart', 'text2text-generation': 'tiny-t5'}
+VOCAB_SIZE = 4096
+WORDS = ('the a of to and in is that for it as with on this are be by we at from or an which can our '
+         'learning gradient descent rate loss function network layer neuron weights model training data '
+         'lecture question answer options correct generate multiple choice text output json array').split()
+
+
+def tokenizer(family: str, vocab_size: int = VOCAB_SIZE):
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+    specials = SPECIALS[family]
+    vocab = {tok: i for i, tok in enumerate(specials)}
+    for word in WORDS + ['w%d' % i for i in range(vocab_size)]:
+        if len(vocab) >= vocab_size:
+            break
+        vocab.setdefault(word, len(vocab))
+    tok = Tokenizer(models.WordLevel(vocab=vocab, unk_token='<unk>'))
+    tok.normalizer = normalizers.Lowercase()
+    tok.pre_tokenizer = pre_tokenizers.Whitespace()
+    eos = vocab['</s>']
+    if family == 'bart':
+        tok.post_processor = processors.TemplateProcessing(single='<s> $A </s>',
+                                                           special_tokens=[('<s>', vocab['<s>']), ('</s>', eos)])
+        return PreTrainedTokenizerFast(tokenizer_object=tok, bos_token='<s>', eos_token='</s>',
+                                       pad_token='<pad>', unk_token='<unk>', model_max_length=1024)
+    tok.post_processor = processors.TemplateProcessing(single='$A </s>', special_tokens=[('</s>', eos)])
+    return PreTrainedTokenizerFast(tokenizer_object=tok, eos_token='</s>', pad_token='<pad>', unk_token='<unk>',
+                                   model_max_length=4096)
+
+
+def model(family: str, vocab_size: int = VOCAB_SIZE, d_model: int = 64, layers: int = 2, seed: int = 0):
+    import torch
+    torch.manual_seed(seed)
+    if family == 'bart':
+        from transformers import BartConfig, BartForConditionalGeneration
+        config = BartConfig(vocab_size=vocab_size, d_model=d_model, encoder_layers=layers, decoder_layers=layers,
+                            encoder_attention_heads=4, decoder_attention_heads=4, encoder_ffn_dim=4 * d_model,
+                            decoder_ffn_dim=4 * d_model, max_position_embeddings=1024, bos_token_id=0,
+                            pad_token_id=1, eos_token_id=2, decoder_start_token_id=2, forced_eos_token_id=2)
+        return BartForConditionalGeneration(config).eval()
+    from transformers import T5Config, T5ForConditionalGeneration
+    config = T5Config(vocab_size=vocab_size, d_model=d_model, d_kv=d_model // 4, d_ff=4 * d_model,
+                      num_layers=layers, num_decoder_layers=layers, num_heads=4, pad_token_id=0,
+                      eos_token_id=1, decoder_start_token_id=0)
+    return T5ForConditionalGeneration(config).eval()
+
+
+def load_pipeline(task: str, model_name: str = ''):
+    """A tiny pipeline for `task`: BART for summarization, T5 for text2text-generation."""
+    from transformers import pipeline
+    family = 'bart' if task == 'summarization' else 't5'
+    return pipeline(task, model=model(family), tokenizer=tokenizer(family), framework='pt')
@@ -0,0 +1,57 @@
+"""Compression codec for large text columns (lecture transcripts and summaries).
+
+Stored values are bytes that start with a 4-byte format marker:
+  b'\\x1fZL\\x01' + zlib stream
+  b'\\x1fZS\\x01' + zstd frame (needs the optional `zstandard` package)
+Bytes without a marker are plain UTF-8, and `str` values are legacy rows written
+before compression was introduced, so every existing row keeps reading.
+"""
+import os
+import zlib
+
+try:
+    import zstandard as _zstd
+except Exception:
+    _zstd = None
+
+ZLIB_MARKER = b'\x1fZL\x01'
+ZSTD_MARKER = b'\x1fZS\x01'
+
+# 'zlib' (default), 'zstd' (falls back to zlib if zstandard is missing) or 'none'
+TEXT_CODEC = os.environ.get('TRANSCRIPT_CODEC', 'zlib')
+# Values shorter than this are stored as plain UTF-8; compressing them rarely pays off
+MIN_COMPRESS_BYTES = int(os.environ.get('TRANSCRIPT_MIN_COMPRESS_BYTES', '256'))
+
+
+def compress_text(value, codec=None):
+    """Encode a str for storage. Returns None for None."""
+    if value is None:
+        return None
+    raw = value.encode('utf-8')
+    codec = codec or TEXT_CODEC
+    if codec == 'none' or len(raw) < MIN_COMPRESS_BYTES:
+        return raw
+    if codec == 'zstd' and _zstd is not None:
+        packed = ZSTD_MARKER + _zstd.ZstdCompressor(level=6).compress(raw)
+    else:
+        packed = ZLIB_MARKER + zlib.compress(raw, 6)
+    return packed if len(packed) < len(raw) else raw
+
+
+def decompress_text(value):
+    """Decode any stored form (legacy str, plain bytes or marked compressed bytes) to str."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    marker = value[:4]
+    if marker == ZLIB_MARKER:
+        return zlib.decompress(value[4:]).decode('utf-8')
+    if marker == ZSTD_MARKER:
+        if _zstd is None:
+            raise RuntimeError('zstd-compressed value found but the zstandard package is not installed')
+        return _zstd.ZstdDecompressor().decompress(value[4:]).decode('utf-8')
+    return value.decode('utf-8')
+
+
+def is_compressed(value) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:4]) in (ZLIB_MARKER, ZSTD_MARKER)
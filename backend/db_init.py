@@ -17,9 +17,37 @@ def init_db():
 
     engine = create_engine(DB_URL, echo=False)
     Base.metadata.create_all(engine)
+    ensure_columns(engine)
     return engine
 
 
+def ensure_columns(engine):
+    """Add columns declared on the models but missing from existing tables.
+
+    `create_all` only creates missing tables, so databases created by an older
+    version of the app would otherwise lack newly added nullable columns.
+    Returns the list of "table.column" names added.
+    """
+    from sqlalchemy import inspect, text
+    from models import Base
+
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c['name'] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in present or not col.nullable:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text('ALTER TABLE %s ADD COLUMN %s %s' % (table.name, col.name, col_type)))
+                added.append('%s.%s' % (table.name, col.name))
+    return added
+
+
 def seed_questions():
     try:
         from sqlalchemy.orm import sessionmaker
@@ -69,5 +97,57 @@ def seed_questions():
     session.close()
 
 
+def compress_lecture_text(engine=None, batch_size=200, vacuum=True):
+    """Migration: rewrite legacy plain-text transcript/summary values in compressed form.
+
+    Rows already stored as bytes are left alone, so the migration can be re-run
+    safely. Returns (rows_rewritten, bytes_before, bytes_after).
+    """
+    try:
+        from sqlalchemy import text
+        from compression import compress_text
+    except Exception as e:
+        raise RuntimeError('Database not available: %s' % str(e))
+
+    engine = engine or init_db()
+    rewritten = before = after = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text('SELECT id, transcript, summary FROM lectures WHERE id > :last ORDER BY id LIMIT :n'),
+                {'last': last_id, 'n': batch_size},
+            ).all()
+            if not rows:
+                break
+            updates = []
+            for lid, transcript, summary in rows:
+                # Raw driver values: str means a legacy uncompressed row
+                if isinstance(transcript, str) or isinstance(summary, str):
+                    new_t = compress_text(transcript) if isinstance(transcript, str) else transcript
+                    new_s = compress_text(summary) if isinstance(summary, str) else summary
+                    before += sum(len(v.encode('utf-8')) for v in (transcript, summary) if isinstance(v, str))
+                    after += sum(len(v) for v, old in ((new_t, transcript), (new_s, summary)) if isinstance(old, str))
+                    updates.append({'id': lid, 't': new_t, 's': new_s})
+            if updates:
+                conn.execute(text('UPDATE lectures SET transcript = :t, summary = :s WHERE id = :id'), updates)
+                rewritten += len(updates)
+            last_id = rows[-1][0]
+    if vacuum and rewritten and engine.dialect.name == 'sqlite':
+        # Return the freed pages to the filesystem
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text('VACUUM'))
+    return rewritten, before, after
+
+
 if __name__ == '__main__':
-    seed_questions()
+    import argparse
+    parser = argparse.ArgumentParser(description='Initialize, seed or migrate the database')
+    parser.add_argument('--compress-transcripts', action='store_true',
+                        help='Compress legacy plain-text lecture transcripts/summaries instead of seeding')
+    args = parser.parse_args()
+    if args.compress_transcripts:
+        n, before, after = compress_lecture_text()
+        print('compressed %d lectures: %d -> %d bytes' % (n, before, after))
+    else:
+        seed_questions()
@@ -0,0 +1,206 @@
+"""Near-duplicate transcript detection with MinHash signatures and LSH banding.
+
+Re-uploads, mirrors and alternative caption tracks of one lecture differ in
+a few words, casing and caption markup. They still share most of their word
+5-shingles. For each transcript:
+  - normalize it: lowercase, drop [music]-style cues and punctuation;
+  - hash every shingle to 32 bits (crc32 per word, mixed positionally);
+  - keep the minimum of `num_perm` multiply-shift hashes of those shingles.
+The fraction of equal signature entries estimates the Jaccard similarity of
+two shingle sets.
+
+The signature is cut into `bands` bands of `rows` values, and each band is
+hashed to one 64-bit key. Two transcripts with Jaccard similarity s share at
+least one key with probability 1 - (1 - s^rows)^bands. `lsh_params` picks the
+split whose 50% point sits just below the similarity threshold. A lookup is
+then one indexed IN query over `bands` keys, however many lectures are
+stored. Candidates are confirmed by comparing full signatures.
+
+Signatures live in `lecture_signatures`, band keys in `lecture_lsh_bands`
+(see models.py). Signatures are only comparable under the same num_perm,
+shingle size and seed; rows written with other settings are skipped. Band
+keys depend on the (bands, rows) split and so on the threshold. The split is
+recorded by the data itself: every lecture has exactly `bands` keys.
+`ensure_layout()` counts one lecture's keys and calls `reindex()` when they
+do not match, so a threshold change takes effect on the next start
+(`python main.py dedup-reindex` does the same by hand).
+"""
+from __future__ import annotations
+
+import re
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE = 5
+# Transcripts shorter than this (e.g. mock or placeholder text) are never matched
+DEFAULT_MIN_WORDS = 50
+
+_CUE_RE = re.compile(r'\[[^\]]*\]|\([^)]*\)')
+_NON_WORD_RE = re.compile(r"[^a-z0-9' ]+")
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+
+
+def normalize(text: str) -> List[str]:
+    """Words of `text`, lowercased, without caption cues ([Music], (applause)) or punctuation."""
+    text = _CUE_RE.sub(' ', (text or '').lower())
+    return _NON_WORD_RE.sub(' ', text.replace('\n', ' ')).split()
+
+
+def shingle_hashes(words: List[str], k: int = DEFAULT_SHINGLE) -> np.ndarray:
+    """Distinct 32-bit hashes (as uint64) of the word k-shingles."""
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    tokens = np.fromiter((zlib.crc32(w.encode('utf-8')) for w in words), dtype=np.uint64, count=len(words))
+    k = min(k, len(tokens))
+    n = len(tokens) - k + 1
+    h = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(k):
+            h = h * _MIX + tokens[j:j + n]
+    return np.unique((h ^ (h >> _SHIFT32)) & _MASK32)
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows == num_perm whose S-curve midpoint is the
+    largest one not above `threshold`, so true matches are rarely missed."""
+    best = (num_perm, 1)
+    best_mid = -1.0
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        mid = (1.0 / bands) ** (1.0 / rows)
+        if best_mid < mid <= threshold:
+            best, best_mid = (bands, rows), mid
+    return best
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle: int = DEFAULT_SHINGLE, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: ((a * x + b) mod 2^64) >> 32 with odd a
+        self._a = (rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def signature(self, words: List[str]) -> np.ndarray:
+        """uint32 signature of `num_perm` minima (all 0xFFFFFFFF for empty input)."""
+        shingles = shingle_hashes(words, self.shingle)
+        if not len(shingles):
+            return np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint32)
+        out = np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint64)
+        # Blocks keep the (num_perm, shingles) temporary small for hour-long transcripts
+        with np.errstate(over='ignore'):
+            for lo in range(0, len(shingles), 4096):
+                block = shingles[None, lo:lo + 4096]
+                np.minimum(out, ((self._a[:, None] * block + self._b[:, None]) >> _SHIFT32).min(axis=1), out=out)
+        return out.astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """One signed 64-bit key per band (SQLite INTEGER), salted by the band number and width."""
+    values = signature[:bands * rows].astype(np.uint64).reshape(bands, rows)
+    keys = np.arange(1, bands + 1, dtype=np.uint64) + (np.uint64(rows) << _SHIFT32)
+    with np.errstate(over='ignore'):
+        for j in range(rows):
+            keys = keys * _MIX + values[:, j]
+    return keys.view(np.int64)
+
+
+class DedupIndex:
+    """MinHash/LSH index over lecture transcripts, persisted through a SQLAlchemy session."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 shingle: int = DEFAULT_SHINGLE, min_words: int = DEFAULT_MIN_WORDS, seed: int = 1):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError('threshold must be in (0, 1]')
+        self.threshold = threshold
+        self.min_words = min_words
+        self.hasher = MinHasher(num_perm, shingle, seed)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        # Identifies signatures computed with these settings
+        self.scheme = '%d/%d/%d' % (num_perm, shingle, seed)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Signature of a transcript, or None when it is too short to compare."""
+        words = normalize(text)
+        if len(words) < self.min_words:
+            return None
+        return self.hasher.signature(words)
+
+    def query(self, session, signature: np.ndarray, limit: int = 5) -> List[Tuple[int, float]]:
+        """[(lecture_id, similarity)] at or above the threshold, most similar first."""
+        from models import LectureBand, LectureSignature
+        keys = band_keys(signature, self.bands, self.rows).tolist()
+        candidates = [r[0] for r in session.query(LectureBand.lecture_id)
+                      .filter(LectureBand.key.in_(keys)).distinct()]
+        if not candidates:
+            return []
+        matches = []
+        for lecture_id, blob in (session.query(LectureSignature.lecture_id, LectureSignature.signature)
+                                 .filter(LectureSignature.lecture_id.in_(candidates),
+                                         LectureSignature.scheme == self.scheme)):
+            sim = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if sim >= self.threshold:
+                matches.append((lecture_id, round(sim, 4)))
+        matches.sort(key=lambda m: (-m[1], m[0]))
+        return matches[:limit]
+
+    def add(self, session, lecture_id: int, signature: np.ndarray):
+        """Store a lecture's signature and band keys (caller commits)."""
+        from models import LectureBand, LectureSignature
+        session.add(LectureSignature(lecture_id=lecture_id, scheme=self.scheme,
+                                     signature=signature.astype(np.uint32).tobytes()))
+        session.add_all([LectureBand(key=k, lecture_id=lecture_id)
+                         for k in band_keys(signature, self.bands, self.rows).tolist()])
+
+    def stored_bands(self, session) -> Optional[int]:
+        """Band keys per lecture in the stored index (its layout), or None when it is empty."""
+        from sqlalchemy import func
+        from models import LectureBand, LectureSignature
+        lecture_id = (session.query(LectureBand.lecture_id)
+                      .join(LectureSignature, LectureSignature.lecture_id == LectureBand.lecture_id)
+                      .filter(LectureSignature.scheme == self.scheme).limit(1).scalar())
+        if lecture_id is None:
+            return None
+        return session.query(func.count(LectureBand.id)).filter(LectureBand.lecture_id == lecture_id).scalar()
+
+    def ensure_layout(self, session) -> int:
+        """Reindex when the stored band keys were written for another split (caller commits).
+        Returns lectures reindexed, 0 when the layout already matches."""
+        stored = self.stored_bands(session)
+        if stored is None or stored == self.bands:
+            return 0
+        return self.reindex(session)
+
+    def reindex(self, session, batch: int = 1000) -> int:
+        """Rewrite every band key for the current threshold; needed after changing it. Returns lectures indexed."""
+        from sqlalchemy import insert
+        from models import LectureBand, LectureSignature
+        session.query(LectureBand).delete()
+        done = 0
+        last = 0
+        while True:
+            rows = (session.query(LectureSignature.lecture_id, LectureSignature.signature)
+                    .filter(LectureSignature.scheme == self.scheme, LectureSignature.lecture_id > last)
+                    .order_by(LectureSignature.lecture_id).limit(batch).all())
+            if not rows:
+                return done
+            session.execute(insert(LectureBand), [
+                {'key': k, 'lecture_id': lid} for lid, blob in rows
+                for k in band_keys(np.frombuffer(blob, dtype=np.uint32), self.bands, self.rows).tolist()])
+            done += len(rows)
+            last = rows[-1][0]
@@ -0,0 +1,406 @@
+"""Chunk embeddings and a memory-mapped vector index for semantic retrieval.
+
+Transcripts are split into word chunks which are embedded with a small CPU
+sentence-embedding model and appended to a float32 matrix file on disk. A
+sidecar file keeps the int64 `LectureChunk` ids in the same row order so
+search hits can be mapped back to database rows.
+
+If transformers isn't installed (or the model is disabled) a deterministic
+hashing embedder is used instead so retrieval still works in demo mode.
+
+Files written for an index at `<path>`:
+  <path>.f32   row-major float32 matrix, one L2-normalized vector per row
+  <path>.ids   int64 chunk ids, one per row
+  <path>.json  metadata (dimension and embedder name)
+  <path>.lock  flock()ed around appends, so gunicorn workers sharing the
+               index never interleave the two files' writes
+
+The row count is read from the file sizes on every search, so a worker sees
+rows appended by the others.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: appends are then only serialized within the process
+    fcntl = None
+
+logger = logging.getLogger('backend')
+
+EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+EMBEDDING_INDEX_PATH = os.environ.get('EMBEDDING_INDEX_PATH', os.path.join('embeddings', 'chunks'))
+# Use the transformer model only when explicitly enabled (mirrors ENABLE_HF_BACKGROUND)
+ENABLE_EMBEDDING_MODEL = os.environ.get('ENABLE_EMBEDDING_MODEL', os.environ.get('ENABLE_HF_BACKGROUND', '0')) == '1'
+CHUNK_MAX_CHARS = int(os.environ.get('EMBEDDING_CHUNK_CHARS', '400'))
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_MAX_CHARS) -> List[str]:
+    """Split text into chunks of whole words no longer than max_chars."""
+    chunks = []
+    cur = []
+    cur_len = 0
+    for w in text.split():
+        if cur_len + len(w) + 1 > max_chars and cur:
+            chunks.append(' '.join(cur))
+            cur = [w]
+            cur_len = len(w) + 1
+        else:
+            cur.append(w)
+            cur_len += len(w) + 1
+    if cur:
+        chunks.append(' '.join(cur))
+    return chunks
+
+
+def _normalize_rows(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vecs / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Signed feature hashing of unigrams and bigrams. No model download needed."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+
+    def _features(self, text: str) -> List[str]:
+        toks = _TOKEN_RE.findall(text.lower())
+        return toks + [a + ' ' + b for a, b in zip(toks, toks[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            feats = self._features(text)
+            if not feats:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in feats), dtype=np.uint32, count=len(feats))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], hashes % self.dim, signs)
+        return _normalize_rows(out)
+
+
+class TransformerEmbedder:
+    """Mean-pooled sentence embeddings from a small transformers encoder on CPU."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, batch_size: int = 32):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        self.dim = int(self.model.config.hidden_size)
+        self.name = model_name
+        self.batch_size = batch_size
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        torch = self._torch
+        out = []
+        with torch.no_grad():
+            for i in range(0, len(texts), self.batch_size):
+                batch = list(texts[i:i + self.batch_size])
+                enc = self.tokenizer(batch, padding=True, truncation=True, max_length=256, return_tensors='pt')
+                hidden = self.model(**enc).last_hidden_state
+                mask = enc['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+                out.append(pooled.cpu().numpy())
+        if not out:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return _normalize_rows(np.concatenate(out).astype(np.float32))
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """Return the process-wide embedder, loading the transformer model on first use if enabled."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            if ENABLE_EMBEDDING_MODEL:
+                try:
+                    _embedder = TransformerEmbedder(EMBEDDING_MODEL)
+                    logger.info('embeddings: loaded %s (dim=%d)', EMBEDDING_MODEL, _embedder.dim)
+                except Exception as e:
+                    logger.warning('embeddings: could not load %s, using hashing embedder: %s', EMBEDDING_MODEL, e)
+            if _embedder is None:
+                _embedder = HashingEmbedder()
+        return _embedder
+
+
+class EmbeddingIndex:
+    """Append-only float32 matrix on disk with an int64 id sidecar and exact top-k cosine search.
+
+    Vectors are normalized on insert, so a dot product is the cosine similarity.
+    The matrix is memory-mapped read-only for search and scanned in row blocks so
+    memory use stays bounded regardless of index size.
+    """
+
+    def __init__(self, path: str, dim: int, embedder_name: str = ''):
+        self.path = path
+        self.dim = dim
+        self.embedder_name = embedder_name
+        self._lock = threading.Lock()
+        self._mat = None
+        self._ids = None
+        self._mapped_rows = -1
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        meta = self._read_meta()
+        if meta and (meta.get('dim') != dim or meta.get('embedder') != embedder_name):
+            logger.warning('embeddings: index at %s was built with %s, resetting for %s', path, meta.get('embedder'), embedder_name)
+            self.reset()
+        elif not meta:
+            self._write_meta()
+        with self._file_lock():
+            self._repair()
+
+    @property
+    def count(self) -> int:
+        """Rows on disk, including those appended by other processes."""
+        return self._rows_on_disk()
+
+    @property
+    def _vec_path(self):
+        return self.path + '.f32'
+
+    @property
+    def _ids_path(self):
+        return self.path + '.ids'
+
+    @property
+    def _meta_path(self):
+        return self.path + '.json'
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """This process's lock plus an exclusive flock on <path>.lock, shared by every process."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_meta(self):
+        with open(self._meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'dim': self.dim, 'embedder': self.embedder_name}, f)
+
+    def _sizes(self) -> Tuple[int, int]:
+        sizes = []
+        for path in (self._vec_path, self._ids_path):
+            try:
+                sizes.append(os.path.getsize(path))
+            except FileNotFoundError:
+                sizes.append(0)
+        return sizes[0], sizes[1]
+
+    def _rows_on_disk(self) -> int:
+        # Writers append vectors, then ids: rows present in both files are complete, even mid-append
+        vec_size, id_size = self._sizes()
+        return int(min(vec_size // (4 * self.dim), id_size // 8))
+
+    def _repair(self):
+        """Cut both files back to the rows they have in common (caller holds the file lock).
+
+        A crash between (or during) the two appends can leave one file ahead of the other;
+        later appends would then pair ids with the wrong vectors.
+        """
+        vec_size, id_size = self._sizes()
+        rows = self._rows_on_disk()
+        for path, size, want in ((self._vec_path, vec_size, rows * 4 * self.dim), (self._ids_path, id_size, rows * 8)):
+            if size > want:
+                logger.warning('embeddings: truncating %s from %d to %d bytes (%d rows)', path, size, want, rows)
+                os.truncate(path, want)
+
+    def reset(self):
+        with self._file_lock():
+            for p in (self._vec_path, self._ids_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            self._write_meta()
+            self._mat = self._ids = None
+            self._mapped_rows = -1
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray):
+        """Append vectors (normalized here) with their chunk ids."""
+        vecs = _normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        id_arr = np.asarray(ids, dtype=np.int64)
+        if len(id_arr) != len(vecs):
+            raise ValueError('ids and vectors must have the same length')
+        if not len(id_arr):
+            return
+        with self._file_lock():
+            self._repair()  # a writer that crashed mid-append
+            with open(self._vec_path, 'ab') as f:
+                f.write(np.ascontiguousarray(vecs).tobytes())
+            with open(self._ids_path, 'ab') as f:
+                f.write(id_arr.tobytes())
+
+    def _mapped(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            n = self._rows_on_disk()
+            if n != self._mapped_rows:
+                if n:
+                    self._mat = np.memmap(self._vec_path, dtype=np.float32, mode='r', shape=(n, self.dim))
+                    self._ids = np.memmap(self._ids_path, dtype=np.int64, mode='r', shape=(n,))
+                else:
+                    self._mat = np.zeros((0, self.dim), dtype=np.float32)
+                    self._ids = np.zeros((0,), dtype=np.int64)
+                self._mapped_rows = n
+            return self._mat, self._ids
+
+    def memory_bytes(self) -> int:
+        """Bytes currently mapped for search (file-backed, so only touched pages are resident)."""
+        with self._lock:
+            if self._mat is None:
+                return 0
+            return int(self._mat.nbytes + self._ids.nbytes)
+
+    def search(self, queries: np.ndarray, k: int = 5, block_rows: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched exact top-k cosine search.
+
+        Returns (ids, scores), both shaped (n_queries, k') with k' = min(k, count),
+        sorted by descending score.
+        """
+        q = _normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        mat, ids = self._mapped()
+        n = len(ids)
+        k = min(k, n)
+        if k <= 0:
+            return np.zeros((len(q), 0), dtype=np.int64), np.zeros((len(q), 0), dtype=np.float32)
+
+        best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(q), 0), dtype=np.int64)
+        for start in range(0, n, block_rows):
+            block = mat[start:start + block_rows]
+            scores = q @ block.T
+            rows = np.broadcast_to(np.arange(start, start + len(block), dtype=np.int64), scores.shape)
+            cand_scores = np.concatenate([best_scores, scores], axis=1)
+            cand_rows = np.concatenate([best_rows, rows], axis=1)
+            if cand_scores.shape[1] > k:
+                part = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+                cand_scores = np.take_along_axis(cand_scores, part, axis=1)
+                cand_rows = np.take_along_axis(cand_rows, part, axis=1)
+            best_scores, best_rows = cand_scores, cand_rows
+
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return np.asarray(ids[best_rows]), best_scores
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> EmbeddingIndex:
+    """Return the process-wide index, matched to the active embedder."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            emb = get_embedder()
+            _index = EmbeddingIndex(EMBEDDING_INDEX_PATH, emb.dim, emb.name)
+        return _index
+
+
+def index_memory_bytes() -> int:
+    """memory_bytes() of the process-wide index, without creating it."""
+    index = _index
+    return index.memory_bytes() if index is not None else 0
+
+
+def create_chunks(session, lecture_id: int, text: str) -> list:
+    """Add `LectureChunk` rows for a lecture's transcript and flush so they get ids."""
+    from models import LectureChunk
+    chunks = [LectureChunk(lecture_id=lecture_id, position=i, text=c) for i, c in enumerate(chunk_text(text or ''))]
+    session.add_all(chunks)
+    session.flush()
+    return chunks
+
+
+def index_chunks(chunks: Sequence) -> int:
+    """Embed committed chunk rows and append them to the index. Returns rows added."""
+    if not chunks:
+        return 0
+    emb = get_embedder()
+    vecs = emb.embed([c.text for c in chunks])
+    get_index().add([c.id for c in chunks], vecs)
+    return len(chunks)
+
+
+def rebuild_index(session, batch_size: int = 512) -> int:
+    """Re-embed every stored chunk, e.g. after switching embedding models."""
+    from models import LectureChunk
+    index = get_index()
+    index.reset()
+    emb = get_embedder()
+    total = 0
+    last_id = 0
+    while True:
+        rows = (session.query(LectureChunk.id, LectureChunk.text)
+                .filter(LectureChunk.id > last_id)
+                .order_by(LectureChunk.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+        index.add([r.id for r in rows], emb.embed([r.text for r in rows]))
+        total += len(rows)
+        last_id = rows[-1].id
+    return total
+
+
+def search_chunks(session, query: str, k: int = 5, exclude_lecture_id: Optional[int] = None) -> List[dict]:
+    """Top-k chunks for a free-text query, joined with their lecture titles."""
+    from models import Lecture, LectureChunk
+    vec = get_embedder().embed([query])
+    # Over-fetch a little so excluding a lecture still leaves k results
+    fetch_k = k * 2 if exclude_lecture_id is not None else k
+    ids, scores = get_index().search(vec, k=fetch_k)
+    if not ids.size:
+        return []
+    id_list = [int(i) for i in ids[0]]
+    rows = (session.query(LectureChunk.id, LectureChunk.lecture_id, LectureChunk.position, LectureChunk.text, Lecture.title)
+            .join(Lecture, Lecture.id == LectureChunk.lecture_id)
+            .filter(LectureChunk.id.in_(id_list))
+            .all())
+    by_id = {r.id: r for r in rows}
+    out = []
+    for cid, score in zip(id_list, scores[0]):
+        r = by_id.get(cid)
+        if r is None or (exclude_lecture_id is not None and r.lecture_id == exclude_lecture_id):
+            continue
+        out.append({'chunk_id': cid, 'lecture_id': r.lecture_id, 'title': r.title,
+                    'position': r.position, 'text': r.text, 'score': round(float(score), 4)})
+        if len(out) >= k:
+            break
+    return out
@@ -0,0 +1,258 @@
+"""Streaming bulk export of tables as NDJSON, CSV or Parquet.
+
+Rows are read in primary-key order with `stream_results` + `yield_per`, so the
+driver hands them over in batches and memory stays flat regardless of table
+size. Each batch is encoded and handed to the caller before the next one is
+fetched. `since_id` exports only rows with a larger id, for incremental dumps.
+
+The streaming cursor keeps one read transaction open until the last row, and on
+SQLite's rollback journal that blocks every writer. HTTP downloads run as long
+as the client reads, so they use `paged=True` instead: each batch is its own
+keyset query (`id > last ORDER BY id LIMIT n`) on a fresh connection, and
+nothing is held open between batches. Rows committed mid-export with a larger
+id are then included.
+
+CLI (writes one file per table and remembers the last exported id per table):
+  python export.py --tables all --format ndjson --out-dir exports --incremental
+"""
+from __future__ import annotations
+
+import base64
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import pyarrow as _pa
+    import pyarrow.parquet as _pq
+except Exception:
+    _pa = None
+    _pq = None
+
+FORMATS = ('ndjson', 'csv', 'parquet')
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+EXTENSIONS = {'ndjson': 'ndjson', 'csv': 'csv', 'parquet': 'parquet'}
+DEFAULT_BATCH_SIZE = 1000
+
+# Exported columns per table; packed blobs (lecture segments) are left out
+EXPORT_COLUMNS = {
+    'users': ('id', 'name', 'email', 'mastery', 'accuracy'),
+    'lectures': ('id', 'title', 'yt_url', 'transcript', 'summary'),
+    'questions': ('id', 'lecture_id', 'question_text', 'options', 'correct_answer'),
+    'quiz_results': ('id', 'user_id', 'lecture_id', 'score', 'date'),
+    'quiz_answers': ('id', 'quiz_result_id', 'question_id', 'answer', 'correct'),
+}
+
+
+def parquet_available() -> bool:
+    return _pq is not None
+
+
+def _table(name: str):
+    from models import Base
+    if name not in EXPORT_COLUMNS:
+        raise KeyError('unknown table %r (expected one of %s)' % (name, ', '.join(EXPORT_COLUMNS)))
+    return Base.metadata.tables[name]
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    return value
+
+
+def iter_batches(engine, table: str, since_id: int = 0, batch_size: int = DEFAULT_BATCH_SIZE,
+                 limit: Optional[int] = None, stats: Optional[dict] = None) -> Iterator[List[tuple]]:
+    """Yield lists of row tuples (in EXPORT_COLUMNS order) with id > since_id.
+
+    `stats` (if given) is updated with 'rows' and 'last_id' as batches are yielded.
+    """
+    from sqlalchemy import select
+    t = _table(table)
+    query = select(*[t.c[c] for c in EXPORT_COLUMNS[table]]).where(t.c.id > since_id).order_by(t.c.id)
+    if limit:
+        query = query.limit(limit)
+    if stats is not None:
+        stats.setdefault('rows', 0)
+        stats.setdefault('last_id', since_id)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for partition in result.partitions():
+            rows = [tuple(_plain(v) for v in r) for r in partition]
+            if stats is not None:
+                stats['rows'] += len(rows)
+                stats['last_id'] = rows[-1][0]
+            yield rows
+
+
+def iter_pages(engine, table: str, since_id: int = 0, batch_size: int = DEFAULT_BATCH_SIZE,
+               limit: Optional[int] = None, stats: Optional[dict] = None) -> Iterator[List[tuple]]:
+    """Like iter_batches, but each batch is a separate keyset query on its own connection."""
+    from sqlalchemy import select
+    t = _table(table)
+    base = select(*[t.c[c] for c in EXPORT_COLUMNS[table]]).order_by(t.c.id)
+    if stats is not None:
+        stats.setdefault('rows', 0)
+        stats.setdefault('last_id', since_id)
+    last, remaining = since_id, limit or None
+    while remaining is None or remaining > 0:
+        n = batch_size if remaining is None else min(batch_size, remaining)
+        with engine.connect() as conn:
+            rows = [tuple(_plain(v) for v in r) for r in conn.execute(base.where(t.c.id > last).limit(n))]
+        if not rows:
+            return
+        last = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+        if stats is not None:
+            stats['rows'] += len(rows)
+            stats['last_id'] = last
+        yield rows
+        if len(rows) < n:
+            return
+
+
+def _ndjson(columns, batches) -> Iterator[bytes]:
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, r)), ensure_ascii=False) + '\n' for r in rows).encode('utf-8')
+
+
+def _csv(columns, batches) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buf.getvalue().encode('utf-8')
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        out, self._chunks = b''.join(self._chunks), []
+        return out
+
+
+def _arrow_schema(table: str):
+    from sqlalchemy import Boolean, Float, Integer
+    fields = []
+    for name in EXPORT_COLUMNS[table]:
+        col_type = _table(table).c[name].type
+        if isinstance(col_type, Boolean):
+            arrow_type = _pa.bool_()
+        elif isinstance(col_type, Integer):
+            arrow_type = _pa.int64()
+        elif isinstance(col_type, Float):
+            arrow_type = _pa.float64()
+        else:
+            # Text, compressed text and datetimes (ISO strings, as in the other formats)
+            arrow_type = _pa.string()
+        fields.append(_pa.field(name, arrow_type))
+    return _pa.schema(fields)
+
+
+def _parquet(schema, batches) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    writer = _pq.ParquetWriter(sink, schema)
+    try:
+        for rows in batches:
+            # One row group per batch
+            writer.write_table(_pa.table({f.name: [r[i] for r in rows] for i, f in enumerate(schema)}, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export(engine, table: str, fmt: str = 'ndjson', since_id: int = 0, batch_size: int = DEFAULT_BATCH_SIZE,
+           limit: Optional[int] = None, stats: Optional[dict] = None, paged: bool = False) -> Iterator[bytes]:
+    """Encoded export of one table as an iterator of byte chunks (one per batch).
+
+    `paged` reads with iter_pages instead of one streaming cursor (see module docstring).
+    """
+    if fmt not in FORMATS:
+        raise ValueError('unknown format %r (expected one of %s)' % (fmt, ', '.join(FORMATS)))
+    columns = EXPORT_COLUMNS[_table(table).name]
+    batches = (iter_pages if paged else iter_batches)(engine, table, since_id, batch_size, limit, stats)
+    if fmt == 'parquet':
+        if _pq is None:
+            raise RuntimeError('Parquet export needs the optional pyarrow package')
+        return _parquet(_arrow_schema(table), batches)
+    return (_ndjson if fmt == 'ndjson' else _csv)(columns, batches)
+
+
+def export_to_file(engine, table: str, path: str, fmt: str = 'ndjson', since_id: int = 0,
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    stats: Dict[str, int] = {}
+    tmp = path + '.part'
+    with open(tmp, 'wb') as f:
+        for chunk in export(engine, table, fmt, since_id, batch_size, stats=stats):
+            f.write(chunk)
+    os.replace(tmp, path)
+    return stats
+
+
+def main(argv=None):
+    import argparse
+    from sqlalchemy import create_engine
+    from db_init import DB_URL
+
+    parser = argparse.ArgumentParser(description='Export tables as NDJSON, CSV or Parquet')
+    parser.add_argument('--db', default=os.environ.get('DATABASE_URL', DB_URL), help='SQLAlchemy database URL')
+    parser.add_argument('--tables', default='all', help='Comma-separated tables or "all" (%s)' % ', '.join(EXPORT_COLUMNS))
+    parser.add_argument('--format', default='ndjson', choices=FORMATS)
+    parser.add_argument('--out-dir', default='exports')
+    parser.add_argument('--since-id', type=int, default=0, help='Only rows with a larger id')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Continue from the last id recorded in <out-dir>/export_state.json')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    tables = list(EXPORT_COLUMNS) if args.tables == 'all' else [t.strip() for t in args.tables.split(',') if t.strip()]
+    os.makedirs(args.out_dir, exist_ok=True)
+    state_path = os.path.join(args.out_dir, 'export_state.json')
+    state = {}
+    if args.incremental and os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    engine = create_engine(args.db)
+    for table in tables:
+        since = max(args.since_id, int(state.get(table, 0)))
+        suffix = '.since-%d' % since if since else ''
+        path = os.path.join(args.out_dir, '%s%s.%s' % (table, suffix, EXTENSIONS[args.format]))
+        stats = export_to_file(engine, table, path, args.format, since, args.batch_size)
+        state[table] = stats['last_id']
+        print('%s: %d rows -> %s (last id %d)' % (table, stats['rows'], path, stats['last_id']))
+    if args.incremental:
+        with open(state_path, 'w') as f:
+            json.dump(state, f, indent=2)
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
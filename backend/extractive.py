@@ -0,0 +1,173 @@
+"""Extractive summaries: TextRank over TF-IDF sentence vectors.
+
+This is the fast summarization tier between the lead-sentences heuristic and
+the abstractive model. Sentences become L2-normalized TF-IDF rows (sublinear
+tf, smoothed idf, stopwords dropped). The cosine similarity graph is ranked
+with PageRank, and the top sentences are returned in transcript order,
+skipping near-duplicates of ones already picked. Every step is a whole-array
+operation, so an hour-long transcript (~10k words, ~600 sentences) takes a
+few tens of milliseconds.
+
+With SciPy installed the term matrix is a CSR matrix. Without it, only the
+terms shared by two or more sentences are kept (the others add nothing to
+the similarities) and the product is done densely in NumPy. Both paths give
+the same ranking.
+
+Auto-generated captions have no punctuation, so any "sentence" longer than
+`max_words` is cut into `window`-word pieces.
+
+The similarity and transition matrices are dense n x n, so a transcript with
+more than `max_graph` sentences (default 1000, ~8 MB per matrix) is first
+narrowed to the sentences closest to its TF-IDF centroid in one linear pass.
+"""
+from __future__ import annotations
+
+import re
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from scipy import sparse as _sparse
+except Exception:  # optional dependency
+    _sparse = None
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9']*")
+
+STOPWORDS = frozenset('''
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further get got had has
+have having he her here hers herself him himself his how i if in into is it its itself just know let like
+me more most my myself no nor not now of off on once only or other our ours ourselves out over own really
+right same she should so some such than that the their theirs them themselves then there these they this
+those through to too um uh under until up us very was we well were what when where which while who whom
+why will with would yeah you your yours yourself yourselves okay oh going gonna thing things
+'''.split())
+
+DAMPING = 0.85
+MAX_GRAPH_SENTENCES = 1000
+
+
+def split_sentences(text: str, max_words: int = 40, window: int = 25) -> List[str]:
+    """Sentences of `text`; unpunctuated runs longer than max_words are cut into window-word pieces."""
+    out = []
+    for part in _SENTENCE_RE.split(text.replace('\n', ' ')):
+        words = part.split()
+        if len(words) <= max_words:
+            if words:
+                out.append(' '.join(words))
+            continue
+        for i in range(0, len(words), window):
+            out.append(' '.join(words[i:i + window]))
+    return out
+
+
+def tfidf_rows(sentences: List[str]):
+    """(rows, cols, values, n_terms, df): COO entries of the L2-normalized TF-IDF matrix."""
+    vocab = {}
+    rows, cols = [], []
+    for i, sentence in enumerate(sentences):
+        for word in _WORD_RE.findall(sentence.lower()):
+            if word in STOPWORDS or len(word) < 2:
+                continue
+            cols.append(vocab.setdefault(word, len(vocab)))
+            rows.append(i)
+    n, n_terms = len(sentences), len(vocab)
+    if not cols:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0), n_terms, np.zeros(n_terms, dtype=np.int64)
+    # Collapse repeated (sentence, term) pairs into counts
+    pairs, tf = np.unique(np.asarray(rows, dtype=np.int64) * n_terms + np.asarray(cols, dtype=np.int64),
+                          return_counts=True)
+    rows, cols = pairs // n_terms, pairs % n_terms
+    df = np.bincount(cols, minlength=n_terms)
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    values = (1.0 + np.log(tf)) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=n))
+    values /= norms[rows]
+    return rows, cols, values, n_terms, df
+
+
+def centroid_scores(sentences: List[str]) -> np.ndarray:
+    """Cosine of each sentence's TF-IDF vector to the mean vector (linear in the text length)."""
+    rows, cols, values, n_terms, _ = tfidf_rows(sentences)
+    centroid = np.bincount(cols, weights=values, minlength=n_terms) / max(len(sentences), 1)
+    return np.bincount(rows, weights=values * centroid[cols], minlength=len(sentences))
+
+
+def similarity(sentences: List[str]) -> np.ndarray:
+    """Dense (n, n) cosine similarity of the sentences' TF-IDF vectors, zero diagonal."""
+    n = len(sentences)
+    rows, cols, values, n_terms, df = tfidf_rows(sentences)
+    if _sparse is not None:
+        x = _sparse.csr_matrix((values, (rows, cols)), shape=(n, n_terms))
+        sim = (x @ x.T).toarray()
+    else:
+        shared = df >= 2
+        remap = np.cumsum(shared) - 1
+        keep = shared[cols]
+        x = np.zeros((n, int(shared.sum())))
+        x[rows[keep], remap[cols[keep]]] = values[keep]
+        sim = x @ x.T
+    np.fill_diagonal(sim, 0.0)
+    return sim
+
+
+def textrank(sim: np.ndarray, damping: float = DAMPING, tol: float = 1e-6, max_iter: int = 100) -> np.ndarray:
+    """PageRank scores of the weighted similarity graph (sum to 1)."""
+    n = sim.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    out = sim.sum(axis=1)
+    # Sentences sharing no terms with any other spread their rank evenly
+    transition = np.where(out[:, None] > 0, sim / np.where(out > 0, out, 1.0)[:, None], 1.0 / n)
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        nxt = (1.0 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(nxt - scores).sum() < tol:
+            return nxt
+        scores = nxt
+    return scores
+
+
+def summarize(text: str, max_sentences: int = 5, redundancy: float = 0.5, min_words: int = 5,
+              max_chars: Optional[int] = None, max_graph: int = MAX_GRAPH_SENTENCES) -> str:
+    """Top-ranked sentences of `text` in their original order.
+
+    A sentence is skipped when its similarity to one already picked exceeds
+    `redundancy`, or when it has fewer than `min_words` words (unless nothing
+    longer exists). `max_chars` caps the summary length. Only the `max_graph`
+    sentences closest to the centroid enter the TextRank graph.
+    """
+    sentences = split_sentences(text)
+    if len(sentences) <= max_sentences:
+        return ' '.join(sentences)
+    if len(sentences) > max_graph:
+        keep = np.sort(np.argsort(-centroid_scores(sentences), kind='stable')[:max_graph])
+        sentences = [sentences[i] for i in keep]
+    sim = similarity(sentences)
+    scores = textrank(sim)
+    lengths = np.array([s.count(' ') + 1 for s in sentences])
+    if (lengths >= min_words).any():
+        scores = np.where(lengths >= min_words, scores, -1.0)
+    picked: List[int] = []
+    chars = 0
+    for i in np.argsort(-scores, kind='stable'):
+        if len(picked) >= max_sentences or scores[i] < 0:
+            break
+        if picked and sim[i, picked].max() > redundancy:
+            continue
+        if max_chars is not None and picked and chars + len(sentences[i]) > max_chars:
+            continue
+        picked.append(int(i))
+        chars += len(sentences[i]) + 1
+    return ' '.join(sentences[i] for i in sorted(picked))
+
+
+def lead_summary(text: str) -> str:
+    """First two '.'-separated sentences, or the first 200 characters (the original heuristic)."""
+    sentences = [s.strip() for s in text.replace('\n', ' ').split('.') if s.strip()]
+    if len(sentences) >= 2:
+        return '. '.join(sentences[:2]).strip() + '.'
+    return (text[:200].strip() + '...') if len(text) > 200 else text
@@ -0,0 +1,74 @@
+"""Server-side grading of quiz submissions against `Question.correct_answer`.
+
+A submitted answer may be the option text or its index into the question's
+options. Text comparison ignores case and surrounding/repeated whitespace.
+"""
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _norm(value) -> str:
+    return ' '.join(str(value).split()).casefold()
+
+
+def normalize_submission(answers) -> List[Tuple[int, object]]:
+    """Accept [{question_id, answer | answer_index}, ...] or {question_id: answer}
+    and return [(question_id, answer), ...]. Raises ValueError on malformed input."""
+    if answers is None:
+        return []
+    if isinstance(answers, dict):
+        items = list(answers.items())
+    elif isinstance(answers, list):
+        items = []
+        for a in answers:
+            if not isinstance(a, dict) or a.get('question_id') is None:
+                raise ValueError('each answer needs a "question_id"')
+            items.append((a['question_id'], a['answer_index'] if 'answer_index' in a else a.get('answer')))
+    else:
+        raise ValueError('"answers" must be a list or an object')
+    try:
+        # A question answered twice keeps its last answer
+        return list({int(qid): ans for qid, ans in items}.items())
+    except (TypeError, ValueError):
+        raise ValueError('question ids must be integers')
+
+
+def resolve_answer(options: List[str], answer):
+    """Map an index answer to its option text; text answers pass through."""
+    if isinstance(answer, bool) or answer is None:
+        return None
+    if isinstance(answer, int):
+        return options[answer] if 0 <= answer < len(options) else None
+    return str(answer)
+
+
+def answer_index(options: List[str], correct_answer) -> Optional[int]:
+    """Index of the option matching `correct_answer` (same comparison as grading), None if none does."""
+    target = _norm(correct_answer)
+    for i, option in enumerate(options):
+        if _norm(option) == target:
+            return i
+    return None
+
+
+def grade(questions: Dict[int, object], submission: Iterable[Tuple[int, object]]):
+    """Grade a submission against loaded questions keyed by id.
+
+    Returns (results, unknown_ids) where results is a list of
+    {question_id, answer, correct, correct_answer} for known questions.
+    """
+    results = []
+    unknown = []
+    for qid, raw in submission:
+        q = questions.get(qid)
+        if q is None:
+            unknown.append(qid)
+            continue
+        try:
+            options = json.loads(q.options or '[]')
+        except (TypeError, ValueError):
+            options = []
+        answer = resolve_answer(options, raw)
+        correct = answer is not None and _norm(answer) == _norm(q.correct_answer)
+        results.append({'question_id': qid, 'answer': answer, 'correct': correct, 'correct_answer': q.correct_answer})
+    return results, unknown
@@ -0,0 +1,250 @@
+"""Conditional GET and response compression for read endpoints.
+
+`ResponseCache.cached(*tables)` wraps a GET view whose output depends only on
+the query string and the given tables:
+  - The ETag is a weak hash of the JSON body. Every worker computes the same
+    tag for the same data, so a client can revalidate against any of them.
+  - Each process keeps the last body per URL together with the table versions
+    it was built from. Versions are `table_versions.local()` for this process's
+    writes, plus each table's max id, polled at most every `max_staleness`
+    seconds to see other workers' inserts. While they are unchanged, a request
+    is answered from memory without running the view or touching the
+    database: a 304 when If-None-Match matches, otherwise the stored bytes.
+  - Responses say `Cache-Control: no-cache`, so browsers revalidate every
+    poll and get a body-less 304 when nothing changed.
+
+`compress(response)` runs as an after_request hook and gzip- or brotli-encodes
+(brotli needs the optional `brotli` package) JSON and text bodies of at least
+`min_bytes`, following the client's Accept-Encoding q-values. Streamed
+responses (/export, Server-Sent Events) are left alone. Cached entries keep
+their encoded bytes, so repeated polls are not recompressed.
+"""
+from __future__ import annotations
+
+import functools
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import table_versions
+
+try:
+    import brotli as _brotli
+except Exception:  # optional dependency
+    _brotli = None
+
+COMPRESSIBLE = ('application/json', 'text/', 'application/javascript', 'application/x-ndjson')
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br', 'gzip' or None for an Accept-Encoding header value."""
+    if not accept_encoding:
+        return None
+    q: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        q[name.strip().lower()] = weight
+    star = q.get('*', 0.0)
+    offers = [('br', q.get('br', star)), ('gzip', q.get('gzip', q.get('x-gzip', star)))]
+    if _brotli is None:
+        offers = offers[1:]
+    # Highest q wins; brotli on ties since it is smaller for JSON
+    best = max(offers, key=lambda o: o[1])
+    return best[0] if best[1] > 0 else None
+
+
+def encode(data: bytes, encoding: str, level: int = 6) -> bytes:
+    if encoding == 'br':
+        return _brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class _Entry:
+    __slots__ = ('key', 'version', 'etag', 'body', 'mimetype', 'encoded')
+
+    def __init__(self, key: str, version, etag: str, body: bytes, mimetype: str):
+        self.key = key
+        self.version = version
+        self.etag = etag
+        self.body = body
+        self.mimetype = mimetype
+        self.encoded: Dict[str, bytes] = {}
+
+
+class ResponseCache:
+    def __init__(self, engine=None, max_bytes: int = 32 << 20, max_staleness: float = 5.0,
+                 min_bytes: int = 1024, level: int = 6, compress: bool = True, enabled: bool = True):
+        self.enabled = enabled
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.max_staleness = max_staleness
+        self.min_bytes = min_bytes
+        self.level = level
+        self.compress_enabled = compress
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._bytes = 0
+        self._max_ids: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'compressed': 0,
+                       'bytes_in': 0, 'bytes_out': 0}
+
+    # -- versions ----------------------------------------------------------------
+    def _max_id(self, table: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            seen = self._max_ids.get(table)
+        if seen is not None and now - seen[0] < self.max_staleness:
+            return seen[1]
+        try:
+            with self.engine.connect() as conn:
+                value = table_versions.max_id(conn, table)
+        except Exception:
+            value = -1
+        with self._lock:
+            self._max_ids[table] = (now, value)
+        return value
+
+    def version(self, tables) -> tuple:
+        out = tuple(table_versions.local(t) for t in tables)
+        if self.engine is not None:
+            out += tuple(self._max_id(t) for t in tables)
+        return out
+
+    # -- entries -----------------------------------------------------------------
+    def _get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, entry: _Entry):
+        size = len(entry.body)
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop(entry.key, None)
+            if old is not None:
+                self._bytes -= len(old.body) + sum(len(v) for v in old.encoded.values())
+            self._entries[entry.key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, dropped = self._entries.popitem(last=False)
+                self._bytes -= len(dropped.body) + sum(len(v) for v in dropped.encoded.values())
+
+    def _encoded(self, entry: _Entry, encoding: str) -> bytes:
+        data = entry.encoded.get(encoding)
+        if data is None:
+            data = encode(entry.body, encoding, self.level)
+            with self._lock:
+                if encoding not in entry.encoded and self._entries.get(entry.key) is entry:
+                    entry.encoded[encoding] = data
+                    self._bytes += len(data)
+        return data
+
+    # -- responses ---------------------------------------------------------------
+    def _respond(self, entry: _Entry, request, response_class):
+        """304 or the stored body (encoded as negotiated) for `entry`."""
+        if request.if_none_match.contains_weak(entry.etag):
+            resp = response_class(status=304)
+            with self._lock:
+                self._stats['not_modified'] += 1
+        else:
+            resp = response_class(entry.body, mimetype=entry.mimetype)
+            encoding = self._negotiate(request, len(entry.body), entry.mimetype)
+            if encoding:
+                resp.set_data(self._encoded(entry, encoding))
+                resp.headers['Content-Encoding'] = encoding
+                self._count(len(entry.body), resp.content_length)
+        resp.set_etag(entry.etag, weak=True)
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp.vary.add('Accept-Encoding')
+        return resp
+
+    def cached(self, *tables, when=None):
+        """Decorator for GET views whose body depends on the query string and `tables`.
+
+        `when()`, if given, is called per request; falsy means pass through uncached
+        (e.g. for randomized responses).
+        """
+        def decorate(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                from flask import current_app, make_response, request
+                if not self.enabled or request.method != 'GET' or (when is not None and not when()):
+                    return view(*args, **kwargs)
+                key = request.full_path
+                version = self.version(tables)
+                entry = self._get(key)
+                if entry is not None and entry.version == version:
+                    with self._lock:
+                        self._stats['hits'] += 1
+                    return self._respond(entry, request, current_app.response_class)
+                with self._lock:
+                    self._stats['misses'] += 1
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200 or resp.is_streamed:
+                    return resp
+                body = resp.get_data()
+                entry = _Entry(key, version, hashlib.blake2b(body, digest_size=12).hexdigest(), body, resp.mimetype)
+                self._put(entry)
+                out = self._respond(entry, request, current_app.response_class)
+                # Keep headers the view set itself
+                for name, value in resp.headers.items():
+                    if name.lower() not in ('content-length', 'content-type', 'etag', 'content-encoding', 'vary'):
+                        out.headers.setdefault(name, value)
+                return out
+            return wrapper
+        return decorate
+
+    # -- compression of uncached responses ---------------------------------------
+    def _negotiate(self, request, size: int, mimetype: Optional[str]) -> Optional[str]:
+        if not self.compress_enabled or size < self.min_bytes or not mimetype:
+            return None
+        if not mimetype.startswith(COMPRESSIBLE):
+            return None
+        return negotiate(request.headers.get('Accept-Encoding'))
+
+    def _count(self, before: int, after: int):
+        with self._lock:
+            self._stats['compressed'] += 1
+            self._stats['bytes_in'] += before
+            self._stats['bytes_out'] += after
+
+    def compress(self, resp):
+        """after_request hook: encode eligible bodies that aren't encoded yet."""
+        from flask import request
+        if (resp.status_code < 200 or resp.status_code in (204, 206, 304) or resp.is_streamed
+                or resp.direct_passthrough or 'Content-Encoding' in resp.headers or request.method == 'HEAD'):
+            return resp
+        resp.vary.add('Accept-Encoding')
+        data = resp.get_data()
+        encoding = self._negotiate(request, len(data), resp.mimetype)
+        if encoding is None:
+            return resp
+        packed = encode(data, encoding, self.level)
+        if len(packed) >= len(data):
+            return resp
+        resp.set_data(packed)
+        resp.headers['Content-Encoding'] = encoding
+        self._count(len(data), len(packed))
+        return resp
+
+    def metrics(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out['entries'] = len(self._entries)
+            out['cached_bytes'] = self._bytes
+        out['brotli'] = _brotli is not None
+        out['ratio'] = round(out['bytes_out'] / out['bytes_in'], 3) if out['bytes_in'] else None
+        return out
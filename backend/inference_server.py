@@ -0,0 +1,411 @@
+"""Model inference in separate worker processes.
+
+`InferenceClient` spawns a pool of worker processes. Each worker loads the
+pipelines itself (`load_pipeline`) and serves requests over its own local
+Pipe, so generation runs outside the API process: it does not hold the API's
+GIL, and a segfault or OOM kill during generation takes down one worker
+instead of the server.
+
+  - Transcripts of at least `shm_min_bytes` are written to a shared-memory
+    segment, and only its name and size go over the Pipe. The worker reads
+    the text from the segment; the client unlinks it when the reply arrives.
+    Shorter texts are sent inline.
+  - A worker collects the requests that arrive within `batch_wait_ms` of the
+    first one (up to `max_batch`). It runs those with the same role and
+    arguments as one batched pipeline call. If the batch fails, it retries
+    the inputs one by one, so one bad input only fails its own request.
+  - `call()` waits at most `timeout` seconds (InferenceTimeout). A worker
+    that has been stuck on one batch longer than `hang_timeout` is killed.
+  - When a worker exits, its pending calls fail with WorkerCrashed. The
+    worker is restarted after an exponential backoff and reloads its models.
+    Until then, `ready(role)` only counts the other workers.
+
+Workers are started with the 'spawn' method: forking a threaded server (and
+an initialized torch) is unsafe. Each API process owns its own pool, so with
+several gunicorn workers, size INFERENCE_WORKERS for the total.
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as _FutureTimeout
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('backend')
+
+# role -> (transformers pipeline task, model name)
+DEFAULT_MODELS = {'summarizer': ('summarization', 'sshleifer/distilbart-cnn-12-6'),
+                  'generator': ('text2text-generation', 'google/flan-t5-small')}
+
+
+class InferenceError(RuntimeError):
+    """The worker could not run the pipeline for this request."""
+
+
+class WorkerCrashed(InferenceError):
+    """The worker serving the request exited before replying."""
+
+
+class InferenceTimeout(InferenceError, TimeoutError):
+    """No reply within the call's timeout."""
+
+
+class NotReady(InferenceError):
+    """No live worker has the requested model loaded."""
+
+
+def load_pipeline(task: str, model_name: str):
+    """Default worker loader: a transformers pipeline."""
+    from transformers import pipeline
+    return pipeline(task, model=model_name)
+
+
+# -- worker process --------------------------------------------------------------
+def _read_payload(payload) -> str:
+    if payload[0] == 'shm':
+        _, name, size = payload
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            return bytes(shm.buf[:size]).decode('utf-8')
+        finally:
+            shm.close()
+    return payload[1]
+
+
+def _first(output):
+    # Pipelines return [dict] per input (a list of candidates with num_return_sequences)
+    return output[0] if isinstance(output, list) and output else output
+
+
+def _run_group(conn, pipe, role: str, kwargs: dict, items: List[Tuple[int, tuple]]):
+    if pipe is None:
+        for req_id, _ in items:
+            conn.send(('error', req_id, '%s model is not loaded' % role))
+        return
+    try:
+        inputs = [_read_payload(p) for _, p in items]
+        call_kwargs = dict(kwargs)
+        if len(inputs) > 1:
+            call_kwargs.setdefault('batch_size', len(inputs))
+        outputs = [_first(o) for o in pipe(inputs, **call_kwargs)]
+    except Exception as e:
+        if len(items) > 1:
+            for item in items:
+                _run_group(conn, pipe, role, kwargs, [item])
+            return
+        conn.send(('error', items[0][0], '%s: %s' % (type(e).__name__, e)))
+        return
+    for n, ((req_id, _), out) in enumerate(zip(items, outputs)):
+        conn.send(('result', req_id, out, len(items), n == 0))
+
+
+def _worker_main(conn, models: Dict[str, Tuple[str, str]], loader: Callable, max_batch: int, batch_wait: float,
+                 threads: Optional[dict] = None):
+    if threads:
+        # Before the loader imports torch, so OpenMP picks up the thread count too
+        from thread_budget import apply_threads
+        apply_threads(**threads)
+    pipes = {}
+    for role, (task, name) in models.items():
+        conn.send(('event', 'load-progress', role, {'model_name': name, 'stage': 'loading'}))
+        try:
+            pipes[role] = loader(task, name)
+        except Exception as e:
+            conn.send(('event', 'failed', role, {'model_name': name, 'error': str(e)}))
+        else:
+            conn.send(('event', 'ready', role, {'model_name': name}))
+    while True:
+        try:
+            batch = [conn.recv()]
+            deadline = time.monotonic() + batch_wait
+            while batch[-1][0] != 'stop' and len(batch) < max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not conn.poll(remaining):
+                    break
+                batch.append(conn.recv())
+        except (EOFError, OSError):
+            return  # the API process went away
+        groups: Dict[tuple, tuple] = {}
+        for msg in batch:
+            if msg[0] == 'call':
+                _, req_id, role, payload, kwargs = msg
+                key = (role, repr(sorted(kwargs.items())))
+                groups.setdefault(key, (role, kwargs, []))[2].append((req_id, payload))
+        for role, kwargs, items in groups.values():
+            _run_group(conn, pipes.get(role), role, kwargs, items)
+        if batch[-1][0] == 'stop':
+            return
+
+
+# -- API process -----------------------------------------------------------------
+class _Worker:
+    def __init__(self, index: int, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.ready: set = set()
+        # req_id -> (future, shared memory segment or None, sent at)
+        self.pending: Dict[int, Tuple[Future, Optional[shared_memory.SharedMemory], float]] = {}
+        self.started = time.monotonic()
+        self.last_reply = self.started
+
+
+def _release(shm: Optional[shared_memory.SharedMemory]):
+    if shm is None:
+        return
+    try:
+        shm.close()
+        shm.unlink()
+    except Exception:
+        pass
+
+
+class InferenceClient:
+    """Thin client for a pool of inference worker processes (see module docstring)."""
+
+    def __init__(self, workers: int = 1, models: Optional[Dict[str, Tuple[str, str]]] = None,
+                 loader: Callable = load_pipeline, max_batch: int = 8, batch_wait_ms: float = 5.0,
+                 timeout: float = 60.0, hang_timeout: float = 300.0, shm_min_bytes: Optional[int] = 64 * 1024,
+                 restart_backoff: Tuple[float, float] = (0.5, 30.0),
+                 on_event: Optional[Callable[[str, str, dict], None]] = None, thread_budget=None):
+        if workers < 1:
+            raise ValueError('workers must be >= 1')
+        self.size = workers
+        self.models = dict(models or DEFAULT_MODELS)
+        self.loader = loader
+        self.max_batch = max(1, max_batch)
+        self.batch_wait = max(0.0, batch_wait_ms) / 1000.0
+        self.timeout = timeout
+        self.hang_timeout = hang_timeout
+        self.shm_min_bytes = shm_min_bytes
+        self.restart_backoff = restart_backoff
+        self.on_event = on_event
+        # thread_budget.ThreadBudget sized for these workers (one inference at a time each)
+        self.thread_budget = thread_budget
+        self._ctx = multiprocessing.get_context('spawn')
+        self._workers: List[Optional[_Worker]] = [None] * workers
+        self._restarts = [0] * workers
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._ready_cv = threading.Condition(self._lock)
+        self._closed = False
+        self._stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'crashes': 0, 'restarts': 0,
+                       'shm_payloads': 0, 'shm_bytes': 0, 'batches': 0, 'batched_calls': 0, 'max_batch_seen': 0}
+
+    # -- lifecycle -----------------------------------------------------------
+    def start(self):
+        for index in range(self.size):
+            self._spawn(index)
+        return self
+
+    def _spawn(self, index: int):
+        with self._lock:
+            if self._closed:
+                return
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, name='inference-%d' % index, daemon=True,
+                                    args=(child_conn, self.models, self.loader, self.max_batch, self.batch_wait,
+                                          self.thread_budget.settings(index) if self.thread_budget else None))
+        process.start()
+        child_conn.close()
+        worker = _Worker(index, process, parent_conn)
+        with self._lock:
+            self._workers[index] = worker
+        threading.Thread(target=self._read_loop, args=(worker,), name='inference-reader-%d' % index,
+                         daemon=True).start()
+        logger.info('inference: started worker %d (pid %s)', index, process.pid)
+
+    def close(self, timeout: float = 5.0):
+        with self._lock:
+            self._closed = True
+            workers = [w for w in self._workers if w is not None]
+        for w in workers:
+            try:
+                with w.send_lock:
+                    w.conn.send(('stop',))
+            except Exception:
+                pass
+        for w in workers:
+            w.process.join(timeout)
+            if w.process.is_alive():
+                w.process.terminate()
+                w.process.join(timeout)
+
+    def wait_ready(self, roles=None, timeout: Optional[float] = None) -> bool:
+        """Block until some worker has each of `roles` (default: all models) loaded."""
+        roles = list(roles or self.models)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._ready_cv:
+            while not all(self._ready_locked(r) for r in roles):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if self._closed or (remaining is not None and remaining <= 0):
+                    return False
+                self._ready_cv.wait(remaining)
+            return True
+
+    def _ready_locked(self, role: str) -> bool:
+        return any(w is not None and role in w.ready for w in self._workers)
+
+    def ready(self, role: str) -> bool:
+        with self._lock:
+            return self._ready_locked(role)
+
+    # -- replies and crashes -------------------------------------------------
+    def _emit(self, event: str, role: str, data: dict):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(event, role, data)
+        except Exception as e:
+            logger.warning('inference: event callback failed: %s', e)
+
+    def _read_loop(self, worker: _Worker):
+        while True:
+            try:
+                msg = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = msg[0]
+            if kind == 'event':
+                _, event, role, data = msg
+                with self._ready_cv:
+                    if event == 'ready':
+                        worker.ready.add(role)
+                    else:
+                        worker.ready.discard(role)
+                    self._ready_cv.notify_all()
+                self._emit(event, role, dict(data, worker=worker.index))
+                continue
+            req_id = msg[1]
+            with self._lock:
+                worker.last_reply = time.monotonic()
+                entry = worker.pending.pop(req_id, None)
+                if kind == 'result':
+                    size, first = msg[3], msg[4]
+                    self._stats['batches'] += first
+                    self._stats['batched_calls'] += size > 1
+                    self._stats['max_batch_seen'] = max(self._stats['max_batch_seen'], size)
+                else:
+                    self._stats['errors'] += 1
+            if entry is None:
+                continue  # the caller timed out long ago
+            future, shm, _ = entry
+            _release(shm)
+            if kind == 'result':
+                future.set_result(msg[2])
+            else:
+                future.set_exception(InferenceError(msg[2]))
+        self._on_exit(worker)
+
+    def _on_exit(self, worker: _Worker):
+        worker.process.join(1.0)
+        code = worker.process.exitcode
+        with self._ready_cv:
+            pending, worker.pending = worker.pending, {}
+            roles, worker.ready = worker.ready, set()
+            if self._workers[worker.index] is worker:
+                self._workers[worker.index] = None
+            closed = self._closed
+            if not closed:
+                self._stats['crashes'] += 1
+            self._ready_cv.notify_all()
+        for future, shm, _ in pending.values():
+            _release(shm)
+            future.set_exception(WorkerCrashed('inference worker %d exited (code %s)' % (worker.index, code)))
+        try:
+            worker.conn.close()
+        except Exception:
+            pass
+        if closed:
+            return
+        # Back off on crash loops; a worker that stayed up for a while starts over
+        if time.monotonic() - worker.started > 60.0:
+            self._restarts[worker.index] = 0
+        low, high = self.restart_backoff
+        delay = min(high, low * (2 ** self._restarts[worker.index]))
+        self._restarts[worker.index] += 1
+        logger.warning('inference: worker %d exited with code %s, %d calls failed; restarting in %.1fs',
+                       worker.index, code, len(pending), delay)
+        for role in roles:
+            self._emit('failed', role, {'worker': worker.index, 'error': 'worker exited with code %s' % code})
+        timer = threading.Timer(delay, self._restart, args=(worker.index,))
+        timer.daemon = True
+        timer.start()
+
+    def _restart(self, index: int):
+        with self._lock:
+            self._stats['restarts'] += 1
+        try:
+            self._spawn(index)
+        except Exception as e:
+            logger.exception('inference: failed to restart worker %d: %s', index, e)
+
+    # -- calls ---------------------------------------------------------------
+    def _pick(self, role: str) -> _Worker:
+        with self._lock:
+            live = [w for w in self._workers if w is not None and role in w.ready]
+            if not live:
+                raise NotReady('no inference worker has the %s model loaded' % role)
+            return min(live, key=lambda w: len(w.pending))
+
+    def call(self, role: str, text: str, timeout: Optional[float] = None, **kwargs):
+        """Output of the `role` pipeline for one input (the dict a pipeline returns per input)."""
+        worker = self._pick(role)
+        data = text.encode('utf-8')
+        shm = None
+        if self.shm_min_bytes is not None and len(data) >= max(1, self.shm_min_bytes):
+            shm = shared_memory.SharedMemory(create=True, size=len(data))
+            shm.buf[:len(data)] = data
+            payload = ('shm', shm.name, len(data))
+        else:
+            payload = ('inline', text)
+        req_id = next(self._ids)
+        future: Future = Future()
+        with self._lock:
+            worker.pending[req_id] = (future, shm, time.monotonic())
+            self._stats['calls'] += 1
+            if shm is not None:
+                self._stats['shm_payloads'] += 1
+                self._stats['shm_bytes'] += len(data)
+        try:
+            with worker.send_lock:
+                worker.conn.send(('call', req_id, role, payload, kwargs))
+        except Exception as e:
+            with self._lock:
+                worker.pending.pop(req_id, None)
+            _release(shm)
+            raise WorkerCrashed('inference worker %d is gone: %s' % (worker.index, e))
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except _FutureTimeout:
+            with self._lock:
+                self._stats['timeouts'] += 1
+                oldest = min((sent for _, _, sent in worker.pending.values()), default=None)
+                # No reply at all since the oldest outstanding request went out
+                stuck = oldest is not None and time.monotonic() - max(oldest, worker.last_reply) > self.hang_timeout
+                if stuck:
+                    worker.ready = set()  # route nothing more to it
+            if stuck and worker.process.is_alive():
+                logger.warning('inference: worker %d made no progress for %.0fs, killing it',
+                               worker.index, self.hang_timeout)
+                worker.process.kill()
+            raise InferenceTimeout('no reply from the %s model within %.1fs' % (role, timeout or self.timeout))
+
+    def metrics(self) -> dict:
+        from profiling import rss_bytes
+        with self._lock:
+            out = dict(self._stats)
+            now = time.monotonic()
+            out['workers'] = [None if w is None else {
+                'pid': w.process.pid, 'alive': w.process.is_alive(), 'ready': sorted(w.ready),
+                'in_flight': len(w.pending), 'uptime_s': round(now - w.started, 1),
+                'rss_bytes': rss_bytes(w.process.pid),
+                'restarts': self._restarts[w.index]} for w in self._workers]
+        out['max_batch'] = self.max_batch
+        out['batch_wait_ms'] = self.batch_wait * 1000.0
+        return out
@@ -0,0 +1,142 @@
+"""In-process background jobs with pollable handles.
+
+A request submits work with `JobRegistry.submit(fn, ..., key=...)` and waits
+up to its own time limit on `Job.wait()`. Work that finishes in time is
+answered inline. Otherwise the caller hands back `job.id`, and the client
+polls it. Jobs with the same `key` that are still queued or running are
+shared, so two clients ingesting the same video do the work once.
+
+Handles live in the process that created them. Behind several pre-forked
+workers a status poll may reach another one, so `on_change(job)` is called
+when a job is created, starts and finishes; the app stores the status there
+and answers polls for unknown ids from the store.
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger('backend')
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class Job:
+    __slots__ = ('id', 'key', 'status', 'result', 'error', 'created', 'started', 'finished', '_done')
+
+    def __init__(self, job_id: str, key: Optional[str]):
+        self.id = job_id
+        self.key = key
+        self.status = 'queued'
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True once the job has finished (either way)."""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        out = {'job_id': self.id, 'status': self.status}
+        if self.started is not None:
+            out['elapsed_ms'] = round(((self.finished or time.time()) - self.started) * 1000.0, 1)
+        if self.status == 'failed':
+            out['error'] = str(self.error)
+        return out
+
+
+class JobRegistry:
+    """Runs jobs on a small thread pool and keeps the last `keep` finished ones for `ttl` seconds."""
+
+    def __init__(self, workers: int = 2, keep: int = 256, ttl: float = 3600.0, name: str = 'job',
+                 on_change: Optional[Callable[[Job], None]] = None):
+        self.keep = keep
+        self.ttl = ttl
+        self.on_change = on_change
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        # Process-unique, hard to guess ids: a random prefix plus a counter
+        self._prefix = os.urandom(4).hex()
+        self._ids = itertools.count(1)
+        self._stats = {'submitted': 0, 'deduplicated': 0, 'done': 0, 'failed': 0}
+
+    def submit(self, fn: Callable, *args, key: Optional[str] = None, **kwargs) -> Tuple[Job, bool]:
+        """Start fn(*args, **kwargs) unless a job with `key` is in flight. Returns (job, created)."""
+        with self._lock:
+            if key is not None and key in self._active:
+                self._stats['deduplicated'] += 1
+                return self._active[key], False
+            job = Job('%s-%d' % (self._prefix, next(self._ids)), key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active[key] = job
+            self._stats['submitted'] += 1
+            self._prune()
+        self._changed(job)
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job, True
+
+    def _changed(self, job: Job):
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(job)
+        except Exception as e:
+            logger.warning('jobs: on_change failed for %s: %s', job.id, e)
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job.status = 'running'
+        job.started = time.time()
+        self._changed(job)
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = 'done'
+        except BaseException as e:
+            job.error = e
+            job.status = 'failed'
+        job.finished = time.time()
+        self._changed(job)
+        with self._lock:
+            self._stats[job.status] += 1
+            if job.key is not None and self._active.get(job.key) is job:
+                del self._active[job.key]
+        job._done.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        finished = [j for j in self._jobs.values() if j.done]
+        excess = len(finished) - self.keep
+        for job in finished:
+            if excess <= 0 and job.finished >= cutoff:
+                break
+            del self._jobs[job.id]
+            excess -= 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out['in_flight'] = sum(1 for j in self._jobs.values() if not j.done)
+            out['tracked'] = len(self._jobs)
+        return out
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,303 @@
+"""Incremental leaderboard: learners ranked by mean quiz score, with O(log n) rank queries.
+
+/analytics/rankings re-sorts the whole cohort whenever results change. This
+keeps each learner's attempt count and score sum plus an order-statistics
+index over their means:
+
+  buckets   a mean maps to one of 100 * resolution + 1 buckets (0.01 points
+            by default); means in the same bucket share a rank
+  tree      a Fenwick tree counting learners per bucket, so "learners above
+            this mean" and "the bucket holding the k-th best learner" are
+            each O(log buckets)
+  members   the learners in each bucket. A top-N page sorts a bucket
+            (mean, then attempts, then id, as in analytics.py) when it first
+            reaches it, and keeps that order until the bucket changes
+
+Rank (competition ranking: 1 + learners in strictly higher buckets) and
+percentile cost O(log buckets). A page of the top N also pays for the
+buckets it touches. The index is built from one GROUP BY over quiz_results
+at startup. After that it follows the table by id, as analytics.py does: the
+first read after a write (`table_versions.bump`, or a higher max id seen
+when polling every `max_staleness` seconds) folds in only the new rows, each
+moving its learner between two buckets.
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+import table_versions
+from analytics import numeric
+
+logger = logging.getLogger('backend')
+
+TABLE = 'quiz_results'
+MAX_SCORE = 100
+
+
+class Fenwick:
+    """Counts per position 0..size-1 with O(log n) updates, prefix sums and k-th element search."""
+
+    def __init__(self, counts: List[int]):
+        self.size = len(counts)
+        self.total = sum(counts)
+        tree = [0] + [int(c) for c in counts]
+        for i in range(1, self.size + 1):  # O(n) build: push each node into its parent
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self._top_bit = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def add(self, pos: int, delta: int) -> None:
+        self.total += delta
+        i = pos + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, pos: int) -> int:
+        """Sum of the counts at positions < pos."""
+        out = 0
+        while pos > 0:
+            out += self.tree[pos]
+            pos -= pos & -pos
+        return out
+
+    def find(self, k: int) -> int:
+        """Position of the k-th element (0-based, in position order); requires 0 <= k < total."""
+        pos, step = 0, self._top_bit
+        while step:
+            if pos + step <= self.size and self.tree[pos + step] <= k:
+                pos += step
+                k -= self.tree[pos]
+            step >>= 1
+        return pos
+
+
+def _columns(conn):
+    """SQL for (user, score): non-integer users read as 0 (skipped), non-numeric scores as 0."""
+    sqlite = conn.dialect.name == 'sqlite'
+    return numeric('user_id', sqlite), numeric('score', sqlite, ('integer', 'real'))
+
+
+def load_user_totals(conn, newest: int) -> Dict[str, np.ndarray]:
+    """Per-user attempt counts and score sums over rows with id <= newest (NULL/0/non-integer users skipped,
+    NULL score -> 0)."""
+    user, score = _columns(conn)
+    sql = ('SELECT %s AS u, COUNT(*), SUM(%s) FROM %s WHERE id <= %%s AND %s != 0 GROUP BY u'
+           % (user, score, TABLE, user))
+    if conn.dialect.name == 'sqlite':
+        # Plain tuples off the DBAPI cursor: much faster than Row objects for millions of users
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(sql % '?', (newest,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    else:
+        from sqlalchemy import text
+        rows = conn.execute(text(sql % ':newest'), {'newest': newest}).fetchall()
+    flat = np.fromiter(itertools.chain.from_iterable(rows), np.float64, count=3 * len(rows)).reshape(-1, 3)
+    return {'user': flat[:, 0].astype(np.int64), 'count': flat[:, 1].astype(np.int64), 'sum': flat[:, 2]}
+
+
+class Leaderboard:
+    """Rank, percentile and top-N queries over quiz_results for one engine.
+
+    `min_attempts`   learners with fewer results are tracked but not ranked.
+    `resolution`     buckets per score point; means closer than 1/resolution tie.
+    `max_staleness`  seconds between max-id checks for writes from other processes.
+    """
+
+    def __init__(self, engine, min_attempts: int = 1, resolution: int = 100, max_staleness: float = 5.0):
+        self.engine = engine
+        self.min_attempts = max(1, min_attempts)
+        self.resolution = resolution
+        self.max_staleness = max_staleness
+        self.buckets = MAX_SCORE * resolution + 1
+        self._lock = threading.Lock()
+        self._tree: Optional[Fenwick] = None
+        self._last_id = 0
+        self._seen_version = None
+        self._checked = 0.0
+        self._stats = {'rebuilds': 0, 'rows_applied': 0, 'last_rebuild_ms': 0.0}
+        self._reset(0)
+
+    def _reset(self, capacity: int):
+        self._slots: Dict[int, int] = {}
+        self._user = np.zeros(capacity, np.int64)
+        self._count = np.zeros(capacity, np.int64)
+        self._sum = np.zeros(capacity, np.float64)
+        self._bucket = np.full(capacity, -1, np.int64)
+        self._members: Dict[int, Set[int]] = {}  # bucket -> slots
+        self._order: Dict[int, np.ndarray] = {}  # bucket -> its slots in rank order
+
+    def _bucket_of(self, total, count):
+        return np.rint(np.clip(total / count, 0, MAX_SCORE) * self.resolution).astype(np.int64)
+
+    # -- loading -------------------------------------------------------------------
+    def _is_fresh(self) -> bool:
+        return (self._tree is not None and self._seen_version == table_versions.local(TABLE)
+                and time.monotonic() - self._checked < self.max_staleness)
+
+    def _sync(self):
+        """Bring the index up to date (caller holds the lock)."""
+        if self._is_fresh():
+            return
+        version = table_versions.local(TABLE)
+        with self.engine.connect() as conn:
+            newest = table_versions.max_id(conn, TABLE)
+            if self._tree is None or newest < self._last_id:
+                # First load, or rows were deleted (table reset): start over
+                self._rebuild(conn, newest)
+            elif newest > self._last_id:
+                from sqlalchemy import text
+                user, score = _columns(conn)
+                rows = conn.execute(text('SELECT %s, %s FROM %s WHERE id > :last AND id <= :newest AND %s != 0 '
+                                         'ORDER BY id' % (user, score, TABLE, user)),
+                                    {'last': self._last_id, 'newest': newest}).fetchall()
+                for user_id, score in rows:
+                    self._apply(user_id, score)
+                self._stats['rows_applied'] += len(rows)
+        self._last_id = newest
+        self._seen_version = version
+        self._checked = time.monotonic()
+
+    def _rebuild(self, conn, newest: int):
+        t0 = time.perf_counter()
+        totals = load_user_totals(conn, newest)
+        n = len(totals['user'])
+        self._reset(max(1024, 2 * n))
+        self._slots = dict(zip(totals['user'].tolist(), range(n)))
+        self._user[:n], self._count[:n], self._sum[:n] = totals['user'], totals['count'], totals['sum']
+        ranked = np.flatnonzero(totals['count'] >= self.min_attempts)
+        buckets = self._bucket_of(totals['sum'][ranked], totals['count'][ranked])
+        self._bucket[ranked] = buckets
+        self._tree = Fenwick(np.bincount(buckets, minlength=self.buckets).tolist())
+        # Group the ranked users by bucket
+        order = np.argsort(buckets, kind='stable')
+        slots, buckets = ranked[order], buckets[order]
+        edges = np.flatnonzero(np.diff(buckets)) + 1
+        for lo, hi in zip(np.append(0, edges).tolist(), np.append(edges, len(buckets)).tolist()):
+            if hi > lo:
+                self._members[int(buckets[lo])] = set(slots[lo:hi].tolist())
+        self._stats['rebuilds'] += 1
+        self._stats['last_rebuild_ms'] = (time.perf_counter() - t0) * 1000.0
+        logger.info('leaderboard: indexed %d users (%d ranked) in %.0f ms', n, len(ranked),
+                    self._stats['last_rebuild_ms'])
+
+    def _slot(self, user_id: int) -> int:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = len(self._slots)
+            if slot == len(self._user):
+                grow = max(1024, 2 * slot)
+                self._user = np.append(self._user, np.zeros(grow, np.int64))
+                self._count = np.append(self._count, np.zeros(grow, np.int64))
+                self._sum = np.append(self._sum, np.zeros(grow, np.float64))
+                self._bucket = np.append(self._bucket, np.full(grow, -1, np.int64))
+            self._slots[user_id] = slot
+            self._user[slot] = user_id
+        return slot
+
+    def _apply(self, user_id, score):
+        """Fold in one result: the user moves from their old bucket to the new one. Non-integer ids are skipped."""
+        if isinstance(user_id, bool) or not isinstance(user_id, (int, np.integer)):
+            return
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            score = 0.0
+        slot = self._slot(int(user_id))
+        self._count[slot] += 1
+        self._sum[slot] += score
+        old = int(self._bucket[slot])
+        count = int(self._count[slot])
+        new = int(self._bucket_of(self._sum[slot], count)) if count >= self.min_attempts else -1
+        if new == old:
+            self._order.pop(new, None)  # same bucket, but the order inside it may change
+            return
+        if old >= 0:
+            self._tree.add(old, -1)
+            members = self._members[old]
+            members.discard(slot)
+            if not members:
+                del self._members[old]
+        if new >= 0:
+            self._tree.add(new, 1)
+            self._members.setdefault(new, set()).add(slot)
+        self._bucket[slot] = new
+        self._order.pop(old, None)
+        self._order.pop(new, None)
+
+    def refresh(self) -> None:
+        """Fold in new rows now (or build the index), ignoring `max_staleness`."""
+        with self._lock:
+            self._checked = 0.0
+            self._sync()
+
+    # -- queries -------------------------------------------------------------------
+    def _mean(self, slot: int) -> float:
+        return float(self._sum[slot]) / int(self._count[slot])
+
+    def _ranked(self, bucket: int) -> np.ndarray:
+        """Slots of the bucket's members: higher mean, then more attempts, then lower id first."""
+        order = self._order.get(bucket)
+        if order is None:
+            members = self._members[bucket]
+            slots = np.fromiter(members, np.int64, count=len(members))
+            mean = self._sum[slots] / self._count[slots]
+            order = self._order[bucket] = slots[np.lexsort((self._user[slots], -self._count[slots], -mean))]
+        return order
+
+    def user(self, user_id: int) -> Optional[dict]:
+        """{user_id, attempts, mean, rank, percentile, cohort_size}; None for a user without results."""
+        with self._lock:
+            self._sync()
+            slot = self._slots.get(user_id)
+            if slot is None:
+                return None
+            tree, bucket = self._tree, int(self._bucket[slot])
+            rank = percentile = None
+            if bucket >= 0:
+                below = tree.prefix(bucket)
+                equal = len(self._members[bucket])
+                rank = tree.total - below - equal + 1
+                percentile = round((below + 0.5 * equal) / tree.total * 100.0, 1)
+            return {'user_id': user_id, 'attempts': int(self._count[slot]), 'mean': round(self._mean(slot), 2),
+                    'rank': rank, 'percentile': percentile, 'cohort_size': tree.total}
+
+    def top(self, limit: int = 20, offset: int = 0) -> dict:
+        """{cohort_size, rankings: [{rank, user_id, mean, attempts}]} for ranks offset+1 .. offset+limit."""
+        with self._lock:
+            self._sync()
+            tree = self._tree
+            out: List[dict] = []
+            pos = max(offset, 0)
+            while len(out) < limit and pos < tree.total:
+                # The bucket holding the pos-th best user (0-based), and how many users rank above it
+                bucket = tree.find(tree.total - 1 - pos)
+                above = tree.total - tree.prefix(bucket + 1)
+                slots = self._ranked(bucket)
+                for s in slots[pos - above:limit - len(out) + pos - above].tolist():
+                    out.append({'rank': above + 1, 'user_id': int(self._user[s]), 'mean': round(self._mean(s), 2),
+                                'attempts': int(self._count[s])})
+                pos = above + len(slots)
+            return {'cohort_size': tree.total, 'rankings': out}
+
+    def metrics(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out['last_rebuild_ms'] = round(out['last_rebuild_ms'], 2)
+            out['users'] = len(self._slots)
+            out['ranked'] = self._tree.total if self._tree is not None else 0
+            out['last_id'] = self._last_id
+            out['buckets'] = self.buckets
+            out['index_age_s'] = round(time.monotonic() - self._checked, 3) if self._tree is not None else None
+            return out
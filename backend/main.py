@@ -3,23 +3,46 @@
 This script preloads HF models synchronously at startup so users don't wait
 for downloads on first request. Run with: python main.py
 It will start the existing Flask `app` defined in backend/app.py.
+
+    python main.py prepare-models [--dtype bfloat16] [--quantize dynamic-int8]
+
+writes version-pinned local snapshots of the models (model_snapshots.py) so
+later starts load them offline from memory-mapped safetensors files.
+
+    python main.py dedup-reindex
+
+rewrites the near-duplicate index's band keys for the current DEDUP_THRESHOLD
+(the app also does this on start when it finds keys for another layout).
 """
+import argparse
 import os
 import logging
 import importlib.util
 import sys
 
-# Load backend/app.py as a module named 'backend_app' so we can reference the Flask app
 BACKEND_APP_PATH = os.path.join(os.path.dirname(__file__), 'app.py')
-spec = importlib.util.spec_from_file_location('backend_app', BACKEND_APP_PATH)
-webapp_module = importlib.util.module_from_spec(spec)
-sys.modules['backend_app'] = webapp_module
-spec.loader.exec_module(webapp_module)
+webapp_module = None
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
 log = logging.getLogger('main')
 
 
+def load_app():
+    """Load backend/app.py as a module named 'backend_app' so we can reference the Flask app.
+
+    Done on demand rather than at import: inference worker processes re-import
+    this script as their __main__ and must not start another app.
+    """
+    global webapp_module
+    if webapp_module is None:
+        spec = importlib.util.spec_from_file_location('backend_app', BACKEND_APP_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['backend_app'] = module
+        spec.loader.exec_module(module)
+        webapp_module = module
+    return webapp_module
+
+
 def preload_models_if_needed():
     """Preload HF models synchronously by invoking the function in app.py
     or by building pipelines directly if necessary."""
@@ -46,7 +69,75 @@ def preload_models_if_needed():
         log.exception('Fallback preload failed; models may not be available')
 
 
+def prepare_models(argv):
+    """Write and pin a local snapshot of each configured model (or verify the pinned ones)."""
+    import model_snapshots
+    parser = argparse.ArgumentParser(prog='main.py prepare-models',
+                                     description='Snapshot the configured models for offline, memory-mapped loading')
+    parser.add_argument('--root', default=model_snapshots.DEFAULT_ROOT, help='Snapshot directory (MODEL_SNAPSHOT_DIR)')
+    parser.add_argument('--roles', default='summarizer,generator')
+    parser.add_argument('--dtype', choices=model_snapshots.DTYPES, default='float32')
+    parser.add_argument('--quantize', choices=[q for q in model_snapshots.QUANTIZE if q])
+    parser.add_argument('--summarizer-revision', help='Hub revision (branch, tag or commit) to pin')
+    parser.add_argument('--generator-revision', help='Hub revision (branch, tag or commit) to pin')
+    parser.add_argument('--verify', action='store_true', help='Check the pinned snapshots\' checksums instead')
+    args = parser.parse_args(argv)
+    app_module = load_app()
+    models = {'summarizer': ('summarization', app_module.SUMMARIZER_MODEL, args.summarizer_revision),
+              'generator': ('text2text-generation', app_module.GENERATOR_MODEL, args.generator_revision)}
+    status = 0
+    for role in [r.strip() for r in args.roles.split(',') if r.strip()]:
+        if role not in models:
+            parser.error('unknown role %r' % role)
+        task, name, revision = models[role]
+        if args.verify:
+            path = model_snapshots.find(name, args.root)
+            try:
+                if path is None:
+                    raise model_snapshots.SnapshotError('no snapshot pinned for %s' % name)
+                manifest = model_snapshots.verify(path, checksums=True)
+                log.info('%s: %s @ %s (%s) OK', role, name, manifest['revision'][:12], path)
+            except model_snapshots.SnapshotError as e:
+                log.error('%s: %s', role, e)
+                status = 1
+            continue
+        try:
+            path = model_snapshots.prepare(role, task, name, root=args.root, revision=revision,
+                                           dtype=args.dtype, quantize=args.quantize)
+        except ImportError as e:
+            log.error('prepare-models needs transformers and torch installed: %s', e)
+            return 1
+        log.info('%s: %s -> %s', role, name, path)
+    return status
+
+
+def dedup_reindex(argv):
+    """Rewrite the near-duplicate band keys for DEDUP_THRESHOLD."""
+    parser = argparse.ArgumentParser(prog='main.py dedup-reindex',
+                                     description='Rebuild the LSH band keys of the transcript dedup index')
+    parser.add_argument('--if-needed', action='store_true', help='Only when the stored layout differs')
+    args = parser.parse_args(argv)
+    app_module = load_app()
+    if app_module.SessionLocal is None:
+        log.error('dedup-reindex needs the database')
+        return 1
+    index = app_module._get_dedup_index()
+    session = app_module.SessionLocal()
+    try:
+        done = index.ensure_layout(session) if args.if_needed else index.reindex(session)
+        session.commit()
+    finally:
+        session.close()
+    log.info('dedup: %d lectures indexed with %d bands x %d rows', done, index.bands, index.rows)
+    return 0
+
+
 def main():
+    if sys.argv[1:2] == ['prepare-models']:
+        sys.exit(prepare_models(sys.argv[2:]))
+    if sys.argv[1:2] == ['dedup-reindex']:
+        sys.exit(dedup_reindex(sys.argv[2:]))
+    load_app()
     # Explicitly enable HF background flag so app logs reflect intended behavior
     os.environ.setdefault('ENABLE_HF_BACKGROUND', '1')
 
@@ -0,0 +1,148 @@
+"""In-process event bus for model lifecycle events, served as Server-Sent Events.
+
+The background loader publishes `load-progress`, `ready`, `failed` and
+`evicted` events here; `/models/events` streams them to every connected
+client. Events carry increasing sequence ids and the most recent ones are kept
+in a ring buffer, so a client reconnecting with `Last-Event-ID` gets exactly
+what it missed. If the id has already fallen out of the buffer, the client gets
+a fresh `status` snapshot instead.
+
+A stream holds a server thread while it is open, so streams end after
+`max_age` seconds (the client reconnects and resumes from its last id) and
+`acquire_stream()` caps how many are open at once.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+EVENT_TYPES = ('load-progress', 'ready', 'failed', 'evicted')
+
+
+class EventBus:
+    def __init__(self, history: int = 256):
+        self._events: deque = deque(maxlen=history)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._models: Dict[str, dict] = {}
+        self._streams = 0
+
+    @property
+    def streams(self) -> int:
+        """Streams currently open."""
+        return self._streams
+
+    def acquire_stream(self, limit: int) -> bool:
+        """Reserve one of `limit` stream slots; False when all are taken. Pair with release_stream()."""
+        with self._cond:
+            if self._streams >= limit:
+                return False
+            self._streams += 1
+            return True
+
+    def release_stream(self) -> None:
+        with self._cond:
+            self._streams = max(0, self._streams - 1)
+
+    @property
+    def last_id(self) -> int:
+        return self._seq
+
+    def publish(self, event: str, model: str, **data) -> dict:
+        """Record an event for `model` (e.g. 'summarizer') and wake all waiting streams."""
+        if event not in EVENT_TYPES:
+            raise ValueError('unknown model event %r' % event)
+        with self._cond:
+            self._seq += 1
+            record = {'id': self._seq, 'event': event,
+                      'data': dict(data, model=model, ts=round(time.time(), 3))}
+            self._events.append(record)
+            self._models[model] = dict(record['data'], state=event)
+            self._cond.notify_all()
+        return record
+
+    def models(self) -> Dict[str, dict]:
+        """Last known event per model."""
+        with self._cond:
+            return {k: dict(v) for k, v in self._models.items()}
+
+    def since(self, last_id: int) -> Optional[List[dict]]:
+        """Events after `last_id`, or None if some of them were already dropped from the buffer."""
+        with self._cond:
+            return self._since(last_id)
+
+    def _since(self, last_id: int) -> Optional[List[dict]]:
+        if last_id >= self._seq:
+            return []
+        if not self._events or self._events[0]['id'] > last_id + 1:
+            return None
+        return [e for e in self._events if e['id'] > last_id]
+
+    def wait(self, last_id: int, timeout: float) -> Optional[List[dict]]:
+        """Block until there are events after `last_id` or `timeout` passes (then returns [])."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > last_id, timeout)
+            return self._since(last_id)
+
+
+def format_sse(data: dict, event: Optional[str] = None, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append('id: %d' % event_id)
+    if event:
+        lines.append('event: %s' % event)
+    lines.append('data: %s' % json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream(bus: EventBus, snapshot, last_event_id: Optional[str] = None, heartbeat: float = 15.0,
+           retry_ms: int = 3000, max_age: Optional[float] = None) -> Iterator[str]:
+    """Yield SSE frames: missed events (or a snapshot), then live events for up to `max_age` seconds.
+
+    `snapshot()` returns the current /models/status payload; it is sent as a
+    `status` event on first connect and whenever a reconnect can't be replayed.
+    An SSE comment is sent every `heartbeat` seconds so proxies keep an idle
+    connection open and dead clients are noticed. `max_age=None` streams forever.
+    """
+    deadline = time.monotonic() + max_age if max_age is not None else None
+    yield 'retry: %d\n\n' % retry_ms
+    try:
+        cursor = int(last_event_id) if last_event_id else None
+    except ValueError:
+        cursor = None
+    pending = bus.since(cursor) if cursor is not None else None
+    if pending is None:
+        cursor = bus.last_id
+        yield format_sse(snapshot(), event='status', event_id=cursor)
+        pending = []
+    while True:
+        for e in pending:
+            cursor = e['id']
+            yield format_sse(e['data'], event=e['event'], event_id=e['id'])
+        timeout = heartbeat
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                return
+        pending = bus.wait(cursor, timeout)
+        if pending is None:
+            cursor = bus.last_id
+            yield format_sse(snapshot(), event='status', event_id=cursor)
+            pending = []
+        elif not pending and (deadline is None or time.monotonic() < deadline):
+            yield ': keep-alive\n\n'
+
+
+_bus: Optional[EventBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_bus() -> EventBus:
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = EventBus()
+        return _bus
@@ -0,0 +1,191 @@
+"""Version-pinned local model snapshots for offline, memory-mapped cold starts.
+
+`prepare()` (run by `python main.py prepare-models`) downloads each
+configured model once and writes a self-contained snapshot:
+
+    <root>/<model slug>/<revision[:12]>-<dtype>/
+        model.safetensors, config.json, generation_config.json, tokenizer files
+        snapshot.json    model, task, resolved hub revision, dtype, quantization,
+                         library versions and the size and sha256 of every file
+    <root>/models.lock.json   role -> snapshot currently in use
+
+Snapshots are written to a temporary directory and renamed into place, and
+the lock file is replaced atomically. A half-written snapshot is never
+used, and `prepare` can be re-run while the server is up.
+
+`load_pipeline()` loads the snapshot pinned for a model with
+`local_files_only=True`, so boot never touches the network. Weights come
+from safetensors with `low_cpu_mem_usage=True`: the file is memory-mapped
+and copied into the model without random-initializing it first. If no
+snapshot is pinned, it falls back to the hub (unless `required`).
+
+`dtype` may be bfloat16 or float16 to halve the snapshot. Dynamic int8
+quantization (`quantize='dynamic-int8'`) produces packed weights that
+safetensors cannot store, so the float weights are stored. The manifest
+records the request, and the Linear layers are quantized right after loading.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger('backend')
+
+DEFAULT_ROOT = os.environ.get('MODEL_SNAPSHOT_DIR',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_snapshots'))
+LOCK_FILE = 'models.lock.json'
+MANIFEST = 'snapshot.json'
+DTYPES = ('float32', 'bfloat16', 'float16')
+QUANTIZE = (None, 'dynamic-int8')
+
+
+class SnapshotError(RuntimeError):
+    """A pinned snapshot is missing, incomplete or does not match its manifest."""
+
+
+def slug(model_name: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]+', '--', model_name).strip('-')
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_json(path: str, data: dict):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def read_lock(root: str = DEFAULT_ROOT) -> Dict[str, dict]:
+    """role -> {model, task, path, revision, dtype, quantize}; empty when nothing was prepared."""
+    try:
+        with open(os.path.join(root, LOCK_FILE)) as f:
+            return json.load(f).get('models', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def pin(root: str, role: str, snapshot_dir: str):
+    """Point `role` at a snapshot directory (relative to `root`) in the lock file."""
+    with open(os.path.join(snapshot_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    models = read_lock(root)
+    models[role] = {k: manifest[k] for k in ('model', 'task', 'revision', 'dtype', 'quantize')}
+    models[role]['path'] = os.path.relpath(snapshot_dir, root)
+    _write_json(os.path.join(root, LOCK_FILE), {'models': models, 'updated': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())})
+
+
+def find(model_name: str, root: str = DEFAULT_ROOT) -> Optional[str]:
+    """Directory of the snapshot pinned for `model_name`, or None."""
+    for entry in read_lock(root).values():
+        if entry.get('model') == model_name:
+            return os.path.join(root, entry['path'])
+    return None
+
+
+def verify(snapshot_dir: str, checksums: bool = False) -> dict:
+    """The snapshot's manifest after checking every file's size (and sha256 with `checksums`)."""
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SnapshotError('no readable %s in %s: %s' % (MANIFEST, snapshot_dir, e))
+    for name, info in manifest['files'].items():
+        path = os.path.join(snapshot_dir, name)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            raise SnapshotError('%s is missing from %s' % (name, snapshot_dir))
+        if size != info['size'] or (checksums and _sha256(path) != info['sha256']):
+            raise SnapshotError('%s in %s does not match the manifest' % (name, snapshot_dir))
+    return manifest
+
+
+def _auto_model(task: str):
+    import transformers
+    if task in ('summarization', 'text2text-generation', 'translation'):
+        return transformers.AutoModelForSeq2SeqLM
+    return transformers.AutoModelForCausalLM
+
+
+def prepare(role: str, task: str, model_name: str, root: str = DEFAULT_ROOT, revision: Optional[str] = None,
+            dtype: str = 'float32', quantize: Optional[str] = None) -> str:
+    """Download `model_name` and write its snapshot under `root`; pins it for `role`. Returns the snapshot directory."""
+    if dtype not in DTYPES:
+        raise ValueError('dtype must be one of %s' % ', '.join(DTYPES))
+    if quantize not in QUANTIZE:
+        raise ValueError('quantize must be dynamic-int8 or None')
+    import torch
+    import transformers
+    from transformers import AutoTokenizer
+    started = time.perf_counter()
+    model = _auto_model(task).from_pretrained(model_name, revision=revision, torch_dtype=getattr(torch, dtype))
+    tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+    resolved = getattr(model.config, '_commit_hash', None) or revision or 'unversioned'
+    parent = os.path.join(root, slug(model_name))
+    os.makedirs(parent, exist_ok=True)
+    final = os.path.join(parent, '%s-%s' % (resolved[:12], dtype))
+    tmp = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        model.save_pretrained(tmp, safe_serialization=True)
+        tokenizer.save_pretrained(tmp)
+        files = {}
+        for name in sorted(os.listdir(tmp)):
+            path = os.path.join(tmp, name)
+            files[name] = {'size': os.path.getsize(path), 'sha256': _sha256(path)}
+        _write_json(os.path.join(tmp, MANIFEST), {
+            'model': model_name, 'task': task, 'revision': resolved, 'dtype': dtype, 'quantize': quantize,
+            'files': files, 'transformers': transformers.__version__, 'torch': torch.__version__,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())})
+        if os.path.isdir(final):
+            shutil.rmtree(final)
+        os.replace(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    pin(root, role, final)
+    logger.info('model_snapshots: %s -> %s (%.1fs)', model_name, final, time.perf_counter() - started)
+    return final
+
+
+def load_snapshot(snapshot_dir: str):
+    """Pipeline from a snapshot directory, offline and with memory-mapped safetensors weights."""
+    import torch
+    from transformers import AutoTokenizer, pipeline
+    manifest = verify(snapshot_dir)
+    model = _auto_model(manifest['task']).from_pretrained(
+        snapshot_dir, local_files_only=True, use_safetensors=True, low_cpu_mem_usage=True,
+        torch_dtype=getattr(torch, manifest['dtype']))
+    model.eval()
+    if manifest.get('quantize') == 'dynamic-int8':
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    tokenizer = AutoTokenizer.from_pretrained(snapshot_dir, local_files_only=True)
+    return pipeline(manifest['task'], model=model, tokenizer=tokenizer)
+
+
+def load_pipeline(task: str, model_name: str, root: str = DEFAULT_ROOT, required: bool = False):
+    """The pinned snapshot's pipeline for `model_name`; from the hub when none is pinned (unless `required`)."""
+    snapshot_dir = find(model_name, root)
+    if snapshot_dir is not None:
+        started = time.perf_counter()
+        pipe = load_snapshot(snapshot_dir)
+        logger.info('model_snapshots: loaded %s from %s in %.2fs', model_name, snapshot_dir,
+                    time.perf_counter() - started)
+        return pipe
+    if required:
+        raise SnapshotError('no snapshot of %s under %s; run `python main.py prepare-models`' % (model_name, root))
+    from transformers import pipeline
+    return pipeline(task, model=model_name)
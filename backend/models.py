@@ -4,12 +4,26 @@ provide lightweight placeholders so the app can run in demo mode.
 import json
 
 try:
-    from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
-    from sqlalchemy.orm import declarative_base, relationship
+    from sqlalchemy import BigInteger, Column, Integer, Float, String, Text, Boolean, ForeignKey, DateTime, LargeBinary
+    from sqlalchemy.orm import declarative_base, deferred, relationship
     from sqlalchemy.sql import func
+    from sqlalchemy.types import TypeDecorator
+    from compression import compress_text, decompress_text
     Base = declarative_base()
 
 
+    class CompressedText(TypeDecorator):
+        """Text stored as marked, compressed bytes; legacy plain-text rows still read."""
+        impl = LargeBinary
+        cache_ok = True
+
+        def process_bind_param(self, value, dialect):
+            return compress_text(value)
+
+        def process_result_value(self, value, dialect):
+            return decompress_text(value)
+
+
     class User(Base):
         __tablename__ = 'users'
         id = Column(Integer, primary_key=True)
@@ -24,8 +38,14 @@ try:
         id = Column(Integer, primary_key=True)
         title = Column(String(256))
         yt_url = Column(String(512))
-        transcript = Column(Text)
-        summary = Column(Text)
+        # Large columns are deferred: loaded (and decompressed) only when accessed
+        transcript = deferred(Column(CompressedText))
+        summary = deferred(Column(CompressedText))
+        # Packed timestamped segments (see segments.SegmentArray)
+        segments = deferred(Column(LargeBinary))
+        # Set when the transcript is a near-duplicate of an earlier lecture (see dedup.py);
+        # summary, chunks and questions are shared with that lecture
+        duplicate_of = Column(Integer, ForeignKey('lectures.id'), nullable=True)
 
 
     class Question(Base):
@@ -39,6 +59,69 @@ try:
         lecture = relationship('Lecture')
 
 
+    class LectureChunk(Base):
+        """A transcript chunk; its id is the row key in the embedding index sidecar."""
+        __tablename__ = 'lecture_chunks'
+        id = Column(Integer, primary_key=True)
+        lecture_id = Column(Integer, ForeignKey('lectures.id'), nullable=False, index=True)
+        position = Column(Integer, nullable=False)
+        text = Column(Text, nullable=False)
+
+
+    class LectureSignature(Base):
+        """MinHash signature of a lecture transcript (dedup.py)."""
+        __tablename__ = 'lecture_signatures'
+        lecture_id = Column(Integer, ForeignKey('lectures.id'), primary_key=True)
+        scheme = Column(String(32), nullable=False)
+        signature = Column(LargeBinary, nullable=False)
+
+
+    class LectureBand(Base):
+        """One LSH band key of a lecture signature; lookups are IN queries on `key`."""
+        __tablename__ = 'lecture_lsh_bands'
+        id = Column(Integer, primary_key=True)
+        key = Column(BigInteger, nullable=False, index=True)
+        lecture_id = Column(Integer, ForeignKey('lectures.id'), nullable=False)
+
+
+    class IngestJob(Base):
+        """Status of an /ingest-lecture job, so a poll reaching another worker process can answer it."""
+        __tablename__ = 'ingest_jobs'
+        id = Column(String(32), primary_key=True)
+        status = Column(String(16), nullable=False)
+        result = Column(Text)  # JSON body once done
+        error = Column(Text)
+        error_code = Column(Integer)  # HTTP status a failure maps to
+        started = Column(Float)
+        finished = Column(Float, index=True)
+
+
+    class QuizAnswer(Base):
+        """A single graded answer belonging to a server-graded QuizResult."""
+        __tablename__ = 'quiz_answers'
+        id = Column(Integer, primary_key=True)
+        quiz_result_id = Column(Integer, ForeignKey('quiz_results.id'), nullable=False, index=True)
+        question_id = Column(Integer, ForeignKey('questions.id'), nullable=False)
+        answer = Column(String(256))
+        correct = Column(Boolean, nullable=False, default=False)
+
+
+    class UserAbility(Base):
+        """Checkpointed ability estimate for the adaptive quiz engine."""
+        __tablename__ = 'user_abilities'
+        user_id = Column(Integer, primary_key=True)
+        ability = Column(Float, nullable=False, default=0.0)
+        answers = Column(Integer, nullable=False, default=0)
+
+
+    class QuestionDifficulty(Base):
+        """Checkpointed difficulty estimate for the adaptive quiz engine."""
+        __tablename__ = 'question_difficulties'
+        question_id = Column(Integer, primary_key=True)
+        difficulty = Column(Float, nullable=False, default=0.0)
+        answers = Column(Integer, nullable=False, default=0)
+
+
     class QuizResult(Base):
         __tablename__ = 'quiz_results'
         id = Column(Integer, primary_key=True)
@@ -71,6 +154,27 @@ except Exception:
     class Question:
         pass
 
+    class LectureChunk:
+        pass
+
+    class LectureSignature:
+        pass
+
+    class LectureBand:
+        pass
+
+    class IngestJob:
+        pass
+
+    class QuizAnswer:
+        pass
+
+    class UserAbility:
+        pass
+
+    class QuestionDifficulty:
+        pass
+
     class QuizResult:
         pass
 
@@ -1,12 +1,17 @@
-"""Monitor backend logs for HF model download/load progress, poll /models/status
-and fetch a YouTube transcript when models are ready.
+"""Monitor backend logs for HF model download/load progress, wait for the models
+to be ready and fetch a YouTube transcript.
 
 Usage (PowerShell example):
   & .\venv311\Scripts\Activate.ps1
   python backend\monitor_and_fetch.py --yt https://www.youtube.com/watch?v=znF2U_3Z210
 
-The script will tail `backend/backend.err` (default) and poll
-http://localhost:5000/models/status. When both summarizer and generator
+Bulk mode fetches many videos concurrently and keeps a resumable manifest:
+  python backend/monitor_and_fetch.py --bulk course_videos.txt --workers 8 --rate 2 \
+      --post-url http://localhost:5000/save-lectures
+
+The script will tail `backend/backend.err` (default) and listen on the
+http://localhost:5000/models/events stream (falling back to polling
+/models/status on older backends). When both summarizer and generator
 report ready, it will fetch the transcript (using youtube-transcript-api if
 installed) and write a prepared transcript file under `backend/transcripts/`.
 
@@ -19,11 +24,14 @@ import argparse
 import json
 import logging
 import os
+import random
 import re
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Callable, Optional
+from typing import Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
 
 import requests
 
@@ -79,28 +87,127 @@ def poll_models_status(status_url: str, timeout: int = 3600, interval: float = 5
         backoff = min(backoff * 1.1, 5.0)
 
 
+def iter_sse(lines) -> Iterator[dict]:
+    """Parse Server-Sent Events from an iterable of text lines.
+
+    Yields {'event', 'id', 'data'} dicts with `data` JSON-decoded when possible.
+    Comment lines (heartbeats) are skipped.
+    """
+    event, event_id, data = None, None, []
+    for line in lines:
+        if line is None:
+            continue
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.rstrip('\r')
+        if not line:
+            if data:
+                raw = '\n'.join(data)
+                try:
+                    payload = json.loads(raw)
+                except ValueError:
+                    payload = raw
+                yield {'event': event or 'message', 'id': event_id, 'data': payload}
+            event, data = None, []
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        value = value[1:] if value.startswith(' ') else value
+        if field == 'event':
+            event = value
+        elif field == 'data':
+            data.append(value)
+        elif field == 'id':
+            event_id = value
+
+
+def _models_ready(state: dict) -> bool:
+    return all(state.get(role) == 'ready' for role in ('summarizer', 'generator'))
+
+
+def wait_models_via_events(events_url: str, timeout: float = 3600) -> Optional[dict]:
+    """Wait for both models on the /models/events SSE stream.
+
+    Returns per-model states once both are ready, or None on timeout or when a
+    model fails to load. Reconnects with Last-Event-ID if the stream drops, and
+    raises requests.RequestException if the endpoint can't be reached at all,
+    so callers can fall back to polling.
+    """
+    deadline = time.time() + timeout
+    state: Dict[str, str] = {}
+    last_id = None
+    connected_once = False
+    while time.time() < deadline:
+        headers = {'Accept': 'text/event-stream'}
+        if last_id:
+            headers['Last-Event-ID'] = last_id
+        try:
+            # The read timeout bounds the wait between frames; the server heartbeats every ~15s
+            with requests.get(events_url, headers=headers, stream=True, timeout=(10, 60)) as resp:
+                resp.raise_for_status()
+                connected_once = True
+                for msg in iter_sse(resp.iter_lines(decode_unicode=True)):
+                    last_id = msg['id'] or last_id
+                    data = msg['data'] if isinstance(msg['data'], dict) else {}
+                    if msg['event'] == 'status':
+                        if not data.get('transformers_available'):
+                            LOG.warning('models/events: transformers not available on the backend')
+                        state['summarizer'] = 'ready' if data.get('summarizer_ready') else 'pending'
+                        state['generator'] = 'ready' if data.get('generator_ready') else 'pending'
+                    elif msg['event'] in ('load-progress', 'ready', 'failed', 'evicted'):
+                        state[data.get('model')] = msg['event']
+                        LOG.info('models/events: %s %s %s', data.get('model'), msg['event'],
+                                 data.get('error') or data.get('model_name') or '')
+                        if msg['event'] == 'failed':
+                            return None
+                    if _models_ready(state):
+                        return state
+                    if time.time() >= deadline:
+                        break
+        except requests.RequestException as e:
+            if not connected_once:
+                raise
+            LOG.warning('models/events stream dropped (%s); reconnecting', e)
+            # 503 means too many open streams: wait as long as the server asks
+            retry_after = getattr(getattr(e, 'response', None), 'headers', {}).get('Retry-After')
+            time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else 1.0)
+    LOG.error('Timeout while waiting for models to become ready (waited %ds)', timeout)
+    return None
+
+
 def extract_video_id(url: str) -> str:
     """Extract YouTube video id from a URL or return the input if it looks like an id."""
     m = re.search(r'(?:v=|youtu\.be/)([A-Za-z0-9_-]{6,})', url)
     return m.group(1) if m else url
 
 
-def fetch_transcript_local(vid: str) -> Optional[str]:
-    """Try to fetch a transcript using youtube-transcript-api if installed.
+def fetch_segments_local(vid: str) -> Optional[List[dict]]:
+    """Fetch timestamped segments [{text, start, duration}, ...] with youtube-transcript-api.
 
-    Returns the transcript text or None on failure.
+    Returns None if the package is missing or the fetch fails.
     """
     try:
         from youtube_transcript_api import YouTubeTranscriptApi
         LOG.info('Using youtube-transcript-api to fetch transcript for %s', vid)
         raw = YouTubeTranscriptApi.get_transcript(vid)
-        text = ' '.join([t.get('text', '') for t in raw])
-        return text
+        return [{'text': t.get('text', ''), 'start': t.get('start', 0.0), 'duration': t.get('duration', 0.0)} for t in raw]
     except Exception as e:
         LOG.warning('youtube-transcript-api not available or failed: %s', e)
         return None
 
 
+def fetch_transcript_local(vid: str) -> Optional[str]:
+    """Try to fetch a transcript using youtube-transcript-api if installed.
+
+    Returns the transcript text or None on failure.
+    """
+    segments = fetch_segments_local(vid)
+    if segments is None:
+        return None
+    return ' '.join(s['text'] for s in segments)
+
+
 def fetch_transcript_via_backend(fetch_url: str, full_video_url: str, timeout: int = 30) -> Optional[str]:
     """Ask the running backend to fetch the transcript (backend has a /fetch-transcript endpoint).
 
@@ -117,8 +224,12 @@ def fetch_transcript_via_backend(fetch_url: str, full_video_url: str, timeout: i
         return None
 
 
-def prepare_and_save_transcript(transcript: str, out_dir: str, vid: str) -> str:
-    """Perform lightweight cleaning/preparation and save to disk. Returns file path."""
+def prepare_and_save_transcript(transcript: str, out_dir: str, vid: str, segments: Optional[List[dict]] = None) -> str:
+    """Perform lightweight cleaning/preparation and save to disk. Returns file path.
+
+    When timestamped segments are given they are written next to the transcript
+    as `<name>.segments.json` so they can be posted to /save-lecture later.
+    """
     os.makedirs(out_dir, exist_ok=True)
     # Simple normalization
     text = transcript.replace('\r', ' ').replace('\n', ' ').strip()
@@ -127,20 +238,311 @@ def prepare_and_save_transcript(transcript: str, out_dir: str, vid: str) -> str:
     fpath = os.path.join(out_dir, fname)
     with open(fpath, 'w', encoding='utf-8') as f:
         f.write(text)
+    if segments:
+        with open(fpath[:-len('.txt')] + '.segments.json', 'w', encoding='utf-8') as f:
+            json.dump(segments, f)
     LOG.info('Prepared transcript saved to %s', fpath)
     return fpath
 
 
+# ---------------------------------------------------------------------------
+# Bulk harvesting
+# ---------------------------------------------------------------------------
+
+def read_video_list(spec: str) -> List[str]:
+    """Read video URLs/ids from a file (one per line, '#' comments allowed) or a comma-separated list."""
+    if os.path.isfile(spec):
+        with open(spec, 'r', encoding='utf-8') as f:
+            items = [ln.split('#', 1)[0].strip() for ln in f]
+    else:
+        items = [x.strip() for x in spec.split(',')]
+    seen = set()
+    out = []
+    for item in items:
+        if not item:
+            continue
+        vid = extract_video_id(item)
+        if vid not in seen:
+            seen.add(vid)
+            out.append(vid)
+    return out
+
+
+class HostRateLimiter:
+    """Token bucket per host: at most `rate` requests/second with bursts of `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, List[float]] = {}
+
+    def acquire(self, host: str):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (float(self.burst), now))
+                tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+                if tokens >= 1.0:
+                    self._buckets[host] = [tokens - 1.0, now]
+                    return
+                self._buckets[host] = [tokens, now]
+                wait = (1.0 - tokens) / self.rate
+            time.sleep(wait)
+
+
+def call_with_retry(fn: Callable, retries: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                    sleep: Callable[[float], None] = time.sleep):
+    """Call fn(), retrying failures with exponential backoff and jitter. Re-raises the last error."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt)) * (0.5 + random.random() / 2)
+            LOG.info('Attempt %d failed (%s); retrying in %.1fs', attempt + 1, e, delay)
+            sleep(delay)
+            attempt += 1
+
+
+class Manifest:
+    """Append-only JSONL log of harvest outcomes so reruns can skip finished videos.
+
+    The last record for a video wins; a 'done' record includes the saved transcript path.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        self.entries[rec['vid']] = rec
+                    except (ValueError, KeyError):
+                        continue  # tolerate a torn last line from an interrupted run
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+
+    def is_done(self, vid: str) -> bool:
+        return self.entries.get(vid, {}).get('status') == 'done'
+
+    def record(self, vid: str, status: str, **info):
+        rec = dict(info, vid=vid, status=status, ts=datetime.utcnow().isoformat() + 'Z')
+        with self._lock:
+            prev = self.entries.get(vid, {})
+            if status == 'posted' and prev.get('status') == 'done':
+                rec = dict(prev, posted=True, ts=rec['ts'])
+            self.entries[vid] = rec
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(rec) + '\n')
+                f.flush()
+
+
+def youtube_segments_provider(vid: str) -> List[dict]:
+    segments = fetch_segments_local(vid)
+    if segments is None:
+        raise RuntimeError('youtube-transcript-api fetch failed for %s' % vid)
+    return segments
+
+
+class HTTPTranscriptProvider:
+    """Fetch segments from `<base_url>/<vid>` returning JSON {"segments": [...]} or {"transcript": "..."}.
+
+    Useful for a local fake provider in tests or a self-hosted transcript cache.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.host = urlparse(self.base_url).netloc
+        self._session = requests.Session()
+
+    def __call__(self, vid: str) -> List[dict]:
+        resp = self._session.get(f'{self.base_url}/{vid}', timeout=self.timeout)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get('segments'):
+            return data['segments']
+        if data.get('transcript'):
+            return [{'text': data['transcript'], 'start': 0.0, 'duration': 0.0}]
+        raise RuntimeError('provider returned no transcript for %s' % vid)
+
+
+class BackendPoster:
+    """Collect harvested lectures and post them to the backend's /save-lectures in batches."""
+
+    def __init__(self, url: str, batch_size: int = 20, timeout: float = 120.0, retries: int = 3):
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._pending: List[dict] = []
+        self.posted = 0
+        self.failed = 0
+
+    def add(self, lecture: dict, manifest: Optional[Manifest] = None):
+        with self._lock:
+            self._pending.append(lecture)
+            batch = None
+            if len(self._pending) >= self.batch_size:
+                batch, self._pending = self._pending, []
+        if batch:
+            self._post(batch, manifest)
+
+    def flush(self, manifest: Optional[Manifest] = None):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._post(batch, manifest)
+
+    def _post(self, batch: List[dict], manifest: Optional[Manifest]):
+        def send():
+            resp = requests.post(self.url, json={'lectures': batch}, timeout=self.timeout)
+            resp.raise_for_status()
+            return resp.json()
+        try:
+            result = call_with_retry(send, retries=self.retries)
+        except Exception as e:
+            LOG.error('Posting batch of %d lectures failed: %s', len(batch), e)
+            with self._lock:
+                self.failed += len(batch)
+            return
+        with self._lock:
+            self.posted += len(batch)
+        LOG.info('Posted %d lectures to backend (ids=%s)', len(batch), result.get('lecture_ids'))
+        if manifest is not None:
+            for lec in batch:
+                manifest.record(lec['vid'], 'posted')
+
+
+def _lecture_from_files(vid: str, path: str) -> Optional[dict]:
+    """Rebuild a post payload from a previous run's saved transcript (and segments sidecar)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            transcript = f.read()
+    except OSError:
+        return None
+    segments = None
+    seg_path = path[:-len('.txt')] + '.segments.json'
+    if os.path.exists(seg_path):
+        with open(seg_path, 'r', encoding='utf-8') as f:
+            segments = json.load(f)
+    return {'vid': vid, 'title': vid, 'video_url': f'https://www.youtube.com/watch?v={vid}',
+            'transcript': transcript, 'segments': segments}
+
+
+def harvest(video_ids: List[str], provider: Callable[[str], List[dict]], out_dir: str, manifest: Manifest,
+            workers: int = 4, limiter: Optional[HostRateLimiter] = None, host: str = 'www.youtube.com',
+            retries: int = 3, base_delay: float = 1.0, poster: Optional[BackendPoster] = None) -> dict:
+    """Fetch transcripts for many videos through a bounded thread pool.
+
+    Videos already marked done in the manifest are skipped (and re-posted if a
+    poster is given and they were never posted). Returns counts by outcome.
+    """
+    stats = {'done': 0, 'failed': 0, 'skipped': 0}
+    stats_lock = threading.Lock()
+    todo = []
+    for vid in video_ids:
+        if manifest.is_done(vid):
+            stats['skipped'] += 1
+            entry = manifest.entries[vid]
+            if poster is not None and not entry.get('posted'):
+                lec = _lecture_from_files(vid, entry.get('path', ''))
+                if lec:
+                    poster.add(lec, manifest)
+        else:
+            todo.append(vid)
+    LOG.info('Harvest: %d to fetch, %d already done', len(todo), stats['skipped'])
+
+    def fetch_one(vid: str):
+        def attempt():
+            if limiter is not None:
+                limiter.acquire(host)
+            return provider(vid)
+        try:
+            segments = call_with_retry(attempt, retries=retries, base_delay=base_delay)
+            transcript = ' '.join(str(s.get('text', '')) for s in segments)
+            if not transcript.strip():
+                raise RuntimeError('empty transcript')
+            path = prepare_and_save_transcript(transcript, out_dir, vid, segments=segments)
+        except Exception as e:
+            manifest.record(vid, 'failed', error=str(e))
+            with stats_lock:
+                stats['failed'] += 1
+            return
+        manifest.record(vid, 'done', path=path, segments=len(segments))
+        with stats_lock:
+            stats['done'] += 1
+        if poster is not None:
+            poster.add({'vid': vid, 'title': vid, 'video_url': f'https://www.youtube.com/watch?v={vid}',
+                        'transcript': transcript, 'segments': segments}, manifest)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='harvest') as pool:
+        list(pool.map(fetch_one, todo))
+    if poster is not None:
+        poster.flush(manifest)
+        stats['posted'] = poster.posted
+        stats['post_failed'] = poster.failed
+    return stats
+
+
+def run_bulk(args) -> int:
+    video_ids = []
+    for spec in (args.bulk, args.ids):
+        if spec:
+            video_ids.extend(v for v in read_video_list(spec) if v not in video_ids)
+    if args.provider_url:
+        provider = HTTPTranscriptProvider(args.provider_url)
+        host = provider.host
+    else:
+        provider = youtube_segments_provider
+        host = 'www.youtube.com'
+    manifest = Manifest(args.manifest or os.path.join(args.out_dir, 'manifest.jsonl'))
+    poster = BackendPoster(args.post_url, batch_size=args.post_batch) if args.post_url else None
+    stats = harvest(video_ids, provider, args.out_dir, manifest, workers=args.workers,
+                    limiter=HostRateLimiter(args.rate, burst=args.burst), host=host,
+                    retries=args.retries, poster=poster)
+    LOG.info('Harvest finished: %s', json.dumps(stats))
+    return 0 if stats['failed'] == 0 and stats.get('post_failed', 0) == 0 else 1
+
+
 def main():
     parser = argparse.ArgumentParser(description='Monitor backend logs, wait for HF models, and fetch YouTube transcript')
     parser.add_argument('--log-path', default=os.path.join('backend', 'backend.err'), help='Path to backend error log to tail')
     parser.add_argument('--status-url', default='http://localhost:5000/models/status', help='Backend /models/status URL')
     parser.add_argument('--fetch-url', default='http://localhost:5000/fetch-transcript', help='Backend /fetch-transcript URL')
-    parser.add_argument('--yt', required=True, help='YouTube video URL or video id to fetch transcript for')
+    parser.add_argument('--yt', help='YouTube video URL or video id to fetch transcript for')
+    bulk = parser.add_argument_group('bulk mode')
+    bulk.add_argument('--bulk', help='File with one YouTube URL or id per line (or a comma-separated list)')
+    bulk.add_argument('--ids', help='Comma-separated YouTube URLs or ids')
+    bulk.add_argument('--workers', type=int, default=4, help='Concurrent fetches')
+    bulk.add_argument('--rate', type=float, default=2.0, help='Max requests per second per host (0 = unlimited)')
+    bulk.add_argument('--burst', type=int, default=2, help='Burst size for the per-host rate limit')
+    bulk.add_argument('--retries', type=int, default=3, help='Retries per video with exponential backoff')
+    bulk.add_argument('--manifest', help='Resumable manifest path (default: <out-dir>/manifest.jsonl)')
+    bulk.add_argument('--provider-url', help='Fetch from <url>/<vid> instead of YouTube (e.g. a local fake provider)')
+    bulk.add_argument('--post-url', help='Post results in batches to this /save-lectures URL')
+    bulk.add_argument('--post-batch', type=int, default=20, help='Lectures per /save-lectures request')
+    bulk.add_argument('--wait-models', action='store_true', help='In bulk mode, wait for models before fetching')
     parser.add_argument('--timeout', type=int, default=60*60, help='Max seconds to wait for models to become ready')
     parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds between /models/status polls')
+    parser.add_argument('--events-url', default='http://localhost:5000/models/events',
+                        help="Backend /models/events SSE URL ('' to poll /models/status only)")
     parser.add_argument('--out-dir', default=os.path.join('backend', 'transcripts'), help='Directory to write prepared transcripts')
     args = parser.parse_args()
+    if not (args.yt or args.bulk or args.ids):
+        parser.error('one of --yt, --bulk or --ids is required')
+    if (args.bulk or args.ids) and not args.wait_models:
+        raise SystemExit(run_bulk(args))
 
     stop_event = threading.Event()
     # Simple shared flags updated from the log tail
@@ -163,11 +565,23 @@ def main():
     tail_thread = threading.Thread(target=tail_file, args=(args.log_path, stop_event, on_line), daemon=True)
     tail_thread.start()
 
-    # Poll /models/status until both ready or until flags from logs indicate ready
     start = time.time()
     status = None
     try:
-        while True:
+        # Prefer the push stream: one idle connection, readiness seen as soon as it happens
+        ready = False
+        if args.events_url:
+            try:
+                if wait_models_via_events(args.events_url, timeout=args.timeout) is None:
+                    stop_event.set()
+                    return
+                LOG.info('Models are ready per /models/events')
+                ready = True
+            except requests.RequestException as e:
+                LOG.warning('models/events unavailable (%s); falling back to polling %s', e, args.status_url)
+
+        # Poll /models/status until both ready or until flags from logs indicate ready
+        while not ready:
             # First consult log-detected flags — if both True, we can skip polling
             if flags['summarizer_ready'] and flags['generator_ready']:
                 LOG.info('Both models reported ready from log monitoring')
@@ -202,12 +616,15 @@ def main():
 
             time.sleep(args.poll_interval)
 
-        # At this point models are ready (or at least signaled ready): proceed to fetch transcript
+        # At this point models are ready (or at least signaled ready): proceed to fetch transcript(s)
+        if args.bulk or args.ids:
+            raise SystemExit(run_bulk(args))
         vid = extract_video_id(args.yt)
         LOG.info('Fetching transcript for video id=%s', vid)
 
         # Try local youtube-transcript-api first
-        transcript = fetch_transcript_local(vid)
+        segments = fetch_segments_local(vid)
+        transcript = ' '.join(s['text'] for s in segments) if segments else None
         if not transcript:
             # Fallback to backend endpoint which itself may call youtube-transcript-api or return mock
             transcript = fetch_transcript_via_backend(args.fetch_url, args.yt)
@@ -218,7 +635,7 @@ def main():
             return
 
         # Prepare and save transcript
-        out_path = prepare_and_save_transcript(transcript, args.out_dir, vid)
+        out_path = prepare_and_save_transcript(transcript, args.out_dir, vid, segments=segments)
         LOG.info('Transcript preparation completed: %s', out_path)
 
     finally:
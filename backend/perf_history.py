@@ -0,0 +1,97 @@
+"""Benchmark history and regression flags.
+
+Benchmarks append one JSON line per run to a history file:
+
+    {"ts", "commit", "env": {...}, "config": {...},
+     "results": {"<case>": {"p50_ms": .., "p95_ms": .., "rps": ..}, ...}}
+
+`compare()` checks a new run against earlier runs from the same environment
+(same `env` fingerprint: CPU count, machine, Python and library versions),
+so numbers from a laptop never become the baseline for a CI runner. The
+baseline of each case is the median of its last `window` matching runs. A
+case regresses when its p50 latency rose, or its throughput fell, by more
+than `threshold`.
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+LOWER_IS_BETTER = ('p50_ms',)
+HIGHER_IS_BETTER = ('rps',)
+
+
+def _version(module: str) -> Optional[str]:
+    try:
+        return __import__(module).__version__
+    except Exception:
+        return None
+
+
+def fingerprint(**extra) -> dict:
+    """The environment a run's numbers are only comparable within."""
+    out = {'machine': platform.machine(), 'python': platform.python_version(),
+           'cpus': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+           'torch': _version('torch'), 'transformers': _version('transformers')}
+    out.update(extra)
+    return out
+
+
+def git_commit(cwd: Optional[str] = None) -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def load(path: str) -> List[dict]:
+    """Runs in the history file, oldest first (unreadable lines are skipped)."""
+    runs = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return runs
+
+
+def append(path: str, results: Dict[str, dict], env: dict, config: Optional[dict] = None,
+           commit: Optional[str] = None) -> dict:
+    record = {'ts': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'commit': commit,
+              'env': env, 'config': config or {}, 'results': results}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+    return record
+
+
+def compare(results: Dict[str, dict], history: List[dict], env: dict, threshold: float = 0.1,
+            window: int = 5) -> List[dict]:
+    """[{case, metric, baseline, value, change}] for every metric worse than its baseline by over `threshold`."""
+    matching = [run for run in history if run.get('env') == env]
+    flags = []
+    for case, metrics in sorted(results.items()):
+        past = [run['results'][case] for run in matching if case in run.get('results', {})][-window:]
+        if not past:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            values = [p[metric] for p in past if p.get(metric)]
+            if not values or not metrics.get(metric):
+                continue
+            baseline = statistics.median(values)
+            change = metrics[metric] / baseline - 1.0
+            worse = change > threshold if metric in LOWER_IS_BETTER else change < -threshold
+            if worse:
+                flags.append({'case': case, 'metric': metric, 'baseline': round(baseline, 3),
+                              'value': round(metrics[metric], 3), 'change': round(change, 3)})
+    return flags
@@ -0,0 +1,294 @@
+"""On-demand CPU and memory introspection for a running backend.
+
+- `sample_stacks` is a pure-Python sampling profiler. It reads every thread's
+  stack via sys._current_frames() at a fixed interval and returns collapsed
+  stacks ("frame;frame;frame count"), which flamegraph.pl and speedscope load
+  directly.
+- tracemalloc snapshots are kept by id so two of them can be diffed.
+- Memory reporters are named callables, registered by the subsystems that hold
+  large objects (models, DB engine, caches), that estimate their footprint.
+- `SlowRequestProfiler` samples only request threads that have been running
+  longer than a threshold, and keeps the stacks of requests that end up slow.
+
+Nothing here runs until it's called: no hooks or threads exist while disabled.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get('__name__') or os.path.basename(code.co_filename)
+    return '%s:%s' % (module, code.co_name)
+
+
+def _collapse(frame, thread_name: str, max_depth: int = 128) -> str:
+    stack = []
+    while frame is not None and len(stack) < max_depth:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.append(thread_name)
+    return ';'.join(reversed(stack))
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, thread_ids: Optional[Iterable[int]] = None,
+                  include_idle: bool = False) -> Counter:
+    """Sample thread stacks for `seconds`; returns Counter of collapsed stack -> samples.
+
+    The calling thread is never sampled. Threads parked in a wait/select/sleep
+    are skipped unless include_idle is set, so the output shows where CPU goes.
+    """
+    me = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    wanted = set(thread_ids) if thread_ids is not None else None
+    counts: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for tid, frame in sys._current_frames().items():
+            if tid == me or (wanted is not None and tid not in wanted):
+                continue
+            if not include_idle and _is_idle(frame):
+                continue
+            counts[_collapse(frame, names.get(tid, 'thread-%d' % tid))] += 1
+        time.sleep(interval)
+    return counts
+
+
+_IDLE_FUNCS = {'wait', 'select', 'poll', 'accept', 'sleep', '_wait_for_tstate_lock', 'readinto', 'recv_into',
+               'serve_forever'}
+
+
+def _is_idle(frame) -> bool:
+    return frame.f_code.co_name in _IDLE_FUNCS
+
+
+def to_collapsed(counts: Counter) -> str:
+    return ''.join('%s %d\n' % (stack, n) for stack, n in counts.most_common())
+
+
+def top_functions(counts: Counter, limit: int = 20) -> List[dict]:
+    """Self and total sample counts per function."""
+    self_counts: Counter = Counter()
+    total_counts: Counter = Counter()
+    for stack, n in counts.items():
+        frames = stack.split(';')[1:]
+        if not frames:
+            continue
+        self_counts[frames[-1]] += n
+        for f in set(frames):
+            total_counts[f] += n
+    samples = sum(counts.values()) or 1
+    return [{'function': f, 'self': n, 'total': total_counts[f], 'self_pct': round(100.0 * n / samples, 1)}
+            for f, n in self_counts.most_common(limit)]
+
+
+# --- tracemalloc snapshots -------------------------------------------------
+
+_snapshots: 'OrderedDict[int, tuple]' = OrderedDict()
+_snapshot_lock = threading.Lock()
+_snapshot_seq = 0
+MAX_SNAPSHOTS = 8
+
+
+def take_snapshot(label: str = '', nframes: int = 10) -> dict:
+    """Start tracemalloc if needed and keep a snapshot; returns its id and totals."""
+    global _snapshot_seq
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(nframes)
+    snap = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, _THIS_FILE),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    with _snapshot_lock:
+        _snapshot_seq += 1
+        sid = _snapshot_seq
+        _snapshots[sid] = (snap, label, time.time())
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return {'id': sid, 'label': label, 'traced_bytes': current, 'traced_peak_bytes': peak}
+
+
+def list_snapshots() -> List[dict]:
+    with _snapshot_lock:
+        return [{'id': sid, 'label': label, 'taken_at': ts} for sid, (_, label, ts) in _snapshots.items()]
+
+
+def _get_snapshot(sid: int):
+    with _snapshot_lock:
+        if sid not in _snapshots:
+            raise KeyError('unknown snapshot %s' % sid)
+        return _snapshots[sid][0]
+
+
+def snapshot_top(sid: int, limit: int = 20, group_by: str = 'lineno') -> List[dict]:
+    stats = _get_snapshot(sid).statistics(group_by)
+    return [{'where': str(s.traceback), 'size_bytes': s.size, 'count': s.count} for s in stats[:limit]]
+
+
+def snapshot_diff(old_id: int, new_id: int, limit: int = 20, group_by: str = 'lineno') -> List[dict]:
+    stats = _get_snapshot(new_id).compare_to(_get_snapshot(old_id), group_by)
+    return [{'where': str(s.traceback), 'size_bytes': s.size, 'size_diff_bytes': s.size_diff,
+             'count': s.count, 'count_diff': s.count_diff} for s in stats[:limit]]
+
+
+def stop_tracing():
+    with _snapshot_lock:
+        _snapshots.clear()
+    tracemalloc.stop()
+
+
+def traced_bytes_by_package(packages: Iterable[str], sid: Optional[int] = None) -> Dict[str, int]:
+    """Traced bytes per package (matched on the allocating file's path).
+
+    Uses snapshot `sid`, or a fresh one when tracemalloc is running; returns {}
+    when it isn't. Only allocations made since tracing started are counted.
+    """
+    if sid is not None:
+        snap = _get_snapshot(sid)
+    elif tracemalloc.is_tracing():
+        snap = tracemalloc.take_snapshot()
+    else:
+        return {}
+    out = {p: 0 for p in packages}
+    for stat in snap.statistics('filename'):
+        path = stat.traceback[0].filename
+        for p in out:
+            if (os.sep + p + os.sep) in path or path.endswith(os.sep + p + '.py'):
+                out[p] += stat.size
+                break
+    return out
+
+
+# --- memory reporters ------------------------------------------------------
+
+_reporters: Dict[str, Callable[[], dict]] = {}
+
+
+def register_memory_reporter(name: str, fn: Callable[[], dict]):
+    """`fn()` returns a dict with at least 'bytes' (estimated footprint) for `name`."""
+    _reporters[name] = fn
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of this process, or of `pid` (Linux /proc only)."""
+    try:
+        with open('/proc/%s/statm' % ('self' if pid is None else pid)) as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        if pid is not None:
+            return None
+    try:
+        import resource
+        # Peak, not current, RSS; ru_maxrss is KiB on Linux and bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+    except Exception:
+        return None
+
+
+def memory_report() -> dict:
+    components = {}
+    for name, fn in list(_reporters.items()):
+        try:
+            components[name] = fn()
+        except Exception as e:
+            components[name] = {'error': str(e)}
+    attributed = sum(c.get('bytes') or 0 for c in components.values() if isinstance(c, dict))
+    rss = rss_bytes()
+    report = {'rss_bytes': rss, 'attributed_bytes': attributed, 'components': components,
+              'tracemalloc': tracemalloc.is_tracing()}
+    if rss is not None:
+        report['unattributed_bytes'] = max(0, rss - attributed)
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        report['traced_bytes'], report['traced_peak_bytes'] = current, peak
+    return report
+
+
+def torch_module_bytes(module) -> int:
+    """Parameter + buffer bytes of a torch module (0 if it isn't one)."""
+    total = 0
+    for getter in ('parameters', 'buffers'):
+        fn = getattr(module, getter, None)
+        if fn is None:
+            continue
+        for t in fn():
+            total += t.numel() * t.element_size()
+    return total
+
+
+# --- slow request profiling ------------------------------------------------
+
+class SlowRequestProfiler:
+    """Sample request threads once they've run longer than `threshold_ms`.
+
+    Requests register on start and unregister on finish. One sampler thread
+    looks only at requests already past the threshold, so fast requests are
+    never sampled. Profiles of requests that finish slow are kept (last `keep`).
+    """
+
+    def __init__(self, threshold_ms: float, interval: float = 0.01, keep: int = 50):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval
+        self._active: Dict[int, list] = {}
+        self._lock = threading.Lock()
+        self._profiles: deque = deque(maxlen=keep)
+        self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+        self._thread.start()
+
+    def start(self, label: str):
+        with self._lock:
+            self._active[threading.get_ident()] = [time.monotonic(), label, Counter()]
+
+    def finish(self, status: Optional[int] = None) -> Optional[dict]:
+        with self._lock:
+            entry = self._active.pop(threading.get_ident(), None)
+        if entry is None:
+            return None
+        started, label, counts = entry
+        elapsed = time.monotonic() - started
+        if elapsed < self.threshold:
+            return None
+        profile = {'request': label, 'status': status, 'duration_ms': round(elapsed * 1000.0, 1),
+                   'finished_at': time.time(), 'samples': sum(counts.values()),
+                   'top': top_functions(counts, 10), 'collapsed': to_collapsed(counts)}
+        self._profiles.append(profile)
+        return profile
+
+    def profiles(self) -> List[dict]:
+        return list(self._profiles)
+
+    def _run(self):
+        names = {}
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self._lock:
+                slow = {tid: e for tid, e in self._active.items() if now - e[0] >= self.threshold}
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            stacks = []
+            for tid, entry in slow.items():
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                if tid not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stacks.append((tid, entry, _collapse(frame, names.get(tid, 'thread-%d' % tid))))
+            del frames
+            with self._lock:
+                for tid, entry, stack in stacks:
+                    # Skip requests that finished (or were replaced) while we were sampling
+                    if self._active.get(tid) is entry:
+                        entry[2][stack] += 1
@@ -0,0 +1,201 @@
+"""Line-oriented quiz output: prompt, incremental parser and parse metrics.
+
+Asking flan-t5-small for a JSON array rarely yields valid JSON. One stray
+quote, a missing bracket or a cut-off at `max_length` loses the whole
+generation. This module asks for a compact block per question instead:
+
+    Q: What controls the step size of gradient descent?
+    A) The loss  B) The learning rate  C) The batch  D) The epoch
+    ANSWER: B
+
+The markers carry the structure and newlines are optional. T5's tokenizer
+drops them, so blocks often come back on one line. `QuizParser` scans text as
+it arrives and emits each block once its ANSWER letter is seen. A malformed
+or truncated block is counted and skipped, and the questions around it are
+kept. Output that is JSON after all (the old prompt, or a hosted model
+ignoring the format) goes through the same filter: each complete question
+object is kept, even when the array around it is broken.
+
+`QuizStats` counts parse attempts, usable and malformed questions and output
+tokens, giving the parse success rate and the tokens spent per usable
+question.
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+from typing import List, Optional, Tuple
+
+LETTERS = 'ABCD'
+
+_Q_RE = re.compile(r'(?:^|(?<=\s))Q(?:uestion)?\s*\d*\s*:', re.I)
+_BLOCK_RE = re.compile(r'(?:^|(?<=\s))Q(?:uestion)?\s*\d*\s*:(?P<body>.*?)'
+                       r'(?:^|(?<=\s))ANSWER\s*[:=]\s*\(?(?P<answer>[A-D])\b', re.I | re.S)
+_OPTION_RE = re.compile(r'(?:^|(?<=\s))\(?([A-D])\)\s*')
+
+
+def prompt(text: str, count: int = 2) -> str:
+    return (f"Write {count} multiple-choice questions about the text below. Use exactly this format for each "
+            f"question:\nQ: <question>\nA) <option>\nB) <option>\nC) <option>\nD) <option>\nANSWER: <letter>\n\n"
+            f"Text:\n{text}")
+
+
+def json_prompt(text: str, count: int = 2) -> str:
+    return (f"Generate {count} multiple-choice questions (provide options and correct answer index) from the "
+            f"following text:\n\n{text}\n\nOutput as JSON array")
+
+
+def _block(body: str, answer: str) -> Optional[dict]:
+    """{question, options, answerIndex} from the text between 'Q:' and 'ANSWER:', or None if malformed."""
+    parts = _OPTION_RE.split(body)
+    question, letters, options = parts[0].strip(), parts[1::2], [p.strip() for p in parts[2::2]]
+    if not question or len(options) < 2 or ''.join(letters).upper() != LETTERS[:len(options)]:
+        return None
+    if not all(options) or LETTERS.index(answer.upper()) >= len(options):
+        return None
+    return {'question': question, 'options': options, 'answerIndex': LETTERS.index(answer.upper())}
+
+
+def _json_question(obj) -> Optional[dict]:
+    """A question object from JSON output normalized to {question, options, answerIndex}, or None."""
+    if not isinstance(obj, dict):
+        return None
+    question, options = obj.get('question'), obj.get('options')
+    if not isinstance(question, str) or not question.strip() or not isinstance(options, list):
+        return None
+    if len(options) < 2 or not all(isinstance(o, str) and o.strip() for o in options):
+        return None
+    answer = obj.get('answerIndex', obj.get('answer'))
+    if isinstance(answer, str) and len(answer.strip()) == 1 and answer.strip().upper() in LETTERS:
+        answer = LETTERS.index(answer.strip().upper())
+    elif isinstance(answer, str) and answer in options:
+        answer = options.index(answer)
+    if isinstance(answer, bool) or not isinstance(answer, int) or not 0 <= answer < len(options):
+        return None
+    return {'question': question.strip(), 'options': [o.strip() for o in options], 'answerIndex': answer}
+
+
+def _json_questions(text: str) -> Tuple[List[dict], int]:
+    """(questions, malformed) from every complete JSON object in `text`, outermost first."""
+    decoder = json.JSONDecoder()
+    questions, malformed, pos = [], 0, 0
+    while True:
+        pos = text.find('{', pos)
+        if pos == -1:
+            return questions, malformed
+        try:
+            obj, end = decoder.raw_decode(text, pos)
+        except ValueError:
+            pos += 1
+            continue
+        if isinstance(obj, dict) and isinstance(obj.get('questions'), list):
+            obj = obj['questions']  # {"questions": [...]}
+        for item in obj if isinstance(obj, list) else [obj]:
+            q = _json_question(item)
+            if q is None:
+                malformed += 1
+            else:
+                questions.append(q)
+        pos = end
+
+
+class QuizParser:
+    """Incremental parser for the line format (with a JSON fallback at close()).
+
+    feed() returns the questions completed by that chunk. close() flushes the
+    rest and returns what it completed. `questions` holds every usable question
+    so far, `malformed` counts the blocks dropped, and `format` is 'lines',
+    'json' or None when nothing was recognised.
+    """
+
+    def __init__(self):
+        self.questions: List[dict] = []
+        self.malformed = 0
+        self.format: Optional[str] = None
+        self._buf = ''
+        self._pos = 0
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        self._buf += chunk
+        return self._scan(final=False)
+
+    def close(self) -> List[dict]:
+        if self._closed:
+            return []
+        self._closed = True
+        out = self._scan(final=True)
+        rest = self._buf[self._pos:]
+        if _Q_RE.search(rest):
+            self.malformed += 1  # a block cut off before its ANSWER line
+        elif self.format is None and '{' in rest:
+            out, bad = _json_questions(rest)
+            self.questions.extend(out)
+            self.malformed += bad
+            if out or bad:
+                self.format = 'json'
+        self._pos = len(self._buf)
+        return out
+
+    def _scan(self, final: bool) -> List[dict]:
+        out = []
+        for m in _BLOCK_RE.finditer(self._buf, self._pos):
+            if not final and m.end() == len(self._buf):
+                break  # the answer letter may still be the start of a word
+            body = m.group('body')
+            starts = [q.end() for q in _Q_RE.finditer(body)]
+            if starts:
+                # Earlier questions in the span never got an ANSWER line
+                self.malformed += len(starts)
+                body = body[starts[-1]:]
+            self.format = 'lines'
+            q = _block(body, m.group('answer'))
+            if q is None:
+                self.malformed += 1
+            else:
+                out.append(q)
+            self._pos = m.end()
+        self.questions.extend(out)
+        return out
+
+
+def parse(text: str) -> QuizParser:
+    """A closed parser over the whole of `text`."""
+    parser = QuizParser()
+    parser.feed(text)
+    parser.close()
+    return parser
+
+
+class QuizStats:
+    """Thread-safe counters of quiz parse outcomes and the output tokens they cost."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.parsed = 0
+        self.questions = 0
+        self.malformed = 0
+        self.tokens = 0
+        self.formats = {'lines': 0, 'json': 0, 'none': 0}
+
+    def record(self, parser: QuizParser, tokens: int = 0) -> None:
+        with self._lock:
+            self.attempts += 1
+            self.parsed += 1 if parser.questions else 0
+            self.questions += len(parser.questions)
+            self.malformed += parser.malformed
+            self.tokens += tokens
+            self.formats[parser.format or 'none'] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            blocks = self.questions + self.malformed
+            return {'attempts': self.attempts, 'parsed': self.parsed,
+                    'parse_success_rate': round(self.parsed / self.attempts, 4) if self.attempts else None,
+                    'questions': self.questions, 'malformed': self.malformed,
+                    'question_yield': round(self.questions / blocks, 4) if blocks else None,
+                    'output_tokens': self.tokens,
+                    'tokens_per_question': round(self.tokens / self.questions, 1) if self.questions else None,
+                    'formats': dict(self.formats)}
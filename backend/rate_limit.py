@@ -0,0 +1,251 @@
+"""Token-bucket rate limiting for expensive routes.
+
+Each (route, client) pair owns a bucket that holds up to `burst` tokens and
+refills at `rate` tokens per second. A request spends one token or is
+throttled. The client is identified by its API key when the key is one of
+`RATE_LIMIT_API_KEYS`, otherwise by IP address. Unchecked identifiers
+(an unknown key, a user_id) are never used: a client could send a new one
+with every request and always get a full bucket.
+
+Stores:
+  MemoryStore   per-process dict; a lock and a few float ops per check
+  SQLiteStore   one small table shared by every process on the host, so limits
+                hold across pre-forked gunicorn workers
+
+Limits come from `RATE_LIMITS`, e.g. "/summarize=20/60:5,POST /generate-quiz=10/60",
+which reads as `[METHOD ]route=requests/seconds[:burst]`. Burst defaults to
+the request count.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Collection, Dict, NamedTuple, Optional, Tuple
+
+
+class Rule(NamedTuple):
+    limit: int      # requests allowed per `period`
+    period: float   # seconds
+    burst: int      # bucket capacity
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int          # seconds until the bucket is full again
+    retry_after: int    # seconds until the next request would be allowed (0 if allowed)
+
+
+def parse_rules(spec: str) -> Dict[str, Rule]:
+    rules = {}
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        route, _, value = item.partition('=')
+        count, _, rest = value.partition('/')
+        period, _, burst = rest.partition(':')
+        limit = int(count)
+        rules[route.strip()] = Rule(limit, float(period or 60), int(burst) if burst else limit)
+    return rules
+
+
+def _refill(tokens: float, updated: float, now: float, rule: Rule) -> float:
+    return min(float(rule.burst), tokens + max(0.0, now - updated) * rule.rate)
+
+
+def _decide(tokens: float, rule: Rule, cost: float) -> Tuple[bool, float, Decision]:
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    reset = (rule.burst - tokens) / rule.rate
+    retry = 0.0 if allowed else (cost - tokens) / rule.rate
+    return allowed, tokens, Decision(allowed, rule.limit, int(tokens), int(reset + 0.999),
+                                     int(retry + 0.999) if retry else 0)
+
+
+class MemoryStore:
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, list]' = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rule: Rule, cost: float = 1.0, now: Optional[float] = None) -> Decision:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = rule.burst if bucket is None else _refill(bucket[0], bucket[1], now, rule)
+            allowed, tokens, decision = _decide(tokens, rule, cost)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._evict(now)
+                self._buckets[key] = [tokens, now]
+            else:
+                bucket[0], bucket[1] = tokens, now
+                self._buckets.move_to_end(key)
+        return decision
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sys.getsizeof(self._buckets) + sum(
+                sys.getsizeof(k) + sys.getsizeof(b) + sys.getsizeof(b[0]) + sys.getsizeof(b[1])
+                for k, b in self._buckets.items())
+
+    def _evict(self, now: float):
+        # Drop buckets idle long enough to be full again (1 hour covers any sane period);
+        # they'd be recreated identically. Then, if still full, the least recently used one.
+        buckets = self._buckets
+        while buckets:
+            key, (_, ts) = next(iter(buckets.items()))
+            if now - ts <= 3600 and len(buckets) < self.max_keys:
+                break
+            del buckets[key]
+
+
+class SQLiteStore:
+    """Buckets in a SQLite file so every worker process on the host shares them.
+
+    Uses wall-clock time (shared between processes) and one short IMMEDIATE
+    transaction per check. Every `purge_every` seconds a check also deletes
+    buckets idle for `idle` seconds, so the table doesn't grow with every
+    client ever seen.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0, purge_every: float = 300.0, idle: float = 3600.0):
+        self.path = path
+        self.timeout = timeout
+        self.purge_every = purge_every
+        self.idle = idle
+        self._next_purge = time.time() + purge_every
+        self._purge_lock = threading.Lock()
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS rate_buckets '
+                     '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rule: Rule, cost: float = 1.0, now: Optional[float] = None) -> Decision:
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+            tokens = rule.burst if row is None else _refill(row[0], row[1], now, rule)
+            allowed, tokens, decision = _decide(tokens, rule, cost)
+            conn.execute('INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                         'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                         (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if now >= self._next_purge and self._purge_lock.acquire(blocking=False):
+            try:
+                self._next_purge = now + self.purge_every
+                self.purge(self.idle, now)
+            finally:
+                self._purge_lock.release()
+        return decision
+
+    def memory_bytes(self) -> int:
+        return 0  # buckets live in the database file
+
+    def purge(self, older_than: Optional[float] = None, now: Optional[float] = None) -> int:
+        """Delete buckets idle for `older_than` seconds (default `idle`); they'd be full again anyway."""
+        now = time.time() if now is None else now
+        older_than = self.idle if older_than is None else older_than
+        conn = self._conn()
+        return conn.execute('DELETE FROM rate_buckets WHERE updated < ?', (now - older_than,)).rowcount
+
+
+class RateLimiter:
+    def __init__(self, rules: Dict[str, Rule], store=None):
+        self.rules = dict(rules)
+        self.store = store if store is not None else MemoryStore()
+        self._stats = {'checked': 0, 'throttled': 0}
+        self._stats_lock = threading.Lock()
+
+    def rule_for(self, route: str, method: Optional[str] = None) -> Optional[Tuple[str, Rule]]:
+        """(rule name, rule) limiting `route`, or None.
+
+        A rule named "POST /generate-quiz" applies to that method only and wins
+        over a plain "/generate-quiz" rule.
+        """
+        if method:
+            name = '%s %s' % (method, route)
+            rule = self.rules.get(name)
+            if rule is not None:
+                return name, rule
+        rule = self.rules.get(route)
+        return (route, rule) if rule is not None else None
+
+    def check(self, route: str, client: str, method: Optional[str] = None, cost: float = 1.0) -> Optional[Decision]:
+        """Spend tokens for `client` on `route`; None when the route isn't limited (see rule_for)."""
+        found = self.rule_for(route, method)
+        if found is None:
+            return None
+        name, rule = found
+        decision = self.store.take('%s|%s' % (name, client), rule, cost)
+        with self._stats_lock:
+            self._stats['checked'] += 1
+            if not decision.allowed:
+                self._stats['throttled'] += 1
+        return decision
+
+    def memory_bytes(self) -> int:
+        return self.store.memory_bytes()
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return dict(stats, store=type(self.store).__name__,
+                    rules={r: {'limit': v.limit, 'period': v.period, 'burst': v.burst} for r, v in self.rules.items()})
+
+
+def client_key(api_key: Optional[str], remote_addr: Optional[str], forwarded_for: Optional[str] = None,
+               trust_proxy: bool = False, api_keys: Collection[str] = ()) -> str:
+    """Bucket owner: a known API key, else the client IP."""
+    if api_key and api_key in api_keys:
+        return 'key:' + api_key
+    ip = remote_addr or 'unknown'
+    if trust_proxy and forwarded_for:
+        ip = forwarded_for.split(',')[0].strip() or ip
+    return 'ip:' + ip
+
+
+def headers(decision: Decision) -> Dict[str, str]:
+    """IETF RateLimit header fields, plus Retry-After when throttled."""
+    h = {'RateLimit-Limit': str(decision.limit), 'RateLimit-Remaining': str(decision.remaining),
+         'RateLimit-Reset': str(decision.reset)}
+    if not decision.allowed:
+        h['Retry-After'] = str(max(1, decision.retry_after))
+    return h
+
+
+def from_env() -> RateLimiter:
+    rules = parse_rules(os.environ.get(
+        'RATE_LIMITS', 'POST /summarize=30/60:10,POST /generate-quiz=30/60:10,/fetch-transcript=30/60:10,/related=120/60:30,'
+        'POST /ingest-lecture=30/60:10'))
+    if os.environ.get('RATE_LIMIT_STORE', 'memory') == 'sqlite':
+        store = SQLiteStore(os.environ.get('RATE_LIMIT_SQLITE_PATH', 'rate_limits.db'),
+                            purge_every=float(os.environ.get('RATE_LIMIT_PURGE_SECONDS', '300')))
+    else:
+        store = MemoryStore()
+    return RateLimiter(rules, store)
@@ -0,0 +1,108 @@
+"""Compact, array-backed transcript segments with time-range lookup.
+
+YouTube transcripts arrive as a list of {text, start, duration} dicts. They are
+packed into parallel arrays plus one UTF-8 text blob:
+
+  header   b'SEG1', n (uint32), max_duration (float32), blob_len (uint32)
+  starts     float32[n]   segment start, seconds (sorted ascending)
+  durations  float32[n]
+  offsets    uint32[n+1]  byte offsets of each segment's text in the blob
+  blob       UTF-8 text of all segments, concatenated
+
+`SegmentArray.from_bytes` maps the arrays straight onto the stored buffer, and a
+time-range query is two binary searches plus decoding only the matching slice
+of the blob.
+"""
+import struct
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+_MAGIC = b'SEG1'
+_HEADER = struct.Struct('<4sIfI')
+
+
+class SegmentArray:
+    def __init__(self, starts: np.ndarray, durations: np.ndarray, offsets: np.ndarray, blob, max_duration: float):
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+        self.blob = blob
+        self.max_duration = float(max_duration)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_segments(cls, segments: Sequence[dict]) -> 'SegmentArray':
+        """Build from youtube-transcript-api style dicts; segments are sorted by start."""
+        segs = sorted(({'text': str(s.get('text') or ''), 'start': float(s.get('start') or 0.0),
+                        'duration': float(s.get('duration') or 0.0)} for s in segments),
+                      key=lambda s: s['start'])
+        encoded = [s['text'].encode('utf-8') for s in segs]
+        offsets = np.zeros(len(segs) + 1, dtype=np.uint32)
+        if encoded:
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        starts = np.asarray([s['start'] for s in segs], dtype=np.float32)
+        durations = np.asarray([s['duration'] for s in segs], dtype=np.float32)
+        max_dur = float(durations.max()) if len(durations) else 0.0
+        return cls(starts, durations, offsets, b''.join(encoded), max_dur)
+
+    def to_bytes(self) -> bytes:
+        n = len(self.starts)
+        blob = bytes(self.blob)
+        return b''.join([
+            _HEADER.pack(_MAGIC, n, self.max_duration, len(blob)),
+            self.starts.astype('<f4').tobytes(),
+            self.durations.astype('<f4').tobytes(),
+            self.offsets.astype('<u4').tobytes(),
+            blob,
+        ])
+
+    @classmethod
+    def from_bytes(cls, buf) -> 'SegmentArray':
+        """Zero-copy view over a stored buffer."""
+        mv = memoryview(buf)
+        magic, n, max_dur, blob_len = _HEADER.unpack_from(mv, 0)
+        if magic != _MAGIC:
+            raise ValueError('not a segment array')
+        pos = _HEADER.size
+        starts = np.frombuffer(mv, dtype='<f4', count=n, offset=pos)
+        pos += 4 * n
+        durations = np.frombuffer(mv, dtype='<f4', count=n, offset=pos)
+        pos += 4 * n
+        offsets = np.frombuffer(mv, dtype='<u4', count=n + 1, offset=pos)
+        pos += 4 * (n + 1)
+        return cls(starts, durations, offsets, mv[pos:pos + blob_len], max_dur)
+
+    def _text(self, i: int) -> str:
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])]).decode('utf-8')
+
+    def range_indices(self, t_from: float = 0.0, t_to: Optional[float] = None) -> np.ndarray:
+        """Indices of segments overlapping [t_from, t_to).
+
+        Any overlapping segment starts after t_from - max_duration, which bounds
+        the left binary search; the right edge is the first start >= t_to. Only
+        the window in between is checked against segment end times.
+        """
+        n = len(self.starts)
+        hi = n if t_to is None else int(np.searchsorted(self.starts, np.float32(t_to), side='left'))
+        lo = int(np.searchsorted(self.starts, np.float32(t_from - self.max_duration), side='left'))
+        if lo >= hi:
+            return np.zeros(0, dtype=np.int64)
+        starts = self.starts[lo:hi]
+        keep = (starts + self.durations[lo:hi] > t_from) | (starts >= t_from)
+        return lo + np.flatnonzero(keep)
+
+    def slice(self, t_from: float = 0.0, t_to: Optional[float] = None) -> List[dict]:
+        return [{'start': round(float(self.starts[i]), 3), 'duration': round(float(self.durations[i]), 3),
+                 'text': self._text(i)} for i in self.range_indices(t_from, t_to)]
+
+    def text(self) -> str:
+        return ' '.join(self._text(i) for i in range(len(self.starts)))
+
+    @property
+    def end_time(self) -> float:
+        if not len(self.starts):
+            return 0.0
+        return float(np.max(self.starts + self.durations))
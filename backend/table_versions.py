@@ -0,0 +1,34 @@
+"""Cheap change detection for append-mostly tables.
+
+Write paths call `bump(table)` after committing. Caches compare `local(table)`
+to the value they were built from, which catches this process's writes
+immediately. Writes from other workers, or rows a write-behind buffer commits
+later, show up in `max_id(conn, table)`, a single index lookup. Caches poll it
+at most every few seconds.
+"""
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from typing import Dict
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = defaultdict(int)
+
+
+def bump(table: str, n: int = 1) -> int:
+    with _lock:
+        _versions[table] += n
+        return _versions[table]
+
+
+def local(table: str) -> int:
+    with _lock:
+        return _versions[table]
+
+
+def max_id(conn, table: str) -> int:
+    """Largest primary key in `table` (0 when empty). `table` must be a trusted name."""
+    from sqlalchemy import text
+    value = conn.execute(text('SELECT MAX(id) FROM %s' % table)).scalar()
+    return int(value or 0)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Backend modules are imported as top-level modules (e.g. `from models import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,103 @@
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from adaptive import AdaptiveEngine
+from models import Base, Question, QuestionDifficulty, UserAbility
+
+
+def test_estimates_move_with_answers_and_selection_tracks_ability():
+    engine = AdaptiveEngine(recent_window=0)
+    engine.add_questions(list(range(1, 101)), difficulties=np.linspace(-3, 3, 100))
+    engine.record_batch([7] * 5, [50] * 5, [True] * 5)
+    assert engine.ability(7) > 0
+    assert engine.difficulty(50) < np.linspace(-3, 3, 100)[49]
+
+    chosen = engine.select(7, k=3)
+    theta = engine.ability(7)
+    gaps = sorted(abs(engine.difficulty(q) - theta) for q in range(1, 101))
+    assert sorted(abs(engine.difficulty(q) - theta) for q in chosen) == gaps[:3]
+
+
+def test_select_respects_candidates_and_recent_questions():
+    engine = AdaptiveEngine(recent_window=10)
+    engine.add_questions([1, 2, 3, 4])
+    assert set(engine.select(1, k=5, candidates=[2, 3])) == {2, 3}
+    first = engine.select(1, k=2)
+    second = engine.select(1, k=2)
+    assert not set(first) & set(second)
+
+
+def test_checkpoint_round_trip():
+    db = create_engine('sqlite://')
+    Base.metadata.create_all(db)
+    Session = sessionmaker(bind=db)
+    session = Session()
+    session.add_all([Question(question_text='q', options='[]', correct_answer='a') for _ in range(3)])
+    session.commit()
+
+    engine = AdaptiveEngine()
+    engine.load(session)
+    engine.record_batch([1, 1, 2], [1, 2, 3], [True, False, True])
+    assert engine.checkpoint(session) == 5
+    engine.record(1, 1, True)
+    assert engine.checkpoint(session) == 2
+    assert session.query(UserAbility).count() == 2
+    assert session.query(QuestionDifficulty).filter_by(question_id=1).one().answers == 2
+
+    restored = AdaptiveEngine()
+    restored.load(session)
+    assert np.isclose(restored.ability(1), engine.ability(1))
+    assert restored.pending_writes == 0
+
+
+def test_answers_to_unknown_questions_do_not_hide_new_ones():
+    db = create_engine('sqlite://')
+    Base.metadata.create_all(db)
+    session = sessionmaker(bind=db)()
+    session.add_all([Question(question_text='q', options='[]', correct_answer='a') for _ in range(3)])
+    session.commit()
+    engine = AdaptiveEngine()
+    engine.load(session)
+    session.add_all([Question(question_text='q', options='[]', correct_answer='a') for _ in range(2)])
+    session.commit()
+
+    # Questions 4 and 5 aren't synced yet, 10**9 doesn't exist: nothing is registered or recorded
+    assert engine.record_batch([1, 1], [5, 10 ** 9], [True, False]) == 0
+    assert engine.max_question_id == 3 and engine.pending_writes == 0
+    engine.sync_questions(session)
+    assert sorted(engine.questions.index) == [1, 2, 3, 4, 5]
+    assert engine.record_batch([1, 1], [5, 10 ** 9], [True, False]) == 1
+    assert engine.difficulty(10 ** 9) is None
+
+
+def test_checkpoints_from_two_workers_merge(tmp_path):
+    db = create_engine('sqlite:///' + str(tmp_path / 'adaptive.db'))
+    Base.metadata.create_all(db)
+    Session = sessionmaker(bind=db)
+    session = Session()
+    session.add_all([Question(question_text='q', options='[]', correct_answer='a') for _ in range(2)])
+    session.commit()
+    workers = []
+    for _ in range(2):
+        engine = AdaptiveEngine()
+        engine.load(session)
+        workers.append(engine)
+    a, b = workers
+    a.record_batch([1, 1], [1, 2], [True, True])
+    b.record_batch([1, 2], [1, 1], [False, True])
+    assert a.checkpoint(Session()) == 3
+    assert b.checkpoint(Session()) == 3  # same keys: upserted instead of failing on the primary key
+    b.record(1, 2, True)
+    assert b.checkpoint(Session()) == 2 and b.pending_writes == 0
+    counts = dict(session.query(QuestionDifficulty.question_id, QuestionDifficulty.answers))
+    assert counts == {1: 3, 2: 2}
+    assert dict(session.query(UserAbility.user_id, UserAbility.answers)) == {1: 4, 2: 1}
+
+
+def test_memory_bytes_grows_with_the_tables():
+    engine = AdaptiveEngine()
+    empty = engine.memory_bytes()
+    engine.add_questions(list(range(1, 5001)))
+    engine.record_batch([1, 2], [1, 2], [True, False])
+    assert engine.memory_bytes() > empty + 5000 * 8
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Gate, Rejected, parse_deadline
+
+
+def _hold(gate, release, started):
+    with gate.admit():
+        started.set()
+        release.wait(5)
+
+
+def test_queue_full_is_shed_with_429():
+    gate = Gate('summarizer', concurrency=1, max_queue=1)
+    release, started = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold, args=(gate, release, started))
+    holder.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: gate.admit().__exit__(None, None, None))
+    waiter.start()
+    while gate.metrics()['queue_depth'] < 1:
+        time.sleep(0.001)
+
+    with pytest.raises(Rejected) as exc:
+        gate.admit()
+    assert exc.value.status == 429
+    assert exc.value.retry_after >= 1
+
+    release.set()
+    holder.join()
+    waiter.join()
+    m = gate.metrics()
+    assert m['shed_queue_full'] == 1
+    assert m['completed'] == 2
+    assert m['in_flight'] == 0 and m['queue_depth'] == 0
+
+
+def test_deadline_that_cannot_be_met_is_shed_early():
+    gate = Gate('generator', concurrency=1, max_queue=4, service_time=2.0)
+    slot = gate.admit()
+    t = time.monotonic()
+    with pytest.raises(Rejected) as exc:
+        gate.admit(deadline=time.monotonic() + 0.5)
+    assert time.monotonic() - t < 0.1
+    assert exc.value.status == 503
+    assert exc.value.retry_after == 2
+    slot.__exit__(None, None, None)
+    assert gate.metrics()['shed_deadline'] == 1
+
+
+def test_deadline_expires_while_queued():
+    gate = Gate('generator', concurrency=1, max_queue=4)
+    slot = gate.admit()
+    with pytest.raises(Rejected) as exc:
+        gate.admit(deadline=time.monotonic() + 0.05)
+    assert exc.value.reason == 'deadline exceeded while queued'
+    slot.__exit__(None, None, None)
+    m = gate.metrics()
+    assert m['expired_in_queue'] == 1
+    assert m['in_flight'] == 0
+
+
+def test_controller_reports_each_model_and_tracks_service_time():
+    ctl = AdmissionController(concurrency=2, max_queue=1)
+    with ctl.gate('summarizer').admit():
+        time.sleep(0.01)
+    m = ctl.metrics()
+    assert set(m) == {'summarizer'}
+    assert m['summarizer']['concurrency'] == 2
+    assert m['summarizer']['service_time_ms'] >= 10
+
+
+def test_parse_deadline_prefers_header_and_ignores_junk():
+    now = time.monotonic()
+    d = parse_deadline('250', 10_000)
+    assert now + 0.2 < d < now + 1.0
+    assert parse_deadline('junk', None) is None
+    assert parse_deadline(None, None, default_ms=1000) > now
@@ -0,0 +1,155 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import analytics
+import table_versions
+from models import Base, QuizResult
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db = create_engine('sqlite:///' + str(tmp_path / 'analytics.db'))
+    Base.metadata.create_all(db)
+    rows = [
+        # user 1 improves on lecture 10 over two weeks
+        (1, 10, 40, datetime(2024, 1, 1)), (1, 10, 60, datetime(2024, 1, 2)), (1, 10, 80, datetime(2024, 1, 8)),
+        # user 2 is steady on both lectures
+        (2, 10, 70, datetime(2024, 1, 1)), (2, 20, 70, datetime(2024, 1, 8)),
+        # user 3 struggles on lecture 20; one result without a lecture
+        (3, 20, 20, datetime(2024, 1, 9)), (3, None, 30, datetime(2024, 1, 9)),
+    ]
+    with db.begin() as conn:
+        conn.execute(insert(QuizResult), [{'user_id': u, 'lecture_id': lec, 'score': s, 'date': d}
+                                          for u, lec, s, d in rows])
+    yield db
+    db.dispose()
+
+
+def test_user_summary_trend_and_rank(engine):
+    stats = analytics.Analytics(engine)
+    user = stats.user(1)
+    assert user['attempts'] == 3 and user['mean'] == 60.0 and user['best'] == 80 and user['last'] == 80
+    assert user['trend'] == pytest.approx(20.0)
+    # means: user 2 -> 70, user 1 -> 60, user 3 -> 25
+    assert (user['rank'], user['cohort_size'], user['percentile']) == (2, 3, 50.0)
+    assert user['weekly']['weeks'] == ['2024-01-01', '2024-01-08']
+    assert user['weekly']['mastery'] == [50, 80]
+    assert user['weekly']['accuracy'] == [50, 100]
+    assert user['weekly']['engagement'] == [29, 14]  # 2 of 7 days, then 1 of 7
+    assert stats.user(99) is None
+
+
+def test_lecture_difficulty_and_percentiles(engine):
+    stats = analytics.Analytics(engine)
+    lec = stats.lecture(20)
+    assert lec['attempts'] == 2 and lec['learners'] == 2 and lec['mean'] == 45.0
+    assert lec['difficulty'] == 0.55 and lec['pass_rate'] == 0.5
+    assert lec['percentiles']['50'] == 45.0
+    assert [row['lecture_id'] for row in stats.lectures()] == [20, 10]
+    assert [row['lecture_id'] for row in stats.lectures(sort='attempts')] == [10, 20]
+    all_scores = [40, 60, 80, 70, 70, 20, 30]
+    assert stats.percentiles([10, 90])['percentiles'] == {
+        '10': pytest.approx(np.percentile(all_scores, 10)), '90': pytest.approx(np.percentile(all_scores, 90))}
+    assert stats.percentiles([50], user_id=3, lecture_id=20) == {'count': 1, 'percentiles': {'50': 20.0}}
+
+
+def test_histogram_percentiles_match_numpy():
+    rng = np.random.default_rng(0)
+    groups = [rng.integers(0, 101, n) for n in (1, 2, 7, 500)]
+    hist = np.stack([np.bincount(g, minlength=analytics.SCORE_BINS) for g in groups])
+    got = analytics._hist_percentiles(hist, (0, 5, 50, 95, 100))
+    for row, g in zip(got, groups):
+        assert row == pytest.approx(np.percentile(g, (0, 5, 50, 95, 100)))
+
+
+@pytest.mark.parametrize('shuffle_days', [False, True])
+def test_batched_aggregates_match_full_recount(shuffle_days):
+    rng = np.random.default_rng(1)
+    n = 3000
+    cols = {'id': np.arange(1, n + 1), 'user': rng.integers(0, 40, n).astype(np.int32),
+            'lecture': rng.integers(0, 6, n).astype(np.int32), 'score': rng.integers(0, 101, n).astype(np.int32),
+            'day': np.sort(rng.integers(19000, 19100, n)).astype(np.int32)}
+    if shuffle_days:
+        rng.shuffle(cols['day'][n // 2:])
+    cols['day'][::97] = -1  # undated rows
+    agg = analytics.Aggregates()
+    for lo in range(0, n, 700):
+        batch = {k: v[lo:lo + 700] for k, v in cols.items()}
+        if not agg.update(batch):
+            agg.rebuild_engagement({k: v[:lo + 700] for k, v in cols.items()})
+    assert (agg.engagement_rebuilds > 0) == shuffle_days
+    snap = analytics.Snapshot(cols, agg)
+    assert snap.cohort_weekly() == analytics.weekly_series(cols['user'], cols['score'], cols['day'])
+    known = cols['user'] != 0
+    users = np.unique(cols['user'][known])
+    assert agg.users.keys.tolist() == users.tolist()
+    for u in users[:5]:
+        mine = cols['user'] == u
+        i = agg.users.find(u)
+        assert agg.users.data['count'][i] == mine.sum()
+        assert agg.users.data['best'][i] == cols['score'][mine].max()
+        assert agg.users.data['last'][i] == cols['score'][mine][-1]
+        assert agg.users.data['last_day'][i] == cols['day'][mine].max()
+
+
+def test_rankings_with_ties_and_filters(engine):
+    stats = analytics.Analytics(engine)
+    assert [(r['rank'], r['user_id']) for r in stats.rankings()['rankings']] == [(1, 2), (2, 1), (3, 3)]
+    assert stats.rankings(min_attempts=2)['cohort_size'] == 3
+    assert stats.rankings(min_attempts=3)['rankings'] == [{'rank': 1, 'user_id': 1, 'mean': 60.0, 'attempts': 3}]
+    by_lecture = stats.rankings(lecture_id=10)['rankings']
+    assert [(r['rank'], r['user_id'], r['mean']) for r in by_lecture] == [(1, 2, 70.0), (2, 1, 60.0)]
+    assert stats.rankings(limit=1, offset=2)['rankings'][0]['user_id'] == 3
+
+
+def test_writes_invalidate_and_load_incrementally(engine):
+    stats = analytics.Analytics(engine, max_staleness=3600)
+    assert stats.user(4) is None
+    session = sessionmaker(bind=engine)()
+    session.add(QuizResult(user_id=4, lecture_id=20, score=100))
+    session.commit()
+    session.close()
+    assert stats.user(4) is None  # not announced yet and within max_staleness
+    table_versions.bump('quiz_results')
+    assert stats.user(4)['attempts'] == 1
+    assert stats.lecture(20)['attempts'] == 3
+    m = stats.metrics()
+    assert (m['full_loads'], m['rows_loaded'], m['rows'], m['last_id']) == (1, 8, 8, 8)
+
+
+def test_table_reset_triggers_full_reload(engine):
+    stats = analytics.Analytics(engine, max_staleness=0)
+    assert stats.user(1)['attempts'] == 3
+    with engine.begin() as conn:
+        conn.exec_driver_sql('DELETE FROM quiz_results')
+        conn.execute(insert(QuizResult), [{'user_id': 1, 'score': 10}])
+    assert stats.user(1)['attempts'] == 1
+    assert stats.metrics()['full_loads'] == 2
+
+
+def test_weekly_cohort_series(engine):
+    weekly = analytics.Analytics(engine).weekly()
+    assert weekly['weeks'] == ['2024-01-01', '2024-01-08']
+    assert weekly['attempts'] == [3, 4]
+    assert weekly['mastery'] == [57, 50]
+    # week 2: user 1 one day, user 2 one day, user 3 one day -> 3 active days / (3 learners * 7)
+    assert weekly['engagement'] == [21, 14]
+    assert analytics.Analytics(engine).weekly(lecture_id=20)['attempts'] == [2]
+
+
+def test_non_integer_values_read_as_zero(engine):
+    # SQLite stores what the API passed; text ids must not break every analytics read
+    with engine.begin() as conn:
+        conn.execute(insert(QuizResult), [{'user_id': 'abc', 'lecture_id': 'L1', 'score': 'high',
+                                           'date': datetime(2024, 1, 9)},
+                                          {'user_id': '2', 'lecture_id': 20, 'score': 85.0, 'date': datetime(2024, 1, 9)}])
+    with engine.connect() as conn:
+        cols = analytics.load_columns(conn, since_id=7)
+    assert cols['user'].tolist() == [0, 2] and cols['lecture'].tolist() == [0, 20] and cols['score'].tolist() == [0, 85]
+    stats = analytics.Analytics(engine)
+    assert stats.user(2)['attempts'] == 3
+    assert stats.lecture(20) is not None
@@ -0,0 +1,115 @@
+import asyncio
+import importlib
+import sys
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('asgiref')
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    """asgi module with its upstream client swapped for an in-memory fake."""
+    monkeypatch.chdir(tmp_path)  # app.py creates its SQLite file in the working directory
+    monkeypatch.setenv('RATE_LIMIT_ENABLED', '0')
+    for name in ('app', 'asgi'):
+        sys.modules.pop(name, None)
+    asgi = importlib.import_module('asgi')
+    calls = []
+
+    def upstream(request):
+        calls.append(request.url.path)
+        if request.method == 'GET':
+            return httpx.Response(200, json={'segments': [{'text': 'hi', 'start': 1.0, 'duration': 2.0}]})
+        return httpx.Response(200, json=[{'summary_text': 'hosted summary'}])
+
+    asgi.upstream.transcript_url = 'http://transcripts'
+    asgi.upstream.hf_api_key = 'test'
+    asgi.upstream._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    yield asgi, calls
+    for name in ('app', 'asgi'):
+        sys.modules.pop(name, None)
+
+
+def _post(asgi, path, body):
+    async def go():
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.post(path, json=body)
+    return asyncio.run(go())
+
+
+def test_fetch_transcript_is_served_async_from_provider(served):
+    asgi, calls = served
+    resp = _post(asgi, '/fetch-transcript', {'url': 'https://youtu.be/abcdefgh'})
+    assert resp.status_code == 200
+    assert resp.json() == {'transcript': 'hi', 'segments': [{'text': 'hi', 'start': 1.0, 'duration': 2.0}]}
+    assert calls == ['/abcdefgh']
+
+
+def test_summarize_hosted_fallback_goes_through_async_client(served, monkeypatch):
+    asgi, calls = served
+    monkeypatch.setattr(asgi.webapp, '_hf_available', True)
+    monkeypatch.setattr(asgi.webapp, '_HF_INFERENCE_API_KEY', 'test')
+    resp = _post(asgi, '/summarize', {'text': 'Some lecture text.'})
+    body = resp.json()
+    assert {k: body[k] for k in ('summary', 'source')} == {'summary': 'hosted summary', 'source': 'hf-inference'}
+    assert body['routing']['tier'] == 'hf-inference' and body['routing']['reason'] == 'best available'
+    assert calls == ['/models/' + asgi.webapp.SUMMARIZER_MODEL]
+    assert asgi.webapp._get_router('summarizer').metrics()['hf-inference']['chosen'] == 1
+
+
+def test_other_cases_are_delegated_to_flask(served):
+    asgi, calls = served
+    resp = _post(asgi, '/summarize', {'text': 'First sentence. Second sentence. Third.'})
+    assert resp.json()['source'] == 'extractive'
+    assert _post(asgi, '/cognitive-load', {'text': 'a b c'}).json()['chunks'] == ['a b c']
+    assert calls == []
+
+
+def test_generate_quiz_reuses_stored_questions(served, monkeypatch):
+    asgi, calls = served
+    webapp = asgi.webapp
+    monkeypatch.setattr(webapp, '_hf_available', True)
+    monkeypatch.setattr(webapp, '_HF_INFERENCE_API_KEY', 'test')
+    from models import Question
+    transcript = ' '.join('word%d' % (i % 97) for i in range(300))
+    session = webapp.SessionLocal()
+    lec, _ = webapp._add_lecture(session, {'title': 'Lecture', 'transcript': transcript})
+    session.add(Question(lecture_id=lec.id, question_text='Q?', options='["a", "b", "c"]', correct_answer='b'))
+    session.commit()
+    lecture_id = lec.id
+    session.close()
+    body = _post(asgi, '/generate-quiz', {'text': transcript}).json()
+    assert body['source'] == 'stored' and body['lecture_id'] == lecture_id
+    assert body['questions'] == [{'id': 1, 'question': 'Q?', 'options': ['a', 'b', 'c'], 'answerIndex': 1}]
+    assert calls == []
+
+
+def test_hosted_responses_match_flask(served, monkeypatch):
+    asgi, calls = served
+    webapp = asgi.webapp
+    monkeypatch.setattr(webapp, '_hf_available', True)
+    monkeypatch.setattr(webapp, '_HF_INFERENCE_API_KEY', 'test')
+    monkeypatch.setattr(webapp, '_hf_inference_request', lambda *a, **kw: [{'summary_text': 'hosted summary'}])
+    want = webapp.app.test_client().post('/summarize', json={'text': 'Some lecture text.'})
+    got = _post(asgi, '/summarize', {'text': 'Some lecture text.'})
+    assert calls  # served natively, not by the Flask fallback
+
+    def shape(body):
+        return dict(body, routing={k: v for k, v in body['routing'].items() if k not in ('actual_ms', 'predicted_ms')})
+    assert shape(got.json()) == shape(want.get_json())
+    def exposed(headers):
+        return sorted(h.strip() for h in headers['access-control-expose-headers'].split(','))
+    assert exposed(got.headers) == exposed(want.headers)
+    assert 'ETag' in got.headers['access-control-expose-headers']
+
+
+def test_requests_with_a_deadline_are_delegated_to_flask(served, monkeypatch):
+    asgi, calls = served
+    monkeypatch.setattr(asgi.webapp, '_hf_available', True)
+    monkeypatch.setattr(asgi.webapp, '_HF_INFERENCE_API_KEY', 'test')
+    monkeypatch.setattr(asgi.webapp, '_hf_inference_request', lambda *a, **kw: [{'summary_text': 'flask summary'}])
+    body = _post(asgi, '/summarize', {'text': 'Some lecture text.', 'deadline_ms': 5000}).json()
+    assert body['summary'] == 'flask summary' and calls == []
@@ -0,0 +1,40 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from compression import ZLIB_MARKER, compress_text, decompress_text, is_compressed
+from db_init import compress_lecture_text
+from models import Base, Lecture
+
+LONG = 'the derivative measures the rate of change. ' * 50
+
+
+def test_round_trip_and_legacy_values():
+    packed = compress_text(LONG)
+    assert packed.startswith(ZLIB_MARKER) and len(packed) < len(LONG)
+    assert decompress_text(packed) == LONG
+    assert decompress_text(compress_text('short')) == 'short'
+    assert decompress_text('legacy row') == 'legacy row'
+    assert decompress_text(None) is None
+
+
+def test_migration_compresses_legacy_rows(tmp_path):
+    db = create_engine('sqlite:///' + str(tmp_path / 'c.db'))
+    Base.metadata.create_all(db)
+    with db.begin() as conn:
+        conn.execute(text("INSERT INTO lectures (id, title, transcript, summary) VALUES (1, 't', :t, 's')"), {'t': LONG})
+
+    session = sessionmaker(bind=db)()
+    assert session.get(Lecture, 1).transcript == LONG
+    session.close()
+
+    n, before, after = compress_lecture_text(db)
+    assert n == 1 and after < before
+    assert compress_lecture_text(db)[0] == 0
+    with db.connect() as conn:
+        assert is_compressed(conn.execute(text('SELECT transcript FROM lectures')).scalar())
+
+    session = sessionmaker(bind=db)()
+    lec = session.query(Lecture).first()
+    assert 'transcript' not in lec.__dict__
+    assert lec.transcript == LONG and lec.summary == 's'
+    session.close()
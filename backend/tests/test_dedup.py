@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import dedup
+from models import Base, Lecture, LectureBand
+
+
+def _lecture(seed, words=400):
+    rng = np.random.default_rng(seed)
+    vocab = ['w%d' % i for i in range(2000)]
+    return ' '.join(rng.choice(vocab, words))
+
+
+def _mutate(text, rate, seed=0):
+    rng = np.random.default_rng(seed)
+    words = text.split()
+    for i in np.flatnonzero(rng.random(len(words)) < rate):
+        words[i] = 'edit%d' % i
+    return ' '.join(words)
+
+
+@pytest.fixture
+def session(tmp_path):
+    db = create_engine('sqlite:///' + str(tmp_path / 'dedup.db'))
+    Base.metadata.create_all(db)
+    s = sessionmaker(bind=db)()
+    yield s
+    s.close()
+    db.dispose()
+
+
+def test_normalize_drops_caption_noise():
+    assert dedup.normalize('[Music] Hello, World!\n(applause) OK') == ['hello', 'world', 'ok']
+
+
+def test_signature_estimates_jaccard():
+    hasher = dedup.MinHasher(num_perm=256)
+    a = dedup.normalize(_lecture(1))
+    b = dedup.normalize(_mutate(_lecture(1), 0.02))
+    sa, sb = set(dedup.shingle_hashes(a).tolist()), set(dedup.shingle_hashes(b).tolist())
+    jaccard = len(sa & sb) / len(sa | sb)
+    assert dedup.similarity(hasher.signature(a), hasher.signature(b)) == pytest.approx(jaccard, abs=0.08)
+    assert dedup.similarity(hasher.signature(a), hasher.signature(dedup.normalize(_lecture(2)))) < 0.05
+
+
+def test_lsh_params_midpoint_below_threshold():
+    for threshold in (0.5, 0.7, 0.85, 0.95):
+        bands, rows = dedup.lsh_params(threshold, 128)
+        assert bands * rows == 128
+        assert (1.0 / bands) ** (1.0 / rows) <= threshold
+
+
+def test_index_finds_near_duplicates(session):
+    index = dedup.DedupIndex(threshold=0.8)
+    for lid in (1, 2, 3):
+        session.add(Lecture(id=lid, title='t%d' % lid))
+        index.add(session, lid, index.signature(_lecture(lid)))
+    session.commit()
+    copy = '[Music] ' + _mutate(_lecture(2), 0.01).upper()
+    matches = index.query(session, index.signature(copy))
+    assert [m[0] for m in matches] == [2] and matches[0][1] >= 0.8
+    assert index.query(session, index.signature(_mutate(_lecture(2), 0.3))) == []
+    assert index.query(session, index.signature(_lecture(9))) == []
+    assert index.signature('too short to compare') is None
+
+
+def test_reindex_after_threshold_change(session):
+    index = dedup.DedupIndex(threshold=0.9)
+    session.add(Lecture(id=1, title='t'))
+    index.add(session, 1, index.signature(_lecture(1)))
+    session.commit()
+    looser = dedup.DedupIndex(threshold=0.6)
+    near = looser.signature(_mutate(_lecture(1), 0.02))
+    assert looser.query(session, near) == []  # band keys were written for the old layout
+    assert looser.reindex(session) == 1
+    assert session.query(LectureBand).count() == looser.bands
+    assert [m[0] for m in looser.query(session, near)] == [1]
+
+
+def test_ensure_layout_reindexes_only_on_mismatch(session):
+    index = dedup.DedupIndex(threshold=0.9)
+    assert index.ensure_layout(session) == 0 and index.stored_bands(session) is None
+    session.add(Lecture(id=1, title='t'))
+    index.add(session, 1, index.signature(_lecture(1)))
+    session.commit()
+    assert index.ensure_layout(session) == 0 and index.stored_bands(session) == index.bands
+    looser = dedup.DedupIndex(threshold=0.6)
+    assert looser.ensure_layout(session) == 1
+    session.commit()
+    assert looser.stored_bands(session) == looser.bands
+    assert [m[0] for m in looser.query(session, looser.signature(_mutate(_lecture(1), 0.02)))] == [1]
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+
+import numpy as np
+
+from embeddings import EmbeddingIndex, HashingEmbedder, chunk_text
+
+
+def test_chunk_text_respects_limit():
+    chunks = chunk_text('alpha beta gamma delta epsilon zeta', max_chars=13)
+    assert chunks == ['alpha beta', 'gamma delta', 'epsilon zeta']
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    emb = HashingEmbedder(dim=64)
+    a, b = emb.embed(['gradient descent optimizes loss', 'gradient descent optimizes loss'])
+    assert np.allclose(a, b)
+    assert np.isclose(np.linalg.norm(a), 1.0)
+
+
+def test_index_search_and_reopen(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(500, 16)).astype(np.float32)
+    path = str(tmp_path / 'idx')
+    index = EmbeddingIndex(path, dim=16, embedder_name='test')
+    index.add(list(range(1000, 1250)), vecs[:250])
+    index.add(list(range(1250, 1500)), vecs[250:])
+
+    ids, scores = index.search(vecs[[3, 400]], k=3, block_rows=64)
+    assert ids.shape == (2, 3)
+    assert ids[0, 0] == 1003 and ids[1, 0] == 1400
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+    reopened = EmbeddingIndex(path, dim=16, embedder_name='test')
+    assert reopened.count == 500
+    ids2, _ = reopened.search(vecs[[3]], k=1)
+    assert ids2[0, 0] == 1003
+
+
+def test_index_resets_when_embedder_changes(tmp_path):
+    path = str(tmp_path / 'idx')
+    EmbeddingIndex(path, dim=8, embedder_name='a').add([1], np.ones((1, 8)))
+    assert EmbeddingIndex(path, dim=8, embedder_name='b').count == 0
+
+
+def test_reopen_truncates_a_half_written_append(tmp_path):
+    path = str(tmp_path / 'idx')
+    vecs = np.eye(8, dtype=np.float32)
+    EmbeddingIndex(path, dim=8, embedder_name='t').add([1, 2, 3], vecs[:3])
+    with open(path + '.f32', 'ab') as f:  # crash after the vector append, before the ids
+        f.write(vecs[3].tobytes() + b'\0\0')
+    index = EmbeddingIndex(path, dim=8, embedder_name='t')
+    assert index.count == 3 and os.path.getsize(path + '.f32') == 3 * 8 * 4
+    index.add([4], vecs[4:5])
+    ids, _ = index.search(vecs[[4]], k=1)
+    assert ids[0, 0] == 4
+
+
+def test_instances_sharing_a_path_see_each_others_rows(tmp_path):
+    path = str(tmp_path / 'idx')
+    vecs = np.eye(8, dtype=np.float32)
+    first = EmbeddingIndex(path, dim=8, embedder_name='t')
+    second = EmbeddingIndex(path, dim=8, embedder_name='t')
+    first.add([1], vecs[:1])
+    second.add([2], vecs[1:2])
+    assert first.count == second.count == 2
+    assert first.search(vecs[[1]], k=1)[0][0, 0] == 2
+    assert second.search(vecs[[0]], k=1)[0][0, 0] == 1
+    assert os.path.exists(path + '.lock')
+
+
+def _append(path, worker, n):
+    index = EmbeddingIndex(path, dim=8, embedder_name='t')
+    for i in range(n):
+        row_id = worker * 1000 + i
+        index.add([row_id], np.full((1, 8), row_id, dtype=np.float32) + np.arange(8))
+
+
+def test_concurrent_appends_from_processes_stay_aligned(tmp_path):
+    path = str(tmp_path / 'idx')
+    EmbeddingIndex(path, dim=8, embedder_name='t')
+    ctx = multiprocessing.get_context('spawn')
+    procs = [ctx.Process(target=_append, args=(path, w, 50)) for w in range(1, 4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+    index = EmbeddingIndex(path, dim=8, embedder_name='t')
+    assert index.count == 150
+    mat, ids = index._mapped()
+    want = np.asarray(ids, dtype=np.float32)[:, None] + np.arange(8)
+    assert np.allclose(mat, want / np.linalg.norm(want, axis=1, keepdims=True), atol=1e-6)
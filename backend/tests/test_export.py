@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import export
+from models import Base, Lecture, QuizAnswer, QuizResult
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db = create_engine('sqlite:///' + str(tmp_path / 'export.db'))
+    Base.metadata.create_all(db)
+    session = sessionmaker(bind=db)()
+    session.add_all([Lecture(title='L%d' % i, yt_url='u', transcript='word ' * 100, summary='s') for i in range(5)])
+    session.add_all([QuizResult(user_id=1, score=i * 10) for i in range(7)])
+    session.add(QuizAnswer(quiz_result_id=1, question_id=1, answer='a', correct=True))
+    session.commit()
+    session.close()
+    yield db
+    db.dispose()
+
+
+def test_ndjson_in_batches_with_since_id(engine):
+    stats = {}
+    chunks = list(export.export(engine, 'quiz_results', 'ndjson', since_id=2, batch_size=2, stats=stats))
+    assert len(chunks) == 3
+    rows = [json.loads(line) for c in chunks for line in c.decode().splitlines()]
+    assert [r['id'] for r in rows] == [3, 4, 5, 6, 7]
+    assert isinstance(rows[0]['date'], str)
+    assert stats == {'rows': 5, 'last_id': 7}
+
+
+def test_csv_decompresses_lecture_text(engine):
+    data = b''.join(export.export(engine, 'lectures', 'csv', batch_size=2)).decode()
+    rows = list(csv.DictReader(io.StringIO(data)))
+    assert len(rows) == 5
+    assert rows[0]['transcript'].startswith('word word')
+
+
+def test_empty_result_and_bad_input(engine):
+    assert b''.join(export.export(engine, 'quiz_results', 'ndjson', since_id=100)) == b''
+    assert b''.join(export.export(engine, 'quiz_answers', 'csv', since_id=100)).decode().strip() == \
+        'id,quiz_result_id,question_id,answer,correct'
+    with pytest.raises(KeyError):
+        export.export(engine, 'sqlite_master')
+    with pytest.raises(ValueError):
+        export.export(engine, 'lectures', 'xml')
+
+
+def test_parquet_round_trip(engine):
+    pq = pytest.importorskip('pyarrow.parquet')
+    data = b''.join(export.export(engine, 'quiz_answers', 'parquet'))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.column('correct').to_pylist() == [True]
+
+
+def test_cli_incremental_state(engine, tmp_path):
+    out = tmp_path / 'out'
+    db_url = str(engine.url)
+    export.main(['--db', db_url, '--tables', 'quiz_results', '--out-dir', str(out), '--incremental'])
+    assert json.loads((out / 'export_state.json').read_text()) == {'quiz_results': 7}
+    session = sessionmaker(bind=engine)()
+    session.add(QuizResult(user_id=2, score=99))
+    session.commit()
+    session.close()
+    export.main(['--db', db_url, '--tables', 'quiz_results', '--out-dir', str(out), '--incremental'])
+    lines = (out / 'quiz_results.since-7.ndjson').read_text().splitlines()
+    assert [json.loads(line)['score'] for line in lines] == [99]
+
+
+def test_paged_matches_streamed(engine):
+    stats = {}
+    paged = b''.join(export.export(engine, 'quiz_results', 'ndjson', since_id=1, batch_size=2, limit=5,
+                                   stats=stats, paged=True))
+    assert paged == b''.join(export.export(engine, 'quiz_results', 'ndjson', since_id=1, batch_size=2, limit=5))
+    assert stats == {'rows': 5, 'last_id': 6}
+
+
+def test_paged_export_lets_writers_commit_between_batches(engine):
+    from sqlalchemy import text
+    chunks = export.export(engine, 'quiz_results', 'ndjson', batch_size=2, paged=True)
+    first = next(chunks)
+    writer = create_engine(engine.url, connect_args={'timeout': 0.2})
+    with writer.begin() as conn:
+        conn.execute(text('INSERT INTO quiz_results (user_id, score) VALUES (2, 99)'))
+    writer.dispose()
+    rows = [json.loads(line) for c in [first, *chunks] for line in c.decode().splitlines()]
+    assert [r['id'] for r in rows] == list(range(1, 9))
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import extractive
+
+
+def test_split_sentences_windows_unpunctuated_captions():
+    assert extractive.split_sentences('One two. Three four!\nFive?') == ['One two.', 'Three four!', 'Five?']
+    words = ' '.join('w%d' % i for i in range(60))
+    pieces = extractive.split_sentences(words, max_words=40, window=25)
+    assert [len(p.split()) for p in pieces] == [25, 25, 10]
+
+
+def test_similarity_matches_dense_tfidf(monkeypatch):
+    sentences = ['Gradient descent minimizes the loss.', 'The loss measures prediction error.',
+                 'Stochastic gradient descent samples batches.', 'Cats sleep all day.']
+    monkeypatch.setattr(extractive, '_sparse', None)
+    got = extractive.similarity(sentences)
+    # brute force: dense tf-idf over every term
+    rows, cols, values, n_terms, _ = extractive.tfidf_rows(sentences)
+    dense = np.zeros((len(sentences), n_terms))
+    dense[rows, cols] = values
+    want = dense @ dense.T
+    np.fill_diagonal(want, 0.0)
+    assert got == pytest.approx(want)
+    assert np.linalg.norm(dense, axis=1) == pytest.approx(1.0)
+    assert got[0, 2] > got[0, 1] > 0 and got[3].max() == 0
+
+
+def test_textrank_favours_central_sentences():
+    sim = np.array([[0, 1, 1, 1], [1, 0, 0, 0], [1, 0, 0, 0], [1, 0, 0, 0]], dtype=float)
+    scores = extractive.textrank(sim)
+    assert scores.sum() == pytest.approx(1.0)
+    assert scores.argmax() == 0
+    # an isolated sentence still gets the teleport share
+    assert extractive.textrank(np.zeros((3, 3))) == pytest.approx([1 / 3] * 3)
+
+
+def test_summary_keeps_order_and_drops_redundant_sentences():
+    text = ('Neural networks learn weights from training data. '
+            'Cats are popular pets in many homes. '
+            'Training data teaches neural networks their weights. '
+            'Backpropagation computes gradients of the loss for neural networks. '
+            'Gradient descent updates network weights using the loss gradients. '
+            'The weather was pleasant during the lecture today.')
+    summary = extractive.summarize(text, max_sentences=2, min_words=3)
+    picked = extractive.split_sentences(summary)
+    assert len(picked) == 2
+    assert 'Cats' not in summary and 'weather' not in summary
+    # the two near-identical first/third sentences are not both chosen
+    assert not {'Neural networks learn weights from training data.',
+                'Training data teaches neural networks their weights.'} <= set(picked)
+    order = extractive.split_sentences(text)
+    assert sorted(picked, key=order.index) == picked
+    assert extractive.summarize('Short text. Two sentences.') == 'Short text. Two sentences.'
+
+
+def test_large_input_is_bounded_in_time_and_memory():
+    import time
+    import tracemalloc
+    rng = np.random.default_rng(0)
+    words = np.array(['term%d' % i for i in range(3000)])[rng.integers(0, 3000, (20_000, 6))]
+    # ~20k sentences (~700 KB): the full graph would need two 3 GB matrices
+    text = ' '.join(' '.join(row) + '.' for row in words.tolist())
+    t = time.perf_counter()
+    summary = extractive.summarize(text, max_sentences=5)
+    assert time.perf_counter() - t < 3.0
+    assert summary.count('.') == 5
+    tracemalloc.start()
+    extractive.summarize(text, max_sentences=5)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < 200 * 2 ** 20
+
+
+def test_graph_keeps_sentences_closest_to_the_centroid():
+    sentences = ['Gradient descent updates the weights.', 'Gradient descent follows the loss gradient.',
+                 'The loss gradient points uphill.', 'Cats sleep all day.']
+    scores = extractive.centroid_scores(sentences)
+    assert scores.argmin() == 3
+    text = ' '.join(sentences)
+    assert 'Cats' not in extractive.summarize(text, max_sentences=2, max_graph=3)
@@ -0,0 +1,35 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from grading import answer_index, grade, normalize_submission
+
+
+def _q(correct, options=('alpha', 'beta', 'gamma')):
+    return SimpleNamespace(options=json.dumps(list(options)), correct_answer=correct)
+
+
+def test_normalize_accepts_list_and_mapping():
+    assert normalize_submission([{'question_id': '3', 'answer': 'x'}, {'question_id': 4, 'answer_index': 1}]) == [(3, 'x'), (4, 1)]
+    assert normalize_submission({'7': 'y'}) == [(7, 'y')]
+    with pytest.raises(ValueError):
+        normalize_submission([{'answer': 'no id'}])
+
+
+def test_grade_by_text_and_index_and_reports_unknown():
+    questions = {1: _q('beta'), 2: _q('gamma')}
+    results, unknown = grade(questions, [(1, '  BETA '), (2, 0), (9, 'x')])
+    assert [r['correct'] for r in results] == [True, False]
+    assert results[1]['answer'] == 'alpha'
+    assert unknown == [9]
+
+
+def test_out_of_range_index_is_incorrect():
+    results, _ = grade({1: _q('alpha')}, [(1, 5)])
+    assert results[0]['correct'] is False and results[0]['answer'] is None
+
+
+def test_answer_index_is_none_without_a_matching_option():
+    assert answer_index(['alpha', 'Beta '], 'beta') == 1
+    assert answer_index(['alpha', 'beta'], 'delta') is None
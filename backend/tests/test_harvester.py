@@ -0,0 +1,69 @@
+import json
+
+from monitor_and_fetch import HostRateLimiter, Manifest, call_with_retry, harvest, read_video_list
+
+
+class FakeProvider:
+    """Local stand-in for YouTube: fails the first call for ids listed in `flaky`."""
+
+    def __init__(self, flaky=(), missing=()):
+        self.flaky = set(flaky)
+        self.missing = set(missing)
+        self.calls = []
+
+    def __call__(self, vid):
+        self.calls.append(vid)
+        if vid in self.missing:
+            raise RuntimeError('no captions')
+        if vid in self.flaky:
+            self.flaky.discard(vid)
+            raise ConnectionError('transient')
+        return [{'text': f'hello from {vid}', 'start': 0.0, 'duration': 1.5}]
+
+
+def test_read_video_list_dedupes_and_extracts_ids(tmp_path):
+    f = tmp_path / 'videos.txt'
+    f.write_text('https://youtu.be/abcdef1\n# comment\nabcdef1\nhttps://www.youtube.com/watch?v=zzzzzz2\n')
+    assert read_video_list(str(f)) == ['abcdef1', 'zzzzzz2']
+    assert read_video_list('abcdef1, ghijkl3') == ['abcdef1', 'ghijkl3']
+
+
+def test_harvest_retries_records_and_resumes(tmp_path):
+    provider = FakeProvider(flaky={'vid0002'}, missing={'vid0003'})
+    manifest_path = str(tmp_path / 'manifest.jsonl')
+    ids = ['vid0001', 'vid0002', 'vid0003']
+    stats = harvest(ids, provider, str(tmp_path / 'out'), Manifest(manifest_path), workers=3,
+                    retries=2, base_delay=0.001)
+    assert stats == {'done': 2, 'failed': 1, 'skipped': 0}
+    assert provider.calls.count('vid0002') == 2
+
+    done = Manifest(manifest_path).entries['vid0001']
+    with open(done['path'][:-len('.txt')] + '.segments.json') as f:
+        assert json.load(f)[0]['text'] == 'hello from vid0001'
+
+    rerun = FakeProvider()
+    stats = harvest(ids, rerun, str(tmp_path / 'out'), Manifest(manifest_path), retries=0)
+    assert stats['skipped'] == 2 and rerun.calls == ['vid0003']
+
+
+def test_call_with_retry_gives_up():
+    attempts = []
+
+    def boom():
+        attempts.append(1)
+        raise ValueError('nope')
+
+    try:
+        call_with_retry(boom, retries=2, sleep=lambda s: None)
+    except ValueError:
+        pass
+    assert len(attempts) == 3
+
+
+def test_rate_limiter_spaces_requests():
+    import time
+    limiter = HostRateLimiter(rate=50.0, burst=1)
+    t0 = time.monotonic()
+    for _ in range(4):
+        limiter.acquire('example.com')
+    assert time.monotonic() - t0 >= 0.05
@@ -0,0 +1,80 @@
+import gzip
+
+from flask import Flask, Response, jsonify
+
+import http_cache
+import table_versions
+
+
+def _app(**kwargs):
+    app = Flask(__name__)
+    cache = http_cache.ResponseCache(**kwargs)
+    app.after_request(cache.compress)
+    calls = []
+
+    @app.route('/items')
+    @cache.cached('http_cache_items')
+    def items():
+        calls.append(1)
+        return jsonify({'items': ['lecture transcript %d' % i for i in range(200)]})
+
+    @app.route('/stream')
+    def stream():
+        return Response((b'x' * 4096 for _ in range(2)), mimetype='text/plain')
+
+    return app, cache, calls
+
+
+def test_negotiate_follows_q_values():
+    assert http_cache.negotiate(None) is None
+    assert http_cache.negotiate('identity') is None
+    assert http_cache.negotiate('gzip;q=0, deflate') is None
+    assert http_cache.negotiate('deflate, gzip;q=0.5') == 'gzip'
+    assert http_cache.negotiate('*') == ('br' if http_cache._brotli else 'gzip')
+    assert http_cache.negotiate('br;q=0.1, gzip;q=0.9') == 'gzip'
+
+
+def test_etag_304_and_no_rerun_while_unchanged():
+    app, cache, calls = _app()
+    client = app.test_client()
+    first = client.get('/items')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag.startswith('W/') and first.headers['Cache-Control'] == 'no-cache'
+    again = client.get('/items', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    assert client.get('/items').json == first.json
+    assert len(calls) == 1
+    assert cache.metrics()['hits'] == 2 and cache.metrics()['not_modified'] == 1
+
+    table_versions.bump('http_cache_items')
+    refreshed = client.get('/items', headers={'If-None-Match': etag})
+    # Same content after a write: the view reruns but the client still gets a 304
+    assert refreshed.status_code == 304 and len(calls) == 2
+
+
+def test_gzip_above_threshold_only():
+    app, cache, _ = _app()
+    client = app.test_client()
+    resp = client.get('/items', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in resp.headers['Vary']
+    plain = client.get('/items')
+    assert 'Content-Encoding' not in plain.headers
+    assert gzip.decompress(resp.data) == plain.data
+    assert resp.headers['ETag'] == plain.headers['ETag']
+
+    app, _, _ = _app(min_bytes=1 << 20)
+    assert 'Content-Encoding' not in app.test_client().get('/items', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_streamed_responses_are_not_compressed():
+    app, _, _ = _app()
+    resp = app.test_client().get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resp.headers and len(resp.data) == 8192
+
+
+def test_disabled_cache_runs_view_every_time():
+    app, _, calls = _app(enabled=False)
+    client = app.test_client()
+    client.get('/items')
+    client.get('/items')
+    assert len(calls) == 2
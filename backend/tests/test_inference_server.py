@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+
+import pytest
+
+from inference_server import InferenceClient, InferenceError, InferenceTimeout, NotReady, WorkerCrashed
+from thread_budget import ThreadBudget
+
+# generator loads (and fails) first, so it has failed once the summarizer is ready
+MODELS = {'generator': ('text2text-generation', 'broken'), 'summarizer': ('summarization', 'fake')}
+
+
+class _Echo:
+    """Stands in for a pipeline: upper-cases inputs; 'crash' exits, 'sleep' hangs, 'bad' raises."""
+
+    def __call__(self, inputs, **kwargs):
+        for text in inputs:
+            if text == 'crash':
+                os._exit(3)
+            if text == 'sleep':
+                time.sleep(30)
+            if text == 'bad':
+                raise ValueError('bad input')
+        time.sleep(0.05)
+        return [[{'summary_text': text.upper()[:20], 'length': len(text), 'batch': len(inputs),
+                  'max_length': kwargs.get('max_length'), 'threads': os.environ.get('OMP_NUM_THREADS')}]
+                for text in inputs]
+
+
+def fake_loader(task, model_name):
+    if model_name == 'broken':
+        raise RuntimeError('no weights')
+    return _Echo()
+
+
+@pytest.fixture
+def client():
+    events = []
+    c = InferenceClient(workers=1, models=MODELS, loader=fake_loader, max_batch=4, batch_wait_ms=50,
+                        timeout=10, shm_min_bytes=1024, restart_backoff=(0.05, 0.1),
+                        on_event=lambda *e: events.append(e)).start()
+    c.events = events
+    assert c.wait_ready(['summarizer'], timeout=30)
+    yield c
+    c.close()
+
+
+def test_calls_inline_and_through_shared_memory(client):
+    assert client.call('summarizer', 'hello', max_length=10)['summary_text'] == 'HELLO'
+    long_text = 'transcript ' * 10000
+    out = client.call('summarizer', long_text)
+    assert out['length'] == len(long_text) and out['max_length'] is None
+    m = client.metrics()
+    assert (m['calls'], m['shm_payloads'], m['shm_bytes']) == (2, 1, len(long_text))
+    rss = m['workers'][0]['rss_bytes']
+    assert rss is None or rss > 0
+
+
+def test_failed_model_is_not_ready(client):
+    assert not client.ready('generator')
+    assert ('failed', 'generator') in [e[:2] for e in client.events]
+    with pytest.raises(NotReady):
+        client.call('generator', 'x')
+
+
+def test_concurrent_calls_are_batched(client):
+    results = [None] * 4
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, client.call('summarizer', 'q%d' % i)))
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [r['summary_text'] for r in results] == ['Q0', 'Q1', 'Q2', 'Q3']
+    assert client.metrics()['max_batch_seen'] > 1
+
+
+def test_error_fails_only_its_request(client):
+    with pytest.raises(InferenceError, match='bad input'):
+        client.call('summarizer', 'bad')
+    assert client.call('summarizer', 'ok')['summary_text'] == 'OK'
+
+
+def test_crash_fails_pending_calls_and_restarts(client):
+    pid = client.metrics()['workers'][0]['pid']
+    with pytest.raises(WorkerCrashed):
+        client.call('summarizer', 'crash')
+    assert client.wait_ready(['summarizer'], timeout=30)
+    assert client.call('summarizer', 'back')['summary_text'] == 'BACK'
+    m = client.metrics()
+    assert m['crashes'] == 1 and m['restarts'] == 1 and m['workers'][0]['pid'] != pid
+
+
+def test_timeout_kills_a_hung_worker(client):
+    client.hang_timeout = 0.2
+    with pytest.raises(InferenceTimeout):
+        client.call('summarizer', 'sleep', timeout=0.5)
+    assert client.wait_ready(['summarizer'], timeout=30)
+    assert client.call('summarizer', 'alive')['summary_text'] == 'ALIVE'
+
+
+def test_workers_apply_their_thread_budget():
+    budget = ThreadBudget(processes=2, cpus=list(range(8)))
+    c = InferenceClient(workers=2, models=MODELS, loader=fake_loader, thread_budget=budget).start()
+    try:
+        assert c.wait_ready(['summarizer'], timeout=30)
+        assert c.call('summarizer', 'x')['threads'] == '4'
+    finally:
+        c.close()
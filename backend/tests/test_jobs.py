@@ -0,0 +1,70 @@
+import threading
+
+from jobs import JobRegistry
+
+
+def test_same_key_shares_one_job():
+    jobs = JobRegistry(workers=2)
+    release = threading.Event()
+    calls = []
+
+    def work(x):
+        calls.append(x)
+        release.wait(5)
+        return x * 2
+
+    first, created = jobs.submit(work, 21, key='vid')
+    second, joined = jobs.submit(work, 21, key='vid')
+    assert created and not joined and second is first
+    assert not first.wait(0.05)
+    release.set()
+    assert first.wait(5)
+    assert (first.status, first.result, calls) == ('done', 42, [21])
+    # finished jobs no longer absorb new submissions
+    third, created = jobs.submit(work, 1, key='vid')
+    assert created and third is not first and third.wait(5)
+    m = jobs.metrics()
+    assert (m['submitted'], m['deduplicated'], m['done'], m['in_flight']) == (2, 1, 2, 0)
+    jobs.shutdown()
+
+
+def test_failures_are_recorded_and_lookup_by_id():
+    jobs = JobRegistry(workers=1)
+
+    def fail():
+        raise LookupError('no transcript')
+
+    job, _ = jobs.submit(fail)
+    assert job.wait(5)
+    assert jobs.get(job.id) is job and jobs.get('missing') is None
+    out = job.to_dict()
+    assert out['status'] == 'failed' and out['error'] == 'no transcript' and 'elapsed_ms' in out
+    assert isinstance(job.error, LookupError)
+    jobs.shutdown()
+
+
+def test_finished_jobs_are_pruned():
+    jobs = JobRegistry(workers=1, keep=3)
+    done = []
+    for i in range(6):
+        job, _ = jobs.submit(lambda i=i: i)
+        job.wait(5)
+        done.append(job)
+    jobs.submit(lambda: None)[0].wait(5)
+    assert jobs.get(done[0].id) is None
+    assert jobs.get(done[-1].id) is done[-1]
+    assert jobs.metrics()['tracked'] <= 4
+    jobs.shutdown()
+
+
+def test_on_change_sees_every_status():
+    seen = []
+    jobs = JobRegistry(workers=1, on_change=lambda job: seen.append(job.status))
+    job, _ = jobs.submit(lambda: 1)
+    assert job.wait(5)
+    assert seen == ['queued', 'running', 'done']
+    failing = JobRegistry(workers=1, on_change=lambda job: 1 / 0)  # hook errors never fail the job
+    job, _ = failing.submit(lambda: 2)
+    assert job.wait(5) and job.result == 2
+    jobs.shutdown()
+    failing.shutdown()
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine, delete, insert
+
+import analytics
+import leaderboard
+import table_versions
+from models import Base, QuizResult
+
+
+@pytest.fixture
+def engine(tmp_path):
+    db = create_engine('sqlite:///' + str(tmp_path / 'leaderboard.db'))
+    Base.metadata.create_all(db)
+    yield db
+    db.dispose()
+
+
+def _write(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(insert(QuizResult), [{'user_id': u, 'score': s} for u, s in rows])
+    table_versions.bump('quiz_results', len(rows))
+
+
+def test_fenwick_prefix_and_find_match_brute_force():
+    rng = random.Random(0)
+    counts = [rng.randint(0, 3) for _ in range(37)]
+    tree = leaderboard.Fenwick(counts)
+    for _ in range(200):
+        pos, delta = rng.randrange(37), rng.choice([1, -1])
+        if counts[pos] + delta >= 0:
+            counts[pos] += delta
+            tree.add(pos, delta)
+    assert tree.total == sum(counts)
+    assert [tree.prefix(i) for i in range(38)] == [sum(counts[:i]) for i in range(38)]
+    expanded = [pos for pos, c in enumerate(counts) for _ in range(c)]
+    assert [tree.find(k) for k in range(tree.total)] == expanded
+
+
+def test_rank_percentile_and_top_match_analytics(engine):
+    # means: user 2 -> 70 (2 attempts), user 4 -> 70 (1), user 1 -> 60, user 3 -> 25; unknown users skipped
+    _write(engine, [(1, 40), (1, 60), (1, 80), (2, 70), (2, 70), (3, 20), (3, 30), (4, 70), (None, 99), (0, 99)])
+    board = leaderboard.Leaderboard(engine)
+    assert board.user(1) == {'user_id': 1, 'attempts': 3, 'mean': 60.0, 'rank': 3, 'percentile': 37.5,
+                             'cohort_size': 4}
+    assert board.user(99) is None
+    want = analytics.Analytics(engine).rankings(limit=10)
+    assert board.top(limit=10) == want
+    assert [r['user_id'] for r in board.top(limit=2, offset=1)['rankings']] == [4, 1]
+    assert board.top(limit=5, offset=10)['rankings'] == []
+
+
+def test_writes_are_folded_in_incrementally(engine):
+    _write(engine, [(1, 50), (2, 60)])
+    board = leaderboard.Leaderboard(engine, min_attempts=2)
+    assert board.user(1)['rank'] is None and board.top()['cohort_size'] == 0
+    _write(engine, [(1, 90), (2, 60), (3, 100)])
+    assert [(r['user_id'], r['rank']) for r in board.top()['rankings']] == [(1, 1), (2, 2)]
+    assert board.user(3)['rank'] is None
+    _write(engine, [(1, 0)])
+    assert board.user(1) == {'user_id': 1, 'attempts': 3, 'mean': 46.67, 'rank': 2, 'percentile': 25.0,
+                             'cohort_size': 2}
+    assert board.metrics()['rebuilds'] == 1 and board.metrics()['rows_applied'] == 4
+
+
+def test_table_reset_rebuilds(engine):
+    _write(engine, [(1, 50), (2, 60)])
+    board = leaderboard.Leaderboard(engine)
+    assert board.top()['cohort_size'] == 2
+    with engine.begin() as conn:
+        conn.execute(delete(QuizResult))
+    _write(engine, [(5, 10)])
+    assert [r['user_id'] for r in board.top()['rankings']] == [5]
+    assert board.user(1) is None and board.metrics()['rebuilds'] == 2
+
+
+def test_non_integer_user_ids_are_skipped(engine):
+    _write(engine, [(1, 50), ('abc', 90)])
+    board = leaderboard.Leaderboard(engine)
+    assert board.top()['cohort_size'] == 1
+    _write(engine, [('xyz', 70), (2, 'high'), (1, 70.0)])
+    assert [(r['user_id'], r['mean']) for r in board.top()['rankings']] == [(1, 60.0), (2, 0.0)]
+    board._apply('abc', 10)  # rows read by other means are checked too
+    assert board.metrics()['users'] == 2
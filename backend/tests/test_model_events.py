@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from model_events import EventBus, format_sse, stream
+from monitor_and_fetch import iter_sse
+
+
+def _frames(gen, n):
+    return [next(gen) for _ in range(n)]
+
+
+def test_publish_and_replay_since():
+    bus = EventBus(history=4)
+    bus.publish('load-progress', 'summarizer', step=1, steps=2)
+    bus.publish('ready', 'summarizer')
+    assert [e['event'] for e in bus.since(0)] == ['load-progress', 'ready']
+    assert bus.since(2) == []
+    assert bus.models()['summarizer']['state'] == 'ready'
+    with pytest.raises(ValueError):
+        bus.publish('exploded', 'summarizer')
+
+
+def test_since_returns_none_once_history_is_dropped():
+    bus = EventBus(history=2)
+    for _ in range(5):
+        bus.publish('load-progress', 'generator')
+    assert bus.since(1) is None
+    assert [e['id'] for e in bus.since(3)] == [4, 5]
+
+
+def test_stream_sends_snapshot_then_live_events():
+    bus = EventBus()
+    gen = stream(bus, lambda: {'summarizer_ready': False}, heartbeat=0.01)
+    retry, snapshot, heartbeat = _frames(gen, 3)
+    assert retry.startswith('retry:')
+    assert 'event: status' in snapshot
+    assert heartbeat.startswith(':')
+
+    threading.Timer(0.05, bus.publish, args=('ready', 'generator')).start()
+    frame = next(f for f in gen if not f.startswith(':'))
+    msg = next(iter_sse(frame.split('\n')))
+    assert msg['event'] == 'ready'
+    assert msg['data']['model'] == 'generator'
+    assert msg['id'] == '1'
+
+
+def test_stream_replays_from_last_event_id():
+    bus = EventBus()
+    bus.publish('load-progress', 'summarizer')
+    bus.publish('ready', 'summarizer')
+    bus.publish('load-progress', 'generator')
+    gen = stream(bus, lambda: {}, last_event_id='1')
+    frames = _frames(gen, 3)[1:]
+    assert [m['id'] for f in frames for m in iter_sse(f.split('\n'))] == ['2', '3']
+
+
+def test_iter_sse_skips_comments_and_handles_plain_data():
+    text = ': keep-alive\n\n' + format_sse({'a': 1}, event='status', event_id=7) + 'data: hello\n\n'
+    msgs = list(iter_sse(text.split('\n')))
+    assert msgs == [{'event': 'status', 'id': '7', 'data': {'a': 1}},
+                    {'event': 'message', 'id': '7', 'data': 'hello'}]
+
+
+def test_stream_ends_after_max_age():
+    bus = EventBus()
+    frames = list(stream(bus, lambda: {}, heartbeat=0.01, max_age=0.05))
+    assert frames[0].startswith('retry:') and 'event: status' in frames[1]
+    assert all(f.startswith(':') for f in frames[2:])
+
+
+def test_stream_slots_are_capped():
+    bus = EventBus()
+    assert bus.acquire_stream(2) and bus.acquire_stream(2)
+    assert not bus.acquire_stream(2)
+    bus.release_stream()
+    assert bus.acquire_stream(2) and bus.streams == 2
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+import model_snapshots as ms
+
+
+def _fake_snapshot(root, model='org/tiny-bart', revision='0123456789abcdef'):
+    path = os.path.join(str(root), ms.slug(model), revision[:12] + '-float32')
+    os.makedirs(path)
+    files = {}
+    for name, data in (('model.safetensors', b'\0' * 64), ('config.json', b'{}')):
+        with open(os.path.join(path, name), 'wb') as f:
+            f.write(data)
+        files[name] = {'size': len(data), 'sha256': ms._sha256(os.path.join(path, name))}
+    with open(os.path.join(path, ms.MANIFEST), 'w') as f:
+        json.dump({'model': model, 'task': 'summarization', 'revision': revision, 'dtype': 'float32',
+                   'quantize': None, 'files': files}, f)
+    return path
+
+
+def test_slug():
+    assert ms.slug('sshleifer/distilbart-cnn-12-6') == 'sshleifer--distilbart-cnn-12-6'
+
+
+def test_pin_and_find(tmp_path):
+    assert ms.read_lock(str(tmp_path)) == {} and ms.find('org/tiny-bart', str(tmp_path)) is None
+    path = _fake_snapshot(tmp_path)
+    ms.pin(str(tmp_path), 'summarizer', path)
+    lock = ms.read_lock(str(tmp_path))
+    assert lock['summarizer']['path'] == os.path.relpath(path, str(tmp_path))
+    assert lock['summarizer']['revision'] == '0123456789abcdef'
+    assert ms.find('org/tiny-bart', str(tmp_path)) == path
+    assert ms.find('org/other', str(tmp_path)) is None
+
+
+def test_verify_catches_incomplete_snapshots(tmp_path):
+    path = _fake_snapshot(tmp_path)
+    assert ms.verify(path, checksums=True)['model'] == 'org/tiny-bart'
+    with open(os.path.join(path, 'config.json'), 'wb') as f:
+        f.write(b'[]')  # same size, different bytes
+    ms.verify(path)
+    with pytest.raises(ms.SnapshotError):
+        ms.verify(path, checksums=True)
+    os.remove(os.path.join(path, 'model.safetensors'))
+    with pytest.raises(ms.SnapshotError, match='missing'):
+        ms.verify(path)
+    with pytest.raises(ms.SnapshotError):
+        ms.verify(str(tmp_path))
+
+
+def test_required_snapshot_never_falls_back_to_the_hub(tmp_path):
+    with pytest.raises(ms.SnapshotError, match='prepare-models'):
+        ms.load_pipeline('summarization', 'org/tiny-bart', root=str(tmp_path), required=True)
@@ -0,0 +1,36 @@
+import json
+
+import perf_history
+
+ENV = {'cpus': 4, 'torch': '2.1'}
+
+
+def _run(path, p50, rps, env=ENV):
+    perf_history.append(str(path), {'summarize/inline': {'p50_ms': p50, 'p95_ms': p50 * 2, 'rps': rps}}, env)
+
+
+def test_append_and_load(tmp_path):
+    path = tmp_path / 'history.jsonl'
+    _run(path, 10.0, 100.0)
+    with open(path, 'a') as f:
+        f.write('not json\n')
+    _run(path, 11.0, 90.0)
+    runs = perf_history.load(str(path))
+    assert [r['results']['summarize/inline']['p50_ms'] for r in runs] == [10.0, 11.0]
+    assert perf_history.load(str(tmp_path / 'missing.jsonl')) == []
+    assert json.loads(path.read_text().splitlines()[0])['env'] == ENV
+
+
+def test_flags_regressions_against_median_of_matching_runs(tmp_path):
+    path = tmp_path / 'history.jsonl'
+    for p50 in (10.0, 30.0, 11.0, 9.0):
+        _run(path, p50, 100.0)
+    _run(path, 1.0, 1000.0, env={'cpus': 64, 'torch': '2.1'})  # another machine: ignored
+    history = perf_history.load(str(path))
+    ok = {'summarize/inline': {'p50_ms': 11.5, 'rps': 95.0}, 'new-case': {'p50_ms': 5.0, 'rps': 1.0}}
+    assert perf_history.compare(ok, history, ENV, threshold=0.1) == []
+    slow = {'summarize/inline': {'p50_ms': 13.0, 'rps': 80.0}}
+    flags = perf_history.compare(slow, history, ENV, threshold=0.1)
+    assert [(f['metric'], f['baseline']) for f in flags] == [('p50_ms', 10.5), ('rps', 100.0)]
+    assert flags[1]['change'] == -0.2
+    assert perf_history.compare(slow, history, ENV, threshold=0.3) == []
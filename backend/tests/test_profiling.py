@@ -0,0 +1,71 @@
+import threading
+import time
+
+import profiling
+from profiling import (SlowRequestProfiler, memory_report, register_memory_reporter, sample_stacks, snapshot_diff,
+                       stop_tracing, take_snapshot, to_collapsed, top_functions)
+
+
+def _busy_loop(stop):
+    x = 0
+    while not stop.is_set():
+        x += 1
+
+
+def test_sample_stacks_finds_busy_thread():
+    stop = threading.Event()
+    t = threading.Thread(target=_busy_loop, args=(stop,), name='busy')
+    t.start()
+    try:
+        counts = sample_stacks(0.2, interval=0.002)
+    finally:
+        stop.set()
+        t.join()
+    text = to_collapsed(counts)
+    assert any(line.startswith('busy;') and 'test_profiling:_busy_loop' in line for line in text.splitlines())
+    top = {f['function']: f for f in top_functions(counts)}
+    assert sum(f['self'] for name, f in top.items() if 'busy_loop' in name or 'is_set' in name) > 0
+
+
+def test_snapshot_diff_reports_growth():
+    try:
+        before = take_snapshot('before')['id']
+        hold = [bytearray(1024) for _ in range(2000)]
+        after = take_snapshot('after')['id']
+        diff = snapshot_diff(before, after, limit=5)
+        assert diff[0]['size_diff_bytes'] >= 1024 * 2000
+        assert 'test_profiling.py' in diff[0]['where']
+        del hold
+    finally:
+        stop_tracing()
+
+
+def test_memory_report_includes_reporters():
+    register_memory_reporter('test-cache', lambda: {'bytes': 1234})
+    register_memory_reporter('broken', lambda: 1 / 0)
+    try:
+        report = memory_report()
+    finally:
+        profiling._reporters.pop('test-cache')
+        profiling._reporters.pop('broken')
+    assert report['components']['test-cache'] == {'bytes': 1234}
+    assert 'error' in report['components']['broken']
+    assert report['attributed_bytes'] >= 1234
+    assert report['rss_bytes'] is None or report['rss_bytes'] > 0
+
+
+def test_slow_request_profiler_keeps_only_slow_requests():
+    prof = SlowRequestProfiler(threshold_ms=50, interval=0.005)
+    prof.start('GET /fast')
+    assert prof.finish(200) is None
+
+    prof.start('POST /slow')
+    end = time.monotonic() + 0.2
+    while time.monotonic() < end:
+        pass
+    profile = prof.finish(200)
+    assert profile['request'] == 'POST /slow'
+    assert profile['duration_ms'] >= 200
+    assert profile['samples'] > 0
+    assert 'test_slow_request_profiler_keeps_only_slow_requests' in profile['collapsed']
+    assert [p['request'] for p in prof.profiles()] == ['POST /slow']
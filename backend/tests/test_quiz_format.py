@@ -0,0 +1,62 @@
+import quiz_format
+
+LINES = '''Q: What controls the step size of gradient descent?
+A) The loss
+B) The learning rate
+C) The batch
+D) The epoch
+ANSWER: B
+Q: Which set is held out?
+A) Training B) Validation
+ANSWER: B'''
+
+
+def test_parses_blocks_with_or_without_newlines():
+    parser = quiz_format.parse(LINES)
+    assert parser.format == 'lines' and parser.malformed == 0
+    assert parser.questions[0] == {'question': 'What controls the step size of gradient descent?',
+                                   'options': ['The loss', 'The learning rate', 'The batch', 'The epoch'],
+                                   'answerIndex': 1}
+    # T5 output loses its newlines
+    assert quiz_format.parse(' '.join(LINES.split())).questions == parser.questions
+
+
+def test_keeps_well_formed_questions_around_broken_ones():
+    text = ('Q: No answer here A) x B) y '
+            'Q: Good one? A) yes B) no ANSWER: A '
+            'Q: Skips a letter A) x C) y ANSWER: A '
+            'Q: Answer out of range A) x B) y ANSWER: D '
+            'Q: Cut off at max_length A) x B')
+    parser = quiz_format.parse(text)
+    assert parser.questions == [{'question': 'Good one?', 'options': ['yes', 'no'], 'answerIndex': 0}]
+    assert parser.malformed == 4
+
+
+def test_feed_emits_each_question_once_its_answer_arrives():
+    parser = quiz_format.QuizParser()
+    chunks = [LINES[i:i + 7] for i in range(0, len(LINES), 7)]
+    emitted = [len(parser.feed(c)) for c in chunks]
+    assert sum(emitted) == 1  # the last answer letter could still be the start of a word
+    assert len(parser.close()) == 1
+    assert parser.questions == quiz_format.parse(LINES).questions
+
+
+def test_json_output_keeps_each_complete_question_object():
+    text = ('[{"question": "Q1?", "options": ["a", "b"], "answerIndex": 1}, '
+            '{"question": "no options", "answerIndex": 0}, '
+            '{"question": "Q3?", "options": ["a", "b", "c"], "answer": "C"}, '
+            '{"question": "cut off", "opti')
+    parser = quiz_format.parse(text)
+    assert parser.format == 'json' and parser.malformed == 1
+    assert [(q['question'], q['answerIndex']) for q in parser.questions] == [('Q1?', 1), ('Q3?', 2)]
+    assert quiz_format.parse('no structure at all').format is None
+
+
+def test_stats_report_success_rate_and_tokens_per_question():
+    stats = quiz_format.QuizStats()
+    stats.record(quiz_format.parse(LINES), tokens=60)
+    stats.record(quiz_format.parse('gibberish'), tokens=40)
+    m = stats.metrics()
+    assert m['parse_success_rate'] == 0.5 and m['questions'] == 2
+    assert m['tokens_per_question'] == 50.0
+    assert m['formats'] == {'lines': 1, 'json': 0, 'none': 1}
@@ -0,0 +1,96 @@
+import multiprocessing
+
+from rate_limit import MemoryStore, RateLimiter, Rule, SQLiteStore, client_key, headers, parse_rules
+
+
+def test_parse_rules():
+    rules = parse_rules('/summarize=20/60:5, POST /generate-quiz=10/30')
+    assert rules['/summarize'] == Rule(20, 60.0, 5)
+    assert rules['POST /generate-quiz'] == Rule(10, 30.0, 10)
+
+
+def test_bucket_allows_burst_then_refills():
+    store = MemoryStore()
+    rule = Rule(limit=60, period=60, burst=3)
+    allowed = [store.take('k', rule, now=100.0).allowed for _ in range(4)]
+    assert allowed == [True, True, True, False]
+    denied = store.take('k', rule, now=100.0)
+    assert denied.retry_after == 1 and denied.remaining == 0
+    assert store.take('k', rule, now=101.0).allowed
+    assert store.take('other', rule, now=100.0).allowed
+
+
+def test_method_specific_rule_wins_and_unlimited_routes_pass():
+    limiter = RateLimiter(parse_rules('POST /generate-quiz=1/60,/generate-quiz=100/60'))
+    assert limiter.check('/generate-quiz', 'ip:1', method='POST').allowed
+    assert not limiter.check('/generate-quiz', 'ip:1', method='POST').allowed
+    assert limiter.check('/generate-quiz', 'ip:1', method='GET').allowed
+    assert limiter.check('/health', 'ip:1', method='GET') is None
+    assert limiter.metrics()['throttled'] == 1
+
+
+def test_client_key_trusts_only_known_api_keys():
+    assert client_key('abc', '1.2.3.4', api_keys={'abc'}) == 'key:abc'
+    assert client_key('made-up', '1.2.3.4', api_keys={'abc'}) == 'ip:1.2.3.4'
+    assert client_key(None, '10.0.0.1', '5.6.7.8, 10.0.0.1', trust_proxy=True) == 'ip:5.6.7.8'
+    assert client_key(None, '10.0.0.1', '5.6.7.8') == 'ip:10.0.0.1'
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStore(max_keys=3)
+    rule = Rule(limit=1, period=60, burst=1)
+    for key in ('a', 'b', 'c'):
+        store.take(key, rule, now=0.0)
+    store.take('a', rule, now=1.0)  # 'b' is now the least recently used
+    store.take('d', rule, now=2.0)
+    assert list(store._buckets) == ['c', 'a', 'd']
+    assert not store.take('a', rule, now=2.0).allowed  # surviving buckets keep their state
+
+
+def test_headers_on_throttle():
+    store = MemoryStore()
+    rule = Rule(1, 10, 1)
+    store.take('k', rule, now=0.0)
+    h = headers(store.take('k', rule, now=0.0))
+    assert h['RateLimit-Limit'] == '1' and h['RateLimit-Remaining'] == '0'
+    assert h['Retry-After'] == '10'
+
+
+def _spend(path, n, out):
+    store = SQLiteStore(path)
+    rule = Rule(limit=1, period=3600, burst=10)
+    out.put(sum(store.take('shared', rule).allowed for _ in range(n)))
+
+
+def test_sqlite_store_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / 'limits.db')
+    SQLiteStore(path)
+    ctx = multiprocessing.get_context('spawn')
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_spend, args=(path, 8, out)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+    assert sum(out.get(timeout=5) for _ in procs) == 10
+
+
+def test_sqlite_store_purges_idle_buckets(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'limits.db'), purge_every=60, idle=3600)
+    rule = Rule(1, 10, 1)
+    start = store._next_purge
+    store.take('old', rule, now=start - 4000)
+    store.take('recent', rule, now=start - 100)
+    count = lambda: store._conn().execute('SELECT COUNT(*) FROM rate_buckets').fetchone()[0]
+    assert count() == 2
+    store.take('new', rule, now=start)
+    assert count() == 2
+    assert store._next_purge == start + 60
+
+
+def test_memory_store_reports_bucket_bytes():
+    store = MemoryStore()
+    empty = store.memory_bytes()
+    for i in range(100):
+        store.take('k%d' % i, Rule(1, 10, 1), now=0.0)
+    assert store.memory_bytes() > empty + 100 * 100
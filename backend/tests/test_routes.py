@@ -0,0 +1,163 @@
+import importlib
+import json
+import sys
+
+import pytest
+
+
+def _import_app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # app.py creates its SQLite file in the working directory
+    monkeypatch.setenv('RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('ANALYTICS_WARM_ON_START', '0')
+    sys.modules.pop('app', None)
+    return importlib.import_module('app')
+
+
+@pytest.fixture
+def webapp(tmp_path, monkeypatch):
+    """app module on a fresh SQLite database in tmp_path, without rate limits or warm-up threads."""
+    yield _import_app(tmp_path, monkeypatch)
+    sys.modules.pop('app', None)
+
+
+def _questions(webapp, *specs):
+    """Store (correct_answer, options) questions for a new lecture; returns (lecture_id, question ids)."""
+    from models import Lecture, Question
+    session = webapp.SessionLocal()
+    try:
+        lec = Lecture(title='Lecture', transcript='text')
+        session.add(lec)
+        session.flush()
+        qs = [Question(lecture_id=lec.id, question_text='Q%d?' % i, options=json.dumps(options),
+                       correct_answer=correct) for i, (correct, options) in enumerate(specs)]
+        session.add_all(qs)
+        session.commit()
+        return lec.id, [q.id for q in qs]
+    finally:
+        session.close()
+
+
+def test_submit_quiz_grades_and_stores_answers(webapp):
+    from models import QuizAnswer, QuizResult
+    lecture_id, (q1, q2) = _questions(webapp, ('b', ['a', 'b']), ('x', ['x', 'y']))
+    client = webapp.app.test_client()
+    resp = client.post('/submit-quiz', json={'user_id': 7, 'answers': [
+        {'question_id': q1, 'answer': 'B'}, {'question_id': q2, 'answer_index': 1}, {'question_id': 999, 'answer': 'a'}]})
+    body = resp.get_json()
+    assert resp.status_code == 200
+    assert (body['score'], body['correct'], body['total'], body['unknown_question_ids']) == (50, 1, 2, [999])
+    session = webapp.SessionLocal()
+    try:
+        result = session.query(QuizResult).one()
+        assert (result.id, result.user_id, result.lecture_id, result.score) == (body['quiz_result_id'], 7, lecture_id, 50)
+        answers = session.query(QuizAnswer).order_by(QuizAnswer.question_id).all()
+        assert [(a.question_id, a.answer, a.correct) for a in answers] == [(q1, 'B', True), (q2, 'y', False)]
+    finally:
+        session.close()
+
+
+def test_submit_quiz_rejects_bad_input(webapp):
+    from models import QuizResult
+    _, (q1,) = _questions(webapp, ('a', ['a', 'b']))
+    client = webapp.app.test_client()
+    answers = [{'question_id': q1, 'answer': 'a'}]
+    assert client.post('/submit-quiz', json={'user_id': 'abc', 'answers': answers}).status_code == 400
+    assert client.post('/submit-quiz', json={'lecture_id': 'L1', 'answers': answers}).status_code == 400
+    unknown = client.post('/submit-quiz', json={'answers': [{'question_id': 999, 'answer': 'a'}]})
+    assert unknown.status_code == 400 and unknown.get_json()['unknown_question_ids'] == [999]
+    assert client.post('/submit-quiz', json={'answers': []}).status_code == 400
+    session = webapp.SessionLocal()
+    try:
+        assert session.query(QuizResult).count() == 0
+    finally:
+        session.close()
+
+
+def test_stored_question_without_a_matching_option_is_dropped(webapp):
+    from types import SimpleNamespace
+    q = SimpleNamespace(id=1, question_text='Q?', options='["a", "b"]', correct_answer='B')
+    assert webapp._generated_payload(q) == {'id': 1, 'question': 'Q?', 'options': ['a', 'b'], 'answerIndex': 1}
+    assert webapp._generated_payload(SimpleNamespace(id=2, question_text='Q?', options='["a"]', correct_answer='z')) is None
+
+
+def test_save_progress_validates_before_writing(webapp):
+    from models import QuizResult
+    client = webapp.app.test_client()
+    for bad in ({'user_id': 'abc'}, {'lecture_id': 'L1'}, {'mastery': 'high'}, {'answers': [{'question_id': 'q'}]}):
+        assert client.post('/save-progress', json=dict(bad)).status_code == 400
+    assert client.post('/save-progress', json={'user_id': '3', 'lecture_id': 2, 'mastery': 80}).status_code == 200
+    session = webapp.SessionLocal()
+    try:
+        assert [(r.user_id, r.lecture_id, r.score) for r in session.query(QuizResult)] == [(3, 2, 80)]
+    finally:
+        session.close()
+
+
+def _transcript(url, allow_mock=True):
+    text = 'Gradient descent updates the weights. The learning rate sets the step size. Momentum smooths the updates.'
+    return {'transcript': text, 'segments': [{'text': text, 'start': 0.0, 'duration': 5.0}]}
+
+
+def test_ingest_lecture_answers_inline(webapp, monkeypatch):
+    monkeypatch.setattr(webapp, '_fetch_transcript_payload', _transcript)
+    resp = webapp.app.test_client().post('/ingest-lecture', json={'url': 'https://youtu.be/abcdefgh', 'wait_ms': 10000})
+    body = resp.get_json()
+    assert resp.status_code == 200 and body['status'] == 'done'
+    assert body['source'] == 'extractive' and body['lecture_id'] == 1 and body['segments'] == 1
+
+
+def test_ingest_lecture_poll_reaches_another_worker(webapp, monkeypatch):
+    import threading
+    from jobs import JobRegistry
+    release = threading.Event()
+
+    def slow(url, allow_mock=True):
+        release.wait(10)
+        return _transcript(url)
+    monkeypatch.setattr(webapp, '_fetch_transcript_payload', slow)
+    client = webapp.app.test_client()
+    resp = client.post('/ingest-lecture', json={'url': 'https://youtu.be/abcdefgh', 'wait_ms': 0})
+    assert resp.status_code == 202 and resp.headers['Location'] == resp.get_json()['status_url']
+    status_url = resp.get_json()['status_url']
+    assert client.get(status_url).status_code == 202
+    release.set()
+    job = webapp._ingest_jobs.get(resp.get_json()['job_id'])
+    assert job.wait(10)
+    # A worker process that never saw the job answers from the ingest_jobs table
+    monkeypatch.setattr(webapp, '_ingest_jobs', JobRegistry(workers=1, on_change=webapp._store_ingest_job))
+    done = client.get(status_url)
+    assert done.status_code == 200 and done.get_json()['lecture_id'] == 1
+    assert client.get('/ingest-lecture/nope').status_code == 404
+
+
+def test_ingest_lecture_without_transcript_is_422(webapp, monkeypatch):
+    def missing(url, allow_mock=True):
+        raise LookupError('No transcript available for video abcdefgh')
+    monkeypatch.setattr(webapp, '_fetch_transcript_payload', missing)
+    client = webapp.app.test_client()
+    resp = client.post('/ingest-lecture', json={'url': 'https://youtu.be/abcdefgh', 'wait_ms': 10000})
+    assert resp.status_code == 422 and 'No transcript' in resp.get_json()['error']
+    monkeypatch.setattr(webapp, '_ingest_jobs', None)
+    assert client.get('/ingest-lecture/%s' % resp.get_json()['job_id']).status_code == 422
+
+
+def test_process_mode_admits_a_full_batch_per_worker(tmp_path, monkeypatch):
+    monkeypatch.setenv('INFERENCE_MODE', 'process')
+    monkeypatch.setenv('INFERENCE_WORKERS', '2')
+    monkeypatch.setenv('INFERENCE_MAX_BATCH', '4')
+    monkeypatch.delenv('ADMISSION_CONCURRENCY', raising=False)
+    try:
+        module = _import_app(tmp_path, monkeypatch)
+        assert module.ADMISSION_CONCURRENCY == 8
+        assert module._get_admission().gate('summarizer').concurrency == 8
+    finally:
+        sys.modules.pop('app', None)
+
+
+def test_admin_memory_reports_caches(webapp, monkeypatch):
+    monkeypatch.setattr(webapp, 'ADMIN_TOKEN', 'secret')
+    client = webapp.app.test_client()
+    assert client.get('/admin/memory').status_code == 403
+    report = client.get('/admin/memory', headers={'X-Admin-Token': 'secret'}).get_json()
+    caches = report['components']['caches']
+    assert 'error' not in caches and caches['bytes'] == sum(v for k, v in caches.items() if k != 'bytes')
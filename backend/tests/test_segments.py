@@ -0,0 +1,29 @@
+from segments import SegmentArray
+
+SEGMENTS = [
+    {'text': 'intro', 'start': 0.0, 'duration': 4.0},
+    {'text': 'gradient descent', 'start': 4.0, 'duration': 3.5},
+    {'text': 'a long aside', 'start': 7.0, 'duration': 30.0},
+    {'text': 'learning rate', 'start': 12.5, 'duration': 2.0},
+    {'text': 'résumé', 'start': 40.0, 'duration': 1.0},
+]
+
+
+def test_round_trip_preserves_text_and_timing():
+    packed = SegmentArray.from_segments(SEGMENTS).to_bytes()
+    segs = SegmentArray.from_bytes(packed)
+    assert len(segs) == 5
+    assert segs.text() == 'intro gradient descent a long aside learning rate résumé'
+    assert segs.end_time == 41.0
+
+
+def test_time_range_includes_overlapping_long_segments():
+    segs = SegmentArray.from_bytes(SegmentArray.from_segments(SEGMENTS).to_bytes())
+    assert [s['text'] for s in segs.slice(20, 41)] == ['a long aside', 'résumé']
+    assert [s['text'] for s in segs.slice(3, 5)] == ['intro', 'gradient descent']
+    assert segs.slice(100, 200) == []
+
+
+def test_unsorted_input_is_sorted():
+    segs = SegmentArray.from_segments(list(reversed(SEGMENTS)))
+    assert segs.slice(0, 1)[0]['text'] == 'intro'
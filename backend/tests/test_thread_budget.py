@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+
+import pytest
+
+from thread_budget import ThreadBudget, apply_threads, available_cpus
+
+
+def test_splits_cores_between_slots():
+    budget = ThreadBudget(processes=4, concurrency=2, cpus=list(range(16)))
+    assert (budget.intra_op, budget.inter_op, budget.oversubscribed) == (2, 1, False)
+    assert ThreadBudget(processes=3, cpus=list(range(16)), reserve=1).intra_op == 5
+    # never below one thread, even when the slots outnumber the cores
+    tight = ThreadBudget(processes=4, concurrency=2, cpus=[0, 1])
+    assert tight.intra_op == 1 and tight.oversubscribed
+    assert ThreadBudget(processes=2, cpus=list(range(8)), intra_op=3).intra_op == 3
+    with pytest.raises(ValueError):
+        ThreadBudget(processes=0)
+
+
+def test_cpusets_partition_usable_cores():
+    budget = ThreadBudget(processes=3, cpus=list(range(8)), reserve=2, pin=True)
+    assert [budget.cpuset(i) for i in range(3)] == [[0, 1], [2, 3], [4, 5]]
+    assert budget.settings(1) == {'intra_op': 2, 'inter_op': 1, 'cpus': [2, 3]}
+    assert ThreadBudget(processes=3, cpus=list(range(8))).settings(1)['cpus'] is None
+
+
+def test_slot_caps_concurrent_inferences():
+    budget = ThreadBudget(concurrency=2, cpus=[0, 1, 2, 3])
+    peak = []
+
+    def infer():
+        with budget.slot():
+            peak.append(budget.metrics()['active'])
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=infer) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    m = budget.metrics()
+    assert max(peak) == 2 and m['active'] == 0 and m['waited'] >= 3
+
+
+def test_apply_threads_sets_env_and_affinity(monkeypatch):
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        monkeypatch.delenv(name, raising=False)
+    cpus = available_cpus()
+    out = apply_threads(3, cpus=cpus)
+    assert os.environ['OMP_NUM_THREADS'] == '3' and out['intra_op'] == 3
+    if hasattr(os, 'sched_setaffinity'):
+        assert out['pinned'] == cpus
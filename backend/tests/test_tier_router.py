@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from tier_router import TierRouter, parse_budget
+
+
+def _router():
+    return TierRouter('summarizer', {'local': 3000.0, 'hosted': 800.0, 'extractive': 20.0},
+                      concurrency={'local': 1, 'hosted': 2}, alpha=0.5)
+
+
+def test_picks_best_tier_within_budget():
+    router = _router()
+    assert router.choose(['local', 'hosted', 'extractive']).tier == 'local'
+    decision = router.choose(['local', 'hosted', 'extractive'], budget_ms=1000)
+    assert (decision.tier, decision.reason) == ('hosted', 'within budget')
+    assert decision.predicted == {'local': 3000.0, 'hosted': 800.0, 'extractive': 20.0}
+    decision = router.choose(['local', 'hosted'], budget_ms=100)
+    assert (decision.tier, decision.reason) == ('hosted', 'fastest, none within budget')
+    with pytest.raises(ValueError):
+        router.choose([])
+
+
+def test_ewma_and_backlog_drive_predictions():
+    router = _router()
+    with router.track('extractive'):
+        time.sleep(0.02)
+    assert 15 <= router.predict_ms('extractive') < 200
+    # queued calls count as backlog but their wait is not service time
+    with router.track('local', queued=True) as first:
+        time.sleep(0.03)
+        first.begin()
+        assert router.predict_ms('local') == 6000.0  # one call ahead on a single slot
+    assert router.predict_ms('local') < 100
+    with router.track('hosted'), router.track('hosted'):
+        assert router.predict_ms('hosted') == pytest.approx(800.0 * 1.5)
+
+
+def test_shed_calls_do_not_update_estimates():
+    router = _router()
+    with pytest.raises(RuntimeError):
+        with router.track('local', queued=True):
+            raise RuntimeError('queue full')
+    m = router.metrics()['local']
+    assert (m['samples'], m['in_flight'], m['service_ms']) == (0, 0, None)
+
+
+def test_report_counts_budget_hits_and_fallbacks():
+    router = _router()
+    decision = router.choose(['hosted', 'extractive'], budget_ms=1000)
+    report = decision.report('extractive')
+    assert report['tier'] == 'extractive' and report['chosen'] == 'hosted'
+    assert report['predicted_ms'] == 20.0 and report['actual_ms'] < 1000 and report['budget_ms'] == 1000
+    m = router.metrics()
+    assert (m['hosted']['chosen'], m['extractive']['budget_met']) == (1, 1)
+    assert 'chosen' not in router.choose(['extractive']).report()
+
+
+def test_parse_budget():
+    assert parse_budget('250', '900') == 250.0
+    assert parse_budget(None, 900) == 900.0
+    assert parse_budget('x', None) is None
+    assert parse_budget(None, None, default_ms=500) == 500.0
+    assert parse_budget('0', None) is None
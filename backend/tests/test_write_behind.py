@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, QuizResult
+from write_behind import BufferFull, WriteBehindBuffer
+
+
+@pytest.fixture
+def Session(tmp_path):
+    db = create_engine('sqlite:///' + str(tmp_path / 'wb.db'))
+    Base.metadata.create_all(db)
+    yield sessionmaker(bind=db)
+    db.dispose()
+
+
+def test_sync_mode_groups_concurrent_writes(Session):
+    buf = WriteBehindBuffer(Session, QuizResult, durability='sync', max_batch=100, flush_interval=0.05)
+    threads = [threading.Thread(target=buf.submit, args=({'user_id': i, 'score': i},)) for i in range(40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    m = buf.metrics()
+    buf.close()
+    assert m['written'] == 40
+    assert m['batches'] < 40
+    assert Session().query(QuizResult).count() == 40
+
+
+def test_buffered_mode_flushes_on_close(Session):
+    buf = WriteBehindBuffer(Session, QuizResult, durability='buffered', max_batch=1000, flush_interval=60)
+    for i in range(25):
+        buf.submit({'user_id': 1, 'score': i})
+    assert Session().query(QuizResult).count() == 0
+    buf.close()
+    assert Session().query(QuizResult).count() == 25
+
+
+def test_on_commit_reports_batch_sizes(Session):
+    committed = []
+    buf = WriteBehindBuffer(Session, QuizResult, durability='sync', max_batch=10, flush_interval=0.01,
+                            on_commit=committed.append)
+    for i in range(3):
+        buf.submit({'user_id': 1, 'score': i})
+    buf.close()
+    assert sum(committed) == 3
+
+
+def test_full_queue_rejects(Session):
+    buf = WriteBehindBuffer(Session, QuizResult, durability='buffered', max_batch=1000, flush_interval=60, max_queue=2)
+    buf.submit({'score': 1})
+    buf.submit({'score': 2})
+    with pytest.raises(BufferFull):
+        buf.submit({'score': 3})
+    buf.close()
+    assert buf.metrics()['rejected'] == 1
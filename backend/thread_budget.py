@@ -0,0 +1,136 @@
+"""CPU thread budgets for torch inference.
+
+By default every torch call may use one intra-op thread per core. With four
+gunicorn workers, each running a couple of inferences at once, a 16-core
+node ends up with 128 threads competing for 16 cores. Throughput then falls
+below what a single worker achieves.
+
+`ThreadBudget` splits the usable cores between the inference slots that can
+run at the same time: `processes` processes times `concurrency` concurrent
+calls each. Each slot gets `intra_op = cores // slots` threads.
+  - `apply()` sets torch's intra-op and inter-op thread counts, and the
+    OpenMP/MKL/OpenBLAS environment variables for libraries that have not
+    been imported yet. With `pin`, it also restricts the process to its own
+    CPU set (`cpuset(index)`; Linux only).
+  - `slot()` caps concurrent inferences in this process at `concurrency`, so
+    the thread counts stay within the budget.
+
+`benchmarks/bench_threads.py` sweeps process x thread splits to find the best
+one for a model; pass the winner as `intra_op` to override the computed value.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import List, Optional
+
+_THREAD_ENV = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on (its affinity mask where supported)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def apply_threads(intra_op: int, inter_op: int = 1, cpus: Optional[List[int]] = None) -> dict:
+    """Set thread counts (and CPU affinity when `cpus` is given) for this process; returns what took effect."""
+    out = {'intra_op': intra_op, 'inter_op': inter_op, 'torch': False, 'pinned': None}
+    for name in _THREAD_ENV:
+        os.environ[name] = str(intra_op)
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+            out['pinned'] = list(cpus)
+        except OSError:
+            pass
+    try:
+        import torch
+    except Exception:
+        return out
+    torch.set_num_threads(intra_op)
+    try:
+        # Only allowed once, before any inter-op parallel work has started
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError:
+        out['inter_op'] = torch.get_num_interop_threads()
+    out['torch'] = True
+    return out
+
+
+class ThreadBudget:
+    def __init__(self, processes: int = 1, concurrency: int = 1, cpus: Optional[List[int]] = None,
+                 reserve: int = 0, intra_op: int = 0, inter_op: int = 1, pin: bool = False):
+        if processes < 1 or concurrency < 1:
+            raise ValueError('processes and concurrency must be >= 1')
+        self.cpus = list(cpus) if cpus is not None else available_cpus()
+        # Cores kept free for request handling and the database
+        self.usable = self.cpus[:max(1, len(self.cpus) - max(0, reserve))]
+        self.processes = processes
+        self.concurrency = concurrency
+        slots = processes * concurrency
+        self.intra_op = intra_op if intra_op > 0 else max(1, len(self.usable) // slots)
+        self.inter_op = max(1, inter_op)
+        self.pin = pin
+        self._sem = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waits = 0
+        self._applied: Optional[dict] = None
+
+    @property
+    def oversubscribed(self) -> bool:
+        return self.processes * self.concurrency * self.intra_op > len(self.usable)
+
+    def cpuset(self, index: int) -> List[int]:
+        """CPUs for process `index` (0-based): a contiguous share of the usable cores."""
+        share = max(1, len(self.usable) // self.processes)
+        lo = (index % self.processes) * share
+        return self.usable[lo:lo + share] or self.usable
+
+    def settings(self, index: int = 0) -> dict:
+        """Picklable arguments for `apply_threads` in process `index`."""
+        return {'intra_op': self.intra_op, 'inter_op': self.inter_op,
+                'cpus': self.cpuset(index) if self.pin else None}
+
+    def apply(self, index: int = 0) -> dict:
+        """Apply the budget to this process (call before loading models)."""
+        self._applied = apply_threads(**self.settings(index))
+        return self._applied
+
+    def slot(self):
+        """Context manager held around one inference call."""
+        return _Slot(self)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            active, waits = self._active, self._waits
+        return {'cpus': len(self.cpus), 'usable': len(self.usable), 'processes': self.processes,
+                'concurrency': self.concurrency, 'intra_op': self.intra_op, 'inter_op': self.inter_op,
+                'pin': self.pin, 'oversubscribed': self.oversubscribed, 'active': active,
+                'waited': waits, 'applied': self._applied}
+
+
+class _Slot:
+    __slots__ = ('budget',)
+
+    def __init__(self, budget: ThreadBudget):
+        self.budget = budget
+
+    def __enter__(self):
+        b = self.budget
+        if not b._sem.acquire(blocking=False):
+            with b._lock:
+                b._waits += 1
+            b._sem.acquire()
+        with b._lock:
+            b._active += 1
+        return self
+
+    def __exit__(self, *exc):
+        b = self.budget
+        with b._lock:
+            b._active -= 1
+        b._sem.release()
+        return False
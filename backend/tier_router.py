@@ -0,0 +1,168 @@
+"""Latency-budget routing across quality tiers of one task.
+
+A router knows the tiers that can serve a task (e.g. summaries: local model,
+hosted Inference API, extractive), ordered best quality first. For each tier
+it keeps:
+  - an EWMA of the service time of recent calls, starting from a prior
+    until the first call completes, and
+  - the number of calls in flight, including those still waiting for an
+    admission slot.
+A new call is predicted to wait for the backlog ahead of it to drain, then
+take one service time (the same estimate admission control uses):
+
+    predicted = max(0, in_flight - concurrency + 1) / concurrency * service + service
+
+`choose(candidates, budget_ms)` returns the best tier whose prediction fits
+the budget. If none fits, it returns the fastest one. Without a budget it
+returns the best available tier, as before. Each tier's estimate is only
+refreshed by calls that tier serves, so a tier skipped under tight budgets
+keeps its last estimate until an unbudgeted or looser request uses it.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_EWMA_ALPHA = 0.2
+
+
+class _Tier:
+    __slots__ = ('name', 'prior', 'concurrency', 'service', 'samples', 'in_flight', 'chosen', 'met', 'missed')
+
+    def __init__(self, name: str, prior_ms: float, concurrency: Optional[int]):
+        self.name = name
+        self.prior = prior_ms / 1000.0
+        # None = calls never wait for each other (cheap in-process tiers)
+        self.concurrency = concurrency
+        self.service: Optional[float] = None
+        self.samples = 0
+        self.in_flight = 0
+        self.chosen = 0
+        self.met = 0
+        self.missed = 0
+
+    def predict(self) -> float:
+        service = self.service if self.service is not None else self.prior
+        if not self.concurrency:
+            return service
+        ahead = max(0, self.in_flight - self.concurrency + 1)
+        return ahead / self.concurrency * service + service
+
+
+class Call:
+    """One call on a tier. Service time counts from begin() (after any admission wait)."""
+
+    def __init__(self, router: 'TierRouter', tier: str, queued: bool):
+        self.router = router
+        self.tier = tier
+        self.queued = queued
+        self.started: Optional[float] = None
+        self.service_start: Optional[float] = None
+
+    def __enter__(self):
+        with self.router._lock:
+            self.router._tiers[self.tier].in_flight += 1
+        self.started = time.monotonic()
+        if not self.queued:
+            self.service_start = self.started
+        return self
+
+    def begin(self):
+        self.service_start = time.monotonic()
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.monotonic() - (self.service_start or 0.0)
+        with self.router._lock:
+            t = self.router._tiers[self.tier]
+            t.in_flight -= 1
+            # Calls shed before doing any work say nothing about service time
+            if exc_type is None and self.service_start is not None:
+                t.samples += 1
+                t.service = elapsed if t.service is None else t.service + self.router.alpha * (elapsed - t.service)
+        return False
+
+
+class Decision:
+    def __init__(self, router: 'TierRouter', tier: str, budget_ms: Optional[float], predicted: Dict[str, float],
+                 reason: str):
+        self.router = router
+        self.tier = tier
+        self.budget_ms = budget_ms
+        self.predicted = predicted
+        self.reason = reason
+        self.started = time.monotonic()
+
+    def report(self, served_by: Optional[str] = None) -> dict:
+        """Routing details for the response; `served_by` is the tier that actually answered."""
+        served_by = served_by or self.tier
+        actual = (time.monotonic() - self.started) * 1000.0
+        if self.budget_ms is not None:
+            with self.router._lock:
+                t = self.router._tiers[served_by]
+                if actual <= self.budget_ms:
+                    t.met += 1
+                else:
+                    t.missed += 1
+        out = {'tier': served_by, 'predicted_ms': self.predicted.get(served_by), 'actual_ms': round(actual, 1),
+               'budget_ms': self.budget_ms, 'reason': self.reason}
+        if served_by != self.tier:
+            out['chosen'] = self.tier
+        return out
+
+
+class TierRouter:
+    def __init__(self, name: str, prior_ms: Dict[str, float], concurrency: Optional[Dict[str, int]] = None,
+                 alpha: float = DEFAULT_EWMA_ALPHA):
+        concurrency = concurrency or {}
+        self.name = name
+        self.alpha = alpha
+        self._tiers = {tier: _Tier(tier, ms, concurrency.get(tier)) for tier, ms in prior_ms.items()}
+        self._lock = threading.Lock()
+
+    def predict_ms(self, tier: str) -> float:
+        with self._lock:
+            return round(self._tiers[tier].predict() * 1000.0, 1)
+
+    def choose(self, candidates: List[str], budget_ms: Optional[float] = None) -> Decision:
+        """Best-quality candidate predicted to finish within budget_ms (candidates best first)."""
+        if not candidates:
+            raise ValueError('no candidate tiers')
+        with self._lock:
+            predicted = {tier: round(self._tiers[tier].predict() * 1000.0, 1) for tier in candidates}
+            if budget_ms is None:
+                tier, reason = candidates[0], 'best available'
+            else:
+                fits = [tier for tier in candidates if predicted[tier] <= budget_ms]
+                if fits:
+                    tier, reason = fits[0], 'within budget'
+                else:
+                    tier, reason = min(candidates, key=predicted.__getitem__), 'fastest, none within budget'
+            self._tiers[tier].chosen += 1
+        return Decision(self, tier, budget_ms, predicted, reason)
+
+    def track(self, tier: str, queued: bool = False) -> Call:
+        """Context manager around a call on `tier`; with queued=True call .begin() once admitted."""
+        return Call(self, tier, queued)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {t.name: {'service_ms': round(t.service * 1000.0, 1) if t.service is not None else None,
+                             'prior_ms': round(t.prior * 1000.0, 1), 'samples': t.samples,
+                             'in_flight': t.in_flight, 'predicted_ms': round(t.predict() * 1000.0, 1),
+                             'chosen': t.chosen, 'budget_met': t.met, 'budget_missed': t.missed}
+                    for t in self._tiers.values()}
+
+
+def parse_budget(header_value, body_value, default_ms: float = 0.0) -> Optional[float]:
+    """Latency budget in ms (header wins over body); None when neither is a positive number."""
+    for raw in (header_value, body_value):
+        if raw is None or raw == '':
+            continue
+        try:
+            ms = float(raw)
+        except (TypeError, ValueError):
+            continue
+        if ms > 0:
+            return ms
+    return default_ms if default_ms > 0 else None
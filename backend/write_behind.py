@@ -0,0 +1,211 @@
+"""Write-behind buffer with group commit for append-only rows (e.g. QuizResult).
+
+Rows are queued in memory and a single flusher thread inserts them in batched
+transactions, flushing when `max_batch` rows are waiting or `flush_interval`
+seconds after the oldest queued row, whichever comes first.
+
+Durability modes:
+  sync      submit() blocks until the transaction holding the row commits.
+            Concurrent callers share one commit (group commit).
+  buffered  submit() returns once the row is queued. Rows still in memory are
+            lost if the process is killed; close() flushes them on clean shutdown.
+"""
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger('backend')
+
+DURABILITY_MODES = ('sync', 'buffered')
+
+
+class BufferFull(RuntimeError):
+    """Raised when the queue is at capacity; callers should shed load (e.g. HTTP 503)."""
+
+
+class _Pending:
+    __slots__ = ('row', 'done', 'error', 'attempts')
+
+    def __init__(self, row: dict, wait: bool):
+        self.row = row
+        self.done = threading.Event() if wait else None
+        self.error: Optional[BaseException] = None
+        self.attempts = 0
+
+
+class WriteBehindBuffer:
+    def __init__(self, session_factory: Callable, model, durability: str = 'sync', max_batch: int = 500,
+                 flush_interval: float = 0.05, max_queue: int = 100_000, max_retries: int = 3,
+                 on_commit: Optional[Callable[[int], None]] = None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError('durability must be one of %s' % (DURABILITY_MODES,))
+        self.session_factory = session_factory
+        self.model = model
+        self.durability = durability
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        # Called with the batch size after each successful commit (e.g. to invalidate caches)
+        self.on_commit = on_commit
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._oldest = None
+        self._closed = False
+        self._flush_requested = False
+        self._stats = {
+            'enqueued': 0, 'written': 0, 'batches': 0, 'failed_batches': 0, 'dropped': 0, 'rejected': 0,
+            'max_queue_depth': 0, 'last_batch_size': 0, 'last_flush_ms': 0.0, 'flush_ms_total': 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def submit(self, row: dict, timeout: Optional[float] = 30.0):
+        """Queue a row. In sync mode, wait for its commit and re-raise any write error."""
+        pending = _Pending(row, wait=self.durability == 'sync')
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('write-behind buffer is closed')
+            if len(self._queue) >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise BufferFull('write-behind queue full (%d rows)' % self.max_queue)
+            self._queue.append(pending)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._stats['enqueued'] += 1
+            depth = len(self._queue)
+            if depth > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = depth
+            # Wake the flusher to start the interval timer, or to flush a full batch
+            if depth == 1 or depth >= self.max_batch:
+                self._cond.notify()
+        if pending.done is not None:
+            if not pending.done.wait(timeout):
+                raise TimeoutError('write not committed within %.1fs' % timeout)
+            if pending.error is not None:
+                raise pending.error
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Write everything queued so far; returns False if it didn't drain in time."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify()
+            while self._queue and time.monotonic() < deadline:
+                self._cond.wait(0.01)
+            return not self._queue
+
+    def close(self, timeout: float = 30.0):
+        """Flush remaining rows and stop the flusher thread. Safe to call twice."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self._queue:
+            logger.error('write_behind: %d rows not flushed at shutdown', len(self._queue))
+
+    def metrics(self) -> dict:
+        with self._cond:
+            m = dict(self._stats)
+            m['queue_depth'] = len(self._queue)
+        m['durability'] = self.durability
+        m['max_batch'] = self.max_batch
+        m['flush_interval_ms'] = self.flush_interval * 1000.0
+        m['avg_batch_size'] = round(m['written'] / m['batches'], 2) if m['batches'] else 0.0
+        m['last_flush_ms'] = round(m['last_flush_ms'], 3)
+        m['flush_ms_total'] = round(m['flush_ms_total'], 3)
+        return m
+
+    def memory_bytes(self) -> int:
+        """Estimate of the queued rows: each row dict and its values (shallow)."""
+        with self._cond:
+            pending = list(self._queue)
+        return sum(sys.getsizeof(p) + sys.getsizeof(p.row) + sum(sys.getsizeof(v) for v in p.row.values())
+                   for p in pending)
+
+    def _take_batch(self):
+        with self._cond:
+            while True:
+                if self._queue:
+                    due = self._oldest + self.flush_interval
+                    if (len(self._queue) >= self.max_batch or self._closed or self._flush_requested
+                            or time.monotonic() >= due):
+                        break
+                    self._cond.wait(max(0.0, due - time.monotonic()))
+                elif self._closed:
+                    return None
+                else:
+                    self._flush_requested = False
+                    self._cond.wait()
+            n = min(self.max_batch, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(n)]
+            self._oldest = time.monotonic() if self._queue else None
+            if not self._queue:
+                self._flush_requested = False
+            return batch
+
+    def _write(self, batch):
+        from sqlalchemy import insert
+        session = self.session_factory()
+        try:
+            session.execute(insert(self.model), [p.row for p in batch])
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                self._write(batch)
+                error = None
+            except Exception as e:
+                error = e
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            retry = []
+            with self._cond:
+                self._stats['last_flush_ms'] = elapsed_ms
+                self._stats['flush_ms_total'] += elapsed_ms
+                if error is None:
+                    self._stats['batches'] += 1
+                    self._stats['written'] += len(batch)
+                    self._stats['last_batch_size'] = len(batch)
+                else:
+                    self._stats['failed_batches'] += 1
+                    logger.warning('write_behind: batch of %d failed: %s', len(batch), error)
+                    for p in batch:
+                        p.attempts += 1
+                        # Sync callers get the error; buffered rows are retried a few times
+                        if p.done is None and p.attempts < self.max_retries:
+                            retry.append(p)
+                        elif p.done is None:
+                            self._stats['dropped'] += 1
+                    if retry:
+                        self._queue.extendleft(reversed(retry))
+                        if self._oldest is None:
+                            self._oldest = time.monotonic()
+                self._cond.notify_all()
+            if error is None and self.on_commit is not None:
+                try:
+                    self.on_commit(len(batch))
+                except Exception:
+                    logger.exception('write_behind: on_commit callback failed')
+            for p in batch:
+                if p.done is not None:
+                    p.error = error
+                    p.done.set()
+            if retry and not self._closed:
+                time.sleep(min(1.0, self.flush_interval * 4))
@@ -5,6 +5,7 @@ import Spinner from './Spinner';
 export default function LecturePage() {
   const [url, setUrl] = useState('');
   const [transcript, setTranscript] = useState('');
+  const [segments, setSegments] = useState(null);
   const [summary, setSummary] = useState('');
   const [loading, setLoading] = useState(false);
   const [message, setMessage] = useState('');
@@ -21,6 +22,7 @@ export default function LecturePage() {
       const data = await res.json();
       if (!res.ok) throw new Error(data.error || 'Failed to fetch transcript');
       setTranscript(data.transcript || '');
+      setSegments(data.segments || null);
     } catch (err) {
       setMessage(err.message);
     } finally {
@@ -104,7 +106,7 @@ export default function LecturePage() {
       const res = await fetch('http://localhost:5000/save-lecture', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ title: 'Uploaded Lecture', video_url: url, transcript, summary })
+        body: JSON.stringify({ title: 'Uploaded Lecture', video_url: url, transcript, summary, segments })
       });
       const data = await res.json();
       if (!res.ok) throw new Error(data.error || 'Save failed');
@@ -1,6 +1,8 @@
 import React, { useEffect, useState } from 'react';
 import Spinner from './Spinner';
 
+const API = 'http://localhost:5000';
+
 export default function ModelsStatus({ pollInterval = 3000 }) {
   const [status, setStatus] = useState({ transformers_available: false, summarizer_ready: false, generator_ready: false });
   const [loading, setLoading] = useState(true);
@@ -8,10 +10,12 @@ export default function ModelsStatus({ pollInterval = 3000 }) {
   useEffect(() => {
     let mounted = true;
     let timer = null;
+    let source = null;
 
+    // Fallback for backends without /models/events (or browsers without EventSource)
     const fetchStatus = async () => {
       try {
-        const res = await fetch('http://localhost:5000/models/status');
+        const res = await fetch(`${API}/models/status`);
         if (!mounted) return;
         const data = await res.json();
         setStatus(data);
@@ -27,10 +31,43 @@ export default function ModelsStatus({ pollInterval = 3000 }) {
       }
     };
 
-    fetchStatus();
+    const onModelEvent = (ready) => (e) => {
+      if (!mounted) return;
+      const data = JSON.parse(e.data);
+      const key = data.model === 'summarizer' ? 'summarizer_ready' : 'generator_ready';
+      setStatus((prev) => ({ ...prev, [key]: ready }));
+    };
+
+    if (typeof window !== 'undefined' && window.EventSource) {
+      let opened = false;
+      source = new window.EventSource(`${API}/models/events`);
+      source.onopen = () => { opened = true; };
+      source.addEventListener('status', (e) => {
+        if (!mounted) return;
+        setStatus(JSON.parse(e.data));
+        setLoading(false);
+      });
+      source.addEventListener('ready', onModelEvent(true));
+      source.addEventListener('failed', onModelEvent(false));
+      source.addEventListener('evicted', onModelEvent(false));
+      source.onerror = () => {
+        // EventSource reconnects by itself (sending Last-Event-ID); give up on the
+        // stream if it never opened (an older backend without it) or the server
+        // refused a reconnect (503 when too many streams are open)
+        if (source && (!opened || source.readyState === window.EventSource.CLOSED)) {
+          source.close();
+          source = null;
+          fetchStatus();
+        }
+      };
+    } else {
+      fetchStatus();
+    }
+
     return () => {
       mounted = false;
       if (timer) clearTimeout(timer);
+      if (source) source.close();
     };
   }, [pollInterval]);
 
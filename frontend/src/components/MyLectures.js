@@ -5,7 +5,7 @@ export default function MyLectures() {
 
   const fetchLectures = async () => {
     try {
-      const res = await fetch('http://localhost:5000/my-lectures');
+      const res = await fetch('http://localhost:5000/my-lectures?include=');
       const data = await res.json();
       if (res.ok) setLectures(data.lectures || []);
     } catch (err) {
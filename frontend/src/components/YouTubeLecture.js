@@ -1,62 +1,58 @@
 import React, { useState } from 'react';
 
+const API = 'http://localhost:5000';
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 export default function YouTubeLecture() {
   const [url, setUrl] = useState('');
+  const [lectureId, setLectureId] = useState(null);
   const [transcript, setTranscript] = useState('');
   const [summary, setSummary] = useState('');
+  const [status, setStatus] = useState('');
   const [loading, setLoading] = useState(false);
 
-  const fetchTranscript = async () => {
+  // One round trip: the server fetches the transcript, summarizes and saves it.
+  // A 202 carries a job handle that is polled until the lecture is saved.
+  const ingestLecture = async () => {
     setLoading(true);
+    setLectureId(null);
+    setTranscript('');
+    setSummary('');
+    setStatus('Ingesting...');
     try {
-      const res = await fetch('http://localhost:5000/fetch-transcript', {
+      let res = await fetch(`${API}/ingest-lecture`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ url })
+        body: JSON.stringify({ url, title: url })
       });
-      const data = await res.json();
-      if (res.ok) {
-        setTranscript(data.transcript || '');
-      } else {
-        setTranscript('Error fetching transcript');
+      let data = await res.json();
+      while (res.status === 202) {
+        setStatus(`Still working (${data.status})...`);
+        await sleep(1000 * Number(res.headers.get('Retry-After') || 2));
+        res = await fetch(`${API}${data.status_url}`);
+        data = await res.json();
       }
+      if (!res.ok) throw new Error(data.error || 'Ingest failed');
+      setLectureId(data.lecture_id);
+      setSummary(data.summary || '');
+      setStatus(`Saved lecture ${data.lecture_id} (summary: ${data.source})`);
     } catch (err) {
-      setTranscript('Error: ' + err.message);
+      setStatus('Error: ' + err.message);
     } finally {
       setLoading(false);
     }
   };
 
-  const handleSummarize = async () => {
+  // The transcript is not sent back by /ingest-lecture; load it only when asked for
+  const showTranscript = async () => {
     setLoading(true);
     try {
-      const res = await fetch('http://localhost:5000/summarize', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text: transcript })
-      });
+      const res = await fetch(`${API}/lectures/${lectureId}/segments`);
       const data = await res.json();
-      if (res.ok) setSummary(data.summary || '');
-      else setSummary('Error summarizing');
+      if (res.ok) setTranscript(data.segments.map((s) => s.text).join(' '));
+      else setTranscript(data.error || 'Error fetching transcript');
     } catch (err) {
-      setSummary('Error: ' + err.message);
-    } finally {
-      setLoading(false);
-    }
-  };
-
-  const saveLecture = async () => {
-    setLoading(true);
-    try {
-      const res = await fetch('http://localhost:5000/save-lecture', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ title: url, video_url: url, transcript, summary })
-      });
-      const data = await res.json();
-      alert(data.message || JSON.stringify(data));
-    } catch (err) {
-      alert('Error: ' + err.message);
+      setTranscript('Error: ' + err.message);
     } finally {
       setLoading(false);
     }
@@ -67,18 +63,18 @@ export default function YouTubeLecture() {
       <h3>YouTube Lecture</h3>
       <input style={{ width: '100%' }} placeholder="YouTube URL" value={url} onChange={(e) => setUrl(e.target.value)} />
       <div style={{ marginTop: 8 }}>
-        <button onClick={fetchTranscript} disabled={!url || loading}>Fetch Transcript</button>
-        <button onClick={handleSummarize} disabled={!transcript || loading} style={{ marginLeft: 8 }}>Summarize</button>
-        <button onClick={saveLecture} disabled={!transcript || loading} style={{ marginLeft: 8 }}>Save Lecture</button>
-      </div>
-      <div style={{ marginTop: 12 }}>
-        <h4>Transcript</h4>
-        <pre style={{ maxHeight: 200, overflow: 'auto', background: '#f7f7f7', padding: 8 }}>{transcript}</pre>
+        <button onClick={ingestLecture} disabled={!url || loading}>Add Lecture</button>
+        <button onClick={showTranscript} disabled={!lectureId || loading} style={{ marginLeft: 8 }}>Show Transcript</button>
+        <span style={{ marginLeft: 8 }}>{status}</span>
       </div>
       <div style={{ marginTop: 12 }}>
         <h4>Summary</h4>
         <div style={{ background: '#f7f7f7', padding: 8 }}>{summary}</div>
       </div>
+      <div style={{ marginTop: 12 }}>
+        <h4>Transcript</h4>
+        <pre style={{ maxHeight: 200, overflow: 'auto', background: '#f7f7f7', padding: 8 }}>{transcript}</pre>
+      </div>
     </div>
   );
 }